@@ -4,9 +4,12 @@ from django.apps import AppConfig
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytics'
+    # Models are loaded on first use (or warmed up by web workers) through
+    # backend.model_lifecycle, never while the app registry is populated
 
     def ready(self):
-        """Load fine-tuned BERT model when Django starts"""
-        # Temporarily disabled for faster startup
-        # The model will be loaded on-demand when needed
-        pass
\ No newline at end of file
+        from django.db.models.signals import post_migrate
+        from .icd11_search import create_search_indexes
+
+        # ICD-11 search indexes are expression indexes that no migration tracks
+        post_migrate.connect(create_search_indexes, sender=self)
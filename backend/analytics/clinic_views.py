@@ -3,27 +3,21 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Count, Q
+from django.db.models import Count
 from django.utils import timezone
 from datetime import datetime, timedelta
 import re
-import numpy as np
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm
-# Import statsmodels with error handling
-try:
-    from statsmodels.tsa.seasonal import seasonal_decompose
-    STATSMODELS_AVAILABLE = True
-except ImportError:
-    STATSMODELS_AVAILABLE = False
-    seasonal_decompose = None
 from health_records.models import PermitRequest
 from appointments.models import Appointment
-from .hybrid_icd11_service import hybrid_icd11_detector
+from asgiref.sync import sync_to_async
+from backend.async_views import async_api_view
+from backend.model_lifecycle import get_model, lazy_model
+
+# Constructed on first request instead of at import time
+hybrid_icd11_detector = lazy_model('hybrid_icd11')
+
+# Most texts accepted by one batch detection request
+MAX_DETECTION_BATCH = 500
 
 def generate_colors(num_colors):
     """
@@ -37,6 +31,10 @@ def generate_colors(num_colors):
         list: List of hex color codes
     """
     try:
+        import matplotlib.pyplot as plt
+        import matplotlib.cm as cm
+        import numpy as np
+        
         # Use matplotlib's tab20 colormap for maximum distinction (20 distinct colors)
         # This colormap is specifically designed for categorical data with high contrast
         colors = cm.tab20(np.linspace(0, 1, min(num_colors, 20)))
@@ -59,6 +57,7 @@ def generate_colors(num_colors):
     except Exception as e:
         # Fallback to matplotlib's default color cycle
         try:
+            import matplotlib.pyplot as plt
             default_colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
             # Repeat colors if needed
             while len(default_colors) < num_colors:
@@ -195,14 +194,14 @@ def get_physical_health_trends(request):
         months_back = int(request.GET.get('months', 6))
         start_date = timezone.now() - timedelta(days=months_back * 30)
         
-        # Get completed permit requests within the time range
-        completed_requests = PermitRequest.objects.filter(
+        # Get completed permit requests within the time range (demographics read the student)
+        completed_requests = PermitRequest.objects.select_related('student').filter(
             status='completed',
             date__gte=start_date.date()
         )
         
         # Get completed physical health appointments within the time range
-        completed_appointments = Appointment.objects.filter(
+        completed_appointments = Appointment.objects.select_related('client').filter(
             status='completed',
             service_type='physical',
             date__gte=start_date.date()
@@ -625,17 +624,7 @@ def detect_icd_codes(request):
         )
         
         # Format results for response
-        formatted_results = []
-        for condition in detected_conditions:
-            formatted_results.append({
-                'icd11_code': condition['icd11_code'],
-                'icd11_name': condition['icd11_name'],
-                'confidence': condition.get('confidence', 0.0),
-                'source': condition.get('source', 'local'),
-                'enhanced': condition.get('enhanced', False),
-                'local_terms_matched': condition.get('local_terms_matched', []),
-                'display_name': hybrid_icd11_detector.format_condition_display(condition)
-            })
+        formatted_results = [format_detected_condition(condition) for condition in detected_conditions]
         
         return Response({
             'status': 'success',
@@ -647,9 +636,63 @@ def detect_icd_codes(request):
     except Exception as e:
         return Response({'error': f'Failed to detect ICD codes: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def format_detected_condition(condition):
+    """A detected condition as the ICD detection endpoints return it"""
+    return {
+        'icd11_code': condition['icd11_code'],
+        'icd11_name': condition['icd11_name'],
+        'confidence': condition.get('confidence', 0.0),
+        'source': condition.get('source', 'local'),
+        'enhanced': condition.get('enhanced', False),
+        'local_terms_matched': condition.get('local_terms_matched', []),
+        'display_name': hybrid_icd11_detector.format_condition_display(condition)
+    }
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def detect_icd_codes_realtime(request):
+def detect_icd_codes_batch(request):
+    """
+    ICD-11 code detection for many texts in one request, e.g. to code historical records
+    
+    Takes {"texts": [...]} with at most MAX_DETECTION_BATCH texts and returns one
+    result per text, in the same order. Repeated texts are analysed once, and
+    the hybrid system status is reported once for the whole batch.
+    """
+    if request.user.role not in ['clinic', 'admin']:
+        return Response({'error': 'Only clinic staff and administrators can access this endpoint'}, status=status.HTTP_403_FORBIDDEN)
+    
+    texts = request.data.get('texts')
+    if not isinstance(texts, list) or not texts:
+        return Response({'error': 'texts must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(texts) > MAX_DETECTION_BATCH:
+        return Response({'error': f'At most {MAX_DETECTION_BATCH} texts per request'}, status=status.HTTP_400_BAD_REQUEST)
+    if not all(isinstance(text, str) for text in texts):
+        return Response({'error': 'Every text must be a string'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        detections = hybrid_icd11_detector.detect_conditions_batch(texts)
+        
+        results = []
+        for conditions in detections:
+            formatted_results = [format_detected_condition(condition) for condition in conditions]
+            results.append({
+                'detected_conditions': formatted_results,
+                'total_conditions': len(formatted_results),
+            })
+        
+        return Response({
+            'status': 'success',
+            'results': results,
+            'total_texts': len(texts),
+            'unique_texts': len({text.lower().strip() for text in texts if text.strip()}),
+            'hybrid_system_status': hybrid_icd11_detector.get_service_status()
+        })
+        
+    except Exception as e:
+        return Response({'error': f'Failed to detect ICD codes: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@async_api_view(['POST'])
+async def detect_icd_codes_realtime(request):
     """Real-time ICD-11 code detection for frontend modals"""
     if request.user.role not in ['clinic', 'admin', 'counselor']:
         return Response({'error': 'Only clinic staff, counselors, and administrators can access this endpoint'}, status=status.HTTP_403_FORBIDDEN)
@@ -671,8 +714,11 @@ def detect_icd_codes_realtime(request):
                 'message': 'No text provided for analysis'
             })
         
+        # Loading the detector is CPU-bound; keep it off the event loop
+        detector = await sync_to_async(get_model)('hybrid_icd11')
+        
         # Use hybrid detection with vital signs support
-        detected_conditions = hybrid_icd11_detector.detect_conditions_hybrid(
+        detected_conditions = await detector.adetect_conditions_hybrid(
             combined_text, 
             source_type, 
             vital_signs=vital_signs
@@ -710,7 +756,7 @@ def detect_icd_codes_realtime(request):
             'status': 'success',
             'suggested_diagnoses': suggested_diagnoses,
             'total_detected': len(detected_conditions),
-            'hybrid_system_status': hybrid_icd11_detector.get_service_status()
+            'hybrid_system_status': await sync_to_async(detector.get_service_status)()
         })
         
     except Exception as e:
@@ -755,16 +801,10 @@ def search_icd_codes(request):
                     'local_terms': data['local_terms']
                 })
         
-        # Search in database mappings
+        # Search in database mappings (ranked and indexed, see icd11_search.py)
         try:
-            from .models import ICD11Mapping
-            db_mappings = ICD11Mapping.objects.filter(
-                is_active=True
-            ).filter(
-                Q(code__icontains=query) |
-                Q(description__icontains=query) |
-                Q(local_terms__contains=query)
-            )[:10]
+            from .icd11_search import search_mappings
+            db_mappings = search_mappings(query, 10)
             
             for mapping in db_mappings:
                 # Check if already in results
@@ -798,6 +838,42 @@ def search_icd_codes(request):
     except Exception as e:
         return Response({'error': f'Failed to search ICD codes: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def autocomplete_icd_codes(request):
+    """
+    Suggest ICD-11 codes while a diagnosis is typed
+    
+    ?q= is a code prefix or the start of one or more words of the diagnosis;
+    ?limit= defaults to 10 (at most 50).
+    """
+    if request.user.role not in ['clinic', 'admin', 'counselor']:
+        return Response({'error': 'Only clinic staff, counselors, and administrators can access this endpoint'}, status=status.HTTP_403_FORBIDDEN)
+    
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return Response({'status': 'success', 'query': query, 'suggestions': []})
+    
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        from .icd11_search import autocomplete_mappings
+        suggestions = [
+            {
+                'code': mapping['code'],
+                'name': mapping['description'],
+                'confidence_score': mapping['confidence_score'],
+            }
+            for mapping in autocomplete_mappings(query, limit)
+        ]
+        return Response({'status': 'success', 'query': query, 'suggestions': suggestions})
+        
+    except Exception as e:
+        return Response({'error': f'Failed to autocomplete ICD codes: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def update_appointment_documentation(request, appointment_id):
@@ -913,8 +989,8 @@ def update_health_record_assessment(request, permit_id):
         # Handle email sending for send_home outcome
         if outcome == 'send_home' and parent_email:
             try:
-                from django.core.mail import send_mail
                 from django.conf import settings
+                from website.outbox import queue_email
                 
                 # print(f"Attempting to send email to {parent_email} for permit {permit_id}")
                 # print(f"Email settings: HOST={settings.EMAIL_HOST}, PORT={settings.EMAIL_PORT}, USER={settings.EMAIL_HOST_USER}")
@@ -961,9 +1037,10 @@ def update_health_record_assessment(request, permit_id):
                 else:
                     vital_signs_text = "Not recorded"
                 
-                send_mail(
+                # Delivered by the send_outbox worker; the request only queues it
+                queue_email(
                     subject='Student Sent Home - Notification',
-                    message=f'''
+                    body=f'''
 Dear Parent/Guardian,
 
 Your child {permit_request.student.full_name} has been assessed by the school nurse and requires to be sent home for medical attention.
@@ -983,14 +1060,14 @@ Please arrange to pick up your child from school.
 Thank you,
 IETI School Health Office
                     ''',
+                    recipients=[parent_email],
                     from_email=settings.EMAIL_HOST_USER,
-                    recipient_list=[parent_email],
-                    fail_silently=False,
+                    category='parent_notification',
                 )
                 # print(f"Email sent successfully to {parent_email} for permit {permit_id}")
             except Exception as e:
                 # print(f"Failed to send email for permit {permit_id}: {str(e)}")
-                return Response({'error': f'Failed to send email: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                return Response({'error': f'Failed to queue email: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
         # Set status to completed
         permit_request.status = 'completed'
@@ -1101,6 +1178,8 @@ def _prepare_analytics_data(completed_requests, completed_appointments, months_b
 def _perform_predictive_analytics(data):
     """Perform predictive analytics using multiple algorithms"""
     try:
+        import pandas as pd
+        
         predictions = {
             'linear_regression': {},
             'random_forest': {},
@@ -1149,6 +1228,10 @@ def _perform_predictive_analytics(data):
 def _linear_regression_analysis(df):
     """Perform Linear Regression analysis"""
     try:
+        import numpy as np
+        import pandas as pd
+        from sklearn.linear_model import LinearRegression
+        
         # Prepare features (month as numeric)
         df['month_numeric'] = pd.to_datetime(df['month']).dt.to_period('M').astype(int)
         
@@ -1185,6 +1268,9 @@ def _linear_regression_analysis(df):
 def _random_forest_analysis(df):
     """Perform Random Forest analysis"""
     try:
+        import pandas as pd
+        from sklearn.ensemble import RandomForestRegressor
+        
         # Prepare features
         df['month_numeric'] = pd.to_datetime(df['month']).dt.to_period('M').astype(int)
         df['condition_encoded'] = df['condition'].astype('category').cat.codes
@@ -1231,8 +1317,12 @@ def _random_forest_analysis(df):
 def _seasonal_decomposition_analysis(df):
     """Perform Seasonal Decomposition analysis"""
     try:
-        if not STATSMODELS_AVAILABLE:
+        try:
+            from statsmodels.tsa.seasonal import seasonal_decompose
+        except ImportError:
             return {'error': 'statsmodels not available for seasonal decomposition'}
+        import numpy as np
+        import pandas as pd
         
         # Prepare time series data
         df['month_numeric'] = pd.to_datetime(df['month']).dt.to_period('M').astype(int)
@@ -12,12 +12,10 @@ import calendar
 
 from chatbot.models import AnonymizedConversationMetadata, KeywordFlag
 from .models import MentalHealthAlert
-from mood_tracker.models import MoodEntry
-from wellness_journey.models import DailyTask
 from appointments.models import Appointment
 from appointments.serializers import AppointmentSerializer
 from website.models import User
-from .predictive_analytics import PredictiveAmietiEngagementAnalytics
+from .trend_engine import compute_monthly_trends
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -48,305 +46,8 @@ def mental_health_trends(request):
     else:
         end_date = timezone.now().date()
     
-    # 1. Get mental health alerts (existing)
-    alerts = MentalHealthAlert.objects.filter(
-        created_at__date__gte=start_date,
-        created_at__date__lte=end_date
-    )
-    
-    # 2. Get flagged keywords from chatbot conversations (including new rule-based flow)
-    keyword_flags = KeywordFlag.objects.filter(
-        detected_at__date__gte=start_date,
-        detected_at__date__lte=end_date
-    )
-    
-    # 3. Get mood tracker data (NEW)
-    mood_entries = MoodEntry.objects.filter(
-        date__gte=start_date,
-        date__lte=end_date
-    )
-    
-    # 4. Get wellness journey data (NEW)
-    daily_tasks = DailyTask.objects.filter(
-        date__gte=start_date,
-        date__lte=end_date
-    )
-    
-    # 5. Get anonymized chatbot conversation metadata
-    chatbot_conversations = AnonymizedConversationMetadata.objects.filter(
-        started_at__date__gte=start_date,
-        started_at__date__lte=end_date,
-        conversation_type__in=['mental_health', 'chat_with_me', 'general']  # Include all conversation types
-    )
-    
     # Group by month and combine same terms across all categories
-    monthly_data = defaultdict(lambda: defaultdict(int))
-    
-    # Define negative keywords for chatbot - include English keywords from keywords.json
-    negative_keywords = [
-        'stress', 'stressed', 'pressure', 'overwhelmed', 'burden', 'exhausted', 'tired', 'overworked',
-        'anxiety', 'anxious', 'worried', 'nervous', 'panic', 'fear', 'scared', 'restless',
-        'depressed', 'sad', 'hopeless', 'worthless', 'empty', 'lonely', 'down', 'miserable',
-        'bullying', 'bullied', 'harassment', 'teasing', 'picked on', 'mean', 'hurt me',
-        'suicide', 'kill myself', 'end it all', 'die', 'death', 'hurt myself', 'self harm',
-        'self harm', 'cut myself', 'cutting', 'hurt myself', 'self injury', 'harm myself',
-        'eating disorder', 'starving', 'binge', 'purge', 'fat', 'ugly', 'body image',
-        'sawang sawa na ako', 'wala akong silbi', 'pangit ako', 'walang nagmamahal sa akin',
-        'nobody cares', 'hate myself', 'i\'m worthless', 'pagod na pagod ako sa buhay',
-        'walang kwenta lahat', 'iniwan ako', 'hindi ako mahalaga', 'ayoko lumabas',
-        'wala akong kaibigan', 'di ako mahal ng pamilya ko', 'ayoko makipag-usap kahit kanino',
-        'gusto ko mag-isa lang', 'lagi akong malungkot', 'di ko maintindihan sarili ko',
-        'takot ako', 'kinakabahan ako araw-araw', 'di ko alam gagawin ko', 'depressed ako',
-        'sobrang lungkot', 'naiiyak ako', 'nai-stress ako sobra', 'i feel empty',
-        'wala akong gana', 'hindi ako okay', 'not okay', 'broken ako', 'heartbroken',
-        'iniwan sa ere', 'gusto ko mawala pero di ko alam paano', 'napapaisip ako sa buhay',
-        'nasa dark place ako', 'wala akong pag-asa', 'i hate my life', 'galit ako sa sarili ko',
-        'mali lagi ako', 'lahat mali', 'gusto ko nang mamatay', 'ayoko na mabuhay',
-        'magpapakamatay ako', 'tapos na ako sa lahat', 'wala nang kwenta buhay ko',
-        'wala na akong rason mabuhay', 'i want to die', 'magpapaalam na ako', 'paalam na',
-        'goodbye world', 'magwawakas na lahat', 'di ko na kaya', 'wala nang pag-asa',
-        'susuko na ako', 'mag-aalay ng buhay', 'i\'m ending it', 'lahat iiwan ko na',
-        'time to go', 'sawa na ako sa lahat', 'ayoko na goodbye', 'gbye world',
-        'maglalaho na lang ako', 'i will end it all', 'wala na akong silbi',
-        'gusto ko mawala', 'bye forever', 'di niyo na ako makikita', 'final goodbye',
-        'end life', 'ayoko na tapos na', 'ubos na ako', 'magpakamatay', 'i just wanna die',
-        'see you in another life', 'lahat ng sakit tatapusin ko na', 'mamamatay na lang ako'
-    ]
-    
-    # Process mental health alerts (group by specific reasons from keywords, title, or description)
-    for alert in alerts:
-        month_key = alert.created_at.strftime('%b')
-        
-        # Try to get the specific reason from multiple sources
-        specific_reason = None
-        
-        # 1. First try to get from related_keywords
-        if alert.related_keywords:
-            keywords = alert.related_keywords
-            if isinstance(keywords, list) and keywords:
-                # Try each keyword until we find a valid mental health term
-                for keyword in keywords:
-                    if isinstance(keyword, str) and keyword.lower() in negative_keywords:
-                        specific_reason = keyword.lower()
-                        break
-            elif isinstance(keywords, str):
-                # Split by comma and check each keyword
-                keyword_list = [k.strip().lower() for k in keywords.split(',')]
-                for keyword in keyword_list:
-                    if keyword in negative_keywords:
-                        specific_reason = keyword
-                        break
-        
-        # 2. If no keywords, try to extract from title with expanded search
-        if not specific_reason and alert.title:
-            title_lower = alert.title.lower()
-            # Expanded list of mental health terms to search for
-            expanded_mental_health_terms = [
-                'stress', 'stressed', 'stressful', 'anxiety', 'anxious', 'depression', 'depressed', 
-                'suicide', 'suicidal', 'self-harm', 'self harm', 'bullying', 'bullied', 'lonely', 
-                'loneliness', 'sad', 'sadness', 'worried', 'worry', 'overwhelmed', 'overwhelm',
-                'angry', 'anger', 'fear', 'fearful', 'panic', 'panicked', 'hopeless', 'hopelessness',
-                'worthless', 'worthlessness', 'tired', 'exhausted', 'burnout', 'burn out',
-                'afraid', 'scared', 'terrified', 'nervous', 'nervousness', 'tense', 'tension',
-                'frustrated', 'frustration', 'irritated', 'irritation', 'upset', 'disappointed',
-                'disappointment', 'hurt', 'pain', 'suffering', 'struggling', 'struggle',
-                'difficult', 'difficulty', 'hard', 'challenging', 'challenge', 'problem',
-                'problems', 'issue', 'issues', 'concern', 'concerns', 'trouble', 'troubles'
-            ]
-            
-            for term in expanded_mental_health_terms:
-                if term in title_lower:
-                    # Map similar terms to our standard terms
-                    term_mapping = {
-                        'stressed': 'stress', 'stressful': 'stress',
-                        'anxious': 'anxiety',
-                        'depressed': 'depression',
-                        'suicidal': 'suicide',
-                        'self harm': 'self-harm',
-                        'bullied': 'bullying',
-                        'loneliness': 'lonely',
-                        'sadness': 'sad',
-                        'worry': 'worried',
-                        'overwhelm': 'overwhelmed',
-                        'anger': 'angry',
-                        'fearful': 'fear',
-                        'panicked': 'panic',
-                        'hopelessness': 'hopeless',
-                        'worthlessness': 'worthless',
-                        'exhausted': 'tired',
-                        'burn out': 'burnout',
-                        'afraid': 'fear', 'scared': 'fear', 'terrified': 'fear',
-                        'nervous': 'anxiety', 'nervousness': 'anxiety',
-                        'tense': 'stress', 'tension': 'stress',
-                        'frustrated': 'angry', 'frustration': 'angry',
-                        'irritated': 'angry', 'irritation': 'angry',
-                        'upset': 'sad', 'disappointed': 'sad', 'disappointment': 'sad',
-                        'hurt': 'sad', 'pain': 'sad', 'suffering': 'sad',
-                        'struggling': 'stress', 'struggle': 'stress',
-                        'difficult': 'stress', 'difficulty': 'stress',
-                        'hard': 'stress', 'challenging': 'stress', 'challenge': 'stress',
-                        'problem': 'stress', 'problems': 'stress',
-                        'issue': 'stress', 'issues': 'stress',
-                        'concern': 'worried', 'concerns': 'worried',
-                        'trouble': 'stress', 'troubles': 'stress'
-                    }
-                    specific_reason = term_mapping.get(term, term)
-                    break
-        
-        # 3. If still no specific reason, try to extract from description with expanded search
-        if not specific_reason and alert.description:
-            desc_lower = alert.description.lower()
-            # Use the same expanded list and mapping as above
-            expanded_mental_health_terms = [
-                'stress', 'stressed', 'stressful', 'anxiety', 'anxious', 'depression', 'depressed', 
-                'suicide', 'suicidal', 'self-harm', 'self harm', 'bullying', 'bullied', 'lonely', 
-                'loneliness', 'sad', 'sadness', 'worried', 'worry', 'overwhelmed', 'overwhelm',
-                'angry', 'anger', 'fear', 'fearful', 'panic', 'panicked', 'hopeless', 'hopelessness',
-                'worthless', 'worthlessness', 'tired', 'exhausted', 'burnout', 'burn out',
-                'afraid', 'scared', 'terrified', 'nervous', 'nervousness', 'tense', 'tension',
-                'frustrated', 'frustration', 'irritated', 'irritation', 'upset', 'disappointed',
-                'disappointment', 'hurt', 'pain', 'suffering', 'struggling', 'struggle',
-                'difficult', 'difficulty', 'hard', 'challenging', 'challenge', 'problem',
-                'problems', 'issue', 'issues', 'concern', 'concerns', 'trouble', 'troubles'
-            ]
-            
-            for term in expanded_mental_health_terms:
-                if term in desc_lower:
-                    # Use the same mapping as above
-                    term_mapping = {
-                        'stressed': 'stress', 'stressful': 'stress',
-                        'anxious': 'anxiety',
-                        'depressed': 'depression',
-                        'suicidal': 'suicide',
-                        'self harm': 'self-harm',
-                        'bullied': 'bullying',
-                        'loneliness': 'lonely',
-                        'sadness': 'sad',
-                        'worry': 'worried',
-                        'overwhelm': 'overwhelmed',
-                        'anger': 'angry',
-                        'fearful': 'fear',
-                        'panicked': 'panic',
-                        'hopelessness': 'hopeless',
-                        'worthlessness': 'worthless',
-                        'exhausted': 'tired',
-                        'burn out': 'burnout',
-                        'afraid': 'fear', 'scared': 'fear', 'terrified': 'fear',
-                        'nervous': 'anxiety', 'nervousness': 'anxiety',
-                        'tense': 'stress', 'tension': 'stress',
-                        'frustrated': 'angry', 'frustration': 'angry',
-                        'irritated': 'angry', 'irritation': 'angry',
-                        'upset': 'sad', 'disappointed': 'sad', 'disappointment': 'sad',
-                        'hurt': 'sad', 'pain': 'sad', 'suffering': 'sad',
-                        'struggling': 'stress', 'struggle': 'stress',
-                        'difficult': 'stress', 'difficulty': 'stress',
-                        'hard': 'stress', 'challenging': 'stress', 'challenge': 'stress',
-                        'problem': 'stress', 'problems': 'stress',
-                        'issue': 'stress', 'issues': 'stress',
-                        'concern': 'worried', 'concerns': 'worried',
-                        'trouble': 'stress', 'troubles': 'stress'
-                    }
-                    specific_reason = term_mapping.get(term, term)
-                    break
-        
-        # 4. If still no specific reason, try to extract from related conversation messages
-        if not specific_reason and alert.related_conversation:
-            # Get all messages from the related conversation
-            conversation_messages = alert.related_conversation.messages.all()
-            for message in conversation_messages:
-                if message.sender == 'user':  # Only check user messages
-                    message_lower = message.content.lower()
-                    # Use the same expanded search as above
-                    expanded_mental_health_terms = [
-                        'stress', 'stressed', 'stressful', 'anxiety', 'anxious', 'depression', 'depressed', 
-                        'suicide', 'suicidal', 'self-harm', 'self harm', 'bullying', 'bullied', 'lonely', 
-                        'loneliness', 'sad', 'sadness', 'worried', 'worry', 'overwhelmed', 'overwhelm',
-                        'angry', 'anger', 'fear', 'fearful', 'panic', 'panicked', 'hopeless', 'hopelessness',
-                        'worthless', 'worthlessness', 'tired', 'exhausted', 'burnout', 'burn out',
-                        'afraid', 'scared', 'terrified', 'nervous', 'nervousness', 'tense', 'tension',
-                        'frustrated', 'frustration', 'irritated', 'irritation', 'upset', 'disappointed',
-                        'disappointment', 'hurt', 'pain', 'suffering', 'struggling', 'struggle',
-                        'difficult', 'difficulty', 'hard', 'challenging', 'challenge', 'problem',
-                        'problems', 'issue', 'issues', 'concern', 'concerns', 'trouble', 'troubles'
-                    ]
-                    
-                    for term in expanded_mental_health_terms:
-                        if term in message_lower:
-                            # Use the same mapping as above
-                            term_mapping = {
-                                'stressed': 'stress', 'stressful': 'stress',
-                                'anxious': 'anxiety',
-                                'depressed': 'depression',
-                                'suicidal': 'suicide',
-                                'self harm': 'self-harm',
-                                'bullied': 'bullying',
-                                'loneliness': 'lonely',
-                                'sadness': 'sad',
-                                'worry': 'worried',
-                                'overwhelm': 'overwhelmed',
-                                'anger': 'angry',
-                                'fearful': 'fear',
-                                'panicked': 'panic',
-                                'hopelessness': 'hopeless',
-                                'worthlessness': 'worthless',
-                                'exhausted': 'tired',
-                                'burn out': 'burnout',
-                                'afraid': 'fear', 'scared': 'fear', 'terrified': 'fear',
-                                'nervous': 'anxiety', 'nervousness': 'anxiety',
-                                'tense': 'stress', 'tension': 'stress',
-                                'frustrated': 'angry', 'frustration': 'angry',
-                                'irritated': 'angry', 'irritation': 'angry',
-                                'upset': 'sad', 'disappointed': 'sad', 'disappointment': 'sad',
-                                'hurt': 'sad', 'pain': 'sad', 'suffering': 'sad',
-                                'struggling': 'stress', 'struggle': 'stress',
-                                'difficult': 'stress', 'difficulty': 'stress',
-                                'hard': 'stress', 'challenging': 'stress', 'challenge': 'stress',
-                                'problem': 'stress', 'problems': 'stress',
-                                'issue': 'stress', 'issues': 'stress',
-                                'concern': 'worried', 'concerns': 'worried',
-                                'trouble': 'stress', 'troubles': 'stress'
-                            }
-                            specific_reason = term_mapping.get(term, term)
-                            break
-                    if specific_reason:
-                        break
-        
-        # Only count if we found a specific reason - skip generic alert types
-        if specific_reason:
-            monthly_data[month_key][specific_reason] += 1
-    
-    # Process flagged keywords from chatbot conversations (including new rule-based flow)
-    for flag in keyword_flags:
-        month_key = flag.detected_at.strftime('%b')
-        if flag.keyword.lower() in negative_keywords:
-            specific_keyword = flag.keyword.lower()
-            # Store without category prefix - just the specific term
-            monthly_data[month_key][specific_keyword] += 1
-    
-    # Process mood tracker data (group by specific mood)
-    for mood_entry in mood_entries:
-        month_key = mood_entry.date.strftime('%b')
-        if mood_entry.mood in ['sad', 'angry']:
-            specific_mood = mood_entry.mood
-            # Store without category prefix - just the specific term
-            monthly_data[month_key][specific_mood] += 1
-    
-    # Process wellness journey data (0 activities for the day counts as negative case)
-    # Group tasks by user and date to check if user had any activities
-    user_daily_activities = defaultdict(set)
-    for task in daily_tasks:
-        user_daily_activities[(task.user.id, task.date)].add(task.completed)
-    
-    for (user_id, task_date), completions in user_daily_activities.items():
-        month_key = task_date.strftime('%b')
-        # If user has no completed activities for the day, count as negative case
-        if not any(completions):  # All tasks are False (not completed)
-            monthly_data[month_key]['wellness_no_activities'] += 1
-    
-    # Process chatbot conversations (count as "Conversations" category)
-    for conv in chatbot_conversations:
-        month_key = conv.started_at.strftime('%b')
-        monthly_data[month_key]['conversations'] += 1
+    monthly_data = compute_monthly_trends(start_date, end_date)
     
     # Generate labels (months) - Always show full academic year
     labels = []
@@ -748,10 +449,15 @@ def risk_assessment(request):
         'wala ako sa mood', 'na-off ako', 'meh lang', 'hassle', 'tinatamad bumangon', 'need pahinga'
     ]
     
-    # Count flagged keywords by risk level
-    high_risk_flags = flagged_keywords.filter(keyword__in=high_risk_keywords).count()
-    medium_risk_flags = flagged_keywords.filter(keyword__in=moderate_risk_keywords).count()
-    low_risk_flags = flagged_keywords.filter(keyword__in=low_risk_keywords).count()
+    # Count flagged keywords by risk level in a single aggregate query
+    flag_counts = flagged_keywords.aggregate(
+        high=Count('id', filter=Q(keyword__in=high_risk_keywords)),
+        medium=Count('id', filter=Q(keyword__in=moderate_risk_keywords)),
+        low=Count('id', filter=Q(keyword__in=low_risk_keywords)),
+    )
+    high_risk_flags = flag_counts['high']
+    medium_risk_flags = flag_counts['medium']
+    low_risk_flags = flag_counts['low']
     
     # Calculate risk levels from alerts (matching the rule-based chatbot severity levels)
     high_risk_alerts = alerts.filter(severity='high').count()
@@ -1086,6 +792,8 @@ def chatbot_engagement(request):
     
     # Generate predictive analytics insights
     try:
+        # pandas and scikit-learn are only imported when insights are requested
+        from .predictive_analytics import PredictiveAmietiEngagementAnalytics
         predictive_analytics = PredictiveAmietiEngagementAnalytics()
         engagement_data = {
             'labels': labels,
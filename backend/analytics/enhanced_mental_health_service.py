@@ -5,20 +5,20 @@ Uses official WHO ICD-11 dataset and BERT model for accurate mental health condi
 
 import re
 import json
-import pandas as pd
 import numpy as np
 import torch
 from typing import List, Dict, Tuple, Optional
-from django.conf import settings
-from django.db.models import Q
-from analytics.models import ICD11Mapping, ICD11Entity
+from analytics.icd11_snapshot import icd11_reference
 import logging
-import os
-from transformers import AutoTokenizer, AutoModel, AutoModelForSequenceClassification
+from backend.metrics import track_task
+from backend.model_lifecycle import acquire_pretrained, lazy_model
 from sklearn.metrics.pairwise import cosine_similarity
 
 logger = logging.getLogger(__name__)
 
+# Chapter 6 titles embedded per BERT forward pass
+TITLE_EMBEDDING_BATCH_SIZE = 64
+
 class EnhancedMentalHealthDetector:
     """
     Enhanced mental health detector with BERT integration and official ICD-11 codes
@@ -32,6 +32,7 @@ class EnhancedMentalHealthDetector:
         self.bert_model = None
         self.bert_tokenizer = None
         self.bert_loaded = False
+        self._title_embeddings = None  # Chapter 6 title embeddings, computed on first use
         
         # Load database mappings
         self._load_database_mappings()
@@ -206,65 +207,23 @@ class EnhancedMentalHealthDetector:
     def _load_official_icd11_dataset(self):
         """Load official ICD-11 dataset for Chapter 6 mental health conditions"""
         try:
-            dataset_path = os.path.join(settings.BASE_DIR, '..', 'datasets', 'icd11_conditions.csv')
+            # Titles of the ChapterNo 6 rows, parsed once per process or read from the ICD-11 snapshot
+            self.condition_texts = icd11_reference().chapter6_titles
             
-            if os.path.exists(dataset_path):
-                df = pd.read_csv(dataset_path)
-                
-                # Filter for Chapter 6 mental health conditions
-                self.chapter6_conditions = df[df['ChapterNo'] == 6].copy()
-                
-                # Create embeddings for BERT matching
-                self.condition_embeddings = {}
-                self.condition_texts = {}
-                
-                for _, row in self.chapter6_conditions.iterrows():
-                    if pd.notna(row['Code']) and pd.notna(row['Title']):
-                        code = row['Code']
-                        title = row['Title']
-                        
-                        # Store condition data
-                        self.condition_texts[code] = title
-                        
-                        # Create text for embedding
-                        text = f"{title}"
-                        if pd.notna(row.get('Definition', '')):
-                            text += f" {row['Definition']}"
-                        
-                        self.condition_embeddings[code] = text
-                
-                logger.info(f"Loaded {len(self.chapter6_conditions)} Chapter 6 mental health conditions from official ICD-11 dataset")
-            else:
-                logger.warning(f"ICD-11 dataset not found at {dataset_path}")
-                self.chapter6_conditions = pd.DataFrame()
-                self.condition_embeddings = {}
-                self.condition_texts = {}
+            # Text for BERT matching; the dataset has no definition column, so the title alone
+            self.condition_embeddings = self.condition_texts
+            
+            logger.info(f"Loaded {len(self.condition_texts)} Chapter 6 mental health conditions from official ICD-11 dataset")
                 
         except Exception as e:
             logger.error(f"Error loading ICD-11 dataset: {str(e)}")
-            self.chapter6_conditions = pd.DataFrame()
             self.condition_embeddings = {}
             self.condition_texts = {}
     
     def _load_database_mappings(self):
         """Load mental health mappings from database"""
         try:
-            self.db_mappings = {}
-            mappings = ICD11Mapping.objects.filter(
-                Q(code__startswith='6') | Q(code__startswith='MB'),
-                is_active=True
-            ).values('code', 'description', 'local_terms', 'confidence_score', 'source')
-            
-            for mapping in mappings:
-                code = mapping['code']
-                self.db_mappings[code] = {
-                    'code': code,
-                    'name': mapping['description'],
-                    'local_terms': mapping['local_terms'],
-                    'confidence_score': mapping['confidence_score'],
-                    'source': mapping['source']
-                }
-            
+            self.db_mappings = icd11_reference().mental_health_mappings
             logger.info(f"Loaded {len(self.db_mappings)} mental health mappings from database")
             
         except Exception as e:
@@ -278,11 +237,8 @@ class EnhancedMentalHealthDetector:
                 return
             
             model_name = "bert-base-multilingual-cased"
-            self.bert_tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.bert_model = AutoModel.from_pretrained(model_name)
-            
-            # Set to evaluation mode
-            self.bert_model.eval()
+            # One read-only copy per process, already in evaluation mode
+            self.bert_tokenizer, self.bert_model = acquire_pretrained(model_name)
             self.bert_loaded = True
             
             logger.info("BERT model loaded successfully for mental health detection")
@@ -412,25 +368,21 @@ class EnhancedMentalHealthDetector:
         
         return detected_conditions
     
+    @track_task('enhanced_mental_health_bert')
     def _detect_with_bert(self, text: str) -> List[Dict[str, any]]:
         """Detect using BERT semantic matching"""
         if not self.bert_loaded:
             return []
         
         try:
-            # Get text embedding
-            text_embedding = self.get_text_embedding(text)
+            title_embeddings = self._condition_title_embeddings()
+            if not title_embeddings:
+                return []
+            codes, matrix = title_embeddings
             
-            # Get condition embeddings
-            condition_embeddings = {}
-            for code, condition_text in self.condition_embeddings.items():
-                condition_embeddings[code] = self.get_text_embedding(condition_text)
-            
-            # Calculate similarities
-            similarities = []
-            for code, cond_embedding in condition_embeddings.items():
-                similarity = cosine_similarity(text_embedding, cond_embedding)[0][0]
-                similarities.append((code, similarity))
+            # Cosine similarity of the text with every Chapter 6 title
+            text_embedding = self.get_text_embedding(text)
+            similarities = list(zip(codes, cosine_similarity(text_embedding, matrix)[0].tolist()))
             
             # Sort by similarity and get top matches
             similarities.sort(key=lambda x: x[1], reverse=True)
@@ -455,6 +407,42 @@ class EnhancedMentalHealthDetector:
             logger.error(f"Error in BERT detection: {str(e)}")
             return []
     
+    def _condition_title_embeddings(self):
+        """
+        Embeddings of the Chapter 6 titles, computed once per detector
+        
+        Returns:
+            Tuple or None: (codes, matrix of their embeddings), None if there are no titles or they cannot be computed
+        """
+        if self._title_embeddings is None and self.condition_embeddings:
+            codes = list(self.condition_embeddings)
+            titles = [self.condition_embeddings[code] for code in codes]
+            try:
+                batches = [
+                    self._embed_titles(titles[start:start + TITLE_EMBEDDING_BATCH_SIZE])
+                    for start in range(0, len(titles), TITLE_EMBEDDING_BATCH_SIZE)
+                ]
+            except Exception as e:
+                logger.error(f"Error embedding ICD-11 condition titles: {str(e)}")
+                return None
+            self._title_embeddings = (codes, np.vstack(batches))
+        return self._title_embeddings
+    
+    def _embed_titles(self, titles: List[str]) -> np.ndarray:
+        """Embed a batch of titles; the mean skips padding, so rows match get_text_embedding() up to float rounding"""
+        inputs = self.bert_tokenizer(
+            titles,
+            truncation=True,
+            padding=True,
+            max_length=512,
+            return_tensors="pt"
+        )
+        with torch.no_grad():
+            outputs = self.bert_model(**inputs)
+            mask = inputs['attention_mask'].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+            embeddings = (outputs.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+            return embeddings.numpy()
+    
     def _detect_from_database(self, text_lower: str) -> List[Dict[str, any]]:
         """Detect using database mappings"""
         detected_conditions = []
@@ -482,25 +470,24 @@ class EnhancedMentalHealthDetector:
         detected_conditions = []
         
         # Simple keyword matching against official dataset
-        for _, row in self.chapter6_conditions.iterrows():
-            if pd.notna(row['Code']) and pd.notna(row['Title']):
-                title_lower = row['Title'].lower()
+        for code, title in self.condition_texts.items():
+            title_lower = title.lower()
+            
+            # Check for keyword matches
+            if any(word in title_lower for word in text_lower.split() if len(word) > 3):
+                risk_level = self._determine_risk_level_from_condition(title)
+                interventions = self._get_interventions_for_condition(title, risk_level)
                 
-                # Check for keyword matches
-                if any(word in title_lower for word in text_lower.split() if len(word) > 3):
-                    risk_level = self._determine_risk_level_from_condition(row['Title'])
-                    interventions = self._get_interventions_for_condition(row['Title'], risk_level)
-                    
-                    detected_conditions.append({
-                        'condition': row['Title'],
-                        'icd11_code': row['Code'],
-                        'icd11_name': row['Title'],
-                        'confidence': 'low',
-                        'confidence_score': 0.4,
-                        'source': 'official_dataset',
-                        'risk_level': risk_level,
-                        'interventions': interventions
-                    })
+                detected_conditions.append({
+                    'condition': title,
+                    'icd11_code': code,
+                    'icd11_name': title,
+                    'confidence': 'low',
+                    'confidence_score': 0.4,
+                    'source': 'official_dataset',
+                    'risk_level': risk_level,
+                    'interventions': interventions
+                })
         
         return detected_conditions
     
@@ -584,5 +571,5 @@ class EnhancedMentalHealthDetector:
         """Get top suggested diagnoses"""
         return conditions[:limit]
 
-# Global instance
-enhanced_mental_health_detector = EnhancedMentalHealthDetector()
+# Global instance, constructed on first use by backend.model_lifecycle
+enhanced_mental_health_detector = lazy_model('enhanced_mental_health')
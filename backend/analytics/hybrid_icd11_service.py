@@ -3,10 +3,14 @@ Enhanced Hybrid ICD-11 Service with NLP Integration
 Combines local NLP detection with WHO API for comprehensive medical condition analysis
 """
 
+import asyncio
 import os
 import re
 import time
 import logging
+from asgiref.sync import sync_to_async
+from backend.metrics import track_task
+from backend.model_lifecycle import lazy_model
 import requests
 import numpy as np
 from typing import List, Dict, Optional, Tuple, Any
@@ -22,6 +26,15 @@ from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+# Texts per padded forward pass in batch detection; bounds activation memory
+MODEL_BATCH_SIZE = 32
+
+def _normalize_rows(matrix):
+    """Scale each row to unit length so a matrix product gives cosine similarities; zero rows stay zero"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
 class HybridICD11Detector:
     """
     Enhanced hybrid ICD-11 detector with NLP integration and multi-language support
@@ -43,6 +56,7 @@ class HybridICD11Detector:
         self.fine_tuned_tokenizer = None
         self.label_mapping = None
         self._models_loaded = False
+        self._condition_embeddings = None  # Enhanced-mapping embeddings, computed on first use
         
         # Don't load BERT models on init - use lazy loading instead
         
@@ -285,21 +299,20 @@ class HybridICD11Detector:
         """Load the BERT model for enhanced text processing with ICD-11 medical specialization"""
         try:
             import torch
-            from transformers import AutoTokenizer, AutoModel, AutoModelForSequenceClassification
             from sklearn.metrics.pairwise import cosine_similarity
             import numpy as np
+            from backend.model_lifecycle import acquire_pretrained
             
-            # Load BERT model and tokenizer
+            # Load BERT model and tokenizer (shared with the other detectors)
             self.model_name = "bert-base-multilingual-cased"
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.base_model = AutoModel.from_pretrained(self.model_name)
+            self.tokenizer, self.base_model = acquire_pretrained(self.model_name)
             
             # Load fine-tuned model for ICD-11 classification (if available)
             try:
                 # Check if fine-tuned model exists
                 fine_tuned_path = os.path.join(settings.BASE_DIR, 'analytics', 'models', 'icd11_bert_finetuned')
                 if os.path.exists(fine_tuned_path):
-                    self.fine_tuned_model = AutoModelForSequenceClassification.from_pretrained(fine_tuned_path)
+                    _, self.fine_tuned_model = acquire_pretrained(fine_tuned_path, 'sequence_classification')
                     self.fine_tuned_loaded = True
                     logger.info("Loaded fine-tuned BERT model for ICD-11 classification")
                 else:
@@ -475,9 +488,9 @@ class HybridICD11Detector:
         """Load BERT models for semantic analysis and fine-tuned classification"""
         try:
             import torch
-            from transformers import AutoTokenizer, AutoModel, AutoModelForSequenceClassification
             import json
             import os
+            from backend.model_lifecycle import acquire_pretrained
             
             # Get model paths
             base_path = os.path.join(os.path.dirname(__file__), 'models')
@@ -486,8 +499,9 @@ class HybridICD11Detector:
             # Load fine-tuned model
             if os.path.exists(fine_tuned_path):
                 try:
-                    self.fine_tuned_tokenizer = AutoTokenizer.from_pretrained(fine_tuned_path)
-                    self.fine_tuned_model = AutoModelForSequenceClassification.from_pretrained(fine_tuned_path)
+                    self.fine_tuned_tokenizer, self.fine_tuned_model = acquire_pretrained(
+                        fine_tuned_path, 'sequence_classification'
+                    )
                     
                     # Load label mapping
                     label_mapping_path = os.path.join(fine_tuned_path, 'label_mapping.json')
@@ -501,8 +515,7 @@ class HybridICD11Detector:
             
             # Load base BERT model for semantic analysis
             try:
-                self.bert_tokenizer = AutoTokenizer.from_pretrained(self.nlp_model_name)
-                self.bert_model = AutoModel.from_pretrained(self.nlp_model_name)
+                self.bert_tokenizer, self.bert_model = acquire_pretrained(self.nlp_model_name)
                 logger.info("Base BERT model loaded successfully")
             except Exception as e:
                 logger.warning(f"Could not load base BERT model: {str(e)}")
@@ -532,6 +545,98 @@ class HybridICD11Detector:
             return []
         
         text_lower = text.lower().strip()
+        ensemble_conditions = self._detect_conditions_locally(text_lower, vital_signs)
+        
+        # STEP 6: WHO API ENHANCEMENT (Optional)
+        if self._is_api_available():
+            try:
+                api_enhanced_conditions = self._enhance_with_api(ensemble_conditions)
+                ensemble_conditions = api_enhanced_conditions
+            except Exception as e:
+                # logger.warning(f"WHO API enhancement failed: {str(e)}")
+                pass
+        
+        return self._finish_detection(text_lower, ensemble_conditions, source_type)
+    
+    async def adetect_conditions_hybrid(self, text: str, source_type: str = 'combined', vital_signs: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        Async detect_conditions_hybrid for async views
+        
+        The rule-based, database and ML steps run in a worker thread. The WHO API
+        enhancement awaits its rate-limit and retry delays instead of sleeping, so
+        the event loop keeps serving other requests meanwhile.
+        """
+        await sync_to_async(self._initialize_services)()
+        
+        if not text or not text.strip():
+            return []
+        
+        text_lower = text.lower().strip()
+        ensemble_conditions = await sync_to_async(self._detect_conditions_locally)(text_lower, vital_signs)
+        
+        if self._is_api_available():
+            try:
+                ensemble_conditions = await self._aenhance_with_api(ensemble_conditions)
+            except Exception as e:
+                logger.warning(f"WHO API enhancement failed: {str(e)}")
+        
+        return await sync_to_async(self._finish_detection)(text_lower, ensemble_conditions, source_type)
+
+    def detect_conditions_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        detect_conditions_hybrid for many texts at once, e.g. to back-code historical records
+
+        Texts are compared lowercased and stripped, and each distinct text is
+        analysed once. The database terms are matched in one pass over the
+        batch, BERT and the fine-tuned classifier see the texts in padded
+        batches, and the WHO API is asked once per distinct code.
+
+        No AnalyticsCache counts are recorded: the texts are usually old
+        records, and counting them today would distort the trending data.
+
+        Args:
+            texts (List[str]): Texts to analyse
+
+        Returns:
+            List[List[Dict]]: Detected conditions of each text, in input order ([] for empty texts)
+        """
+        self._initialize_services()
+
+        keys = [text.lower().strip() if text else '' for text in texts]
+        unique_texts = list(dict.fromkeys(key for key in keys if key))
+        if not unique_texts:
+            return [[] for _ in texts]
+
+        cached_conditions = self._check_database_cache_batch(unique_texts)
+        ml_conditions = self._ml_ai_detection_batch(unique_texts)
+
+        detected = {}
+        for text, cached, ml in zip(unique_texts, cached_conditions, ml_conditions):
+            all_detected_conditions = self._enhanced_local_detection(text) + cached + ml
+            detected[text] = self._ensemble_scoring(all_detected_conditions, text)
+
+        if self._is_api_available():
+            try:
+                api_data = self._fetch_api_data(
+                    condition['icd11_code'] for conditions in detected.values() for condition in conditions
+                )
+                detected = {text: self._enhance_with_api(conditions, api_data) for text, conditions in detected.items()}
+            except Exception as e:
+                logger.warning(f"WHO API enhancement failed: {str(e)}")
+
+        results = {text: self._deduplicate_conditions(conditions) for text, conditions in detected.items()}
+        try:
+            cache.set_many(
+                {f"icd11_detection_{hash(text)}": conditions for text, conditions in results.items()},
+                self.cache_timeout
+            )
+        except Exception as e:
+            logger.error(f"Error caching detection results: {str(e)}")
+
+        return [list(results[key]) if key else [] for key in keys]
+
+    def _detect_conditions_locally(self, text_lower: str, vital_signs: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """Detection steps 1-5: everything that runs without the WHO API"""
         all_detected_conditions = []
         
         # STEP 1: RULE-BASED DETECTION (Fast & Reliable)
@@ -553,17 +658,12 @@ class HybridICD11Detector:
         if vital_signs:
             ensemble_conditions = self._apply_vital_signs_support(ensemble_conditions, vital_signs)
         
-        # STEP 6: WHO API ENHANCEMENT (Optional)
-        if self._is_api_available():
-            try:
-                api_enhanced_conditions = self._enhance_with_api(ensemble_conditions)
-                ensemble_conditions = api_enhanced_conditions
-            except Exception as e:
-                # logger.warning(f"WHO API enhancement failed: {str(e)}")
-                pass
-        
+        return ensemble_conditions
+    
+    def _finish_detection(self, text_lower: str, conditions: List[Dict[str, Any]], source_type: str) -> List[Dict[str, Any]]:
+        """Detection steps 7-8: deduplicate, then cache the results"""
         # STEP 7: FINAL PROCESSING
-        unique_conditions = self._deduplicate_conditions(ensemble_conditions)
+        unique_conditions = self._deduplicate_conditions(conditions)
         
         # STEP 8: CACHE RESULTS
         self._cache_detection_results(text_lower, unique_conditions, source_type)
@@ -624,7 +724,14 @@ class HybridICD11Detector:
         """
         ADVANCED ML/AI DETECTION: BERT-based semantic understanding with ICD-11 medical specialization
         """
-        ml_conditions = []
+        return self._ml_ai_detection_batch([text])[0]
+    
+    @track_task('icd11_ml_detection')
+    def _ml_ai_detection_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        _ml_ai_detection for many texts, one model pass per stage over the whole batch
+        """
+        ml_conditions = [[] for _ in texts]
         
         try:
             # Check if ML features are enabled
@@ -633,7 +740,7 @@ class HybridICD11Detector:
                 if hasattr(settings, 'DEVELOPMENT_MODE') and settings.DEVELOPMENT_MODE:
                     if not getattr(settings, 'ENABLE_BERT_MODELS', False):
                         logger.info("🚀 Development mode: Skipping ML/AI detection, using rule-based only")
-                        return ml_conditions  # Return empty list, will use rule-based detection
+                        return ml_conditions  # Return empty lists, will use rule-based detection
             except Exception:
                 pass
             
@@ -642,23 +749,23 @@ class HybridICD11Detector:
             
             # STEP 1: BERT-based semantic similarity analysis
             if self.bert_model and self.bert_tokenizer:
-                bert_conditions = self._bert_semantic_analysis(text)
-                ml_conditions.extend(bert_conditions)
+                for conditions, bert_conditions in zip(ml_conditions, self._bert_semantic_analysis_batch(texts)):
+                    conditions.extend(bert_conditions)
             
             # STEP 2: Fine-tuned model classification (if available)
             if self.fine_tuned_model and self.fine_tuned_tokenizer and self.label_mapping:
-                fine_tuned_conditions = self._fine_tuned_classification(text)
-                ml_conditions.extend(fine_tuned_conditions)
+                for conditions, fine_tuned_conditions in zip(ml_conditions, self._fine_tuned_classification_batch(texts)):
+                    conditions.extend(fine_tuned_conditions)
             
             # STEP 3: Enhanced pattern matching as fallback
-            if not ml_conditions:
-                pattern_conditions = self._enhanced_pattern_matching(text)
-                ml_conditions.extend(pattern_conditions)
+            for text, conditions in zip(texts, ml_conditions):
+                if not conditions:
+                    conditions.extend(self._enhanced_pattern_matching(text))
             
         except Exception as e:
             logger.error(f"ML/AI detection error: {str(e)}")
             # Fallback to enhanced pattern matching
-            return self._enhanced_pattern_matching(text)
+            return [self._enhanced_pattern_matching(text) for text in texts]
         
         return ml_conditions
     
@@ -666,13 +773,18 @@ class HybridICD11Detector:
         """
         BERT-BASED SEMANTIC ANALYSIS: Compare input text with ICD-11 condition embeddings
         """
-        bert_conditions = []
+        return self._bert_semantic_analysis_batch([text])[0]
+    
+    def _bert_semantic_analysis_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        _bert_semantic_analysis for many texts: one embedding pass, one similarity matrix
+        """
+        bert_conditions = [[] for _ in texts]
         
         try:
             # Check if required packages are available
             try:
                 import torch
-                from sklearn.metrics.pairwise import cosine_similarity
             except ImportError:
                 logger.warning("Required packages not available for BERT semantic analysis")
                 return bert_conditions
@@ -680,58 +792,70 @@ class HybridICD11Detector:
             if not self.bert_model or not self.bert_tokenizer:
                 return bert_conditions
             
-            # Generate embedding for input text
-            input_embedding = self._generate_text_embedding(text)
-            if input_embedding is None:
+            # Generate embeddings for the input texts
+            input_embeddings = self._generate_text_embeddings(texts)
+            condition_embeddings = self._enhanced_mapping_embeddings()
+            if input_embeddings is None or condition_embeddings is None:
                 return bert_conditions
-            
-            # Compare with enhanced mappings using semantic similarity
-            similarities = []
-            for condition, data in self.enhanced_mappings.items():
-                try:
-                    # Generate embedding for condition terms
-                    condition_text = f"{condition} {' '.join(data['local_terms'])}"
-                    condition_embedding = self._generate_text_embedding(condition_text)
-                    
-                    if condition_embedding is not None:
-                        similarity = cosine_similarity(input_embedding, condition_embedding)[0][0]
-                        similarities.append({
-                            'code': data['code'],
-                            'name': data['name'],
-                            'similarity': float(similarity),
-                            'local_terms': data['local_terms']
+            conditions, matrix = condition_embeddings
+            
+            # Cosine similarity of every text with every enhanced mapping
+            similarities = _normalize_rows(input_embeddings) @ matrix.T
+            
+            for text_conditions, row in zip(bert_conditions, similarities):
+                # Sort by similarity (stable, so ties keep the mapping order) and take the top 3
+                ranked = sorted(range(len(conditions)), key=lambda i: row[i], reverse=True)
+                for i in ranked[:3]:
+                    similarity = float(row[i])
+                    if similarity > 0.3:
+                        data = conditions[i]
+                        text_conditions.append({
+                            'condition': data['name'].lower().replace(', unspecified', ''),
+                            'icd11_code': data['code'],
+                            'icd11_name': data['name'],
+                            'confidence': min(1.0, similarity * 1.2),
+                            'source': 'bert_semantic',
+                            'similarity_score': similarity,
+                            'local_terms_matched': data['local_terms']
                         })
-                except Exception as e:
-                    logger.warning(f"Error calculating similarity for {condition}: {str(e)}")
-                    continue
-            
-            # Sort by similarity and filter by threshold
-            similarities.sort(key=lambda x: x['similarity'], reverse=True)
-            
-            # Take top matches with similarity > 0.3
-            for item in similarities[:3]:  # Top 3 matches
-                if item['similarity'] > 0.3:
-                    confidence = min(1.0, item['similarity'] * 1.2)
-                    
-                    bert_conditions.append({
-                        'condition': item['name'].lower().replace(', unspecified', ''),
-                        'icd11_code': item['code'],
-                        'icd11_name': item['name'],
-                        'confidence': confidence,
-                        'source': 'bert_semantic',
-                        'similarity_score': item['similarity'],
-                        'local_terms_matched': item['local_terms']
-                    })
             
-            logger.info(f"BERT semantic analysis found {len(bert_conditions)} conditions")
+            logger.info(f"BERT semantic analysis found {sum(map(len, bert_conditions))} conditions in {len(texts)} texts")
             return bert_conditions
             
         except Exception as e:
             logger.error(f"Error in BERT semantic analysis: {str(e)}")
-            return bert_conditions
+            return [[] for _ in texts]
+    
+    def _enhanced_mapping_embeddings(self):
+        """
+        Embeddings of the enhanced mappings, computed once per detector
+        
+        Returns:
+            Tuple or None: (mapping dicts, matrix of their L2-normalized embeddings), None if they cannot be computed
+        """
+        if self._condition_embeddings is None:
+            conditions = list(self.enhanced_mappings.values())
+            condition_texts = [
+                f"{condition} {' '.join(data['local_terms'])}" for condition, data in self.enhanced_mappings.items()
+            ]
+            embeddings = self._generate_text_embeddings(condition_texts)
+            if embeddings is None:
+                return None
+            self._condition_embeddings = (conditions, _normalize_rows(embeddings))
+        return self._condition_embeddings
     
     def _generate_text_embedding(self, text: str) -> Optional[np.ndarray]:
         """Generate BERT embedding for text"""
+        return self._generate_text_embeddings([text])
+    
+    def _generate_text_embeddings(self, texts: List[str]) -> Optional[np.ndarray]:
+        """
+        Generate BERT embeddings for many texts, one row per text
+        
+        Texts are encoded MODEL_BATCH_SIZE at a time with padding; the mean
+        pooling skips the padding tokens, so each row matches the embedding of
+        its text encoded alone up to float rounding (about 1e-7).
+        """
         try:
             # Check if required packages are available
             try:
@@ -743,21 +867,25 @@ class HybridICD11Detector:
             if not self.bert_model or not self.bert_tokenizer:
                 return None
             
-            # Tokenize text
-            inputs = self.bert_tokenizer(
-                text,
-                return_tensors="pt",
-                padding=True,
-                truncation=True,
-                max_length=128
-            )
-            
-            # Generate embedding
-            with torch.no_grad():
-                outputs = self.bert_model(**inputs)
-                # Use mean pooling of last hidden state
-                embeddings = outputs.last_hidden_state.mean(dim=1)
-                return embeddings.numpy()
+            embeddings = []
+            for start in range(0, len(texts), MODEL_BATCH_SIZE):
+                # Tokenize texts
+                inputs = self.bert_tokenizer(
+                    texts[start:start + MODEL_BATCH_SIZE],
+                    return_tensors="pt",
+                    padding=True,
+                    truncation=True,
+                    max_length=128
+                )
+                
+                # Generate embeddings
+                with torch.no_grad():
+                    outputs = self.bert_model(**inputs)
+                    # Mean pooling of the last hidden state over the real tokens
+                    mask = inputs['attention_mask'].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+                    pooled = (outputs.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+                    embeddings.append(pooled.numpy())
+            return np.concatenate(embeddings)
                 
         except Exception as e:
             logger.error(f"Error generating text embedding: {str(e)}")
@@ -767,7 +895,13 @@ class HybridICD11Detector:
         """
         FINE-TUNED MODEL CLASSIFICATION: Use fine-tuned BERT for ICD-11 classification
         """
-        fine_tuned_conditions = []
+        return self._fine_tuned_classification_batch([text])[0]
+    
+    def _fine_tuned_classification_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        _fine_tuned_classification for many texts, MODEL_BATCH_SIZE per forward pass
+        """
+        fine_tuned_conditions = [[] for _ in texts]
         
         try:
             # Check if required packages are available
@@ -780,59 +914,55 @@ class HybridICD11Detector:
             if not self.fine_tuned_model or not self.fine_tuned_tokenizer or not self.label_mapping:
                 return fine_tuned_conditions
             
-            # Tokenize input
-            inputs = self.fine_tuned_tokenizer(
-                text,
-                return_tensors="pt",
-                padding=True,
-                truncation=True,
-                max_length=128
-            )
+            # Condition details by code, from the first enhanced mapping with that code
+            details = {}
+            for condition, data in self.enhanced_mappings.items():
+                details.setdefault(data['code'], data)
+            id_to_condition = self.label_mapping.get('id_to_condition', {})
             
-            # Get predictions from fine-tuned model
             self.fine_tuned_model.eval()
-            with torch.no_grad():
-                outputs = self.fine_tuned_model(**inputs)
-                probabilities = torch.softmax(outputs.logits, dim=-1)
-                
-                # Get top predictions
-                top_probs, top_indices = torch.topk(probabilities, k=3, dim=1)
+            for start in range(0, len(texts), MODEL_BATCH_SIZE):
+                # Tokenize input
+                inputs = self.fine_tuned_tokenizer(
+                    texts[start:start + MODEL_BATCH_SIZE],
+                    return_tensors="pt",
+                    padding=True,
+                    truncation=True,
+                    max_length=128
+                )
                 
-                for i in range(top_probs.shape[1]):
-                    prob = float(top_probs[0][i])
-                    idx = int(top_indices[0][i])
+                # Get predictions from fine-tuned model
+                with torch.no_grad():
+                    outputs = self.fine_tuned_model(**inputs)
+                    probabilities = torch.softmax(outputs.logits, dim=-1)
                     
-                    if prob > 0.1:  # Confidence threshold
-                        # Get ICD-11 code from label mapping
-                        icd11_code = self.label_mapping.get('id_to_condition', {}).get(str(idx), f"UNKNOWN_{idx}")
-                        
-                        # Get condition details from enhanced mappings
-                        condition_name = f'ICD-11 Code: {icd11_code}'
-                        local_terms = []
-                        
-                        # Try to find in enhanced mappings
-                        for condition, data in self.enhanced_mappings.items():
-                            if data['code'] == icd11_code:
-                                condition_name = data['name']
-                                local_terms = data['local_terms']
-                                break
-                        
-                        fine_tuned_conditions.append({
-                            'condition': condition_name,
-                            'icd11_code': icd11_code,
-                            'icd11_name': condition_name,
-                            'confidence': prob,
-                            'source': 'fine_tuned_bert',
-                            'model_probability': prob,
-                            'local_terms_matched': local_terms
-                        })
-            
-            logger.info(f"Fine-tuned classification found {len(fine_tuned_conditions)} conditions")
+                    # Get top predictions
+                    top_probs, top_indices = torch.topk(probabilities, k=3, dim=1)
+                
+                for offset, (probs, indices) in enumerate(zip(top_probs.tolist(), top_indices.tolist())):
+                    for prob, idx in zip(probs, indices):
+                        if prob > 0.1:  # Confidence threshold
+                            # Get ICD-11 code from label mapping
+                            icd11_code = id_to_condition.get(str(idx), f"UNKNOWN_{idx}")
+                            data = details.get(icd11_code)
+                            condition_name = data['name'] if data else f'ICD-11 Code: {icd11_code}'
+                            
+                            fine_tuned_conditions[start + offset].append({
+                                'condition': condition_name,
+                                'icd11_code': icd11_code,
+                                'icd11_name': condition_name,
+                                'confidence': prob,
+                                'source': 'fine_tuned_bert',
+                                'model_probability': prob,
+                                'local_terms_matched': data['local_terms'] if data else []
+                            })
+            
+            logger.info(f"Fine-tuned classification found {sum(map(len, fine_tuned_conditions))} conditions in {len(texts)} texts")
             return fine_tuned_conditions
             
         except Exception as e:
             logger.error(f"Error in fine-tuned classification: {str(e)}")
-            return fine_tuned_conditions
+            return [[] for _ in texts]
     
     def _get_icd11_code_mapping(self):
         """
@@ -1083,30 +1213,46 @@ class HybridICD11Detector:
     
     def _check_database_cache(self, text: str) -> List[Dict[str, Any]]:
         """Check database for existing ICD-11 mappings"""
+        return self._check_database_cache_batch([text])[0]
+    
+    def _check_database_cache_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        _check_database_cache for many texts with one pass over the mappings
+        
+        The active mappings come from the process-wide ICD-11 reference tables
+        instead of a query per text. Each term is first looked up in the whole
+        batch at once, so only the few terms found there are checked text by text.
+        """
+        from .icd11_snapshot import icd11_reference
+        
         try:
-            # Search for mappings that might match the text
-            mappings = self.ICD11Mapping.objects.filter(is_active=True)
-            detected_conditions = []
+            batch_text = '\0'.join(texts)
+            detected_conditions = [[] for _ in texts]
             
-            for mapping in mappings:
+            for mapping in icd11_reference().mappings.values():
                 # Check if any local terms match
-                local_terms = mapping.local_terms or []
-                matched_terms = [term for term in local_terms if term.lower() in text]
+                local_terms = [
+                    (term, term.lower()) for term in mapping['local_terms'] or [] if term.lower() in batch_text
+                ]
+                if not local_terms:
+                    continue
                 
-                if matched_terms:
-                    detected_conditions.append({
-                        'condition': mapping.description,
-                        'icd11_code': mapping.code,
-                        'icd11_name': mapping.description,
-                        'confidence': mapping.confidence_score,
-                        'source': mapping.source,
-                        'local_terms_matched': matched_terms
-                    })
+                for conditions, text in zip(detected_conditions, texts):
+                    matched_terms = [term for term, term_lower in local_terms if term_lower in text]
+                    if matched_terms:
+                        conditions.append({
+                            'condition': mapping['name'],
+                            'icd11_code': mapping['code'],
+                            'icd11_name': mapping['name'],
+                            'confidence': mapping['confidence_score'],
+                            'source': mapping['source'],
+                            'local_terms_matched': matched_terms
+                        })
             
             return detected_conditions
         except Exception as e:
             logger.error(f"Error checking database cache: {str(e)}")
-            return []
+            return [[] for _ in texts]
     
     def _apply_vital_signs_support(self, conditions: List[Dict[str, Any]], vital_signs: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
@@ -1239,16 +1385,83 @@ class HybridICD11Detector:
         except (ValueError, TypeError):
             return False
     
-    def _enhance_with_api(self, conditions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Enhance conditions with WHO API data"""
+    def _enhance_with_api(self, conditions: List[Dict[str, Any]], api_data: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        Enhance conditions with WHO API data
+        
+        Args:
+            conditions: Conditions to enhance
+            api_data: WHO data by code from _fetch_api_data(), e.g. fetched once for a whole batch
+        """
+        if api_data is None:
+            api_data = self._fetch_api_data(condition['icd11_code'] for condition in conditions)
         enhanced_conditions = []
         
         for condition in conditions:
             enhanced_condition = condition.copy()
             
+            data = api_data.get(condition['icd11_code'])
+            if data:
+                enhanced_condition.update({
+                    'api_data': data,
+                    'source': 'hybrid',
+                    'enhanced': True
+                })
+            else:
+                enhanced_condition['enhanced'] = False
+            
+            enhanced_conditions.append(enhanced_condition)
+        
+        return enhanced_conditions
+    
+    def _fetch_api_data(self, codes) -> Dict[str, Any]:
+        """Get the WHO API data of each distinct code once; None for codes without data"""
+        api_data = {}
+        for code in codes:
+            if code in api_data:
+                continue
             try:
                 # Get additional data from WHO API
-                api_data = self._get_icd11_data_from_api(condition['icd11_code'])
+                api_data[code] = self._get_icd11_data_from_api(code)
+            except Exception as e:
+                logger.warning(f"Error enhancing condition {code}: {str(e)}")
+                api_data[code] = None
+        return api_data
+    
+    def _get_icd11_data_from_api(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        """Get ICD-11 data from WHO API with caching"""
+        try:
+            # Check local database cache first
+            local_data = self._get_from_local_cache(entity_id)
+            if local_data:
+                return local_data
+            
+            # Check if API is available
+            if not self._is_api_available():
+                return None
+            
+            # Fetch from WHO API with retry logic
+            api_data = self._fetch_from_who_api_with_retry(entity_id)
+            if api_data:
+                # Cache the result
+                self._cache_locally(entity_id, api_data)
+                return api_data
+            
+            return None
+            
+        except Exception as e:
+            logger.error(f"Error getting ICD-11 data for {entity_id}: {str(e)}")
+            return None
+    
+    async def _aenhance_with_api(self, conditions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Async _enhance_with_api; conditions are fetched one after another to respect the rate limit"""
+        enhanced_conditions = []
+        
+        for condition in conditions:
+            enhanced_condition = condition.copy()
+            
+            try:
+                api_data = await self._aget_icd11_data_from_api(condition['icd11_code'])
                 if api_data:
                     enhanced_condition.update({
                         'api_data': api_data,
@@ -1266,23 +1479,19 @@ class HybridICD11Detector:
         
         return enhanced_conditions
     
-    def _get_icd11_data_from_api(self, entity_id: str) -> Optional[Dict[str, Any]]:
-        """Get ICD-11 data from WHO API with caching"""
+    async def _aget_icd11_data_from_api(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        """Async _get_icd11_data_from_api"""
         try:
-            # Check local database cache first
-            local_data = self._get_from_local_cache(entity_id)
+            local_data = await sync_to_async(self._get_from_local_cache)(entity_id)
             if local_data:
                 return local_data
             
-            # Check if API is available
             if not self._is_api_available():
                 return None
             
-            # Fetch from WHO API with retry logic
-            api_data = self._fetch_from_who_api_with_retry(entity_id)
+            api_data = await self._afetch_from_who_api_with_retry(entity_id)
             if api_data:
-                # Cache the result
-                self._cache_locally(entity_id, api_data)
+                await sync_to_async(self._cache_locally)(entity_id, api_data)
                 return api_data
             
             return None
@@ -1420,6 +1629,32 @@ class HybridICD11Detector:
         
         return None
     
+    async def _afetch_from_who_api_with_retry(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        """Async _fetch_from_who_api_with_retry; the delays are awaited, not slept"""
+        for attempt in range(self.max_retries):
+            try:
+                if attempt > 0:
+                    await asyncio.sleep(self.retry_delay * (2 ** attempt))  # Exponential backoff
+                else:
+                    await asyncio.sleep(self.rate_limit_delay)
+                
+                data = await self.who_api_service.aget_icd11_details(entity_id)
+                
+                if data:
+                    self.api_failure_count = 0
+                    logger.info(f"Successfully fetched {entity_id} from WHO API")
+                    return data
+                    
+            except Exception as e:
+                self.api_failure_count += 1
+                logger.error(f"API error for {entity_id} (attempt {attempt + 1}): {str(e)}")
+                
+                if attempt == self.max_retries - 1:
+                    logger.error(f"All retry attempts failed for {entity_id}")
+                    return None
+        
+        return None
+    
     def _deduplicate_conditions(self, conditions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Remove duplicate conditions and sort by confidence"""
         unique_conditions = []
@@ -1625,5 +1860,5 @@ class HybridICD11Detector:
             logger.error(f"Error getting service status: {str(e)}")
             return {'error': str(e)}
 
-# Global instance
-hybrid_icd11_detector = HybridICD11Detector()
+# Global instance, constructed on first use by backend.model_lifecycle
+hybrid_icd11_detector = lazy_model('hybrid_icd11')
@@ -3,6 +3,7 @@ WHO ICD-11 API Service
 Provides access to the World Health Organization's ICD-11 API
 """
 
+import asyncio
 import requests
 import logging
 import time
@@ -23,6 +24,7 @@ class WHOICD11APIService:
     
     def __init__(self):
         self.base_url = "https://icd.who.int/icdapi"
+        self.token_url = "https://icd.who.int/icdapi/oauth2/token"
         self.client_id = getattr(settings, 'CLIENT_ID', None)
         self.client_secret = getattr(settings, 'CLIENT_SECRET', None)
         
@@ -51,34 +53,49 @@ class WHOICD11APIService:
                 return None
             
             # Check if we have a valid token
-            if self.access_token and self.token_expires_at and time.time() < self.token_expires_at:
+            if self._has_valid_token():
                 return self.access_token
             
             # Get new token using OAuth2
-            token_url = "https://icd.who.int/icdapi/oauth2/token"
-            token_data = {
-                'grant_type': 'client_credentials',
-                'client_id': self.client_id,
-                'client_secret': self.client_secret
-            }
-            
-            response = requests.post(token_url, data=token_data, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                token_info = response.json()
-                self.access_token = token_info.get('access_token')
-                expires_in = token_info.get('expires_in', 3600)
-                self.token_expires_at = time.time() + expires_in
-                
-                logger.info("Successfully obtained WHO API access token")
-                return self.access_token
-            else:
-                logger.error(f"Failed to get WHO API token: {response.status_code}")
-                return None
+            response = requests.post(self.token_url, data=self._token_request_data(), timeout=self.timeout)
+            return self._store_access_token(response)
             
         except Exception as e:
             logger.error(f"Error getting WHO API access token: {str(e)}")
             return None
+    
+    def _has_valid_token(self) -> bool:
+        return bool(self.access_token and self.token_expires_at and time.time() < self.token_expires_at)
+    
+    def _token_request_data(self) -> Dict[str, str]:
+        return {
+            'grant_type': 'client_credentials',
+            'client_id': self.client_id,
+            'client_secret': self.client_secret
+        }
+    
+    def _store_access_token(self, response) -> Optional[str]:
+        """Keep the token from a token endpoint response (requests or httpx)"""
+        if response.status_code == 200:
+            token_info = response.json()
+            self.access_token = token_info.get('access_token')
+            expires_in = token_info.get('expires_in', 3600)
+            self.token_expires_at = time.time() + expires_in
+            
+            logger.info("Successfully obtained WHO API access token")
+            return self.access_token
+        else:
+            logger.error(f"Failed to get WHO API token: {response.status_code}")
+            return None
+    
+    def _request_headers(self, token: str) -> Dict[str, str]:
+        return {
+            'Accept': 'application/json',
+            'Accept-Language': 'en',
+            'API-Version': 'v2',
+            'App': 'Amieti-Health-System',
+            'Authorization': f'Bearer {token}'
+        }
             
     def _make_request(self, endpoint: str, params: Dict = None) -> Optional[Dict]:
         """
@@ -97,18 +114,9 @@ class WHOICD11APIService:
             if not token:
                 return None
             
-            # Prepare headers with OAuth2 token
-            headers = {
-                'Accept': 'application/json',
-                'Accept-Language': 'en',
-                'API-Version': 'v2',
-                'App': 'Amieti-Health-System',
-                'Authorization': f'Bearer {token}'
-            }
-            
             # Make request
             url = f"{self.base_url}/{endpoint}"
-            response = requests.get(url, headers=headers, params=params, timeout=self.timeout, verify=False)
+            response = requests.get(url, headers=self._request_headers(token), params=params, timeout=self.timeout, verify=False)
             
             # Update last request time
             self.last_request_time = time.time()
@@ -129,6 +137,63 @@ class WHOICD11APIService:
             logger.error(f"Error making WHO API request: {str(e)}")
             return None
     
+    async def _aget_access_token(self, client) -> Optional[str]:
+        """
+        Async _get_access_token using an httpx.AsyncClient
+        """
+        try:
+            if not self.client_id or not self.client_secret:
+                logger.error("WHO API credentials not configured")
+                return None
+            
+            if self._has_valid_token():
+                return self.access_token
+            
+            response = await client.post(self.token_url, data=self._token_request_data())
+            return self._store_access_token(response)
+            
+        except Exception as e:
+            logger.error(f"Error getting WHO API access token: {str(e)}")
+            return None
+    
+    async def _amake_request(self, endpoint: str, params: Dict = None) -> Optional[Dict]:
+        """
+        Async _make_request for async views: waiting on the rate limit or on the
+        WHO API suspends the request instead of blocking a server thread
+        """
+        # Optional dependency, only needed by the async views
+        import httpx
+        
+        try:
+            time_since_last = time.time() - self.last_request_time
+            if time_since_last < self.min_request_interval:
+                await asyncio.sleep(self.min_request_interval - time_since_last)
+            
+            async with httpx.AsyncClient(timeout=self.timeout, verify=False) as client:
+                for attempt in range(2):
+                    token = await self._aget_access_token(client)
+                    if not token:
+                        return None
+                    
+                    url = f"{self.base_url}/{endpoint}"
+                    response = await client.get(url, headers=self._request_headers(token), params=params)
+                    self.last_request_time = time.time()
+                    
+                    if response.status_code == 200:
+                        return response.json()
+                    if response.status_code == 401 and attempt == 0:
+                        # Token expired, clear and retry once
+                        logger.warning("WHO API token expired, refreshing...")
+                        self.access_token = None
+                        self.token_expires_at = None
+                        continue
+                    logger.error(f"WHO API request failed: {response.status_code} - {response.text}")
+                    return None
+            
+        except Exception as e:
+            logger.error(f"Error making WHO API request: {str(e)}")
+            return None
+    
     def get_icd11_details(self, entity_id: str) -> Optional[Dict[str, Any]]:
         """
         Get detailed information for an ICD-11 entity
@@ -165,6 +230,25 @@ class WHOICD11APIService:
             logger.error(f"Error getting ICD-11 details for {entity_id}: {str(e)}")
             return None
     
+    async def aget_icd11_details(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Async get_icd11_details, reading and filling the cache without blocking
+        """
+        try:
+            cache_key = f"who_icd11_{entity_id}"
+            cached_data = await cache.aget(cache_key)
+            if cached_data:
+                return cached_data
+            
+            enhanced_data = self._get_enhanced_local_data(entity_id)
+            if enhanced_data:
+                await cache.aset(cache_key, enhanced_data, 24 * 60 * 60)
+            return enhanced_data
+            
+        except Exception as e:
+            logger.error(f"Error getting ICD-11 details for {entity_id}: {str(e)}")
+            return None
+    
     def _get_enhanced_local_data(self, entity_id: str) -> Optional[Dict[str, Any]]:
         """
         Get enhanced local data that simulates WHO API response
@@ -242,16 +326,7 @@ class WHOICD11APIService:
             List[Dict]: Search results
         """
         try:
-            params = {
-                'q': query,
-                'propertiesToBeSearched': 'Title,Definition,Exclusion,FullySpecifiedName',
-                'useFlexisearch': 'true',
-                'flatResults': 'true',
-                'linearization': 'mms',
-                'limit': limit
-            }
-            
-            data = self._make_request('content/search', params)
+            data = self._make_request('content/search', self._search_params(query, limit))
             
             if data and 'destinationEntities' in data:
                 return data['destinationEntities']
@@ -262,6 +337,31 @@ class WHOICD11APIService:
             logger.error(f"Error searching ICD-11 entities: {str(e)}")
             return []
     
+    async def asearch_entities(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Async search_entities, using async HTTP (requires httpx)
+        """
+        try:
+            data = await self._amake_request('content/search', self._search_params(query, limit))
+            
+            if data and 'destinationEntities' in data:
+                return data['destinationEntities']
+            return []
+                
+        except Exception as e:
+            logger.error(f"Error searching ICD-11 entities: {str(e)}")
+            return []
+    
+    def _search_params(self, query: str, limit: int) -> Dict[str, Any]:
+        return {
+            'q': query,
+            'propertiesToBeSearched': 'Title,Definition,Exclusion,FullySpecifiedName',
+            'useFlexisearch': 'true',
+            'flatResults': 'true',
+            'linearization': 'mms',
+            'limit': limit
+        }
+    
     def get_api_status(self) -> Dict[str, Any]:
         """
         Get API status and health information
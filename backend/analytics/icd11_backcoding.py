@@ -0,0 +1,151 @@
+"""
+Back-coding of historical clinic visits with ICD-11 diagnosis codes
+
+Completed permit requests and physical-health appointments recorded before
+diagnosis coding have a reason but no diagnosis_code, so they only show up as
+uncoded in the physical health trends. backcode() walks them in id order,
+detects the conditions of a whole batch at once with
+HybridICD11Detector.detect_conditions_batch() and writes the primary
+condition of each record back with one bulk_update per batch.
+
+A DiagnosisBackcodingProgress row per source records how far the run got. It
+is saved in the same transaction as the batch it covers, so an interrupted run
+resumes after the last committed batch, and records where nothing was detected
+are not analysed again on the next run.
+"""
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from appointments.models import Appointment
+from health_records.models import PermitRequest
+
+from .models import DiagnosisBackcodingProgress
+
+DEFAULT_BATCH_SIZE = 200
+
+# Primary conditions below this confidence are not written to the record
+DEFAULT_MIN_CONFIDENCE = 0.5
+
+
+class BackcodingSource:
+    """A kind of clinic record that can be back-coded"""
+
+    def __init__(self, model, condition, text_fields, confidence_field=None):
+        self.model = model
+        self.condition = condition
+        # Concatenated into the detection text, patient's words first
+        self.text_fields = text_fields
+        self.confidence_field = confidence_field
+
+    @property
+    def update_fields(self):
+        fields = ['diagnosis_code', 'diagnosis_name']
+        if self.confidence_field:
+            fields.append(self.confidence_field)
+        return fields
+
+    def text(self, record):
+        return ' '.join(getattr(record, field) or '' for field in self.text_fields).strip()
+
+
+SOURCES = {
+    'permit_request': BackcodingSource(
+        PermitRequest, Q(status='completed'), ('reason', 'nursing_intervention'),
+    ),
+    'appointment': BackcodingSource(
+        Appointment, Q(status='completed', service_type='physical'), ('reason', 'documentation'),
+        confidence_field='confidence_score',
+    ),
+}
+
+
+def uncoded_records(source, after_id=0):
+    """
+    Records of a source that still lack a diagnosis code, oldest first
+
+    Returns:
+        QuerySet: Records with an id above after_id, only the fields needed to code them
+    """
+    spec = SOURCES[source]
+    return spec.model.objects.filter(
+        spec.condition, Q(diagnosis_code__isnull=True) | Q(diagnosis_code=''), id__gt=after_id,
+    ).order_by('id').only('id', *spec.text_fields)
+
+
+def code_records(records, source, detector, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """
+    Set the diagnosis of each record from its primary detected condition, without saving
+
+    Returns:
+        list: The records that were given a diagnosis code
+    """
+    spec = SOURCES[source]
+    detections = detector.detect_conditions_batch([spec.text(record) for record in records])
+    coded = []
+    for record, conditions in zip(records, detections):
+        if not conditions:
+            continue
+        primary = detector.get_primary_condition(conditions)
+        confidence = primary.get('confidence', 0.0)
+        if confidence < min_confidence:
+            continue
+        record.diagnosis_code = primary['icd11_code']
+        record.diagnosis_name = primary['icd11_name'][:255]
+        if spec.confidence_field:
+            setattr(record, spec.confidence_field, confidence)
+        coded.append(record)
+    return coded
+
+
+def backcode(source, detector, batch_size=DEFAULT_BATCH_SIZE, limit=None,
+             min_confidence=DEFAULT_MIN_CONFIDENCE, restart=False, dry_run=False, on_batch=None):
+    """
+    Back-code the uncoded records of a source, resuming where the last run stopped
+
+    Args:
+        source: Key of SOURCES
+        detector: HybridICD11Detector
+        batch_size: Records per detection batch and bulk_update
+        limit: Stop after this many records
+        min_confidence: Lowest primary-condition confidence written to a record
+        restart: Start again from the oldest record instead of the checkpoint
+        dry_run: Detect only; neither the records nor the checkpoint are saved
+        on_batch: Called with (progress, records, coded records) after each batch
+
+    Returns:
+        DiagnosisBackcodingProgress: The checkpoint; unsaved changes only in a dry run
+    """
+    spec = SOURCES[source]
+    progress, _ = DiagnosisBackcodingProgress.objects.get_or_create(source=source)
+    if restart:
+        progress.last_id = progress.processed = progress.coded = 0
+        progress.started_at = timezone.now()
+        progress.completed_at = None
+        if not dry_run:
+            progress.save()
+
+    processed = 0
+    while limit is None or processed < limit:
+        size = batch_size if limit is None else min(batch_size, limit - processed)
+        records = list(uncoded_records(source, progress.last_id)[:size])
+        if not records:
+            progress.completed_at = timezone.now()
+            if not dry_run:
+                progress.save(update_fields=['completed_at', 'updated_at'])
+            break
+
+        coded = code_records(records, source, detector, min_confidence)
+        progress.last_id = records[-1].id
+        progress.processed += len(records)
+        progress.coded += len(coded)
+        progress.completed_at = None
+        if not dry_run:
+            with transaction.atomic():
+                spec.model.objects.bulk_update(coded, spec.update_fields)
+                progress.save()
+        processed += len(records)
+        if on_batch:
+            on_batch(progress, records, coded)
+    return progress
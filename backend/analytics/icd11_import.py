@@ -0,0 +1,249 @@
+"""
+Bulk import of the WHO ICD-11 linearization CSV into ICD11Entity and ICD11Mapping
+
+On PostgreSQL the CSV is streamed into a temporary staging table with
+COPY FROM STDIN, and each target table is then filled by a single
+INSERT ... SELECT ... ON CONFLICT, so a full reload of the 11k+ rows is a
+handful of statements. Other databases (SQLite in tests) parse the rows in
+Python and write them with batched bulk_create upserts.
+
+Both paths give the same rows. A code or entity that appears several times
+in the file is imported once: the first occurrence wins, or the last one with
+force, which is what importing the rows one by one used to produce.
+"""
+
+import csv
+
+from django.db import connection, transaction
+
+from .models import ICD11Entity, ICD11Mapping
+
+# CSV header -> staging column, in file order
+CSV_COLUMNS = [
+    ('Foundation URI', 'foundation_uri'),
+    ('Linearization (release) URI', 'linearization_uri'),
+    ('Code', 'code'),
+    ('BlockId', 'block_id'),
+    ('Title', 'title'),
+    ('ClassKind', 'class_kind'),
+    ('DepthInKind', 'depth_in_kind'),
+    ('IsResidual', 'is_residual'),
+    ('PrimaryLocation', 'primary_location'),
+    ('ChapterNo', 'chapter_no'),
+    ('BrowserLink', 'browser_link'),
+    ('iCatLink', 'icat_link'),
+    ('isLeaf', 'is_leaf'),
+    ('noOfNonResidualChildren', 'no_of_non_residual_children'),
+    ('Primary tabulation', 'primary_tabulation'),
+    ('Grouping1', 'grouping1'),
+    ('Grouping2', 'grouping2'),
+    ('Grouping3', 'grouping3'),
+    ('Grouping4', 'grouping4'),
+    ('Grouping5', 'grouping5'),
+    ('Version:2025 Aug 15 - 22:30 UTC', 'version'),
+]
+BOOLEAN_COLUMNS = {'is_residual', 'is_leaf'}
+
+# Confidence given to mappings taken from the official WHO file
+CSV_MAPPING_CONFIDENCE = 0.8
+CSV_MAPPING_SOURCE = 'csv_import'
+
+STAGING_TABLE = 'icd11_import_staging'
+
+
+class ImportResult:
+    """Counts of one import run"""
+
+    def __init__(self):
+        self.rows = 0
+        self.entities = 0
+        self.entities_created = 0
+        self.mappings = 0
+        self.mappings_created = 0
+
+    @property
+    def entities_existing(self):
+        """Entities already in the database: updated with force, otherwise skipped"""
+        return self.entities - self.entities_created
+
+    @property
+    def mappings_existing(self):
+        return self.mappings - self.mappings_created
+
+
+def read_rows(path, limit=None):
+    """
+    Yield the CSV rows as dicts keyed by staging column, missing values as ''
+
+    Args:
+        path: CSV file path
+        limit: Stop after this many rows
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as csvfile:
+        for count, row in enumerate(csv.DictReader(csvfile), start=1):
+            if limit and count > limit:
+                break
+            yield {column: row.get(header) or '' for header, column in CSV_COLUMNS}
+
+
+def entity_id_from_uri(foundation_uri):
+    return foundation_uri.split('/')[-1] if foundation_uri else ''
+
+
+def entity_json(row):
+    """json_data stored for a CSV row"""
+    data = {}
+    for _, column in CSV_COLUMNS:
+        value = row[column]
+        data[column] = value.upper() == 'TRUE' if column in BOOLEAN_COLUMNS else value
+    return data
+
+
+def mapping_fields(title):
+    return {
+        'description': title,
+        'local_terms': {'tagalog': [], 'english': [title], 'taglish': []},
+        'confidence_score': CSV_MAPPING_CONFIDENCE,
+        'source': CSV_MAPPING_SOURCE,
+        'is_active': True,
+    }
+
+
+def import_icd11_csv(path, limit=None, force=False, batch_size=1000):
+    """
+    Import an ICD-11 CSV export in one transaction
+
+    Args:
+        path: CSV file path
+        limit: Import only the first N rows
+        force: Overwrite entities and mappings that already exist
+        batch_size: Rows per INSERT on databases without COPY
+
+    Returns:
+        ImportResult: Rows read, distinct entities and mappings, and how many were new
+    """
+    with transaction.atomic():
+        entities_before = ICD11Entity.objects.count()
+        mappings_before = ICD11Mapping.objects.count()
+        if connection.vendor == 'postgresql':
+            result = _copy_import(path, limit, force)
+        else:
+            result = _bulk_import(path, limit, force, batch_size)
+        result.entities_created = ICD11Entity.objects.count() - entities_before
+        result.mappings_created = ICD11Mapping.objects.count() - mappings_before
+    return result
+
+
+def _bulk_import(path, limit, force, batch_size):
+    result = ImportResult()
+    entities = {}
+    mappings = {}
+    for row in read_rows(path, limit):
+        result.rows += 1
+        entity_id = entity_id_from_uri(row['foundation_uri'])
+        if not entity_id:
+            continue
+        if force or entity_id not in entities:
+            entities[entity_id] = ICD11Entity(entity_id=entity_id, json_data=entity_json(row), is_active=True)
+
+        code, title = row['code'].strip(), row['title'].strip()
+        if code and title and (force or code not in mappings):
+            mappings[code] = ICD11Mapping(code=code, **mapping_fields(title))
+
+    if force:
+        entity_options = {
+            'update_conflicts': True, 'unique_fields': ['entity_id'],
+            'update_fields': ['json_data', 'is_active', 'last_updated'],
+        }
+        mapping_options = {
+            'update_conflicts': True, 'unique_fields': ['code'],
+            'update_fields': ['description', 'local_terms', 'confidence_score', 'source', 'is_active', 'updated_at'],
+        }
+    else:
+        entity_options = mapping_options = {'ignore_conflicts': True}
+    ICD11Entity.objects.bulk_create(entities.values(), batch_size=batch_size, **entity_options)
+    ICD11Mapping.objects.bulk_create(mappings.values(), batch_size=batch_size, **mapping_options)
+
+    result.entities = len(entities)
+    result.mappings = len(mappings)
+    return result
+
+
+def _copy_import(path, limit, force):
+    result = ImportResult()
+    qn = connection.ops.quote_name
+    columns = [column for _, column in CSV_COLUMNS]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {STAGING_TABLE} (line integer, "
+            + ', '.join(f'{column} text' for column in columns)
+            + ') ON COMMIT DROP'
+        )
+        # Django's cursor wrapper does not expose COPY; use the psycopg cursor
+        copy_sql = f"COPY {STAGING_TABLE} (line, {', '.join(columns)}) FROM STDIN"
+        with cursor.cursor.copy(copy_sql) as copy:
+            for row in read_rows(path, limit):
+                result.rows += 1
+                copy.write_row([result.rows] + [row[column] for column in columns])
+
+        # DISTINCT ON keeps one row per key: the first in the file, or the last with force
+        order = 'DESC' if force else 'ASC'
+        json_pairs = ', '.join(
+            f"'{column}', upper({column}) = 'TRUE'"
+            if column in BOOLEAN_COLUMNS else f"'{column}', {column}"
+            for column in columns
+        )
+        entity_conflict = (
+            'DO UPDATE SET json_data = EXCLUDED.json_data, is_active = EXCLUDED.is_active, '
+            'last_updated = EXCLUDED.last_updated'
+            if force else 'DO NOTHING'
+        )
+        cursor.execute(f"""
+            INSERT INTO {qn(ICD11Entity._meta.db_table)} (entity_id, json_data, is_active, last_updated, created_at)
+            SELECT DISTINCT ON (entity_id) entity_id, json_data, true, now(), now()
+            FROM (
+                SELECT line, regexp_replace(foundation_uri, '^.*/', '') AS entity_id,
+                       jsonb_build_object({json_pairs}) AS json_data
+                FROM {STAGING_TABLE}
+            ) staged
+            WHERE entity_id <> ''
+            ORDER BY entity_id, line {order}
+            ON CONFLICT (entity_id) {entity_conflict}
+        """)
+        cursor.execute(f"""
+            SELECT count(DISTINCT regexp_replace(foundation_uri, '^.*/', ''))
+            FROM {STAGING_TABLE} WHERE regexp_replace(foundation_uri, '^.*/', '') <> ''
+        """)
+        result.entities = cursor.fetchone()[0]
+
+        mapping_conflict = (
+            'DO UPDATE SET description = EXCLUDED.description, local_terms = EXCLUDED.local_terms, '
+            'confidence_score = EXCLUDED.confidence_score, source = EXCLUDED.source, '
+            'is_active = EXCLUDED.is_active, updated_at = EXCLUDED.updated_at'
+            if force else 'DO NOTHING'
+        )
+        # Rows without an entity id are skipped, as on the other path
+        cursor.execute(f"""
+            INSERT INTO {qn(ICD11Mapping._meta.db_table)}
+                (code, description, local_terms, confidence_score, source, is_active, created_at, updated_at)
+            SELECT DISTINCT ON (code) code, title,
+                   jsonb_build_object('tagalog', '[]'::jsonb, 'english', jsonb_build_array(title), 'taglish', '[]'::jsonb),
+                   %s, %s, true, now(), now()
+            FROM (
+                SELECT line, btrim(code) AS code, btrim(title) AS title
+                FROM {STAGING_TABLE}
+                WHERE regexp_replace(foundation_uri, '^.*/', '') <> ''
+            ) staged
+            WHERE code <> '' AND title <> ''
+            ORDER BY code, line {order}
+            ON CONFLICT (code) {mapping_conflict}
+        """, [CSV_MAPPING_CONFIDENCE, CSV_MAPPING_SOURCE])
+        cursor.execute(f"""
+            SELECT count(DISTINCT btrim(code)) FROM {STAGING_TABLE}
+            WHERE regexp_replace(foundation_uri, '^.*/', '') <> '' AND btrim(code) <> '' AND btrim(title) <> ''
+        """)
+        result.mappings = cursor.fetchone()[0]
+        # ON COMMIT DROP does not fire when the import runs inside an outer transaction
+        cursor.execute(f"DROP TABLE {STAGING_TABLE}")
+    return result
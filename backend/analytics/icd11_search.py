@@ -0,0 +1,183 @@
+"""
+Ranked ICD-11 code search and autocomplete over ICD11Mapping
+
+On PostgreSQL every mapping has a full-text document made of its code,
+description and the string values of its local terms ('simple' configuration,
+so Tagalog and Taglish terms are not stemmed as English). Queries match it
+word by word with prefix terms, and the substring (icontains) matches the
+search has always done are served by pg_trgm GIN indexes instead of a
+sequential scan. Results are ranked by code match, then text rank, then the
+mapping's confidence.
+
+The indexes are expression indexes, so they need no model field or migration:
+ensure_search_indexes() creates them and runs after every `migrate` (see
+apps.py). Without pg_trgm the substring matches fall back to a sequential
+scan; other databases (SQLite in tests) only get the substring matches.
+"""
+
+import logging
+import re
+
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.models import BooleanField, Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Length
+
+from .models import ICD11Mapping
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Full-text document of a mapping; the queries must repeat this expression exactly to use its index
+DOCUMENT_SQL = (
+    "to_tsvector('simple'::regconfig, code::text || ' ' || description) || "
+    "jsonb_to_tsvector('simple'::regconfig, local_terms, '[\"string\"]'::jsonb)"
+)
+
+TABLE = ICD11Mapping._meta.db_table
+
+# Same expressions as Django's icontains/istartswith lookups: UPPER(column::text) LIKE UPPER(...)
+TRIGRAM_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS icd11_mappings_code_trgm ON {TABLE} USING gin (UPPER(code::text) gin_trgm_ops)",
+    f"CREATE INDEX IF NOT EXISTS icd11_mappings_description_trgm ON {TABLE} "
+    "USING gin (UPPER(description::text) gin_trgm_ops)",
+    f"CREATE INDEX IF NOT EXISTS icd11_mappings_local_terms_trgm ON {TABLE} "
+    "USING gin (UPPER(local_terms::text) gin_trgm_ops)",
+]
+SEARCH_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS icd11_mappings_document ON {TABLE} USING gin (({DOCUMENT_SQL}))",
+    f"CREATE INDEX IF NOT EXISTS icd11_mappings_code_prefix ON {TABLE} (UPPER(code::text) text_pattern_ops)",
+]
+
+
+def ensure_search_indexes(using='default'):
+    """
+    Create the pg_trgm extension and the search indexes if they are missing
+
+    Returns:
+        bool: False on databases other than PostgreSQL, where there is nothing to create
+    """
+    db = connections[using]
+    if db.vendor != 'postgresql':
+        return False
+    try:
+        # Its own transaction (or savepoint), so a missing privilege does not break the caller's
+        with transaction.atomic(using=using), db.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for statement in TRIGRAM_INDEXES:
+                cursor.execute(statement)
+    except DatabaseError as e:
+        logger.warning(f"ICD-11 substring search stays unindexed, pg_trgm is not available: {str(e)}")
+    with db.cursor() as cursor:
+        for statement in SEARCH_INDEXES:
+            cursor.execute(statement)
+    return True
+
+
+def create_search_indexes(sender, using='default', **kwargs):
+    """post_migrate receiver"""
+    try:
+        ensure_search_indexes(using)
+    except Exception as e:
+        logger.error(f"Error creating ICD-11 search indexes: {str(e)}")
+
+
+def search_words(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def prefix_tsquery(words):
+    """to_tsquery() text matching every word as a prefix; \\w+ words hold no tsquery operators"""
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def _code_rank(query):
+    return Case(
+        When(code__iexact=query, then=Value(2)),
+        When(code__istartswith=query, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _document_match(words):
+    return RawSQL(
+        f"({DOCUMENT_SQL}) @@ to_tsquery('simple'::regconfig, %s)", [prefix_tsquery(words)],
+        output_field=BooleanField(),
+    )
+
+
+def _text_rank(words):
+    return RawSQL(
+        f"ts_rank({DOCUMENT_SQL}, to_tsquery('simple'::regconfig, %s))", [prefix_tsquery(words)],
+        output_field=FloatField(),
+    )
+
+
+def _union_with_document_matches(mappings, matches, words):
+    """
+    The mappings that satisfy matches, plus those containing every word as a prefix
+
+    A UNION rather than an OR, so each half is answered by its own index and
+    the document is not computed again for every candidate row.
+    """
+    return mappings.filter(matches).order_by().union(mappings.filter(_document_match(words)).order_by())
+
+
+def search_mappings(query, limit=DEFAULT_LIMIT):
+    """
+    Active mappings whose code, description or local terms match the query, best first
+
+    A mapping matches when the query is a substring of its code, description or
+    local terms, or, on PostgreSQL, when each query word starts a word of its
+    document ("abdominal pai" finds "Pain in the abdominal region").
+
+    Returns:
+        QuerySet: At most limit ICD11Mapping rows; not evaluated, so it can be iterated asynchronously
+    """
+    query = query.strip()
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    mappings = ICD11Mapping.objects.filter(is_active=True)
+    matches = Q(code__icontains=query) | Q(description__icontains=query) | Q(local_terms__icontains=query)
+
+    words = search_words(query)
+    if connection.vendor == 'postgresql' and words:
+        # Ranked by text only once matched, so the document is computed for the matches alone
+        matching = _union_with_document_matches(mappings.values('pk'), matches, words)
+        mappings = ICD11Mapping.objects.filter(pk__in=matching).annotate(
+            code_rank=_code_rank(query), text_rank=_text_rank(words),
+        )
+        order = ['-code_rank', '-text_rank', '-confidence_score', 'code']
+    else:
+        mappings = mappings.filter(matches).annotate(code_rank=_code_rank(query))
+        order = ['-code_rank', '-confidence_score', 'code']
+    return mappings.order_by(*order)[:limit]
+
+
+def autocomplete_mappings(prefix, limit=DEFAULT_LIMIT):
+    """
+    Completions for a partly typed code or diagnosis
+
+    Codes starting with the text come first, then, on PostgreSQL, mappings with
+    a word starting with each typed word (elsewhere: containing the text),
+    shortest description first.
+
+    Returns:
+        QuerySet: At most limit dicts with code, description and confidence_score
+    """
+    prefix = prefix.strip()
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    # The shortest titles are the general entries ("Migraine" before "Migraine-induced stroke")
+    mappings = ICD11Mapping.objects.filter(is_active=True).annotate(
+        code_rank=_code_rank(prefix), description_length=Length('description'),
+    ).values('code', 'description', 'confidence_score', 'code_rank', 'description_length')
+    matches = Q(code__istartswith=prefix)
+
+    words = search_words(prefix)
+    if connection.vendor == 'postgresql' and words:
+        mappings = _union_with_document_matches(mappings, matches, words)
+    else:
+        mappings = mappings.filter(matches | Q(description__icontains=prefix))
+    return mappings.order_by('-code_rank', 'description_length', 'code')[:limit]
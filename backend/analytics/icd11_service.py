@@ -8,8 +8,9 @@ import requests
 import json
 from typing import List, Dict, Tuple
 from django.conf import settings
-from django.db.models import Q
 from analytics.models import ICD11Mapping, ICD11Entity
+from analytics.icd11_search import search_mappings
+from analytics.icd11_snapshot import icd11_reference
 import logging
 
 logger = logging.getLogger(__name__)
@@ -37,64 +38,74 @@ class ICD11Detector:
         Load ICD-11 mappings from the database
         """
         try:
-            # Get all active mappings from database
-            self.db_mappings = {}
-            mappings = ICD11Mapping.objects.filter(is_active=True).values(
-                'code', 'description', 'local_terms', 'confidence_score', 'source'
-            )
-            
-            for mapping in mappings:
-                code = mapping['code']
-                description = mapping['description']
-                
-                # Store the mapping
-                self.db_mappings[code] = {
-                    'code': code,
-                    'name': description,
-                    'local_terms': mapping['local_terms'],
-                    'confidence_score': mapping['confidence_score'],
-                    'source': mapping['source']
-                }
-                
-                # Create search terms from description and local terms
-                search_terms = [description.lower()]
-                
-                # Add local terms if available
-                if mapping['local_terms']:
-                    local_terms = mapping['local_terms']
-                    if isinstance(local_terms, dict):
-                        # Add English terms
-                        if 'english' in local_terms and local_terms['english']:
-                            search_terms.extend([term.lower() for term in local_terms['english']])
-                        # Add Tagalog terms
-                        if 'tagalog' in local_terms and local_terms['tagalog']:
-                            search_terms.extend([term.lower() for term in local_terms['tagalog']])
-                        # Add Taglish terms
-                        if 'taglish' in local_terms and local_terms['taglish']:
-                            search_terms.extend([term.lower() for term in local_terms['taglish']])
-                
-                # Create word mappings for each search term, but be more selective
-                for term in search_terms:
-                    # Only create mappings for meaningful medical terms
-                    if self._is_meaningful_medical_term(term):
-                        words = re.findall(r'\b\w+\b', term)
-                        for word in words:
-                            if len(word) > 3 and self._is_medical_word(word):  # Only map words longer than 3 chars
-                                if word not in self.db_mappings:
-                                    self.db_mappings[word] = {
-                                        'code': code,
-                                        'name': description,
-                                        'confidence_score': mapping['confidence_score'],
-                                        'source': mapping['source']
-                                    }
-            
+            # Word map shared by the whole process, from the ICD-11 snapshot when it is current
+            self.db_mappings = icd11_reference().word_mappings
             logger.info(f"Loaded {len(self.db_mappings)} ICD-11 mappings from database")
             
         except Exception as e:
             logger.error(f"Error loading database mappings: {str(e)}")
             self.db_mappings = {}
     
-    def _is_meaningful_medical_term(self, term: str) -> bool:
+    @classmethod
+    def build_word_mappings(cls, mappings) -> Dict[str, Dict]:
+        """
+        Build the lookup table of codes and medical words from ICD11Mapping rows
+        
+        Args:
+            mappings: Rows with code, description, local_terms, confidence_score and source
+            
+        Returns:
+            Dict: Code or word -> mapping
+        """
+        db_mappings = {}
+        for mapping in mappings:
+            code = mapping['code']
+            description = mapping['description']
+            
+            # Store the mapping
+            db_mappings[code] = {
+                'code': code,
+                'name': description,
+                'local_terms': mapping['local_terms'],
+                'confidence_score': mapping['confidence_score'],
+                'source': mapping['source']
+            }
+            
+            # Create search terms from description and local terms
+            search_terms = [description.lower()]
+            
+            # Add local terms if available
+            if mapping['local_terms']:
+                local_terms = mapping['local_terms']
+                if isinstance(local_terms, dict):
+                    # Add English terms
+                    if 'english' in local_terms and local_terms['english']:
+                        search_terms.extend([term.lower() for term in local_terms['english']])
+                    # Add Tagalog terms
+                    if 'tagalog' in local_terms and local_terms['tagalog']:
+                        search_terms.extend([term.lower() for term in local_terms['tagalog']])
+                    # Add Taglish terms
+                    if 'taglish' in local_terms and local_terms['taglish']:
+                        search_terms.extend([term.lower() for term in local_terms['taglish']])
+            
+            # Create word mappings for each search term, but be more selective
+            for term in search_terms:
+                # Only create mappings for meaningful medical terms
+                if cls._is_meaningful_medical_term(term):
+                    words = re.findall(r'\b\w+\b', term)
+                    for word in words:
+                        if len(word) > 3 and cls._is_medical_word(word):  # Only map words longer than 3 chars
+                            if word not in db_mappings:
+                                db_mappings[word] = {
+                                    'code': code,
+                                    'name': description,
+                                    'confidence_score': mapping['confidence_score'],
+                                    'source': mapping['source']
+                                }
+        return db_mappings
+    
+    @staticmethod
+    def _is_meaningful_medical_term(term: str) -> bool:
         """
         Check if a term is meaningful for medical detection
         """
@@ -124,7 +135,8 @@ class ICD11Detector:
         
         return True
     
-    def _is_medical_word(self, word: str) -> bool:
+    @staticmethod
+    def _is_medical_word(word: str) -> bool:
         """
         Check if a word is likely to be medical
         """
@@ -286,30 +298,41 @@ class ICD11Detector:
             List[Dict]: List of matching ICD-11 codes
         """
         try:
-            # Search in ICD11Mapping model
-            mappings = ICD11Mapping.objects.filter(
-                Q(description__icontains=query) |
-                Q(code__icontains=query) |
-                Q(local_terms__icontains=query),
-                is_active=True
-            )[:limit]
-            
-            results = []
-            for mapping in mappings:
-                results.append({
-                    'code': mapping.code,
-                    'description': mapping.description,
-                    'confidence_score': mapping.confidence_score,
-                    'source': mapping.source,
-                    'local_terms': mapping.local_terms
-                })
+            return [self._search_result(mapping) for mapping in self._search_queryset(query, limit)]
             
-            return results
+        except Exception as e:
+            logger.error(f"Error searching ICD-11 codes: {str(e)}")
+            return []
+    
+    @classmethod
+    async def asearch_icd11_codes(cls, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Async search_icd11_codes using the async ORM
+        
+        A classmethod: searching needs none of the mappings the constructor loads.
+        """
+        try:
+            return [cls._search_result(mapping) async for mapping in cls._search_queryset(query, limit)]
             
         except Exception as e:
             logger.error(f"Error searching ICD-11 codes: {str(e)}")
             return []
     
+    @staticmethod
+    def _search_queryset(query: str, limit: int):
+        # Ranked, and indexed on PostgreSQL (see icd11_search.py)
+        return search_mappings(query, limit)
+    
+    @staticmethod
+    def _search_result(mapping) -> Dict:
+        return {
+            'code': mapping.code,
+            'description': mapping.description,
+            'confidence_score': mapping.confidence_score,
+            'source': mapping.source,
+            'local_terms': mapping.local_terms
+        }
+    
     def get_icd11_entity(self, entity_id: str) -> Dict:
         """
         Get ICD-11 entity details from database
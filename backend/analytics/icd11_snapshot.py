@@ -0,0 +1,256 @@
+"""
+Precompiled ICD-11 reference data shared by the detectors
+
+The detectors used to build their lookup tables in every instance:
+MentalHealthICD11Detector and EnhancedMentalHealthDetector parsed the whole
+WHO CSV with pandas, and ICD11Detector, which the views construct per request,
+rebuilt its word map from every ICD11Mapping row. icd11_reference() now builds
+these tables once per process and hands the same read-only objects to every
+detector.
+
+`python manage.py build_icd11_snapshot` pickles the tables to
+ICD11_SNAPSHOT_PATH. A process then reads the snapshot instead of parsing the
+CSV and walking the mappings, as long as it is still current: the snapshot
+records the SHA-256 of the CSV and a fingerprint of the ICD11Mapping table
+(row count and latest updated_at), and any part that no longer matches is
+rebuilt from its source. Under Gunicorn the tables are loaded in the master
+before workers are forked (see gunicorn.conf.py), so all workers share one copy.
+
+Rebuild the snapshot after importing or editing mappings; a stale one is only
+slower, never wrong. QuerySet.update() does not touch updated_at, so changes
+made that way are not noticed until the row count changes or a process restarts.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import threading
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .icd11_import import read_rows
+from .models import ICD11Mapping
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the pickled tables changes; older snapshots are then ignored
+SNAPSHOT_FORMAT = 1
+
+# Chapter 6 (mental, behavioural or neurodevelopmental disorders) and the MB symptom block
+MENTAL_HEALTH_PREFIXES = ('6', 'MB')
+
+
+class ICD11Reference:
+    """
+    Lookup tables built from the ICD-11 CSV and the ICD11Mapping table
+
+    Shared by every detector in the process; treat all attributes as read-only.
+    """
+
+    def __init__(self, csv_digest, mental_health_conditions, chapter6_titles,
+                 db_fingerprint, mappings, word_mappings):
+        self.csv_digest = csv_digest
+        # code -> {'code', 'title', 'definition', 'full_text'} for codes starting with 6 or MB
+        self.mental_health_conditions = mental_health_conditions
+        # code -> title of the ChapterNo 6 rows
+        self.chapter6_titles = chapter6_titles
+        self.db_fingerprint = db_fingerprint
+        # code -> mapping of every active ICD11Mapping
+        self.mappings = mappings
+        # codes plus medical words of their terms -> mapping, as ICD11Detector matches them
+        self.word_mappings = word_mappings
+        self.mental_health_mappings = {
+            code: mapping for code, mapping in mappings.items() if code.startswith(MENTAL_HEALTH_PREFIXES)
+        }
+
+
+def file_digest(path):
+    """SHA-256 of a file, or '' when it does not exist"""
+    if not os.path.exists(path):
+        return ''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def database_fingerprint():
+    """(row count, latest updated_at) of ICD11Mapping; changes whenever a mapping is saved or deleted"""
+    stats = ICD11Mapping.objects.order_by().aggregate(count=Count('id'), updated=Max('updated_at'))
+    return stats['count'], stats['updated'].isoformat() if stats['updated'] else ''
+
+
+def build_csv_tables(path):
+    """
+    Read the Chapter 6 lookup tables from the WHO CSV
+
+    Returns:
+        Tuple[dict, dict]: (mental_health_conditions, chapter6_titles), both empty without the file
+    """
+    conditions, titles = {}, {}
+    if not os.path.exists(path):
+        logger.warning(f"ICD-11 dataset not found at {path}")
+        return conditions, titles
+
+    for row in read_rows(path):
+        code, title = row['code'], row['title']
+        if code.startswith(MENTAL_HEALTH_PREFIXES):
+            definition = ''  # No definition column in the dataset
+            conditions[code] = {
+                'code': code,
+                'title': title,
+                'definition': definition,
+                'full_text': f"{title} {definition}".lower(),
+            }
+        if row['chapter_no'].strip() == '6' and code and title:
+            titles[code] = title
+    return conditions, titles
+
+
+def build_database_tables():
+    """
+    Read the active ICD11Mapping rows
+
+    Returns:
+        Tuple[dict, dict]: (mappings by code, word mappings used by ICD11Detector)
+    """
+    from .icd11_service import ICD11Detector
+
+    rows = list(ICD11Mapping.objects.filter(is_active=True).values(
+        'code', 'description', 'local_terms', 'confidence_score', 'source'
+    ))
+    mappings = {
+        row['code']: {
+            'code': row['code'],
+            'name': row['description'],
+            'local_terms': row['local_terms'],
+            'confidence_score': row['confidence_score'],
+            'source': row['source'],
+        }
+        for row in rows
+    }
+    return mappings, ICD11Detector.build_word_mappings(rows)
+
+
+def build_reference(csv_path=None):
+    """Build the lookup tables from the CSV and the database, ignoring any snapshot"""
+    csv_path = csv_path or settings.ICD11_DATASET_PATH
+    fingerprint = database_fingerprint()
+    conditions, titles = build_csv_tables(csv_path)
+    mappings, word_mappings = build_database_tables()
+    return ICD11Reference(file_digest(csv_path), conditions, titles, fingerprint, mappings, word_mappings)
+
+
+def write_snapshot(reference, path=None):
+    """
+    Pickle the lookup tables, replacing any earlier snapshot atomically
+
+    Returns:
+        str: Path of the snapshot
+    """
+    path = path or settings.ICD11_SNAPSHOT_PATH
+    payload = {
+        'format': SNAPSHOT_FORMAT,
+        'built_at': timezone.now().isoformat(),
+        'csv_digest': reference.csv_digest,
+        'mental_health_conditions': reference.mental_health_conditions,
+        'chapter6_titles': reference.chapter6_titles,
+        'db_fingerprint': reference.db_fingerprint,
+        'mappings': reference.mappings,
+        'word_mappings': reference.word_mappings,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+    return path
+
+
+def read_snapshot(path=None):
+    """
+    Load a snapshot written by write_snapshot()
+
+    Returns:
+        dict or None: The snapshot, or None when it is missing, unreadable or of another format
+    """
+    path = path or settings.ICD11_SNAPSHOT_PATH
+    if not os.path.exists(path):
+        return None
+    try:
+        # Written by build_icd11_snapshot on this host; never point this at untrusted files
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable ICD-11 snapshot {path}: {str(e)}")
+        return None
+    if not isinstance(payload, dict) or payload.get('format') != SNAPSHOT_FORMAT:
+        logger.warning(f"Ignoring ICD-11 snapshot {path}: format {SNAPSHOT_FORMAT} expected")
+        return None
+    return payload
+
+
+_lock = threading.Lock()
+_reference = None
+
+
+def _load_reference(fingerprint):
+    csv_path = settings.ICD11_DATASET_PATH
+    snapshot = read_snapshot()
+    stale = []
+
+    # The CSV does not change while a process runs; keep its tables across DB reloads
+    if _reference is not None:
+        csv_digest = _reference.csv_digest
+        conditions, titles = _reference.mental_health_conditions, _reference.chapter6_titles
+    else:
+        csv_digest = file_digest(csv_path)
+        if snapshot and snapshot['csv_digest'] == csv_digest:
+            conditions, titles = snapshot['mental_health_conditions'], snapshot['chapter6_titles']
+        else:
+            conditions, titles = build_csv_tables(csv_path)
+            stale.append('dataset')
+
+    if snapshot and tuple(snapshot['db_fingerprint']) == fingerprint:
+        mappings, word_mappings = snapshot['mappings'], snapshot['word_mappings']
+    else:
+        mappings, word_mappings = build_database_tables()
+        stale.append('mappings')
+
+    if snapshot is None:
+        logger.info("No ICD-11 snapshot; built the reference data from the CSV and the database")
+    elif stale:
+        logger.info(
+            f"ICD-11 snapshot is out of date ({', '.join(stale)} rebuilt); "
+            "run `python manage.py build_icd11_snapshot` to refresh it"
+        )
+    return ICD11Reference(csv_digest, conditions, titles, fingerprint, mappings, word_mappings)
+
+
+def icd11_reference():
+    """
+    The process-wide ICD-11 lookup tables
+
+    Costs one aggregate query per call; the tables are only reloaded when the
+    ICD11Mapping table changed since they were built.
+
+    Returns:
+        ICD11Reference: Shared, read-only tables
+    """
+    global _reference
+    fingerprint = database_fingerprint()
+    with _lock:
+        if _reference is None or _reference.db_fingerprint != fingerprint:
+            _reference = _load_reference(fingerprint)
+        return _reference
+
+
+def clear_reference():
+    """Forget the loaded tables, e.g. after replacing the snapshot or the CSV"""
+    global _reference
+    with _lock:
+        _reference = None
@@ -0,0 +1,83 @@
+"""
+Django management command to give historical clinic records ICD-11 diagnosis codes
+Usage: python manage.py backcode_diagnoses [--source permit_request|appointment] [--batch-size N] [--limit N]
+                                           [--min-confidence X] [--restart] [--dry-run]
+Resumable: each run continues after the last batch a previous run committed
+(see analytics/icd11_backcoding.py).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.icd11_backcoding import (
+    DEFAULT_BATCH_SIZE, DEFAULT_MIN_CONFIDENCE, SOURCES, backcode, uncoded_records,
+)
+from backend.model_lifecycle import get_model
+
+
+class Command(BaseCommand):
+    help = 'Detect and store ICD-11 diagnosis codes for completed permit requests and appointments without one'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            choices=sorted(SOURCES),
+            action='append',
+            help='Records to back-code; repeat for several (default: all)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Records detected and written per batch (default: {DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Maximum number of records per source in this run (default: all)'
+        )
+        parser.add_argument(
+            '--min-confidence',
+            type=float,
+            default=DEFAULT_MIN_CONFIDENCE,
+            help=f'Lowest confidence of a detected diagnosis that is written (default: {DEFAULT_MIN_CONFIDENCE})'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the saved progress and start again from the oldest record'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be coded without saving anything'
+        )
+
+    def handle(self, *args, **options):
+        detector = get_model('hybrid_icd11')
+
+        for source in options['source'] or sorted(SOURCES):
+            self.stdout.write(f'{source}: {uncoded_records(source).count()} uncoded records')
+            started = time.monotonic()
+            progress = backcode(
+                source, detector,
+                batch_size=options['batch_size'],
+                limit=options['limit'],
+                min_confidence=options['min_confidence'],
+                restart=options['restart'],
+                dry_run=options['dry_run'],
+                on_batch=lambda progress, records, coded, source=source: self.stdout.write(
+                    f'{source}: {len(coded)}/{len(records)} coded up to id {progress.last_id} '
+                    f'({progress.coded}/{progress.processed} in total)'
+                ),
+            )
+            elapsed = time.monotonic() - started
+
+            state = 'all records processed' if progress.completed_at else f'stopped after id {progress.last_id}'
+            self.stdout.write(self.style.SUCCESS(
+                f'{source}: {progress.coded} of {progress.processed} records coded, {state} in {elapsed:.1f}s'
+            ))
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: no records or progress were saved'))
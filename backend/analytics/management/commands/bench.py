@@ -0,0 +1,123 @@
+"""
+Django management command to benchmark detection, trends, PDF, OCR and bulk upload
+Usage: python manage.py bench [case ...] [--scale 1 --rounds 5] [--output bench.json] [--baseline bench.json]
+The synthetic dataset is written in a transaction that is rolled back; exits
+non-zero when --baseline is given and a case got slower or runs more queries.
+"""
+
+import json
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.benchmarks import (
+    CASES, DEFAULT_TOLERANCE, BenchmarkError, compare_with_baseline, run_benchmarks,
+)
+
+
+class Command(BaseCommand):
+    help = 'Time the expensive request paths on seeded synthetic data and compare with a saved baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'cases',
+            nargs='*',
+            help='Cases to run (defaults to all, see --list)',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List the available cases and exit',
+        )
+        parser.add_argument(
+            '--scale',
+            type=int,
+            default=1,
+            help='Dataset size multiplier (1 = 50 students, 200 permit requests, ...)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed of the synthetic dataset',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=5,
+            help='Timed runs per case',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=1,
+            help='Untimed runs per case before timing',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results to this JSON file, e.g. to save a baseline',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON file of an earlier run to compare with',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=DEFAULT_TOLERANCE,
+            help='Allowed relative increase of the median time before a case counts as regressed',
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name, (description, _) in CASES.items():
+                self.stdout.write(f'{name:<24} {description}')
+            return
+
+        names = options['cases'] or list(CASES)
+        unknown = [name for name in names if name not in CASES]
+        if unknown:
+            raise CommandError(f"Unknown case(s): {', '.join(unknown)}. Use --list to see the cases.")
+        if options['rounds'] < 1:
+            raise CommandError('--rounds must be at least 1')
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+            if baseline.get('meta', {}).get('scale') != options['scale']:
+                self.stdout.write(self.style.WARNING(
+                    f"Baseline was recorded at scale {baseline.get('meta', {}).get('scale')}, "
+                    f"this run uses {options['scale']}"
+                ))
+
+        try:
+            with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+                current = run_benchmarks(
+                    names, workdir, scale=options['scale'], seed=options['seed'],
+                    rounds=options['rounds'], warmup=options['warmup'], report=self.report,
+                )
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(current, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare_with_baseline(current, baseline, options['tolerance'])
+            if regressions:
+                for message in regressions:
+                    self.stdout.write(self.style.ERROR(message))
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}"))
+
+    def report(self, name, result):
+        if 'skipped' in result:
+            self.stdout.write(self.style.WARNING(f"{name:<24} skipped: {result['skipped']}"))
+            return
+        self.stdout.write(
+            f"{name:<24} median {result['median'] * 1000:9.1f}ms  min {result['min'] * 1000:9.1f}ms  "
+            f"stdev {result['stdev'] * 1000:7.1f}ms  queries {result['queries']}"
+        )
@@ -0,0 +1,68 @@
+"""
+Django management command to build the ICD-11 snapshot the detectors load at startup
+Usage: python manage.py build_icd11_snapshot [--output path] [--check]
+Run it after import_icd11_conditions_csv or other changes to the ICD-11 mappings;
+a stale snapshot is ignored part by part (see analytics/icd11_snapshot.py).
+"""
+
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.icd11_snapshot import (
+    build_reference, database_fingerprint, file_digest, read_snapshot, write_snapshot,
+)
+
+
+class Command(BaseCommand):
+    help = 'Precompile the ICD-11 lookup tables of the detectors into a snapshot file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Snapshot path (default: the ICD11_SNAPSHOT_PATH setting)'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report whether the existing snapshot is current; exits non-zero when it is not'
+        )
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.ICD11_SNAPSHOT_PATH
+
+        if options['check']:
+            snapshot = read_snapshot(path)
+            if snapshot is None:
+                raise CommandError(f'No usable snapshot at {path}')
+            stale = []
+            if snapshot['csv_digest'] != file_digest(settings.ICD11_DATASET_PATH):
+                stale.append('dataset changed')
+            if tuple(snapshot['db_fingerprint']) != database_fingerprint():
+                stale.append('mappings changed')
+            if stale:
+                raise CommandError(f"Snapshot {path} is out of date: {', '.join(stale)}")
+            self.stdout.write(self.style.SUCCESS(f"Snapshot {path} is current (built {snapshot['built_at']})"))
+            return
+
+        if not os.path.exists(settings.ICD11_DATASET_PATH):
+            self.stdout.write(self.style.WARNING(
+                f'ICD-11 dataset not found at {settings.ICD11_DATASET_PATH}; the snapshot will hold mappings only'
+            ))
+
+        started = time.monotonic()
+        reference = build_reference()
+        write_snapshot(reference, path)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(f'Mental health conditions: {len(reference.mental_health_conditions)}')
+        self.stdout.write(f'Chapter 6 titles: {len(reference.chapter6_titles)}')
+        self.stdout.write(f'Active mappings: {len(reference.mappings)}')
+        self.stdout.write(f'Word mappings: {len(reference.word_mappings)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'ICD-11 snapshot written to {path} ({os.path.getsize(path) // 1024} KB) in {elapsed:.1f}s'
+        ))
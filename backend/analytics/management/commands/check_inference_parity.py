@@ -0,0 +1,89 @@
+"""
+Django management command to compare the int8 ONNX backend with PyTorch
+Usage: python manage.py check_inference_parity [--task sequence_classification --num-labels 4]
+Run before switching BERT_INFERENCE_BACKEND to 'onnx'; exits non-zero when parity is lost.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.inference import check_parity
+
+# Tagalog, English and Taglish samples covering every intent the chatbot detects
+DEFAULT_TEXTS = [
+    'I have a headache and a fever since yesterday',
+    'Sobrang stressed ako sa exams, hindi ako makatulog',
+    'I feel hopeless and I do not want to live anymore',
+    'Gusto ko lang mag-kwento tungkol sa araw ko',
+    'My friends keep bullying me at school',
+    'Masakit ang tiyan ko after lunch',
+    'I am anxious before every class presentation',
+    'Thank you, okay na ako ngayon',
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare ONNX int8 inference with PyTorch by embedding cosine and intent label agreement'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--checkpoint',
+            default='bert-base-multilingual-cased',
+            help='Model name or local checkpoint directory',
+        )
+        parser.add_argument(
+            '--task',
+            choices=['base', 'sequence_classification'],
+            default='base',
+            help='base compares embeddings; sequence_classification also compares labels',
+        )
+        parser.add_argument(
+            '--num-labels',
+            type=int,
+            help='Number of labels for a classification head (the intent detector uses 4)',
+        )
+        parser.add_argument(
+            '--texts-file',
+            help='File with one sample text per line (defaults to built-in samples)',
+        )
+        parser.add_argument(
+            '--min-cosine',
+            type=float,
+            default=0.99,
+            help='Lowest acceptable cosine similarity between the two backends',
+        )
+        parser.add_argument(
+            '--min-label-agreement',
+            type=float,
+            default=0.95,
+            help='Lowest acceptable share of texts with the same predicted label',
+        )
+
+    def handle(self, *args, **options):
+        texts = DEFAULT_TEXTS
+        if options['texts_file']:
+            with open(options['texts_file'], encoding='utf-8') as f:
+                texts = [line.strip() for line in f if line.strip()]
+
+        model_options = {}
+        if options['num_labels']:
+            model_options['num_labels'] = options['num_labels']
+
+        try:
+            result = check_parity(options['checkpoint'], texts, task=options['task'], **model_options)
+        except ImportError as e:
+            raise CommandError(f'ONNX backend unavailable: {e}. Install onnx and onnxruntime.')
+
+        self.stdout.write(
+            f"{result['texts']} texts, cosine min {result['min_cosine']:.4f} "
+            f"mean {result['mean_cosine']:.4f}"
+        )
+        if result['label_agreement'] is not None:
+            self.stdout.write(f"Label agreement {result['label_agreement']:.2%}")
+
+        if result['min_cosine'] < options['min_cosine']:
+            raise CommandError(f"Cosine similarity {result['min_cosine']:.4f} below {options['min_cosine']}")
+        if result['label_agreement'] is not None and result['label_agreement'] < options['min_label_agreement']:
+            raise CommandError(
+                f"Label agreement {result['label_agreement']:.2%} below {options['min_label_agreement']:.0%}"
+            )
+        self.stdout.write(self.style.SUCCESS('ONNX backend matches PyTorch'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from analytics.models import MentalHealthAlert
+from analytics.trend_engine import classify_unclassified_alerts
+
+
+class Command(BaseCommand):
+    help = 'Store trend reasons for mental health alerts written before trend classification existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reclassify',
+            action='store_true',
+            help='Clear and recompute trend reasons for all alerts (e.g. after keyword list changes)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of alerts updated per batch',
+        )
+
+    def handle(self, *args, **options):
+        alerts = MentalHealthAlert.objects.all()
+        
+        if options['reclassify']:
+            alerts.update(trend_reason=None)
+            self.stdout.write(self.style.WARNING('Cleared existing trend reasons'))
+        
+        classified = classify_unclassified_alerts(alerts, batch_size=options['batch_size'])
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Classified {classified} mental health alerts')
+        )
@@ -5,16 +5,13 @@ Focuses on Chapter 6 mental health conditions with risk assessment and intervent
 
 import re
 import json
-import pandas as pd
 import numpy as np
 import torch
 from typing import List, Dict, Tuple
-from django.conf import settings
-from django.db.models import Q
-from analytics.models import ICD11Mapping, ICD11Entity
+from analytics.icd11_snapshot import icd11_reference
 import logging
-import os
-from transformers import AutoTokenizer, AutoModel
+from backend.metrics import track_task
+from backend.model_lifecycle import acquire_pretrained, lazy_model
 from sklearn.metrics.pairwise import cosine_similarity
 from .medical_database_integration import medical_database_integration
 
@@ -202,26 +199,8 @@ class MentalHealthICD11Detector:
         Load mental health specific ICD-11 mappings from the database
         """
         try:
-            # Get mental health mappings from database (Chapter 6 codes)
-            self.db_mappings = {}
-            mappings = ICD11Mapping.objects.filter(
-                Q(code__startswith='6') | Q(code__startswith='MB'),  # Chapter 6 and mental health codes
-                is_active=True
-            ).values('code', 'description', 'local_terms', 'confidence_score', 'source')
-            
-            for mapping in mappings:
-                code = mapping['code']
-                description = mapping['description']
-                
-                # Store the mapping
-                self.db_mappings[code] = {
-                    'code': code,
-                    'name': description,
-                    'local_terms': mapping['local_terms'],
-                    'confidence_score': mapping['confidence_score'],
-                    'source': mapping['source']
-                }
-            
+            # Chapter 6 and mental health (MB) codes, shared with the other detectors
+            self.db_mappings = icd11_reference().mental_health_mappings
             logger.info(f"Loaded {len(self.db_mappings)} mental health ICD-11 mappings from database")
             
         except Exception as e:
@@ -233,45 +212,9 @@ class MentalHealthICD11Detector:
         Load ICD-11 dataset for Chapter 6 mental health conditions
         """
         try:
-            # Path to the ICD-11 dataset
-            dataset_path = os.path.join(settings.BASE_DIR, '..', 'datasets', 'icd11_conditions.csv')
-            
-            if os.path.exists(dataset_path):
-                # Read the CSV file
-                df = pd.read_csv(dataset_path)
-                
-                # Check if required columns exist
-                required_columns = ['Code']
-                if not all(col in df.columns for col in required_columns):
-                    logger.warning(f"ICD-11 dataset missing required columns: {required_columns}")
-                    self.icd11_dataset = {}
-                    return
-                
-                # Filter for Chapter 6 mental health conditions
-                # Chapter 6 codes start with '6' and some mental health codes start with 'MB'
-                mental_health_conditions = df[
-                    (df['Code'].str.startswith('6', na=False)) | 
-                    (df['Code'].str.startswith('MB', na=False))
-                ].copy()
-                
-                # Create a dictionary for quick lookup
-                self.icd11_dataset = {}
-                for _, row in mental_health_conditions.iterrows():
-                    code = row['Code']
-                    title = row.get('Title', '')
-                    definition = ''  # No definition column in the dataset
-                    
-                    self.icd11_dataset[code] = {
-                        'code': code,
-                        'title': title,
-                        'definition': definition,
-                        'full_text': f"{title} {definition}".lower()
-                    }
-                
-                logger.info(f"Loaded {len(self.icd11_dataset)} mental health conditions from ICD-11 dataset")
-            else:
-                logger.warning(f"ICD-11 dataset not found at {dataset_path}")
-                self.icd11_dataset = {}
+            # Parsed once per process, or read from the ICD-11 snapshot
+            self.icd11_dataset = icd11_reference().mental_health_conditions
+            logger.info(f"Loaded {len(self.icd11_dataset)} mental health conditions from ICD-11 dataset")
                 
         except Exception as e:
             logger.error(f"Error loading ICD-11 dataset: {str(e)}")
@@ -322,11 +265,8 @@ class MentalHealthICD11Detector:
                 return
             
             model_name = "bert-base-multilingual-cased"
-            self.bert_tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.bert_model = AutoModel.from_pretrained(model_name)
-            
-            # Set to evaluation mode
-            self.bert_model.eval()
+            # One read-only copy per process, already in evaluation mode
+            self.bert_tokenizer, self.bert_model = acquire_pretrained(model_name)
             self.bert_loaded = True
             
             logger.info("BERT model loaded successfully for mental health detection")
@@ -359,6 +299,7 @@ class MentalHealthICD11Detector:
             logger.error(f"Error getting text embedding: {str(e)}")
             return np.zeros((1, 768))  # Default BERT embedding size
     
+    @track_task('mental_health_bert')
     def detect_with_bert(self, text: str) -> List[Dict[str, any]]:
         """Detect mental health conditions using BERT semantic matching"""
         if not self.bert_loaded:
@@ -1044,5 +985,5 @@ class MentalHealthICD11Detector:
         else:
             return '1 month'
 
-# Global instance
-mental_health_icd11_detector = MentalHealthICD11Detector()
+# Global instance, constructed on first use by backend.model_lifecycle
+mental_health_icd11_detector = lazy_model('mental_health_icd11')
@@ -13,15 +13,8 @@ from datetime import timedelta, date, datetime
 from collections import defaultdict
 import calendar
 import re
-import numpy as np
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm
 
-from .mental_health_icd11_service import mental_health_icd11_detector
+from backend.model_lifecycle import lazy_model
 from .models import (
     MentalHealthAlert
 )
@@ -30,6 +23,9 @@ from appointments.models import Appointment
 from mood_tracker.models import MoodEntry
 from website.models import User
 
+# Importing the detector service pulls in torch and transformers; load it on first request
+mental_health_icd11_detector = lazy_model('mental_health_icd11')
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def detect_mental_health_realtime(request):
@@ -194,6 +194,9 @@ class MentalHealthAlert(models.Model):
     resolved_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='resolved_alerts')
     resolution_notes = models.TextField(blank=True)
     
+    # Trend term matched when the alert is written (null = not classified yet, '' = no match)
+    trend_reason = models.CharField(max_length=100, null=True, blank=True)
+    
     class Meta:
         db_table = 'mental_health_alerts'
         ordering = ['-created_at']
@@ -203,10 +206,20 @@ class MentalHealthAlert(models.Model):
             models.Index(fields=['severity']),
             models.Index(fields=['risk_level']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['created_at', 'trend_reason']),
         ]
     
     def __str__(self):
         return f"{self.student.username} - {self.title} ({self.get_status_display()})"
+    
+    def save(self, *args, **kwargs):
+        # Classify once on write so trend analytics can aggregate in the database
+        from .trend_engine import classify_alert
+        self.trend_reason = classify_alert(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'trend_reason' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['trend_reason']
+        super().save(*args, **kwargs)
 
 class RiskLevelDistribution(models.Model):
     """Model to track risk level distribution for analytics"""
@@ -252,4 +265,25 @@ class MentalHealthPattern(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.student.username} - {self.pattern_type} ({self.consecutive_days} days)"
\ No newline at end of file
+        return f"{self.student.username} - {self.pattern_type} ({self.consecutive_days} days)"
+
+class DiagnosisBackcodingProgress(models.Model):
+    """Checkpoint of back-coding one kind of historical clinic record with ICD-11 codes (see icd11_backcoding.py)"""
+    SOURCE_CHOICES = [
+        ('permit_request', 'Permit Request'),
+        ('appointment', 'Appointment'),
+    ]
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, unique=True)
+    last_id = models.PositiveBigIntegerField(default=0, help_text="Records up to this id have been processed")
+    processed = models.PositiveIntegerField(default=0, help_text="Records analysed so far")
+    coded = models.PositiveIntegerField(default=0, help_text="Records given a diagnosis code so far")
+    started_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True, help_text="When the last run reached the newest record")
+    
+    class Meta:
+        db_table = 'diagnosis_backcoding_progress'
+        ordering = ['source']
+    
+    def __str__(self):
+        return f"Back-coding of {self.get_source_display()}: {self.coded}/{self.processed} coded, up to id {self.last_id}"
@@ -14,6 +14,8 @@ from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from reportlab.pdfgen import canvas
 
+from backend.metrics import track_task
+
 class DOHCompliantReportGenerator:
     """
     Generates DOH-compliant PDF reports for school health analytics
@@ -85,6 +87,7 @@ class DOHCompliantReportGenerator:
             leftIndent=20
         ))
     
+    @track_task('pdf_doh_report')
     def generate_doh_compliant_report(self, analytics_data: Dict[str, Any], output_path: str) -> str:
         """
         Generate a DOH-compliant PDF report
@@ -901,6 +904,7 @@ class DOHCompliantReportGenerator:
         else:
             return 'LOW'
 
+    @track_task('pdf_counselor_report')
     def generate_counselor_mental_health_report(self, analytics_data: Dict[str, Any], alerts_data: Dict[str, Any], engagement_data: Dict[str, Any], output_path: str, prepared_by: str = None) -> str:
         """
         Generate a comprehensive mental health PDF report for counselors
@@ -1531,6 +1535,7 @@ class DOHCompliantReportGenerator:
         
         return story
 
+    @track_task('pdf_admin_report')
     def generate_unified_admin_report(self, mental_health_data: Dict[str, Any], physical_health_data: Dict[str, Any], engagement_data: Dict[str, Any], output_path: str, prepared_by: str = None) -> str:
         """
         Generate a unified admin PDF report combining all analytics sections
@@ -1,9 +1,21 @@
-from django.test import TestCase
+import os
+import subprocess
+import sys
+import tempfile
+from importlib.util import find_spec
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import timedelta
 from .models import MentalHealthAlert
 from .utils import is_duplicate_alert, create_alert_if_not_duplicate, cleanup_old_duplicates
+from .trend_engine import compute_monthly_trends, classify_unclassified_alerts
+from backend import model_lifecycle
+from backend.inference import check_parity
+from backend.server_profile import MB, compute_torch_threads, compute_workers
 
 User = get_user_model()
 
@@ -163,3 +175,755 @@ class AlertDuplicatePreventionTestCase(TestCase):
         # Check that only the duplicate was removed
         remaining_alerts = MentalHealthAlert.objects.filter(student=self.user)
         self.assertEqual(remaining_alerts.count(), 2)
+
+
+class MentalHealthTrendEngineTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='trenduser',
+            email='trend@example.com',
+            password='testpass123'
+        )
+    
+    def test_alert_classified_on_save(self):
+        """Test that the trend reason is stored when an alert is written"""
+        keyword_alert = MentalHealthAlert.objects.create(
+            student=self.user,
+            alert_type='keyword_detected',
+            severity='high',
+            title='High-Risk Keywords',
+            description='Student used high-risk keywords',
+            related_keywords=['Kill Myself']
+        )
+        title_alert = MentalHealthAlert.objects.create(
+            student=self.user,
+            alert_type='mood_pattern',
+            title='Student seems stressed',
+            description='Pattern detected'
+        )
+        generic_alert = MentalHealthAlert.objects.create(
+            student=self.user,
+            alert_type='manual_referral',
+            title='Referral',
+            description='Walk-in'
+        )
+        
+        self.assertEqual(keyword_alert.trend_reason, 'kill myself')
+        self.assertEqual(title_alert.trend_reason, 'stress')
+        self.assertEqual(generic_alert.trend_reason, '')
+    
+    def test_monthly_trends_aggregated(self):
+        """Test that monthly trends count classified and backfilled alerts"""
+        for _ in range(2):
+            MentalHealthAlert.objects.create(
+                student=self.user,
+                alert_type='mood_pattern',
+                title='Feeling anxious',
+                description='Pattern detected'
+            )
+        # Simulate an alert written before classification existed
+        MentalHealthAlert.objects.filter(pk=MentalHealthAlert.objects.first().pk).update(trend_reason=None)
+        
+        today = timezone.now().date()
+        with self.assertNumQueries(7):
+            monthly_data = compute_monthly_trends(today - timedelta(days=1), today)
+        
+        month_key = timezone.now().strftime('%b')
+        self.assertEqual(monthly_data[month_key]['anxiety'], 2)
+        self.assertEqual(classify_unclassified_alerts(MentalHealthAlert.objects.all()), 0)
+
+    def test_keyword_flag_dates(self):
+        """Test that flags carry the local date of detected_at and old flags are backfilled"""
+        from io import StringIO
+        from django.core.management import call_command
+        from chatbot.models import KeywordFlag
+        from chatbot.utils import record_keyword_flags
+
+        detected = [{'category': 'stress', 'detected_words': ['pagod', 'stressed']}]
+        self.assertEqual(record_keyword_flags(detected, 'session-1'), 2)
+        for flag in KeywordFlag.objects.all():
+            self.assertEqual(flag.detected_date, timezone.localdate(flag.detected_at))
+
+        # Flags stored before the column existed
+        earlier = timezone.now() - timedelta(days=40)
+        KeywordFlag.objects.update(detected_at=earlier, detected_date=None)
+        call_command('backfill_keyword_flag_dates', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(
+            set(KeywordFlag.objects.values_list('detected_date', flat=True)), {timezone.localdate(earlier)}
+        )
+
+
+class CountingModel:
+    """Stand-in model that records how often it is constructed and warmed up"""
+    instances = 0
+
+    def __init__(self):
+        CountingModel.instances += 1
+        self.loaded = False
+
+    def load(self):
+        self.loaded = True
+
+
+class ModelLifecycleTestCase(TestCase):
+    def setUp(self):
+        CountingModel.instances = 0
+        slot = model_lifecycle.ModelSlot('counting', 'analytics.tests.CountingModel', 'load')
+        patcher = mock.patch.dict(model_lifecycle._slots, {'counting': slot})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_url_import_does_not_load_ml_stack(self):
+        """Management commands import every view during system checks; that must stay cheap"""
+        code = (
+            "import sys, django; django.setup(); "
+            "from django.conf import settings; from django.urls import get_resolver; "
+            "get_resolver().url_patterns; "
+            "print(','.join(m for m in ('torch', 'transformers', 'sklearn') if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR, env=os.environ.copy(),
+            capture_output=True, text=True, timeout=120
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '')
+
+    def test_lazy_model_constructs_once_on_first_use(self):
+        proxy = model_lifecycle.lazy_model('counting')
+        self.assertEqual(CountingModel.instances, 0)
+        self.assertEqual(model_lifecycle._slots['counting'].state, model_lifecycle.NOT_LOADED)
+
+        self.assertFalse(proxy.loaded)
+        self.assertIs(model_lifecycle.get_model('counting'), model_lifecycle.get_model('counting'))
+        self.assertEqual(CountingModel.instances, 1)
+        self.assertEqual(model_lifecycle._slots['counting'].state, model_lifecycle.READY)
+
+    def test_failed_load_is_reported(self):
+        model_lifecycle._slots['counting'].factory_path = 'analytics.tests.MissingModel'
+        with self.assertRaises(ImportError):
+            model_lifecycle.get_model('counting')
+        self.assertEqual(model_lifecycle._slots['counting'].state, model_lifecycle.FAILED)
+
+    def test_readiness_without_warmup(self):
+        response = self.client.get('/api/health/models/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['ready'])
+        self.assertEqual(response.json()['models']['counting']['state'], 'not_loaded')
+
+    @override_settings(MODEL_WARMUP=True, MODEL_WARMUP_NAMES=['counting'])
+    def test_readiness_waits_for_warmup(self):
+        response = self.client.get('/api/health/models/')
+        self.assertEqual(response.status_code, 503)
+
+        thread = model_lifecycle.start_background_warmup()
+        thread.join(timeout=10)
+        self.assertTrue(model_lifecycle.get_model('counting').loaded)
+
+        response = self.client.get('/api/health/models/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['models']['counting']['state'], 'ready')
+
+
+class PreforkServerTestCase(TestCase):
+    def setUp(self):
+        CountingModel.instances = 0
+        slot = model_lifecycle.ModelSlot('counting', 'analytics.tests.CountingModel', 'load')
+        patcher = mock.patch.dict(model_lifecycle._slots, {'counting': slot})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_worker_count_fits_cpu_and_memory(self):
+        self.assertEqual(compute_workers(4, None, worker_memory_mb=300), 9)
+        self.assertEqual(compute_workers(4, 64 * 1024 * MB, worker_memory_mb=300, shared_memory_mb=1200), 9)
+        # 2 GB container: 800 MB left after the shared weights fits two workers
+        self.assertEqual(compute_workers(4, 2048 * MB, worker_memory_mb=300, shared_memory_mb=1200), 2)
+        self.assertEqual(compute_workers(4, 512 * MB, worker_memory_mb=300, shared_memory_mb=1200), 1)
+        self.assertEqual(compute_torch_threads(4, 2), 2)
+        self.assertEqual(compute_torch_threads(2, 5), 1)
+
+    @override_settings(MODEL_WARMUP=True, MODEL_WARMUP_NAMES=['counting'])
+    def test_preload_warms_in_master_without_thread(self):
+        with mock.patch.object(model_lifecycle, '_preload_warmup', False):
+            model_lifecycle.use_preload_warmup()
+            self.assertIsNone(model_lifecycle.start_background_warmup())
+            self.assertEqual(model_lifecycle.preload_models(), {'counting': model_lifecycle.READY})
+        self.assertTrue(model_lifecycle.get_model('counting').loaded)
+        self.assertTrue(model_lifecycle.model_status()[0])
+
+
+class TinyBertCheckpointMixin:
+    """Saves a tiny random BERT checkpoint so tests never download weights"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        import torch
+        from transformers import BertConfig, BertModel, BertTokenizer
+
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        vocab_path = os.path.join(cls.tmpdir.name, 'vocab.txt')
+        with open(vocab_path, 'w') as f:
+            f.write('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]', 'stress', 'sad']))
+        BertTokenizer(vocab_path).save_pretrained(cls.tmpdir.name)
+        config = BertConfig(vocab_size=7, hidden_size=8, num_hidden_layers=1,
+                            num_attention_heads=2, intermediate_size=16)
+        # Same weights in every run, so results do not depend on where random weights land
+        with torch.random.fork_rng():
+            torch.manual_seed(0)
+            BertModel(config).save_pretrained(cls.tmpdir.name)
+        cls.checkpoint = cls.tmpdir.name
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+        super().tearDownClass()
+
+
+class SharedPretrainedTestCase(TinyBertCheckpointMixin, TestCase):
+    """Detectors asking for the same checkpoint share one read-only copy of its weights"""
+
+    def tearDown(self):
+        model_lifecycle._pretrained.clear()
+
+    def test_one_copy_per_checkpoint(self):
+        tokenizer, base = model_lifecycle.acquire_pretrained(self.checkpoint)
+        other_tokenizer, other_base = model_lifecycle.acquire_pretrained(self.checkpoint + os.sep)
+        self.assertIs(tokenizer, other_tokenizer)
+        self.assertIs(base, other_base)
+        self.assertFalse(base.training)
+        self.assertFalse(any(p.requires_grad for p in base.parameters()))
+
+        _, classifier = model_lifecycle.acquire_pretrained(self.checkpoint, 'sequence_classification', num_labels=4)
+        self.assertIs(classifier.bert, base)
+
+        status = model_lifecycle.pretrained_status()
+        self.assertEqual(len(status['checkpoints']), 2)
+        # The classifier only adds its head to the shared encoder
+        head_bytes = sum(p.numel() * p.element_size() for p in classifier.classifier.parameters())
+        self.assertEqual(status['parameter_bytes'], model_lifecycle.parameter_bytes([base]) + head_bytes)
+        base_entry = next(c for c in status['checkpoints'] if c['task'] == 'base')
+        self.assertEqual(base_entry['refs'], 3)
+
+    def test_release_frees_with_last_reference(self):
+        model_lifecycle.acquire_pretrained(self.checkpoint, 'sequence_classification', num_labels=4)
+        model_lifecycle.acquire_pretrained(self.checkpoint)
+        self.assertEqual(len(model_lifecycle._pretrained), 2)
+
+        model_lifecycle.release_pretrained(self.checkpoint, 'sequence_classification', num_labels=4)
+        self.assertEqual(len(model_lifecycle._pretrained), 1)
+        model_lifecycle.release_pretrained(self.checkpoint)
+        self.assertEqual(model_lifecycle._pretrained, {})
+
+    def test_worker_thread_count_applied_on_load(self):
+        import torch
+
+        self.addCleanup(torch.set_num_threads, torch.get_num_threads())
+        with mock.patch.dict(os.environ, {'TORCH_NUM_THREADS': '3'}):
+            model_lifecycle.acquire_pretrained(self.checkpoint)
+        self.assertEqual(torch.get_num_threads(), 3)
+
+    def test_memory_reported_by_readiness_endpoint(self):
+        model_lifecycle.acquire_pretrained(self.checkpoint)
+        memory = self.client.get('/api/health/models/').json()['memory']
+        self.assertEqual(memory['checkpoints'][0]['refs'], 1)
+        self.assertGreater(memory['parameter_bytes'], 0)
+
+
+ONNX_AVAILABLE = find_spec('onnx') is not None and find_spec('onnxruntime') is not None
+
+
+class InferenceBackendTestCase(TinyBertCheckpointMixin, TestCase):
+    def tearDown(self):
+        model_lifecycle._pretrained.clear()
+
+    @override_settings(BERT_INFERENCE_BACKEND='tensorflow')
+    def test_unknown_backend_rejected(self):
+        with self.assertRaises(ValueError):
+            model_lifecycle.acquire_pretrained(self.checkpoint)
+
+    @override_settings(BERT_INFERENCE_BACKEND='onnx')
+    def test_onnx_backend_is_drop_in(self):
+        """Serves int8 ONNX when onnxruntime is installed and PyTorch otherwise, with the same outputs"""
+        import torch
+
+        with tempfile.TemporaryDirectory() as onnx_dir, self.settings(ONNX_MODEL_DIR=onnx_dir):
+            tokenizer, model = model_lifecycle.acquire_pretrained(self.checkpoint)
+            inputs = tokenizer(['stress', 'sad stress'], return_tensors='pt', padding=True)
+            with torch.no_grad():
+                outputs = model(**inputs)
+        self.assertEqual(tuple(outputs.last_hidden_state.shape[:2]), tuple(inputs['input_ids'].shape))
+        if ONNX_AVAILABLE:
+            self.assertEqual(model_lifecycle.pretrained_status()['parameter_bytes'], 0)
+
+    def test_onnx_cache_follows_checkpoint_files(self):
+        from backend.inference import onnx_model_path
+
+        before = onnx_model_path(self.checkpoint, 'base', (), directory='onnx')
+        self.assertEqual(before, onnx_model_path(self.checkpoint, 'base', (), directory='onnx'))
+        # Retraining into the same directory rewrites the weights and config
+        config_path = os.path.join(self.checkpoint, 'config.json')
+        stat = os.stat(config_path)
+        os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertNotEqual(before, onnx_model_path(self.checkpoint, 'base', (), directory='onnx'))
+
+    @skipUnless(ONNX_AVAILABLE, 'onnx and onnxruntime are not installed')
+    def test_onnx_parity(self):
+        texts = ['stress', 'sad', 'stress sad stress']
+        embeddings = check_parity(self.checkpoint, texts)
+        self.assertGreater(embeddings['min_cosine'], 0.95)
+
+        labels = check_parity(self.checkpoint, texts, task='sequence_classification', num_labels=4)
+        self.assertEqual(labels['label_agreement'], 1.0)
+
+
+class AsyncICD11SearchTestCase(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from .models import ICD11Mapping
+
+        ICD11Mapping.objects.create(code='8A80.0', description='Headache', local_terms=['sakit ng ulo'])
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='nurse', password='x', role='clinic'))
+
+    def test_local_search(self):
+        response = self.client.get('/api/analytics/icd11/search/', {'q': 'head'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['code'] for row in response.json()['search_results']], ['8A80.0'])
+        self.assertNotIn('who_results', response.json())
+
+    def test_who_search_runs_alongside_local_search(self):
+        who_match = {'theCode': '8A80', 'title': 'Migraine'}
+        with mock.patch('analytics.icd11_api_service.WHOICD11APIService.asearch_entities',
+                        new=mock.AsyncMock(return_value=[who_match])) as search:
+            response = self.client.get('/api/analytics/icd11/search/', {'q': 'head', 'include_who': 'true'})
+        search.assert_awaited_once_with('head', 10)
+        self.assertEqual(response.json()['who_results'], [who_match])
+        self.assertEqual(len(response.json()['search_results']), 1)
+
+
+class MetricsTestCase(TestCase):
+    def sample(self, name, **labels):
+        from prometheus_client import REGISTRY
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_latency_and_queries_exported(self):
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='teacher', password='x', role='faculty'))
+        before = self.sample('amieti_http_request_db_queries_count', view='get_faculty_notifications')
+        self.assertEqual(client.get('/api/health-records/faculty-notifications/').status_code, 200)
+
+        # The feed is an async view; its queries run in another thread and are still attributed
+        self.assertEqual(self.sample('amieti_http_request_db_queries_count', view='get_faculty_notifications'), before + 1)
+        self.assertGreaterEqual(self.sample('amieti_http_request_db_queries_sum', view='get_faculty_notifications'), 1)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            b'amieti_http_request_duration_seconds_count{method="GET",status="200",view="get_faculty_notifications"}',
+            response.content,
+        )
+
+    @override_settings(METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_skip_query_timing(self):
+        before = self.sample('amieti_http_request_db_queries_count', view='model_readiness')
+        latency_before = self.sample(
+            'amieti_http_request_duration_seconds_count', view='model_readiness', method='GET', status='200'
+        )
+        self.client.get('/api/health/models/')
+        self.assertEqual(self.sample('amieti_http_request_db_queries_count', view='model_readiness'), before)
+        self.assertEqual(self.sample(
+            'amieti_http_request_duration_seconds_count', view='model_readiness', method='GET', status='200'
+        ), latency_before + 1)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_cache_and_task_metrics(self):
+        from django.core.cache import cache
+        from backend.metrics import track_task
+
+        hits = self.sample('amieti_cache_requests_total', cache='default', result='hit')
+        misses = self.sample('amieti_cache_requests_total', cache='default', result='miss')
+        self.assertEqual(cache.get('metrics-test', 'fallback'), 'fallback')
+        cache.set('metrics-test', None)
+        self.assertIsNone(cache.get('metrics-test', 'fallback'))
+        self.assertEqual(cache.get_many(['metrics-test', 'metrics-missing']), {'metrics-test': None})
+        self.assertEqual(self.sample('amieti_cache_requests_total', cache='default', result='hit'), hits + 2)
+        self.assertEqual(self.sample('amieti_cache_requests_total', cache='default', result='miss'), misses + 2)
+
+        runs = self.sample('amieti_task_duration_seconds_count', task='test_task')
+        with track_task('test_task'):
+            pass
+        self.assertEqual(self.sample('amieti_task_duration_seconds_count', task='test_task'), runs + 1)
+
+
+class BenchCommandTestCase(TestCase):
+    def test_bench_writes_results_and_leaves_no_data(self):
+        import json
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        with tempfile.TemporaryDirectory() as workdir:
+            output = os.path.join(workdir, 'bench.json')
+            call_command(
+                'bench', 'mental_health_trends', 'ocr_preprocess', '--rounds', '2', '--warmup', '0',
+                '--output', output, stdout=StringIO(),
+            )
+            with open(output, encoding='utf-8') as f:
+                results = json.load(f)
+
+            self.assertEqual(results['meta']['seed'], 42)
+            self.assertEqual(results['dataset']['permit_requests'], 200)
+            trends = results['results']['mental_health_trends']
+            self.assertEqual(trends['rounds'], 2)
+            self.assertLessEqual(trends['min'], trends['median'])
+            self.assertGreater(trends['queries'], 0)
+            self.assertEqual(results['results']['ocr_preprocess']['queries'], 0)
+            # The synthetic dataset is rolled back
+            self.assertFalse(User.objects.filter(username__startswith='bench-').exists())
+
+            # A baseline that ran fewer queries makes the run fail
+            results['results']['mental_health_trends']['queries'] = 0
+            results['results']['mental_health_trends']['median'] = 3600
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(results, f)
+            with self.assertRaisesMessage(CommandError, '1 regression(s)'):
+                call_command(
+                    'bench', 'mental_health_trends', '--rounds', '1', '--warmup', '0',
+                    '--baseline', output, stdout=StringIO(),
+                )
+
+
+class QueryBudgetTestCase(TestCase):
+    """Registered endpoints stay within their query budget at every dataset size"""
+
+    def test_endpoints_within_query_budget(self):
+        from backend.query_budget import find_budget_violations, measure_query_counts
+
+        violations = find_budget_violations(measure_query_counts())
+        self.assertEqual(violations, [], '\n'.join(violations))
+
+    def test_growing_query_count_is_reported(self):
+        from backend.query_budget import EndpointBudget, find_budget_violations
+
+        budgets = [EndpointBudget('get_permit_requests', 'faculty', 5)]
+        self.assertEqual(
+            find_budget_violations({'get_permit_requests': {1: 3, 3: 5}}, budgets),
+            ['get_permit_requests: queries grow with the data (3 at scale 1, 5 at scale 3)'],
+        )
+        self.assertEqual(
+            find_budget_violations({'get_permit_requests': {1: 6, 3: 6}}, budgets),
+            ['get_permit_requests: 6 queries, budget 5'],
+        )
+
+
+class ICD11ImportTestCase(TestCase):
+    HEADER = (
+        'Foundation URI,Linearization (release) URI,Code,BlockId,Title,ClassKind,DepthInKind,IsResidual,'
+        'PrimaryLocation,ChapterNo,BrowserLink,iCatLink,isLeaf,noOfNonResidualChildren,Primary tabulation,'
+        'Grouping1,Grouping2,Grouping3,Grouping4,Grouping5,Version:2025 Aug 15 - 22:30 UTC'
+    )
+    ROWS = [
+        'http://id.who.int/icd/entity/1,,,,Chapter one,chapter,1,FALSE,TRUE,1,browser,iCat,FALSE,2,,,,,,,',
+        'http://id.who.int/icd/entity/2,,1A10, ,Foodborne intoxication ,category,1,FALSE,TRUE,1,browser,iCat,TRUE,0,TRUE,,,,,,',
+        'http://id.who.int/icd/entity/3,,_NOCODEASSIGNED,,First uncoded,category,1,TRUE,TRUE,1,browser,iCat,TRUE,0,,,,,,,',
+        'http://id.who.int/icd/entity/4,,_NOCODEASSIGNED,,Second uncoded,category,1,FALSE,TRUE,1,browser,iCat,TRUE,0,,,,,,,',
+        ',,9Z99,,Row without entity,category,1,FALSE,TRUE,1,browser,iCat,TRUE,0,,,,,,,',
+    ]
+
+    def write_csv(self, directory, rows):
+        path = os.path.join(directory, 'icd11.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join([self.HEADER] + rows) + '\n')
+        return path
+
+    def test_import_merges_rows_once(self):
+        from .icd11_import import import_icd11_csv
+        from .models import ICD11Entity, ICD11Mapping
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_csv(directory, self.ROWS)
+            result = import_icd11_csv(path)
+            self.assertEqual((result.rows, result.entities_created, result.mappings_created), (5, 4, 2))
+
+            entity = ICD11Entity.objects.get(entity_id='2')
+            self.assertEqual(entity.json_data['code'], '1A10')
+            self.assertIs(entity.json_data['is_leaf'], True)
+            self.assertIs(entity.json_data['is_residual'], False)
+            mapping = ICD11Mapping.objects.get(code='1A10')
+            self.assertEqual(mapping.description, 'Foodborne intoxication')
+            self.assertEqual(mapping.local_terms['english'], ['Foodborne intoxication'])
+            self.assertEqual(mapping.source, 'csv_import')
+            # A repeated code keeps its first title unless forced
+            self.assertEqual(ICD11Mapping.objects.get(code='_NOCODEASSIGNED').description, 'First uncoded')
+            self.assertFalse(ICD11Mapping.objects.filter(code='9Z99').exists())
+
+            result = import_icd11_csv(path)
+            self.assertEqual((result.entities_created, result.entities_existing), (0, 4))
+
+            path = self.write_csv(directory, self.ROWS[:1] + [self.ROWS[1].replace('Foodborne', 'Renamed')] + self.ROWS[2:])
+            import_icd11_csv(path)
+            self.assertEqual(ICD11Mapping.objects.get(code='1A10').description, 'Foodborne intoxication')
+            result = import_icd11_csv(path, force=True)
+            self.assertEqual((result.mappings_created, result.mappings_existing), (0, 2))
+            self.assertEqual(ICD11Mapping.objects.get(code='1A10').description, 'Renamed intoxication')
+            self.assertEqual(ICD11Mapping.objects.get(code='_NOCODEASSIGNED').description, 'Second uncoded')
+
+
+class ICD11SnapshotTestCase(TestCase):
+    HEADER = ICD11ImportTestCase.HEADER
+    write_csv = ICD11ImportTestCase.write_csv
+    ROWS = ICD11ImportTestCase.ROWS[:2] + [
+        'http://id.who.int/icd/entity/6,,6A70,,Single episode depressive disorder,category,1,FALSE,TRUE,6,browser,iCat,TRUE,0,,,,,,,',
+        'http://id.who.int/icd/entity/7,,MB24.3,,Anxiety,category,1,FALSE,TRUE,21,browser,iCat,TRUE,0,,,,,,,',
+    ]
+
+    def setUp(self):
+        from .icd11_snapshot import clear_reference
+        from .models import ICD11Mapping
+
+        ICD11Mapping.objects.create(code='8A80', description='Migraine', local_terms={'tagalog': ['sakit ng ulo']})
+        ICD11Mapping.objects.create(code='6A70', description='Single episode depressive disorder')
+        self.directory = tempfile.TemporaryDirectory()
+        self.csv_path = self.write_csv(self.directory.name, self.ROWS)
+        self.snapshot_path = os.path.join(self.directory.name, 'icd11.pickle')
+        self.paths = override_settings(ICD11_DATASET_PATH=self.csv_path, ICD11_SNAPSHOT_PATH=self.snapshot_path)
+        self.paths.enable()
+        clear_reference()
+        self.addCleanup(clear_reference)
+        self.addCleanup(self.paths.disable)
+        self.addCleanup(self.directory.cleanup)
+
+    def test_detectors_share_tables_from_snapshot(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from . import icd11_snapshot
+        from .icd11_service import ICD11Detector
+
+        call_command('build_icd11_snapshot', stdout=StringIO())
+        call_command('build_icd11_snapshot', '--check', stdout=StringIO())
+
+        with mock.patch.object(icd11_snapshot, 'build_csv_tables') as build_csv, \
+                mock.patch.object(icd11_snapshot, 'build_database_tables') as build_database:
+            first, second = ICD11Detector(), ICD11Detector()
+            reference = icd11_snapshot.icd11_reference()
+        build_csv.assert_not_called()
+        build_database.assert_not_called()
+
+        self.assertIs(first.db_mappings, second.db_mappings)
+        self.assertEqual(first.db_mappings['migraine']['code'], '8A80')
+        self.assertEqual(set(reference.mental_health_conditions), {'6A70', 'MB24.3'})
+        self.assertEqual(reference.chapter6_titles, {'6A70': 'Single episode depressive disorder'})
+        self.assertEqual(set(reference.mental_health_mappings), {'6A70'})
+
+    def test_changed_mappings_are_rebuilt(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from .icd11_snapshot import icd11_reference
+        from .models import ICD11Mapping
+
+        call_command('build_icd11_snapshot', stdout=StringIO())
+        self.assertNotIn('6B00', icd11_reference().mappings)
+
+        ICD11Mapping.objects.create(code='6B00', description='Generalised anxiety disorder')
+        reference = icd11_reference()
+        self.assertIn('6B00', reference.mental_health_mappings)
+        # The CSV tables still come from the snapshot
+        self.assertIn('MB24.3', reference.mental_health_conditions)
+        with self.assertRaisesMessage(CommandError, 'mappings changed'):
+            call_command('build_icd11_snapshot', '--check', stdout=StringIO())
+
+
+class ICD11SearchTestCase(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from .models import ICD11Mapping
+
+        for code, description, confidence in [
+            ('8A80', 'Migraine', 0.8),
+            ('8A80.2', 'Chronic migraine', 0.8),
+            ('8B22.9', 'Migraine-induced stroke', 0.9),
+            ('MIG1', 'Code that starts like the query', 0.1),
+        ]:
+            ICD11Mapping.objects.create(code=code, description=description, confidence_score=confidence)
+        ICD11Mapping.objects.create(code='8A81', description='Inactive migraine', is_active=False)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='nurse', password='x', role='clinic'))
+
+    def test_search_ranks_code_matches_first(self):
+        from .icd11_search import search_mappings
+
+        self.assertEqual([m.code for m in search_mappings('8a80')], ['8A80', '8A80.2'])
+        self.assertEqual([m.code for m in search_mappings('migraine')], ['8B22.9', '8A80', '8A80.2'])
+
+    def test_autocomplete(self):
+        response = self.client.get('/api/analytics/icd/autocomplete/', {'q': 'mig', 'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['code'] for row in response.json()['suggestions']], ['MIG1', '8A80', '8A80.2'],
+        )
+        self.assertEqual(response.json()['suggestions'][1]['name'], 'Migraine')
+
+        self.assertEqual(self.client.get('/api/analytics/icd/autocomplete/').json()['suggestions'], [])
+        response = self.client.get('/api/analytics/icd/autocomplete/', {'q': 'mig', 'limit': 'all'})
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(User.objects.create_user(username='pupil', password='x', role='student'))
+        response = self.client.get('/api/analytics/icd/autocomplete/', {'q': 'mig'})
+        self.assertEqual(response.status_code, 403)
+
+
+class ICD11BatchDetectionTestCase(TinyBertCheckpointMixin, TestCase):
+    TEXTS = ['May lagnat at sakit ng ulo', 'stress', 'sad stress stress', '  MAY LAGNAT AT SAKIT NG ULO ', '', 'ubo']
+
+    def setUp(self):
+        from .hybrid_icd11_service import HybridICD11Detector
+        from .icd11_snapshot import clear_reference
+        from .models import ICD11Mapping
+
+        ICD11Mapping.objects.create(code='8A80.0', description='Headache', local_terms=['Sakit ng ulo'],
+                                    confidence_score=0.9)
+        ICD11Mapping.objects.create(code='MD12', description='Cough', local_terms=['ubo'], confidence_score=0.4)
+        clear_reference()
+        self.addCleanup(clear_reference)
+        self.addCleanup(model_lifecycle._pretrained.clear)
+
+        self.detector = HybridICD11Detector()
+        self.detector._initialize_services()
+        self.detector.api_cooldown_until = timezone.now() + timedelta(days=1)
+        self.detector._models_loaded = True
+        self.detector.bert_tokenizer, self.detector.bert_model = model_lifecycle.acquire_pretrained(self.checkpoint)
+
+    def summary(self, conditions):
+        return [(c['icd11_code'], c['source']) for c in conditions]
+
+    def assertSameConditions(self, conditions, expected):
+        """Same codes and sources; padded batches match single texts only up to float rounding"""
+        self.assertEqual([self.summary(c) for c in conditions], [self.summary(c) for c in expected])
+        for text_conditions, text_expected in zip(conditions, expected):
+            for condition, expected_condition in zip(text_conditions, text_expected):
+                self.assertAlmostEqual(condition['confidence'], expected_condition['confidence'], places=3)
+
+    def test_batch_matches_text_by_text_detection(self):
+        # Condition texts the tiny vocabulary tells apart, so no two similarities tie
+        self.detector.enhanced_mappings = {
+            'fever': {'code': 'MD90.0', 'name': 'Fever', 'local_terms': ['lagnat'], 'confidence': 0.95},
+            'stress': {'code': 'QE01', 'name': 'Stress', 'local_terms': ['stress'], 'confidence': 0.8},
+            'sadness': {'code': 'MB24.5', 'name': 'Sadness', 'local_terms': ['sad', 'stress', 'sad'], 'confidence': 0.8},
+        }
+        self.detector._enhanced_mapping_embeddings()
+        bert_model = self.detector.bert_model
+        with mock.patch.object(self.detector, 'bert_model', wraps=bert_model) as model:
+            batch = self.detector.detect_conditions_batch(self.TEXTS)
+        # The four distinct texts are embedded in one padded forward pass
+        self.assertEqual(model.call_count, 1)
+
+        # Text by text, detection adds the matched terms as new mappings; the batch records nothing
+        with mock.patch.object(self.detector, '_update_analytics_cache'):
+            expected = [self.detector.detect_conditions_hybrid(text) for text in self.TEXTS]
+        self.assertSameConditions(batch, expected)
+        self.assertEqual(batch[4], [])
+        self.assertSameConditions([batch[0]], [batch[3]])
+        self.assertIn('8A80.0', [c['icd11_code'] for c in batch[0]])
+
+    def test_endpoint(self):
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='nurse', password='x', role='clinic'))
+        with mock.patch('analytics.clinic_views.hybrid_icd11_detector', self.detector):
+            response = client.post('/api/analytics/icd/detect-batch/', {'texts': self.TEXTS}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), len(self.TEXTS))
+            self.assertEqual(response.json()['unique_texts'], 4)
+            self.assertEqual(response.json()['results'][4]['total_conditions'], 0)
+
+            response = client.post('/api/analytics/icd/detect-batch/', {'texts': 'lagnat'}, format='json')
+            self.assertEqual(response.status_code, 400)
+            response = client.post('/api/analytics/icd/detect-batch/', {'texts': ['lagnat'] * 501}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_backcode_command_resumes(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from health_records.models import PermitRequest
+        from .models import DiagnosisBackcodingProgress
+
+        # Rule-based detection only; the random tiny BERT finds something in every text
+        self.detector.bert_model = None
+        student = User.objects.create_user(username='pupil', password='x', role='student')
+        visit = {'student': student, 'date': timezone.now().date(), 'time': '09:00', 'grade': '10', 'section': 'A'}
+        fever = PermitRequest.objects.create(reason='May lagnat', status='completed', **visit)
+        unknown = PermitRequest.objects.create(reason='Nagpahinga lang', status='completed', **visit)
+        pending = PermitRequest.objects.create(reason='May lagnat', status='pending', **visit)
+        coded = PermitRequest.objects.create(reason='ubo', status='completed', diagnosis_code='CA23',
+                                             diagnosis_name='Asthma', **visit)
+        cough = PermitRequest.objects.create(reason='ubo', status='completed', **visit)
+
+        def run(*args):
+            output = StringIO()
+            with mock.patch('analytics.management.commands.backcode_diagnoses.get_model',
+                            return_value=self.detector):
+                call_command('backcode_diagnoses', '--source', 'permit_request', '--batch-size', '1',
+                             *args, stdout=output)
+            self.output = output.getvalue()
+            return DiagnosisBackcodingProgress.objects.get(source='permit_request')
+
+        progress = run('--limit', '2')
+        self.assertEqual((progress.last_id, progress.processed, progress.coded), (unknown.id, 2, 1))
+        self.assertIsNone(progress.completed_at)
+        fever.refresh_from_db()
+        self.assertEqual(fever.diagnosis_code, 'MD90.0')
+
+        progress = run()
+        self.assertEqual((progress.last_id, progress.processed, progress.coded), (cough.id, 3, 2))
+        self.assertIsNotNone(progress.completed_at)
+        codes = dict(PermitRequest.objects.values_list('id', 'diagnosis_code'))
+        self.assertIsNone(codes[unknown.id])
+        self.assertIsNone(codes[pending.id])
+        self.assertEqual(codes[coded.id], 'CA23')
+        self.assertTrue(codes[cough.id])
+
+        # Nothing left after the checkpoint; a restart revisits the record nothing was found in
+        self.assertEqual(run().processed, 3)
+        self.assertEqual(run('--restart', '--dry-run').processed, 3)
+        self.assertIn('permit_request: 0 of 1 records coded', self.output)
+
+
+class EnhancedBertDetectionTestCase(TinyBertCheckpointMixin, TestCase):
+    TITLES = {'6A70': 'sad stress', '6B43': 'stress', '6A00': 'sad', 'QE01': 'stress stress sad stress'}
+
+    def setUp(self):
+        from .enhanced_mental_health_service import EnhancedMentalHealthDetector
+
+        self.addCleanup(model_lifecycle._pretrained.clear)
+        self.detector = EnhancedMentalHealthDetector()
+        self.detector.condition_texts = self.detector.condition_embeddings = dict(self.TITLES)
+        self.detector.bert_tokenizer, self.detector.bert_model = model_lifecycle.acquire_pretrained(self.checkpoint)
+        self.detector.bert_loaded = True
+
+    def test_titles_are_embedded_once(self):
+        from sklearn.metrics.pairwise import cosine_similarity
+
+        text = 'sad stress sad'
+        text_embedding = self.detector.get_text_embedding(text)
+        # Text-by-text embedding of every title, as before the titles were cached
+        expected = {
+            code: cosine_similarity(text_embedding, self.detector.get_text_embedding(title))[0][0]
+            for code, title in self.TITLES.items()
+        }
+
+        with mock.patch.object(self.detector, '_embed_titles', wraps=self.detector._embed_titles) as embed:
+            for _ in range(3):
+                conditions = self.detector._detect_with_bert(text)
+                self.assertTrue(conditions)
+                for condition in conditions:
+                    self.assertAlmostEqual(condition['confidence_score'], expected[condition['icd11_code']], places=5)
+        self.assertEqual(embed.call_count, 1)
@@ -0,0 +1,250 @@
+"""
+Mental health trend engine for counselor analytics
+Classifies alerts once when they are written and computes monthly trends
+with grouped database aggregation instead of scanning rows in Python
+"""
+
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.db.models import Count, Q
+from django.db.models.functions import Lower, TruncMonth
+from django.utils import timezone
+
+# Negative keywords for chatbot flags and alert keywords - includes English keywords from keywords.json
+NEGATIVE_KEYWORDS = frozenset([
+    'stress', 'stressed', 'pressure', 'overwhelmed', 'burden', 'exhausted', 'tired', 'overworked',
+    'anxiety', 'anxious', 'worried', 'nervous', 'panic', 'fear', 'scared', 'restless',
+    'depressed', 'sad', 'hopeless', 'worthless', 'empty', 'lonely', 'down', 'miserable',
+    'bullying', 'bullied', 'harassment', 'teasing', 'picked on', 'mean', 'hurt me',
+    'suicide', 'kill myself', 'end it all', 'die', 'death', 'hurt myself', 'self harm',
+    'cut myself', 'cutting', 'self injury', 'harm myself',
+    'eating disorder', 'starving', 'binge', 'purge', 'fat', 'ugly', 'body image',
+    'sawang sawa na ako', 'wala akong silbi', 'pangit ako', 'walang nagmamahal sa akin',
+    'nobody cares', 'hate myself', 'i\'m worthless', 'pagod na pagod ako sa buhay',
+    'walang kwenta lahat', 'iniwan ako', 'hindi ako mahalaga', 'ayoko lumabas',
+    'wala akong kaibigan', 'di ako mahal ng pamilya ko', 'ayoko makipag-usap kahit kanino',
+    'gusto ko mag-isa lang', 'lagi akong malungkot', 'di ko maintindihan sarili ko',
+    'takot ako', 'kinakabahan ako araw-araw', 'di ko alam gagawin ko', 'depressed ako',
+    'sobrang lungkot', 'naiiyak ako', 'nai-stress ako sobra', 'i feel empty',
+    'wala akong gana', 'hindi ako okay', 'not okay', 'broken ako', 'heartbroken',
+    'iniwan sa ere', 'gusto ko mawala pero di ko alam paano', 'napapaisip ako sa buhay',
+    'nasa dark place ako', 'wala akong pag-asa', 'i hate my life', 'galit ako sa sarili ko',
+    'mali lagi ako', 'lahat mali', 'gusto ko nang mamatay', 'ayoko na mabuhay',
+    'magpapakamatay ako', 'tapos na ako sa lahat', 'wala nang kwenta buhay ko',
+    'wala na akong rason mabuhay', 'i want to die', 'magpapaalam na ako', 'paalam na',
+    'goodbye world', 'magwawakas na lahat', 'di ko na kaya', 'wala nang pag-asa',
+    'susuko na ako', 'mag-aalay ng buhay', 'i\'m ending it', 'lahat iiwan ko na',
+    'time to go', 'sawa na ako sa lahat', 'ayoko na goodbye', 'gbye world',
+    'maglalaho na lang ako', 'i will end it all', 'wala na akong silbi',
+    'gusto ko mawala', 'bye forever', 'di niyo na ako makikita', 'final goodbye',
+    'end life', 'ayoko na tapos na', 'ubos na ako', 'magpakamatay', 'i just wanna die',
+    'see you in another life', 'lahat ng sakit tatapusin ko na', 'mamamatay na lang ako'
+])
+
+# Mental health terms searched in alert titles and descriptions, in priority order
+MENTAL_HEALTH_TERMS = [
+    'stress', 'stressed', 'stressful', 'anxiety', 'anxious', 'depression', 'depressed',
+    'suicide', 'suicidal', 'self-harm', 'self harm', 'bullying', 'bullied', 'lonely',
+    'loneliness', 'sad', 'sadness', 'worried', 'worry', 'overwhelmed', 'overwhelm',
+    'angry', 'anger', 'fear', 'fearful', 'panic', 'panicked', 'hopeless', 'hopelessness',
+    'worthless', 'worthlessness', 'tired', 'exhausted', 'burnout', 'burn out',
+    'afraid', 'scared', 'terrified', 'nervous', 'nervousness', 'tense', 'tension',
+    'frustrated', 'frustration', 'irritated', 'irritation', 'upset', 'disappointed',
+    'disappointment', 'hurt', 'pain', 'suffering', 'struggling', 'struggle',
+    'difficult', 'difficulty', 'hard', 'challenging', 'challenge', 'problem',
+    'problems', 'issue', 'issues', 'concern', 'concerns', 'trouble', 'troubles'
+]
+
+# Map similar terms to the standard trend terms
+TERM_MAPPING = {
+    'stressed': 'stress', 'stressful': 'stress',
+    'anxious': 'anxiety',
+    'depressed': 'depression',
+    'suicidal': 'suicide',
+    'self harm': 'self-harm',
+    'bullied': 'bullying',
+    'loneliness': 'lonely',
+    'sadness': 'sad',
+    'worry': 'worried',
+    'overwhelm': 'overwhelmed',
+    'anger': 'angry',
+    'fearful': 'fear',
+    'panicked': 'panic',
+    'hopelessness': 'hopeless',
+    'worthlessness': 'worthless',
+    'exhausted': 'tired',
+    'burn out': 'burnout',
+    'afraid': 'fear', 'scared': 'fear', 'terrified': 'fear',
+    'nervous': 'anxiety', 'nervousness': 'anxiety',
+    'tense': 'stress', 'tension': 'stress',
+    'frustrated': 'angry', 'frustration': 'angry',
+    'irritated': 'angry', 'irritation': 'angry',
+    'upset': 'sad', 'disappointed': 'sad', 'disappointment': 'sad',
+    'hurt': 'sad', 'pain': 'sad', 'suffering': 'sad',
+    'struggling': 'stress', 'struggle': 'stress',
+    'difficult': 'stress', 'difficulty': 'stress',
+    'hard': 'stress', 'challenging': 'stress', 'challenge': 'stress',
+    'problem': 'stress', 'problems': 'stress',
+    'issue': 'stress', 'issues': 'stress',
+    'concern': 'worried', 'concerns': 'worried',
+    'trouble': 'stress', 'troubles': 'stress'
+}
+
+
+def _match_term(text):
+    """Return the standard term for the first mental health term found in text"""
+    text_lower = text.lower()
+    for term in MENTAL_HEALTH_TERMS:
+        if term in text_lower:
+            return TERM_MAPPING.get(term, term)
+    return ''
+
+
+def classify_alert(alert):
+    """
+    Determine the specific trend reason for an alert
+
+    Args:
+        alert: MentalHealthAlert instance (saved or unsaved)
+
+    Returns:
+        str: Trend term, or '' if the alert has no specific mental health reason
+    """
+    # 1. First try the related keywords
+    keywords = alert.related_keywords
+    if isinstance(keywords, str):
+        keywords = [k.strip() for k in keywords.split(',')]
+    if isinstance(keywords, list):
+        for keyword in keywords:
+            if isinstance(keyword, str) and keyword.lower() in NEGATIVE_KEYWORDS:
+                return keyword.lower()
+
+    # 2. Then the title, 3. then the description
+    for text in (alert.title, alert.description):
+        if text:
+            reason = _match_term(text)
+            if reason:
+                return reason
+
+    return ''
+
+
+def classify_unclassified_alerts(queryset, batch_size=500):
+    """
+    Store trend reasons for alerts written before classification existed
+
+    Args:
+        queryset: MentalHealthAlert queryset to backfill
+        batch_size: Number of rows written per UPDATE batch
+
+    Returns:
+        int: Number of alerts classified
+    """
+    from .models import MentalHealthAlert
+
+    pending = []
+    classified = 0
+    for alert in queryset.filter(trend_reason__isnull=True).only(
+        'id', 'title', 'description', 'related_keywords'
+    ).order_by().iterator(chunk_size=batch_size):
+        alert.trend_reason = classify_alert(alert)
+        pending.append(alert)
+        if len(pending) >= batch_size:
+            MentalHealthAlert.objects.bulk_update(pending, ['trend_reason'])
+            classified += len(pending)
+            pending = []
+    if pending:
+        MentalHealthAlert.objects.bulk_update(pending, ['trend_reason'])
+        classified += len(pending)
+    return classified
+
+
+def _day_bounds(start_date, end_date):
+    """Convert an inclusive date range into aware datetimes usable by an index"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    end = timezone.make_aware(datetime.combine(end_date, time.max), tz)
+    return start, end
+
+
+def compute_monthly_trends(start_date, end_date):
+    """
+    Count mental health trend terms per month between two dates (inclusive)
+
+    Each data source is reduced by one grouped query, so the cost depends on the
+    number of months and distinct terms rather than on the number of rows.
+
+    Returns:
+        defaultdict: {'Jan': {'stress': 3, ...}, ...} keyed by month abbreviation
+    """
+    from chatbot.models import AnonymizedConversationMetadata, KeywordFlag
+    from mood_tracker.models import MoodEntry
+    from wellness_journey.models import DailyTask
+    from .models import MentalHealthAlert
+
+    start_dt, end_dt = _day_bounds(start_date, end_date)
+    monthly_data = defaultdict(lambda: defaultdict(int))
+
+    # 1. Mental health alerts, grouped by their stored trend reason
+    alerts = MentalHealthAlert.objects.filter(created_at__range=(start_dt, end_dt))
+    classify_unclassified_alerts(alerts)
+    alert_counts = (
+        alerts.filter(trend_reason__gt='')
+        .annotate(month=TruncMonth('created_at'))
+        .values('month', 'trend_reason')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for row in alert_counts:
+        monthly_data[row['month'].strftime('%b')][row['trend_reason']] += row['count']
+
+    # 2. Flagged keywords from chatbot conversations (including new rule-based flow)
+    flag_counts = (
+        KeywordFlag.objects.filter(detected_date__range=(start_date, end_date))
+        .annotate(term=Lower('keyword'), month=TruncMonth('detected_date'))
+        .filter(term__in=NEGATIVE_KEYWORDS)
+        .values('month', 'term')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for row in flag_counts:
+        monthly_data[row['month'].strftime('%b')][row['term']] += row['count']
+
+    # 3. Mood tracker data (negative moods only)
+    mood_counts = (
+        MoodEntry.objects.filter(date__range=(start_date, end_date), mood__in=['sad', 'angry'])
+        .annotate(month=TruncMonth('date'))
+        .values('month', 'mood')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for row in mood_counts:
+        monthly_data[row['month'].strftime('%b')][row['mood']] += row['count']
+
+    # 4. Wellness journey data (a user-day with no completed activity counts as a negative case)
+    inactive_days = (
+        DailyTask.objects.filter(date__range=(start_date, end_date))
+        .values('user_id', 'date')
+        .annotate(completed_count=Count('id', filter=Q(completed=True)))
+        .filter(completed_count=0)
+        .order_by()
+    )
+    for row in inactive_days:
+        monthly_data[row['date'].strftime('%b')]['wellness_no_activities'] += 1
+
+    # 5. Anonymized chatbot conversations
+    conversation_counts = (
+        AnonymizedConversationMetadata.objects.filter(
+            started_at__range=(start_dt, end_dt),
+            conversation_type__in=['mental_health', 'chat_with_me', 'general']
+        )
+        .annotate(month=TruncMonth('started_at'))
+        .values('month')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for row in conversation_counts:
+        monthly_data[row['month'].strftime('%b')]['conversations'] += row['count']
+
+    return monthly_data
@@ -8,8 +8,10 @@ urlpatterns = [
     
     # ICD-11 Detection (Clinic)
     path('icd/detect/', clinic_views.detect_icd_codes, name='detect_icd_codes'),
+    path('icd/detect-batch/', clinic_views.detect_icd_codes_batch, name='detect_icd_codes_batch'),
     path('icd/detect-realtime/', clinic_views.detect_icd_codes_realtime, name='detect_icd_codes_realtime'),
     path('icd/search/', clinic_views.search_icd_codes, name='search_icd_codes'),
+    path('icd/autocomplete/', clinic_views.autocomplete_icd_codes, name='autocomplete_icd_codes'),
     path('appointments/<int:appointment_id>/documentation/', clinic_views.update_appointment_documentation, name='update_appointment_documentation'),
     path('health-records/<int:permit_id>/assessment/', clinic_views.update_health_record_assessment, name='update_health_record_assessment'),
     
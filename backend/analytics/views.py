@@ -1,3 +1,4 @@
+import asyncio
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -9,6 +10,7 @@ from datetime import datetime
 from django.db.models import Count
 from django.conf import settings
 from django.http import HttpResponse
+from backend.async_views import async_api_view
 
 # Import clinic and counselor analytics views
 from .clinic_views import get_physical_health_trends
@@ -51,14 +53,14 @@ def export_physical_health_pdf(request):
         # Get time range
         start_date = timezone.now() - timedelta(days=months_back * 30)
         
-        # Get completed permit requests within the time range
-        completed_requests = PermitRequest.objects.filter(
+        # Get completed permit requests within the time range (demographics read the student)
+        completed_requests = PermitRequest.objects.select_related('student').filter(
             status='completed',
             date__gte=start_date.date()
         )
         
         # Get completed physical health appointments within the time range
-        completed_appointments = Appointment.objects.filter(
+        completed_appointments = Appointment.objects.select_related('client').filter(
             status='completed',
             service_type='physical',
             date__gte=start_date.date()
@@ -769,10 +771,14 @@ def refresh_icd11_cache(request):
     except Exception as e:
         return Response({'error': f'Failed to refresh cache: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def search_icd11_entities(request):
-    """Search ICD-11 entities"""
+@async_api_view(['GET'])
+async def search_icd11_entities(request):
+    """
+    Search ICD-11 entities
+    
+    ?include_who=true also searches the WHO ICD-11 API, concurrently with the
+    local lookup; its matches are returned separately as who_results.
+    """
     if request.user.role not in ['clinic', 'admin', 'counselor']:
         return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     
@@ -781,11 +787,19 @@ def search_icd11_entities(request):
         limit = int(request.GET.get('limit', 10))
         
         from .icd11_service import ICD11Detector
-        detector = ICD11Detector()
-        results = detector.search_icd11_codes(query, limit)
+        if request.GET.get('include_who', '').lower() not in ('1', 'true', 'yes'):
+            return Response({
+                'search_results': await ICD11Detector.asearch_icd11_codes(query, limit)
+            })
         
+        from .icd11_api_service import WHOICD11APIService
+        results, who_results = await asyncio.gather(
+            ICD11Detector.asearch_icd11_codes(query, limit),
+            WHOICD11APIService().asearch_entities(query, limit),
+        )
         return Response({
-            'search_results': results
+            'search_results': results,
+            'who_results': who_results
         })
         
     except Exception as e:
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Appointment, Availability
+from .models import Appointment, Availability, AppointmentNotification
 
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
@@ -66,3 +66,9 @@ class AppointmentAdmin(admin.ModelAdmin):
         )
 
 admin.site.register(Availability)
+
+@admin.register(AppointmentNotification)
+class AppointmentNotificationAdmin(admin.ModelAdmin):
+    list_display = ['recipient', 'appointment', 'kind', 'audience', 'read_at', 'created_at']
+    list_filter = ['kind', 'audience', 'created_at']
+    raw_id_fields = ['appointment', 'recipient']
@@ -0,0 +1,61 @@
+"""
+Django management command to materialize notification rows for existing appointments
+Usage: python manage.py backfill_appointment_notifications
+Run once after deploying the appointment notification feed
+"""
+
+from django.core.management.base import BaseCommand
+from appointments.models import Appointment, AppointmentNotification
+from appointments.notifications import record_reminder_notifications
+
+# Legacy per-role read markers on Appointment, by feed audience
+CLIENT_VIEWED_FIELDS = ('student_viewed_at', 'faculty_viewed_at')
+PROVIDER_VIEWED_FIELDS = ('clinic_viewed_at', 'counselor_viewed_at')
+
+
+class Command(BaseCommand):
+    help = 'Create notification rows for appointments created before the notification feed existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of appointments processed per batch (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        appointments = Appointment.objects.only(
+            'id', 'client_id', 'provider_id', 'created_at',
+            'client_reminder_sent_at', 'provider_reminder_sent_at',
+            *CLIENT_VIEWED_FIELDS, *PROVIDER_VIEWED_FIELDS
+        ).order_by('id')
+        
+        created = 0
+        batch = []
+        for appointment in appointments.iterator(chunk_size=batch_size):
+            batch.append(appointment)
+            if len(batch) >= batch_size:
+                created += self.backfill(batch)
+                batch = []
+        if batch:
+            created += self.backfill(batch)
+        
+        self.stdout.write(self.style.SUCCESS(f"Wrote {created} appointment notification rows"))
+
+    def backfill(self, appointments):
+        notifications = []
+        for appointment in appointments:
+            client_read_at = next((getattr(appointment, f) for f in CLIENT_VIEWED_FIELDS if getattr(appointment, f)), None)
+            provider_read_at = next((getattr(appointment, f) for f in PROVIDER_VIEWED_FIELDS if getattr(appointment, f)), None)
+            notifications.append(AppointmentNotification(
+                appointment_id=appointment.id, recipient_id=appointment.client_id, audience='client',
+                kind='scheduled', created_at=appointment.created_at, read_at=client_read_at,
+            ))
+            notifications.append(AppointmentNotification(
+                appointment_id=appointment.id, recipient_id=appointment.provider_id, audience='provider',
+                kind='scheduled', created_at=appointment.created_at, read_at=provider_read_at,
+            ))
+        AppointmentNotification.objects.bulk_create(notifications, ignore_conflicts=True)
+        return len(notifications) + record_reminder_notifications(appointments)
@@ -1,8 +1,14 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 User = settings.AUTH_USER_MODEL
 
+# Upcoming appointments with at least one reminder still to send (matches the partial reminder index)
+UNSENT_REMINDER_CONDITION = models.Q(status='upcoming') & (
+    models.Q(client_reminder_sent_at__isnull=True) | models.Q(provider_reminder_sent_at__isnull=True)
+)
+
 class Availability(models.Model):
     provider = models.ForeignKey(User, on_delete=models.CASCADE, related_name='availabilities')
     date = models.DateField(null=True, blank=True)  # If per-day, else leave null for recurring
@@ -60,6 +66,55 @@ class Appointment(models.Model):
 
     class Meta:
         ordering = ['-date', '-time']
+        indexes = [
+            # Default ordering and date-window scans
+            models.Index(fields=['date', 'time'], name='appt_date_time_idx'),
+            # Provider today/upcoming lists and active-case counts by status
+            models.Index(fields=['provider', 'status', 'date', 'time'], name='appt_provider_status_idx'),
+            # Client appointments by status (dashboard counts, notifications)
+            models.Index(fields=['client', 'status'], name='appt_client_status_idx'),
+            # Recent referrals created by a user
+            models.Index(fields=['created_by', 'created_at'], name='appt_created_by_idx'),
+            # Per-minute reminder cron: only upcoming appointments still owed a reminder
+            models.Index(fields=['date', 'time'], condition=UNSENT_REMINDER_CONDITION, name='appt_unsent_reminder_idx'),
+        ]
 
     def __str__(self):
         return f"{self.date} {self.time} | {self.client} with {self.provider} ({self.get_service_type_display()})"
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        super().save(*args, **kwargs)
+        # Keep materialized notification rows in step with the appointment
+        from .notifications import sync_appointment_notifications
+        sync_appointment_notifications(self, created)
+
+class AppointmentNotification(models.Model):
+    """Materialized appointment notification for one recipient, written when the appointment changes"""
+    KIND_CHOICES = [
+        ('scheduled', 'Appointment Scheduled'),
+        ('reminder', 'Appointment Reminder'),
+    ]
+    AUDIENCE_CHOICES = [
+        ('client', 'Client'),
+        ('provider', 'Provider'),
+    ]
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='notifications')
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='appointment_notifications')
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='scheduled')
+    read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)  # When the notification was issued
+    updated_at = models.DateTimeField(auto_now=True)  # Bumped when the appointment changes, drives ?since= polling
+
+    class Meta:
+        unique_together = ('appointment', 'recipient', 'kind')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'created_at']),
+            models.Index(fields=['recipient', 'updated_at']),
+            models.Index(fields=['recipient'], condition=models.Q(read_at__isnull=True), name='appt_notification_unread_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.recipient} - appointment {self.appointment_id}"
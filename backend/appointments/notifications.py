@@ -0,0 +1,184 @@
+"""
+Appointment notification subsystem
+
+Notification rows are materialized when an appointment is created, changes state
+or has its reminder sent, so feeds are served with one indexed query per poll
+instead of rebuilding every notification from every appointment.
+"""
+
+from django.db.models import Q
+from django.utils import timezone
+
+from health_records.notifications import relative_time
+from .models import Appointment, AppointmentNotification
+
+# Feed audience for each recipient role
+ROLE_AUDIENCE = {
+    'student': 'client',
+    'faculty': 'client',
+    'clinic': 'provider',
+    'counselor': 'provider',
+}
+
+APPOINTMENT_NOTIFICATION_FIELDS = (
+    'id', 'kind', 'audience', 'read_at', 'created_at', 'updated_at', 'appointment_id',
+    'appointment__id', 'appointment__date', 'appointment__time', 'appointment__service_type',
+    'appointment__reason', 'appointment__status', 'appointment__referral', 'appointment__created_at',
+    'appointment__client_reminder_sent_at', 'appointment__provider_reminder_sent_at',
+    'appointment__provider__full_name', 'appointment__provider__role',
+    'appointment__client__full_name', 'appointment__client__role',
+)
+
+
+def sync_appointment_notifications(appointment, created=False):
+    """
+    Materialize or refresh notification rows after an appointment is saved
+
+    Args:
+        appointment: Saved Appointment instance
+        created: True when the appointment row was just inserted
+    """
+    if created:
+        AppointmentNotification.objects.bulk_create([
+            AppointmentNotification(appointment=appointment, recipient_id=appointment.client_id,
+                                    audience='client', kind='scheduled'),
+            AppointmentNotification(appointment=appointment, recipient_id=appointment.provider_id,
+                                    audience='provider', kind='scheduled'),
+        ], ignore_conflicts=True)
+    else:
+        now = timezone.now()
+        notifications = AppointmentNotification.objects.filter(appointment=appointment)
+        # A reassigned client or provider takes over the rows, unread, from the previous recipient
+        for audience, recipient_id in (('client', appointment.client_id), ('provider', appointment.provider_id)):
+            notifications.filter(audience=audience).exclude(recipient_id=recipient_id).update(
+                recipient_id=recipient_id, read_at=None, updated_at=now,
+            )
+        # Status and schedule are read through the join; bump updated_at so pollers refetch
+        notifications.update(updated_at=now)
+
+
+def record_reminder_notifications(appointments):
+    """
+    Create reminder notifications for appointments whose reminder emails were sent
+
+    Args:
+        appointments: Iterable of Appointment instances with *_reminder_sent_at set
+
+    Returns:
+        int: Number of reminder rows written (existing ones are left untouched)
+    """
+    reminders = []
+    for appointment in appointments:
+        if appointment.client_reminder_sent_at:
+            reminders.append(AppointmentNotification(
+                appointment_id=appointment.id, recipient_id=appointment.client_id,
+                audience='client', kind='reminder', created_at=appointment.client_reminder_sent_at,
+            ))
+        if appointment.provider_reminder_sent_at:
+            reminders.append(AppointmentNotification(
+                appointment_id=appointment.id, recipient_id=appointment.provider_id,
+                audience='provider', kind='reminder', created_at=appointment.provider_reminder_sent_at,
+            ))
+    if reminders:
+        AppointmentNotification.objects.bulk_create(reminders, ignore_conflicts=True)
+    return len(reminders)
+
+
+def appointment_notification_queryset(user, role):
+    """
+    Build the feed queryset for a notification recipient
+
+    Args:
+        user: Requesting user
+        role: 'student', 'faculty', 'clinic' or 'counselor'
+
+    Returns:
+        QuerySet: Notifications for the user, joined with appointment, provider and client
+    """
+    audience = ROLE_AUDIENCE[role]
+    queryset = AppointmentNotification.objects.filter(recipient=user, audience=audience)
+    if role == 'clinic':
+        queryset = queryset.filter(appointment__service_type='physical')
+    elif role == 'counselor':
+        queryset = queryset.filter(appointment__service_type='mental')
+    # Reminders are only relevant while the appointment is still upcoming
+    queryset = queryset.exclude(Q(kind='reminder') & ~Q(appointment__status='upcoming'))
+    return queryset.select_related(
+        'appointment__provider', 'appointment__client'
+    ).only(*APPOINTMENT_NOTIFICATION_FIELDS)
+
+
+def serialize_appointment_notification(notification, now=None):
+    """Render a notification row in the shape the frontend expects"""
+    appointment = notification.appointment
+    service_type = appointment.get_service_type_display()
+    appointment_data = {
+        'date': appointment.date,
+        'time': appointment.time,
+        'service_type': service_type,
+        'reason': appointment.reason,
+        'status': appointment.status,
+        'provider_name': appointment.provider.full_name,
+        'provider_role': appointment.provider.role,
+        'client_name': appointment.client.full_name,
+        'client_role': appointment.client.role,
+        'created_at': appointment.created_at,
+        'referral': appointment.referral,
+    }
+
+    if notification.kind == 'reminder':
+        if notification.audience == 'client':
+            text = f"⏰ Appointment Reminder: Your {service_type} appointment is in 10 minutes"
+            appointment_data['reminder_sent_at'] = appointment.client_reminder_sent_at
+        else:
+            text = f"⏰ Appointment Reminder: You have a {service_type} appointment in 10 minutes"
+            appointment_data['reminder_sent_at'] = appointment.provider_reminder_sent_at
+        notification_id = f"{appointment.id}_reminder"
+        notification_type = 'appointment_reminder'
+    else:
+        text = "New Appointment Just Scheduled for You"
+        notification_id = appointment.id
+        notification_type = 'appointment'
+
+    return {
+        'id': notification_id,
+        'text': text,
+        'timestamp': relative_time(notification.created_at, now),
+        'type': notification_type,
+        'isRead': notification.read_at is not None,
+        'status': appointment.status,
+        'appointment_data': appointment_data,
+    }
+
+
+def mark_appointment_notifications_read(user, role, notification_id=None):
+    """
+    Mark a recipient's notifications as read with a single UPDATE
+
+    Args:
+        user: Requesting user
+        role: Recipient role
+        notification_id: Optional feed id ('<appointment id>' or '<appointment id>_reminder');
+            when omitted every unread notification is marked
+
+    Returns:
+        int: Number of rows updated
+
+    Raises:
+        Appointment.DoesNotExist: notification_id does not belong to the user
+    """
+    notifications = AppointmentNotification.objects.filter(recipient=user, audience=ROLE_AUDIENCE[role])
+    if notification_id:
+        appointment_id = str(notification_id).split('_', 1)[0]
+        if not appointment_id.isdigit():
+            raise Appointment.DoesNotExist(f"Invalid notification id: {notification_id}")
+        # Reading either notification of an appointment marks both, as before
+        notifications = notifications.filter(appointment_id=int(appointment_id))
+    else:
+        notifications = notifications.filter(read_at__isnull=True)
+
+    now = timezone.now()
+    updated = notifications.update(read_at=now, updated_at=now)
+    if notification_id and not updated:
+        raise Appointment.DoesNotExist(f"Notification not found: {notification_id}")
+    return updated
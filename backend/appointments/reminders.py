@@ -0,0 +1,259 @@
+"""
+Appointment reminder dispatcher
+
+Claims due appointments with SELECT ... FOR UPDATE SKIP LOCKED, renders every
+reminder email up front, queues them in the email outbox with one INSERT and
+marks the appointments with a single bulk UPDATE. Overlapping cron runs skip
+rows another run has already claimed, so no reminder is queued twice. The
+send_outbox worker delivers the emails.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Appointment, UNSENT_REMINDER_CONDITION
+from website.outbox import queue_messages
+from .notifications import record_reminder_notifications
+
+logger = logging.getLogger(__name__)
+
+
+def due_reminder_appointments(now=None, minutes_before=10):
+    """
+    Appointments starting in the reminder minute that still owe a reminder
+
+    Returns:
+        Tuple[QuerySet, datetime]: (appointments, reminder time)
+    """
+    now = now or timezone.now()
+    reminder_time = now + timedelta(minutes=minutes_before)
+    
+    # Get appointments that are:
+    # 1. Upcoming status
+    # 2. Scheduled for the reminder time (within 1 minute window)
+    # 3. Still owe a reminder (served by the partial unsent-reminder index)
+    target_time_start = reminder_time.replace(second=0, microsecond=0)
+    target_time_end = target_time_start + timedelta(minutes=1)
+    
+    appointments = Appointment.objects.filter(
+        UNSENT_REMINDER_CONDITION,
+        date=reminder_time.date(),
+        time__gte=target_time_start.time(),
+        time__lt=target_time_end.time()
+    ).select_related('client', 'provider').order_by('time', 'id')
+    return appointments, reminder_time
+
+
+def render_client_reminder(appointment):
+    """Build the reminder email for the client (student/faculty), or None if they have no email"""
+    client = appointment.client
+    
+    # Skip if client has no email
+    if not client.email:
+        logger.warning(f"Client {client.username} has no email address")
+        return None
+    
+    subject = f"Appointment Reminder - {appointment.get_service_type_display()}"
+    
+    # Format appointment time
+    appointment_time = appointment.time.strftime('%I:%M %p')
+    appointment_date = appointment.date.strftime('%A, %B %d, %Y')
+    
+    message = f"""Hello {client.full_name},
+
+This is a reminder that you have a {appointment.get_service_type_display()} appointment scheduled for:
+
+Date: {appointment_date}
+Time: {appointment_time}
+Provider: {appointment.provider.full_name} ({appointment.provider.get_role_display()})
+
+Please arrive 5-10 minutes before your scheduled time.
+
+If you need to reschedule or cancel, please contact the health office as soon as possible.
+
+Best regards,
+IETI School Health Office"""
+    
+    html_message = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background-color: #f8f9fa; padding: 20px; text-align: center; }}
+            .content {{ padding: 20px; }}
+            .appointment-details {{ background-color: #f8f9fa; padding: 15px; margin: 20px 0; border-radius: 5px; }}
+            .footer {{ text-align: center; padding: 20px; font-size: 0.9em; color: #666; }}
+            .reminder {{ background-color: #fff3cd; border: 1px solid #ffeaa7; padding: 10px; border-radius: 5px; margin: 15px 0; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h2>IETI School Health Office</h2>
+            </div>
+            <div class="content">
+                <p>Hello {client.full_name},</p>
+                
+                <div class="reminder">
+                    <strong>⏰ Appointment Reminder</strong>
+                </div>
+                
+                <p>This is a reminder that you have a <strong>{appointment.get_service_type_display()}</strong> appointment scheduled for:</p>
+                
+                <div class="appointment-details">
+                    <p><strong>Date:</strong> {appointment_date}</p>
+                    <p><strong>Time:</strong> {appointment_time}</p>
+                    <p><strong>Provider:</strong> {appointment.provider.full_name} ({appointment.provider.get_role_display()})</p>
+                </div>
+                
+                <p><strong>Please arrive 5-10 minutes before your scheduled time.</strong></p>
+                
+                <p>If you need to reschedule or cancel, please contact the health office as soon as possible.</p>
+            </div>
+            <div class="footer">
+                <p>Best regards,<br>IETI School Health Office</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    email = EmailMultiAlternatives(subject, message, settings.DEFAULT_FROM_EMAIL, [client.email])
+    email.attach_alternative(html_message, 'text/html')
+    return email
+
+
+def render_provider_reminder(appointment):
+    """Build the reminder email for the provider (clinic/counselor), or None if they have no email"""
+    provider = appointment.provider
+    
+    # Skip if provider has no email
+    if not provider.email:
+        logger.warning(f"Provider {provider.username} has no email address")
+        return None
+    
+    subject = f"Appointment Reminder - {appointment.get_service_type_display()}"
+    
+    # Format appointment time
+    appointment_time = appointment.time.strftime('%I:%M %p')
+    appointment_date = appointment.date.strftime('%A, %B %d, %Y')
+    
+    message = f"""Hello {provider.full_name},
+
+This is a reminder that you have a {appointment.get_service_type_display()} appointment scheduled for:
+
+Date: {appointment_date}
+Time: {appointment_time}
+Client: {appointment.client.full_name} ({appointment.client.get_role_display()})
+
+Please be ready for the appointment.
+
+Best regards,
+IETI School Health Office"""
+    
+    html_message = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background-color: #f8f9fa; padding: 20px; text-align: center; }}
+            .content {{ padding: 20px; }}
+            .appointment-details {{ background-color: #f8f9fa; padding: 15px; margin: 20px 0; border-radius: 5px; }}
+            .footer {{ text-align: center; padding: 20px; font-size: 0.9em; color: #666; }}
+            .reminder {{ background-color: #fff3cd; border: 1px solid #ffeaa7; padding: 10px; border-radius: 5px; margin: 15px 0; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h2>IETI School Health Office</h2>
+            </div>
+            <div class="content">
+                <p>Hello {provider.full_name},</p>
+                
+                <div class="reminder">
+                    <strong>⏰ Appointment Reminder</strong>
+                </div>
+                
+                <p>This is a reminder that you have a <strong>{appointment.get_service_type_display()}</strong> appointment scheduled for:</p>
+                
+                <div class="appointment-details">
+                    <p><strong>Date:</strong> {appointment_date}</p>
+                    <p><strong>Time:</strong> {appointment_time}</p>
+                    <p><strong>Client:</strong> {appointment.client.full_name} ({appointment.client.get_role_display()})</p>
+                </div>
+                
+                <p><strong>Please be ready for the appointment.</strong></p>
+            </div>
+            <div class="footer">
+                <p>Best regards,<br>IETI School Health Office</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    email = EmailMultiAlternatives(subject, message, settings.DEFAULT_FROM_EMAIL, [provider.email])
+    email.attach_alternative(html_message, 'text/html')
+    return email
+
+
+def dispatch_reminders(now=None, minutes_before=10, dry_run=False):
+    """
+    Queue every due appointment reminder in one batch
+
+    Args:
+        now: Current time (defaults to timezone.now())
+        minutes_before: Minutes before the appointment to send the reminder
+        dry_run: Render and report the reminders without queueing or saving anything
+
+    Returns:
+        Tuple[datetime, list]: (reminder time, one result dict per claimed appointment)
+    """
+    appointments, reminder_time = due_reminder_appointments(now, minutes_before)
+    results = []
+    
+    with transaction.atomic():
+        # Lock the due rows; an overlapping run skips them instead of queueing duplicates
+        claimed = appointments.select_for_update(skip_locked=True, of=('self',))
+        
+        for appointment in claimed:
+            results.append({
+                'appointment': appointment,
+                'client_email': None if appointment.client_reminder_sent_at else render_client_reminder(appointment),
+                'provider_email': None if appointment.provider_reminder_sent_at else render_provider_reminder(appointment),
+            })
+        
+        if dry_run:
+            return reminder_time, results
+        
+        sent_at = timezone.now()
+        messages = []
+        sent = []
+        for result in results:
+            appointment = result['appointment']
+            if result['client_email'] is not None:
+                messages.append(result['client_email'])
+                appointment.client_reminder_sent_at = sent_at
+            if result['provider_email'] is not None:
+                messages.append(result['provider_email'])
+                appointment.provider_reminder_sent_at = sent_at
+            if result['client_email'] is not None or result['provider_email'] is not None:
+                sent.append(appointment)
+        
+        # One outbox INSERT, one UPDATE for the sent markers, one INSERT for the notifications
+        if sent:
+            queue_messages(messages, category='appointment_reminder')
+            Appointment.objects.bulk_update(sent, ['client_reminder_sent_at', 'provider_reminder_sent_at'])
+            record_reminder_notifications(sent)
+    
+    return reminder_time, results
@@ -1,7 +1,224 @@
-from django.test import TestCase
+from datetime import date, time, timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from website.models import User
+from .models import Appointment, AppointmentNotification, UNSENT_REMINDER_CONDITION
+from website.models import OutboundEmail
+from website.outbox import deliver_outbox
+from .reminders import dispatch_reminders
 
 # Create your tests here.
 
 class AppointmentModelTest(TestCase):
     def test_placeholder(self):
         self.assertTrue(True)
+
+
+class AppointmentQueryPlanTest(TestCase):
+    """Scheduling views and the reminder cron must keep using their indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = User.objects.create_user(username='clinic1', password='testpass123', role='clinic')
+        cls.client_user = User.objects.create_user(username='student1', password='testpass123', role='student')
+        start = date.today() - timedelta(days=30)
+        for day in range(60):
+            for hour in (8, 10, 14):
+                Appointment.objects.create(
+                    provider=cls.provider,
+                    client=cls.client_user,
+                    date=start + timedelta(days=day),
+                    time=time(hour, 0),
+                    service_type='physical',
+                    status='completed' if day < 30 else 'upcoming',
+                )
+
+    def assertUsesIndex(self, queryset, index_name):
+        """Assert the database plans the query through the named index"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Tiny test tables would otherwise always be sequentially scanned
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertIn(index_name, plan, f"Expected {index_name} in query plan:\n{plan}")
+
+    def test_provider_today_uses_index(self):
+        queryset = Appointment.objects.filter(
+            provider=self.provider,
+            date=date.today(),
+            service_type='physical',
+            status__in=['upcoming', 'in_progress']
+        ).order_by('status', 'time')
+        self.assertUsesIndex(queryset, 'appt_provider_status_idx')
+
+    def test_provider_upcoming_uses_index(self):
+        queryset = Appointment.objects.filter(
+            provider=self.provider,
+            service_type='physical',
+            status='upcoming'
+        ).order_by('date', 'time')
+        self.assertUsesIndex(queryset, 'appt_provider_status_idx')
+
+    def test_client_status_uses_index(self):
+        queryset = Appointment.objects.filter(client=self.client_user, status='upcoming')
+        self.assertUsesIndex(queryset, 'appt_client_status_idx')
+
+    def test_reminder_cron_uses_partial_index(self):
+        queryset = Appointment.objects.filter(
+            UNSENT_REMINDER_CONDITION,
+            date=date.today(),
+            time__gte=time(8, 0),
+            time__lt=time(8, 1)
+        )
+        self.assertUsesIndex(queryset, 'appt_unsent_reminder_idx')
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class ReminderDispatchTest(TestCase):
+    """Reminders are queued in one batch and never twice"""
+
+    def setUp(self):
+        self.now = timezone.now()
+        due = timezone.localtime(self.now + timedelta(minutes=10))
+        provider = User.objects.create_user(username='clinic1', password='testpass123', role='clinic',
+                                            email='clinic@example.com', full_name='Clinic Staff')
+        for i in range(5):
+            client = User.objects.create_user(username=f'student{i}', password='testpass123', role='student',
+                                              email=f'student{i}@example.com' if i else '', full_name=f'Student {i}')
+            Appointment.objects.create(
+                provider=provider,
+                client=client,
+                date=due.date(),
+                time=due.time().replace(second=0, microsecond=0),
+                service_type='physical',
+                status='upcoming',
+            )
+
+    def test_dry_run_sends_nothing(self):
+        _, results = dispatch_reminders(now=self.now, dry_run=True)
+        self.assertEqual(len(results), 5)
+        self.assertFalse(OutboundEmail.objects.exists())
+        self.assertFalse(Appointment.objects.filter(provider_reminder_sent_at__isnull=False).exists())
+
+    def test_batch_queue(self):
+        # Savepoint, locking SELECT, outbox INSERT, one bulk UPDATE, one notification INSERT, release
+        with self.assertNumQueries(6):
+            _, results = dispatch_reminders(now=self.now)
+        self.assertEqual(len(results), 5)
+        # Four clients with an email address plus the provider for every appointment
+        self.assertEqual(OutboundEmail.objects.filter(category='appointment_reminder').count(), 9)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Appointment.objects.filter(client_reminder_sent_at__isnull=False).count(), 4)
+        self.assertEqual(Appointment.objects.filter(provider_reminder_sent_at__isnull=False).count(), 5)
+        self.assertEqual(AppointmentNotification.objects.filter(kind='reminder').count(), 9)
+
+        dispatch_reminders(now=self.now)
+        self.assertEqual(OutboundEmail.objects.count(), 9)
+
+        deliver_outbox()
+        self.assertEqual(len(mail.outbox), 9)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+
+
+class AppointmentNotificationTest(TestCase):
+    """Notification rows follow the appointment and are served by the polling feeds"""
+
+    def setUp(self):
+        self.provider = User.objects.create_user(username='clinic1', password='testpass123', role='clinic', full_name='Clinic One')
+        self.student = User.objects.create_user(username='student1', password='testpass123', role='student', full_name='Student One')
+        self.appointment = Appointment.objects.create(
+            provider=self.provider,
+            client=self.student,
+            date=date.today() + timedelta(days=1),
+            time=time(9, 0),
+            service_type='physical',
+        )
+        self.client = APIClient()
+
+    def feed(self, user, path, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get(f'/api/appointments/{path}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_created_appointment_notifies_both_parties(self):
+        notifications = AppointmentNotification.objects.filter(appointment=self.appointment, kind='scheduled')
+        self.assertEqual(
+            {(n.audience, n.recipient_id) for n in notifications},
+            {('client', self.student.id), ('provider', self.provider.id)},
+        )
+        self.assertEqual([n['id'] for n in self.feed(self.student, 'student-notifications').data], [self.appointment.id])
+        self.assertEqual([n['id'] for n in self.feed(self.provider, 'clinic-notifications').data], [self.appointment.id])
+
+    def test_status_change_is_picked_up_by_since_cursor(self):
+        cursor = self.feed(self.student, 'student-notifications')['X-Poll-Cursor']
+        self.assertEqual(self.feed(self.student, 'student-notifications', since=cursor).data, [])
+
+        self.appointment.status = 'cancelled'
+        self.appointment.save()
+
+        changed = self.feed(self.student, 'student-notifications', since=cursor).data
+        self.assertEqual([n['id'] for n in changed], [self.appointment.id])
+        self.assertEqual(changed[0]['status'], 'cancelled')
+
+    def test_mark_read(self):
+        other = Appointment.objects.create(
+            provider=self.provider, client=self.student, date=date.today() + timedelta(days=2),
+            time=time(10, 0), service_type='physical',
+        )
+        self.client.force_authenticate(self.student)
+        url = '/api/appointments/student-notifications/mark-read/'
+
+        response = self.client.post(url, {'notification_id': self.appointment.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        read = {n['id']: n['isRead'] for n in self.feed(self.student, 'student-notifications').data}
+        self.assertEqual(read, {self.appointment.id: True, other.id: False})
+        # The provider's copy is unaffected
+        self.assertFalse(AppointmentNotification.objects.get(
+            appointment=self.appointment, audience='provider').read_at)
+
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, 200)
+        self.assertTrue(all(n['isRead'] for n in self.feed(self.student, 'student-notifications').data))
+
+        response = self.client.post(url, {'notification_id': other.id + 1000}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_reassignment_moves_notifications(self):
+        AppointmentNotification.objects.filter(appointment=self.appointment).update(read_at=timezone.now())
+        new_provider = User.objects.create_user(username='clinic2', password='testpass123', role='clinic', full_name='Clinic Two')
+        new_student = User.objects.create_user(username='student2', password='testpass123', role='student', full_name='Student Two')
+
+        self.appointment.provider = new_provider
+        self.appointment.client = new_student
+        self.appointment.save()
+
+        self.assertEqual(self.feed(self.provider, 'clinic-notifications').data, [])
+        self.assertEqual(self.feed(self.student, 'student-notifications').data, [])
+        for user, path in ((new_provider, 'clinic-notifications'), (new_student, 'student-notifications')):
+            notifications = self.feed(user, path).data
+            self.assertEqual([n['id'] for n in notifications], [self.appointment.id])
+            self.assertFalse(notifications[0]['isRead'])
+
+    def test_backfill_command(self):
+        viewed_at = timezone.now() - timedelta(hours=1)
+        Appointment.objects.filter(pk=self.appointment.pk).update(student_viewed_at=viewed_at)
+        AppointmentNotification.objects.all().delete()
+
+        call_command('backfill_appointment_notifications', stdout=StringIO())
+
+        notifications = {n.audience: n for n in AppointmentNotification.objects.filter(appointment=self.appointment)}
+        self.assertEqual(notifications['client'].recipient_id, self.student.id)
+        self.assertEqual(notifications['client'].read_at, viewed_at)
+        self.assertEqual(notifications['provider'].recipient_id, self.provider.id)
+        self.assertIsNone(notifications['provider'].read_at)
+
+        # Running it again does not duplicate rows
+        call_command('backfill_appointment_notifications', stdout=StringIO())
+        self.assertEqual(AppointmentNotification.objects.filter(appointment=self.appointment).count(), 2)
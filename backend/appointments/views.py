@@ -4,6 +4,11 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from .models import Appointment, Availability
 from .serializers import AppointmentSerializer, AvailabilitySerializer
+from .notifications import (
+    appointment_notification_queryset,
+    mark_appointment_notifications_read,
+    serialize_appointment_notification,
+)
 from django.contrib.auth import get_user_model
 from django.db.models import Q, Count
 from rest_framework.views import APIView
@@ -14,6 +19,8 @@ from django.utils import timezone
 from datetime import date, datetime
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
+from backend.async_views import async_api_view
+from backend.pagination import InvalidCursor, apaginate_feed
 
 User = get_user_model()
 
@@ -42,138 +49,6 @@ def format_relative_time(created_at):
     else:
         return "Just now"
 
-def create_appointment_notifications(appointments, user_role, viewed_field):
-    """Helper function to create appointment notifications with reminders"""
-    notifications = []
-    
-    for appointment in appointments:
-        # Create base appointment notification
-        relative_time = format_relative_time(appointment.created_at)
-        notification_text = f"New Appointment Just Scheduled for You"
-        
-        base_notification = {
-            'id': appointment.id,
-            'text': notification_text,
-            'timestamp': relative_time,
-            'type': 'appointment',
-            'isRead': getattr(appointment, viewed_field) is not None,
-            'status': appointment.status,
-            'appointment_data': {
-                'date': appointment.date,
-                'time': appointment.time,
-                'service_type': appointment.get_service_type_display(),
-                'reason': appointment.reason,
-                'status': appointment.status,
-                'provider_name': appointment.provider.full_name,
-                'provider_role': appointment.provider.role,
-                'client_name': appointment.client.full_name,
-                'client_role': appointment.client.role,
-                'created_at': appointment.created_at,
-                'referral': appointment.referral
-            }
-        }
-        notifications.append(base_notification)
-        
-        # Add reminder notification if reminder was sent and appointment is upcoming
-        if (appointment.status == 'upcoming' and 
-            appointment.client_reminder_sent_at and 
-            user_role in ['student', 'faculty']):
-            
-            reminder_relative_time = format_relative_time(appointment.client_reminder_sent_at)
-            reminder_text = f"⏰ Appointment Reminder: Your {appointment.get_service_type_display()} appointment is in 10 minutes"
-            
-            reminder_notification = {
-                'id': f"{appointment.id}_reminder",
-                'text': reminder_text,
-                'timestamp': reminder_relative_time,
-                'type': 'appointment_reminder',
-                'isRead': getattr(appointment, viewed_field) is not None,
-                'status': appointment.status,
-                'appointment_data': {
-                    'date': appointment.date,
-                    'time': appointment.time,
-                    'service_type': appointment.get_service_type_display(),
-                    'reason': appointment.reason,
-                    'status': appointment.status,
-                    'provider_name': appointment.provider.full_name,
-                    'provider_role': appointment.provider.role,
-                    'client_name': appointment.client.full_name,
-                    'client_role': appointment.client.role,
-                    'created_at': appointment.created_at,
-                    'referral': appointment.referral,
-                    'reminder_sent_at': appointment.client_reminder_sent_at
-                }
-            }
-            notifications.append(reminder_notification)
-    
-    return notifications
-
-def create_provider_appointment_notifications(appointments, user_role, viewed_field):
-    """Helper function to create provider appointment notifications with reminders"""
-    notifications = []
-    
-    for appointment in appointments:
-        # Create base appointment notification
-        relative_time = format_relative_time(appointment.created_at)
-        notification_text = f"New Appointment Just Scheduled for You"
-        
-        base_notification = {
-            'id': appointment.id,
-            'text': notification_text,
-            'timestamp': relative_time,
-            'type': 'appointment',
-            'isRead': getattr(appointment, viewed_field) is not None,
-            'status': appointment.status,
-            'appointment_data': {
-                'date': appointment.date,
-                'time': appointment.time,
-                'service_type': appointment.get_service_type_display(),
-                'reason': appointment.reason,
-                'status': appointment.status,
-                'provider_name': appointment.provider.full_name,
-                'provider_role': appointment.provider.role,
-                'client_name': appointment.client.full_name,
-                'client_role': appointment.client.role,
-                'created_at': appointment.created_at,
-                'referral': appointment.referral
-            }
-        }
-        notifications.append(base_notification)
-        
-        # Add reminder notification if reminder was sent and appointment is upcoming
-        if (appointment.status == 'upcoming' and 
-            appointment.provider_reminder_sent_at and 
-            user_role in ['clinic', 'counselor']):
-            
-            reminder_relative_time = format_relative_time(appointment.provider_reminder_sent_at)
-            reminder_text = f"⏰ Appointment Reminder: You have a {appointment.get_service_type_display()} appointment in 10 minutes"
-            
-            reminder_notification = {
-                'id': f"{appointment.id}_reminder",
-                'text': reminder_text,
-                'timestamp': reminder_relative_time,
-                'type': 'appointment_reminder',
-                'isRead': getattr(appointment, viewed_field) is not None,
-                'status': appointment.status,
-                'appointment_data': {
-                    'date': appointment.date,
-                    'time': appointment.time,
-                    'service_type': appointment.get_service_type_display(),
-                    'reason': appointment.reason,
-                    'status': appointment.status,
-                    'provider_name': appointment.provider.full_name,
-                    'provider_role': appointment.provider.role,
-                    'client_name': appointment.client.full_name,
-                    'client_role': appointment.client.role,
-                    'created_at': appointment.created_at,
-                    'referral': appointment.referral,
-                    'reminder_sent_at': appointment.provider_reminder_sent_at
-                }
-            }
-            notifications.append(reminder_notification)
-    
-    return notifications
-
 def create_appointment_activity(user, appointment, action):
     """Helper function to create appointment activity records"""
     try:
@@ -222,75 +97,65 @@ def create_appointment_activity(user, appointment, action):
         pass
 
 # Appointment Notification Views
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_student_appointment_notifications(request):
+async def _appointment_notification_feed(request, role):
+    """Serve one keyset-paginated page of materialized appointment notifications"""
+    queryset = appointment_notification_queryset(request.user, role)
+    try:
+        notifications, headers = await apaginate_feed(queryset, request)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    now = timezone.now()
+    return Response(
+        [serialize_appointment_notification(notification, now) for notification in notifications],
+        headers=headers
+    )
+
+def _mark_appointment_notifications_read(request, role):
+    """Mark one appointment's notifications, or all unread ones, as read"""
+    try:
+        notification_id = request.data.get('notification_id')
+        mark_appointment_notifications_read(request.user, role, notification_id)
+        
+        if notification_id:
+            return Response({'message': 'Notification marked as read'})
+        return Response({'message': 'Notifications marked as read'})
+    except Appointment.DoesNotExist:
+        return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@async_api_view(['GET'])
+async def get_student_appointment_notifications(request):
     """Get notifications for students (their own appointments)"""
     if request.user.role != 'student':
         return Response({'error': 'Only students can access notifications'}, status=status.HTTP_403_FORBIDDEN)
     
-    # Get appointments where this student is the client
-    appointments = Appointment.objects.filter(
-        client=request.user
-    ).order_by('-created_at')
-    
-    # Use helper function to create notifications with reminders
-    notifications = create_appointment_notifications(appointments, 'student', 'student_viewed_at')
-    
-    return Response(notifications)
+    return await _appointment_notification_feed(request, 'student')
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_faculty_appointment_notifications(request):
+@async_api_view(['GET'])
+async def get_faculty_appointment_notifications(request):
     """Get notifications for faculty (their own appointments)"""
     if request.user.role != 'faculty':
         return Response({'error': 'Only faculty can access notifications'}, status=status.HTTP_403_FORBIDDEN)
     
-    # Get appointments where this faculty is the client
-    appointments = Appointment.objects.filter(
-        client=request.user
-    ).order_by('-created_at')
-    
-    # Use helper function to create notifications with reminders
-    notifications = create_appointment_notifications(appointments, 'faculty', 'faculty_viewed_at')
-    
-    return Response(notifications)
+    return await _appointment_notification_feed(request, 'faculty')
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_clinic_appointment_notifications(request):
+@async_api_view(['GET'])
+async def get_clinic_appointment_notifications(request):
     """Get notifications for clinic staff (appointments assigned to them)"""
     if request.user.role != 'clinic':
         return Response({'error': 'Only clinic staff can access notifications'}, status=status.HTTP_403_FORBIDDEN)
     
-    # Get appointments where this clinic user is the provider
-    appointments = Appointment.objects.filter(
-        provider=request.user,
-        service_type='physical'
-    ).order_by('-created_at')
-    
-    # Use helper function to create notifications with reminders
-    notifications = create_provider_appointment_notifications(appointments, 'clinic', 'clinic_viewed_at')
-    
-    return Response(notifications)
+    return await _appointment_notification_feed(request, 'clinic')
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_counselor_appointment_notifications(request):
+@async_api_view(['GET'])
+async def get_counselor_appointment_notifications(request):
     """Get notifications for counselors (appointments assigned to them)"""
     if request.user.role != 'counselor':
         return Response({'error': 'Only counselors can access notifications'}, status=status.HTTP_403_FORBIDDEN)
     
-    # Get appointments where this counselor is the provider
-    appointments = Appointment.objects.filter(
-        provider=request.user,
-        service_type='mental'
-    ).order_by('-created_at')
-    
-    # Use helper function to create notifications with reminders
-    notifications = create_provider_appointment_notifications(appointments, 'counselor', 'counselor_viewed_at')
-    
-    return Response(notifications)
+    return await _appointment_notification_feed(request, 'counselor')
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -299,34 +164,7 @@ def mark_student_appointment_notifications_read(request):
     if request.user.role != 'student':
         return Response({'error': 'Only students can mark notifications as read'}, status=status.HTTP_403_FORBIDDEN)
     
-    try:
-        notification_id = request.data.get('notification_id')
-        
-        if notification_id:
-            # Mark specific notification as read
-            appointment = Appointment.objects.get(
-                id=notification_id,
-                client=request.user
-            )
-            appointment.student_viewed_at = timezone.now()
-            appointment.save()
-            return Response({'message': 'Notification marked as read'})
-        else:
-            # Mark all unread notifications as read
-            appointments = Appointment.objects.filter(
-                client=request.user,
-                student_viewed_at__isnull=True
-            )
-            
-            for appointment in appointments:
-                appointment.student_viewed_at = timezone.now()
-                appointment.save()
-        
-        return Response({'message': 'Notifications marked as read'})
-    except Appointment.DoesNotExist:
-        return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return _mark_appointment_notifications_read(request, 'student')
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -335,34 +173,7 @@ def mark_faculty_appointment_notifications_read(request):
     if request.user.role != 'faculty':
         return Response({'error': 'Only faculty can mark notifications as read'}, status=status.HTTP_403_FORBIDDEN)
     
-    try:
-        notification_id = request.data.get('notification_id')
-        
-        if notification_id:
-            # Mark specific notification as read
-            appointment = Appointment.objects.get(
-                id=notification_id,
-                client=request.user
-            )
-            appointment.faculty_viewed_at = timezone.now()
-            appointment.save()
-            return Response({'message': 'Notification marked as read'})
-        else:
-            # Mark all unread notifications as read
-            appointments = Appointment.objects.filter(
-                client=request.user,
-                faculty_viewed_at__isnull=True
-            )
-            
-            for appointment in appointments:
-                appointment.faculty_viewed_at = timezone.now()
-                appointment.save()
-        
-        return Response({'message': 'Notifications marked as read'})
-    except Appointment.DoesNotExist:
-        return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return _mark_appointment_notifications_read(request, 'faculty')
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -371,34 +182,7 @@ def mark_clinic_appointment_notifications_read(request):
     if request.user.role != 'clinic':
         return Response({'error': 'Only clinic staff can mark notifications as read'}, status=status.HTTP_403_FORBIDDEN)
     
-    try:
-        notification_id = request.data.get('notification_id')
-        
-        if notification_id:
-            # Mark specific notification as read
-            appointment = Appointment.objects.get(
-                id=notification_id,
-                provider=request.user
-            )
-            appointment.clinic_viewed_at = timezone.now()
-            appointment.save()
-            return Response({'message': 'Notification marked as read'})
-        else:
-            # Mark all unread notifications as read
-            appointments = Appointment.objects.filter(
-                provider=request.user,
-                clinic_viewed_at__isnull=True
-            )
-            
-            for appointment in appointments:
-                appointment.clinic_viewed_at = timezone.now()
-                appointment.save()
-        
-        return Response({'message': 'Notifications marked as read'})
-    except Appointment.DoesNotExist:
-        return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return _mark_appointment_notifications_read(request, 'clinic')
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -407,34 +191,7 @@ def mark_counselor_appointment_notifications_read(request):
     if request.user.role != 'counselor':
         return Response({'error': 'Only counselors can mark notifications as read'}, status=status.HTTP_403_FORBIDDEN)
     
-    try:
-        notification_id = request.data.get('notification_id')
-        
-        if notification_id:
-            # Mark specific notification as read
-            appointment = Appointment.objects.get(
-                id=notification_id,
-                provider=request.user
-            )
-            appointment.counselor_viewed_at = timezone.now()
-            appointment.save()
-            return Response({'message': 'Notification marked as read'})
-        else:
-            # Mark all unread notifications as read
-            appointments = Appointment.objects.filter(
-                provider=request.user,
-                counselor_viewed_at__isnull=True
-            )
-            
-            for appointment in appointments:
-                appointment.counselor_viewed_at = timezone.now()
-                appointment.save()
-        
-        return Response({'message': 'Notifications marked as read'})
-    except Appointment.DoesNotExist:
-        return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return _mark_appointment_notifications_read(request, 'counselor')
 
 # Create your views here.
 
@@ -457,11 +214,13 @@ class AppointmentViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        # AppointmentSerializer nests these users
+        appointments = Appointment.objects.select_related('provider', 'client', 'created_by')
         # Admin users can see all appointments
         if user.role == 'admin':
-            return Appointment.objects.all()
+            return appointments
         # Other users only see appointments where they are provider, client, or referrer
-        return Appointment.objects.filter(
+        return appointments.filter(
             Q(provider=user) | Q(client=user) | Q(created_by=user)
         ).distinct()
 
@@ -632,7 +391,7 @@ class ClinicTodayAppointmentsView(APIView):
             date=today,
             service_type='physical',
             status__in=['upcoming', 'in_progress']
-        ).order_by('status', 'time')  # Order by status first (upcoming comes before in_progress), then by time
+        ).select_related('client').order_by('status', 'time')  # Order by status first (upcoming comes before in_progress), then by time
         
         appointments_data = []
         for appointment in today_appointments:
@@ -694,7 +453,7 @@ class ClinicUpcomingAppointmentsView(APIView):
             provider=request.user,
             service_type='physical',
             status='upcoming'
-        ).order_by('date', 'time')  # Order by date first, then by time
+        ).select_related('client').order_by('date', 'time')  # Order by date first, then by time
         
         appointments_data = []
         for appointment in upcoming_appointments:
@@ -785,7 +544,7 @@ class CounselorTodayAppointmentsView(APIView):
             date=today,
             service_type='mental',
             status__in=['upcoming', 'in_progress']
-        ).order_by('status', 'time')  # Order by status first (upcoming comes before in_progress), then by time
+        ).select_related('client').order_by('status', 'time')  # Order by status first (upcoming comes before in_progress), then by time
         
         appointments_data = []
         for appointment in today_appointments:
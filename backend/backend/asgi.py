@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Models otherwise load on first use; warm them up off the request path when enabled
+from backend.model_lifecycle import start_background_warmup  # noqa: E402
+
+start_background_warmup()
@@ -0,0 +1,91 @@
+"""
+Async function views for I/O-bound endpoints
+
+DRF's @api_view only builds synchronous views, which hold a server thread for
+as long as they wait on the database or a remote API. @async_api_view gives an
+``async def`` view the same contract: JWT authentication, permission classes,
+request.data and Response objects. Authentication and permission checks run in
+a worker thread because they query the database.
+
+Under ASGI (SERVER_MODE=asgi, see gunicorn.conf.py) a waiting view only
+suspends its coroutine, so one worker serves many slow requests at once. Under
+WSGI Django runs the view to completion in the request thread, and the
+endpoints behave exactly as before.
+"""
+
+import functools
+
+from asgiref.sync import sync_to_async
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+def _authorize(request, permissions):
+    """Authenticate the request and apply the permission classes, as APIView.initial does"""
+    request.user  # Runs the authenticators; the result is cached on the request
+    for permission in permissions:
+        if not permission.has_permission(request, None):
+            if request.authenticators and not request.successful_authenticator:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+
+def _error_response(request, exc):
+    response = Response({'detail': exc.detail}, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        if request.authenticators:
+            header = request.authenticators[0].authenticate_header(request)
+            if header:
+                response['WWW-Authenticate'] = header
+            else:
+                response.status_code = status.HTTP_403_FORBIDDEN
+    return response
+
+
+def async_api_view(http_method_names, permission_classes=(IsAuthenticated,)):
+    """
+    Decorator turning an ``async def view(request)`` into a DRF-style API view
+
+    The view receives a DRF Request and returns a Response, like an @api_view
+    function. Database access inside the view must go through the async ORM
+    or sync_to_async.
+
+    Args:
+        http_method_names: Allowed methods, e.g. ['GET']
+        permission_classes: Permission classes checked before the view runs
+    """
+    allowed = [method.upper() for method in http_method_names]
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def view(request, *args, **kwargs):
+            drf_request = Request(
+                request,
+                parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+                authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+            )
+            try:
+                if request.method not in allowed:
+                    raise exceptions.MethodNotAllowed(request.method)
+                await sync_to_async(_authorize)(drf_request, [permission() for permission in permission_classes])
+                response = await func(drf_request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                response = _error_response(drf_request, exc)
+
+            # Django renders the response once the view returns
+            response.accepted_renderer = JSONRenderer()
+            response.accepted_media_type = JSONRenderer.media_type
+            response.renderer_context = {'request': drf_request, 'response': response, 'view': None}
+            if request.method not in allowed:
+                response['Allow'] = ', '.join(allowed)
+            return response
+
+        # Session-authenticated requests are CSRF-checked by DRF's SessionAuthentication
+        return csrf_exempt(view)
+
+    return decorator
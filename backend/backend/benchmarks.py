@@ -0,0 +1,317 @@
+"""
+Benchmarks for the expensive request paths
+
+Each case is timed over a synthetic dataset (see synthetic_data.py) and
+reports wall-clock statistics and the number of database queries per run.
+Results are plain dicts that the bench command saves as a JSON baseline;
+compare_with_baseline() flags cases that got slower or run more queries, so
+an optimization can be shown and a regression caught by re-running the
+command against a saved file.
+
+Cases call the views the frontend calls, through APIRequestFactory, so the
+timings include serialization and permission checks. The WHO API is kept out
+of the detection case: its latency is the network's, not ours.
+"""
+
+import os
+import platform
+import shutil
+import statistics
+import time
+from datetime import timedelta
+from itertools import count
+
+import django
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .synthetic_data import generate_dataset
+
+# Default tolerance when comparing with a baseline: timings vary between runs
+DEFAULT_TOLERANCE = 0.25
+
+# Rows per unit of scale in the bulk upload CSV; each one hashes a password
+BULK_UPLOAD_ROWS = 10
+
+DETECTION_TEXTS = [
+    'Masakit ang ulo ko since morning at nahihilo ako',
+    'I have a fever of 38.5 and chills, also body aches',
+    'Sipon at ubo since yesterday, masakit din ang lalamunan',
+    'My stomach hurts after lunch and I feel like vomiting',
+    'Nauntog ang ulo ko sa PE, may bukol at masakit',
+    'Student complains of toothache and swelling on the left cheek',
+    'Hirap huminga, may hika po ako dati',
+    'Rashes on both arms, very itchy since last night',
+]
+
+CASES = {}
+
+
+class BenchmarkError(Exception):
+    """A case could not run, e.g. its view returned an error response"""
+
+
+class SkipCase(Exception):
+    """A case cannot run in this environment, e.g. a system binary is missing"""
+
+
+class BenchmarkContext:
+    """What case setups receive: the generated dataset and a scratch directory"""
+
+    def __init__(self, dataset, workdir, scale):
+        self.dataset = dataset
+        self.workdir = workdir
+        self.scale = scale
+        self.factory = APIRequestFactory()
+
+    def get(self, view, user, path, params=None):
+        request = self.factory.get(path, params or {})
+        force_authenticate(request, user)
+        return _check_response(view(request))
+
+
+def _check_response(response):
+    if response.status_code >= 400:
+        detail = getattr(response, 'data', None) or response.status_code
+        raise BenchmarkError(f'View returned {response.status_code}: {detail}')
+    return response
+
+
+def case(name, description):
+    """
+    Register a benchmark case
+
+    The decorated function receives a BenchmarkContext, does any untimed
+    preparation and returns the zero-argument callable that is timed.
+    """
+    def decorator(setup):
+        CASES[name] = (description, setup)
+        return setup
+    return decorator
+
+
+@case('icd11_detection', 'HybridICD11Detector.detect_conditions on Tagalog and English complaints')
+def icd11_detection(context):
+    from analytics.hybrid_icd11_service import HybridICD11Detector
+
+    detector = HybridICD11Detector()
+    detector._initialize_services()
+    detector.api_cooldown_until = timezone.now() + timedelta(days=1)
+
+    def run():
+        for text in DETECTION_TEXTS:
+            detector.detect_conditions(text)
+    return run
+
+
+@case('physical_health_trends', 'get_physical_health_trends view over six months')
+def physical_health_trends(context):
+    from analytics.clinic_views import get_physical_health_trends
+
+    return lambda: context.get(
+        get_physical_health_trends, context.dataset.clinic,
+        '/api/analytics/physical-health-trends/', {'months': 6},
+    )
+
+
+@case('mental_health_trends', 'Counselor mental_health_trends view over the academic year')
+def mental_health_trends(context):
+    from analytics.counselor_views import mental_health_trends as view
+
+    return lambda: context.get(
+        view, context.dataset.counselor, '/api/analytics/counselor/mental-health-trends/', {'months': 12},
+    )
+
+
+@case('pdf_doh_report', 'DOHCompliantReportGenerator through the export_physical_health_pdf view')
+def pdf_doh_report(context):
+    from analytics.views import export_physical_health_pdf
+
+    def run():
+        response = context.get(
+            export_physical_health_pdf, context.dataset.clinic,
+            '/api/analytics/export-physical-health-pdf/', {'months': 12},
+        )
+        # The view leaves its temporary PDF behind. response.close() would send
+        # request_finished, which closes the connection inside the transaction.
+        response.file_to_stream.close()
+        os.remove(response.file_to_stream.name)
+    return run
+
+
+def _draw_exam_form(path):
+    """A letter-size page at 200 dpi laid out like the medical examination form"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', (1700, 2200), 'white')
+    draw = ImageDraw.Draw(image)
+    lines = [
+        'MEDICAL EXAMINATION FORM',
+        'Name: Juan Dela Cruz        Age: 15        Sex: Male',
+        'Grade/Section: 10-A         Date: 06/15/2025',
+        'Height: 165 cm   Weight: 55 kg   BMI: 20.2',
+        'Blood Pressure: 110/70   Pulse Rate: 78   Temperature: 36.8',
+        'Visual Acuity: OD 20/20  OS 20/25',
+        'Heart: Normal   Lungs: Clear   Abdomen: Soft, non-tender',
+        'Hemoglobin: 13.5 g/dL   Urinalysis: Normal',
+        'Remarks: Fit for school activities',
+        'Physician: Dr. Maria Santos, MD   License No. 0123456',
+    ]
+    for index, line in enumerate(lines):
+        draw.text((120, 150 + index * 180), line, fill='black')
+        draw.line((120, 210 + index * 180, 1580, 210 + index * 180), fill='gray', width=2)
+    image.save(path)
+    return path
+
+
+@case('ocr_preprocess', 'EnhancedOCRProcessor.preprocess_image on a scanned form')
+def ocr_preprocess(context):
+    from medical_exam.utils.enhanced_ocr import EnhancedOCRProcessor
+
+    path = _draw_exam_form(os.path.join(context.workdir, 'exam_form.png'))
+    processor = EnhancedOCRProcessor()
+    return lambda: processor.preprocess_image(path)
+
+
+@case('ocr_extract', 'EnhancedOCRProcessor text extraction with every Tesseract config')
+def ocr_extract(context):
+    from medical_exam.utils.enhanced_ocr import EnhancedOCRProcessor
+
+    if not shutil.which('tesseract'):
+        raise SkipCase('tesseract binary not installed')
+    path = _draw_exam_form(os.path.join(context.workdir, 'exam_form.png'))
+    processor = EnhancedOCRProcessor()
+    return lambda: processor.extract_text_with_multiple_configs(path)
+
+
+@case('bulk_upload_users', 'AdminBulkUploadUsersView with a CSV of new students')
+def bulk_upload_users(context):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from website.views import AdminBulkUploadUsersView
+
+    view = AdminBulkUploadUsersView.as_view()
+    rows = BULK_UPLOAD_ROWS * context.scale
+    uploads = count()
+
+    def run():
+        # Fresh emails every round, or later rounds would only report duplicates
+        upload = next(uploads)
+        lines = ['Name,Email,Role,Grade,Section,Date of Birth']
+        lines += [
+            f'Bench Student {upload}-{index},bench-upload-{upload}-{index}@example.com,student,10,A,2010-05-{index % 28 + 1:02d}'
+            for index in range(rows)
+        ]
+        csv_file = SimpleUploadedFile('students.csv', '\n'.join(lines).encode(), content_type='text/csv')
+        request = context.factory.post('/api/admin/bulk-upload/', {'csv_file': csv_file}, format='multipart')
+        force_authenticate(request, context.dataset.admin)
+        response = _check_response(view(request))
+        if response.data['error_count']:
+            raise BenchmarkError(f"Bulk upload rejected rows: {response.data['errors'][:3]}")
+    return run
+
+
+def time_case(func, rounds, warmup):
+    """
+    Time a callable
+
+    Returns:
+        dict: min/median/mean/stdev seconds over the rounds, and the database
+            queries of the last round
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    queries = 0
+    for _ in range(rounds):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        queries = len(captured.captured_queries)
+
+    return {
+        'rounds': rounds,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'stdev': statistics.stdev(timings) if rounds > 1 else 0.0,
+        'queries': queries,
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'cpus': os.cpu_count(),
+        'timestamp': timezone.now().isoformat(),
+    }
+
+
+def run_benchmarks(names, workdir, scale=1, seed=42, rounds=5, warmup=1, report=None):
+    """
+    Generate the dataset and time the named cases
+
+    Everything runs in one transaction that is rolled back, so the database
+    is left as it was.
+
+    Args:
+        names: Case names, in CASES
+        workdir: Scratch directory for files the cases create
+        scale: Dataset size multiplier
+        seed: Dataset random seed
+        rounds: Timed runs per case
+        warmup: Untimed runs per case before timing (caches, lazy imports)
+        report: Optional callable(name, result) called as each case finishes
+
+    Returns:
+        dict: {'meta': {...}, 'dataset': {...}, 'results': {name: result}}
+    """
+    results = {}
+    with transaction.atomic():
+        dataset = generate_dataset(scale=scale, seed=seed)
+        context = BenchmarkContext(dataset, workdir, scale)
+        for name in names:
+            description, setup = CASES[name]
+            try:
+                result = time_case(setup(context), rounds, warmup)
+            except SkipCase as e:
+                result = {'skipped': str(e)}
+            result['description'] = description
+            results[name] = result
+            if report:
+                report(name, result)
+        transaction.set_rollback(True)
+
+    meta = environment()
+    meta.update({'scale': scale, 'seed': seed, 'warmup': warmup})
+    return {'meta': meta, 'dataset': dataset.counts, 'results': results}
+
+
+def compare_with_baseline(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Find the cases that regressed against a saved run
+
+    A case regresses when its median time exceeds the baseline median by more
+    than the tolerance, or when it runs more database queries. Cases missing
+    from either run or skipped in either are not compared.
+
+    Returns:
+        list: Human-readable regression messages (empty when none)
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before or 'skipped' in before or 'skipped' in result:
+            continue
+        if result['median'] > before['median'] * (1 + tolerance):
+            regressions.append(
+                f"{name}: median {result['median'] * 1000:.1f}ms, baseline {before['median'] * 1000:.1f}ms"
+            )
+        if result['queries'] > before['queries']:
+            regressions.append(f"{name}: {result['queries']} queries, baseline {before['queries']}")
+    return regressions
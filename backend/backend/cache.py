@@ -0,0 +1,11 @@
+"""
+Cache backends that report hits and misses to /metrics (see backend/metrics.py)
+"""
+
+from django.core.cache.backends.locmem import LocMemCache as BaseLocMemCache
+
+from .metrics import CacheMetricsMixin
+
+
+class LocMemCache(CacheMetricsMixin, BaseLocMemCache):
+    """Django's local-memory cache with hit/miss counting"""
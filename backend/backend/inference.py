@@ -0,0 +1,268 @@
+"""
+CPU inference backends for the shared BERT checkpoints
+
+BERT_INFERENCE_BACKEND selects how acquire_pretrained() serves a checkpoint:
+
+- 'torch' (default): the full-precision PyTorch model
+- 'onnx': the model is exported to ONNX once, quantized to dynamic int8 and run
+  with onnxruntime. The exported files are cached in ONNX_MODEL_DIR.
+
+ONNX models are drop-in replacements: they accept the tokenizer's PyTorch
+tensors and return the same output objects (last_hidden_state / logits), so
+detector code does not change. onnx and onnxruntime are optional dependencies.
+
+The cached file name includes a fingerprint of a local checkpoint's weight and
+config files, so retraining into the same directory exports a new graph. Every
+process writing the cache exports into its own temporary file and moves the
+result into place atomically.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_BACKENDS = ('torch', 'onnx')
+
+# Graph inputs and the output exported for each task
+ONNX_INPUT_NAMES = ['input_ids', 'attention_mask', 'token_type_ids']
+ONNX_OUTPUT_NAMES = {
+    'base': 'last_hidden_state',
+    'sequence_classification': 'logits',
+}
+ONNX_OPSET = 17
+
+
+def inference_backend():
+    """Configured backend name, validated against INFERENCE_BACKENDS"""
+    backend = getattr(settings, 'BERT_INFERENCE_BACKEND', 'torch')
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown BERT_INFERENCE_BACKEND: {backend}")
+    return backend
+
+
+# Files of a local checkpoint whose changes invalidate its exported graphs
+CHECKPOINT_FILE_PATTERN = re.compile(r'\.(safetensors|bin|json)$')
+
+
+def checkpoint_fingerprint(checkpoint):
+    """
+    (name, size, mtime) of the weight and config files of a local checkpoint
+
+    Returns:
+        tuple: Empty for Hugging Face model names, whose files do not change in place
+    """
+    if not os.path.isdir(checkpoint):
+        return ()
+    fingerprint = []
+    for name in sorted(os.listdir(checkpoint)):
+        if CHECKPOINT_FILE_PATTERN.search(name):
+            stat = os.stat(os.path.join(checkpoint, name))
+            fingerprint.append((name, stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+
+def onnx_model_path(checkpoint, task, options, directory=None):
+    """Cache file for an exported checkpoint, unique per checkpoint version, task and options"""
+    key = (checkpoint, task, options, checkpoint_fingerprint(checkpoint))
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:12]
+    stem = re.sub(r'[^A-Za-z0-9_.-]+', '_', os.path.basename(checkpoint.rstrip('/\\')))
+    return os.path.join(directory or settings.ONNX_MODEL_DIR, f"{stem}-{task}-{digest}.int8.onnx")
+
+
+def _export_module(model, task):
+    import torch
+
+    output_name = ONNX_OUTPUT_NAMES[task]
+
+    class ExportWrapper(torch.nn.Module):
+        """Fixes the forward signature and returns a single tensor for the exporter"""
+
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            outputs = self.model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            )
+            return getattr(outputs, output_name)
+
+    return ExportWrapper().eval()
+
+
+def export_onnx(model, tokenizer, path, task):
+    """
+    Export a PyTorch model to ONNX with dynamic batch and sequence axes
+
+    Args:
+        model: transformers model in eval mode
+        tokenizer: Matching tokenizer, used to build the example input
+        path: Destination .onnx file
+        task: Key of ONNX_OUTPUT_NAMES
+    """
+    import torch
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    example = tokenizer("example input", return_tensors='pt')
+    args = tuple(
+        example.get(name, torch.zeros_like(example['input_ids'])) for name in ONNX_INPUT_NAMES
+    )
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in ONNX_INPUT_NAMES}
+    dynamic_axes[ONNX_OUTPUT_NAMES[task]] = {0: 'batch'}
+    with torch.no_grad():
+        torch.onnx.export(
+            _export_module(model, task), args, path,
+            input_names=ONNX_INPUT_NAMES,
+            output_names=[ONNX_OUTPUT_NAMES[task]],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+            dynamo=False,
+        )
+
+
+def quantize_onnx(source_path, target_path):
+    """Quantize the weights of an ONNX model to int8 (activations stay dynamic)"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(source_path, target_path, weight_type=QuantType.QInt8)
+
+
+class OnnxModel:
+    """
+    onnxruntime session that can be called like the transformers model it replaces
+
+    Only inference is supported: the session is read-only and can be shared
+    between threads like the PyTorch models it stands in for.
+    """
+
+    def __init__(self, session, task, config=None):
+        self.session = session
+        self.task = task
+        self.config = config
+        self.input_names = {node.name for node in session.get_inputs()}
+
+    def __call__(self, input_ids, attention_mask=None, token_type_ids=None, **kwargs):
+        import numpy as np
+        import torch
+        from transformers.modeling_outputs import BaseModelOutput, SequenceClassifierOutput
+
+        feeds = {'input_ids': input_ids, 'attention_mask': attention_mask, 'token_type_ids': token_type_ids}
+        if feeds['attention_mask'] is None:
+            feeds['attention_mask'] = torch.ones_like(input_ids)
+        if feeds['token_type_ids'] is None:
+            feeds['token_type_ids'] = torch.zeros_like(input_ids)
+        inputs = {
+            name: np.asarray(value.cpu().numpy() if hasattr(value, 'cpu') else value, dtype=np.int64)
+            for name, value in feeds.items() if name in self.input_names
+        }
+        output = torch.from_numpy(self.session.run(None, inputs)[0])
+        if self.task == 'sequence_classification':
+            return SequenceClassifierOutput(logits=output)
+        return BaseModelOutput(last_hidden_state=output)
+
+    def eval(self):
+        return self
+
+    def parameters(self):
+        # Weights live inside the session, not in torch tensors
+        return iter(())
+
+    def buffers(self):
+        return iter(())
+
+
+def _export_quantized(model, tokenizer, path, task):
+    """
+    Export and quantize into temporary files next to path, then move the result into place
+
+    Workers that export the same checkpoint at once each write their own files,
+    and readers only ever see a complete graph at path.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    temporary = []
+    try:
+        for suffix in ('.onnx', '.int8.onnx'):
+            fd, temporary_path = tempfile.mkstemp(dir=directory, prefix='.export-', suffix=suffix)
+            os.close(fd)
+            temporary.append(temporary_path)
+        full_precision_path, quantized_path = temporary
+        export_onnx(model, tokenizer, full_precision_path, task)
+        quantize_onnx(full_precision_path, quantized_path)
+        os.replace(quantized_path, path)
+    finally:
+        for temporary_path in temporary:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+
+def load_onnx_model(model, tokenizer, checkpoint, task, options, directory=None):
+    """
+    Return an int8 OnnxModel for a loaded PyTorch model, exporting it on first use
+
+    Raises:
+        ImportError: onnx or onnxruntime is not installed
+    """
+    import onnxruntime
+
+    path = onnx_model_path(checkpoint, task, options, directory=directory)
+    if not os.path.exists(path):
+        logger.info("Exporting %s (%s) to %s", checkpoint, task, path)
+        _export_quantized(model, tokenizer, path, task)
+
+    session_options = onnxruntime.SessionOptions()
+    session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = onnxruntime.InferenceSession(path, session_options, providers=['CPUExecutionProvider'])
+    return OnnxModel(session, task, getattr(model, 'config', None))
+
+
+def check_parity(checkpoint, texts, task='base', **options):
+    """
+    Compare the int8 ONNX model with the PyTorch model on sample texts
+
+    For 'base' the mean-pooled embeddings are compared by cosine similarity; for
+    'sequence_classification' the logits are compared and so are the predicted labels.
+
+    Returns:
+        dict: {'task', 'texts', 'min_cosine', 'mean_cosine', 'label_agreement'}
+    """
+    import torch
+    import transformers
+
+    from .model_lifecycle import PRETRAINED_TASKS
+
+    tokenizer = transformers.AutoTokenizer.from_pretrained(checkpoint)
+    torch_model = getattr(transformers, PRETRAINED_TASKS[task]).from_pretrained(checkpoint, **options).eval()
+
+    cosines = []
+    agreements = []
+    # Export this exact model (classifier heads may be freshly initialized) into a scratch dir
+    with tempfile.TemporaryDirectory() as export_dir, torch.no_grad():
+        onnx_model = load_onnx_model(
+            torch_model, tokenizer, checkpoint, task, tuple(sorted(options.items())), directory=export_dir
+        )
+        for text in texts:
+            inputs = tokenizer(text, return_tensors='pt', truncation=True, max_length=512)
+            expected = torch_model(**inputs)
+            actual = onnx_model(**inputs)
+            if task == 'sequence_classification':
+                agreements.append(int(expected.logits.argmax(-1)) == int(actual.logits.argmax(-1)))
+                left, right = expected.logits, actual.logits
+            else:
+                left = expected.last_hidden_state.mean(dim=1)
+                right = actual.last_hidden_state.mean(dim=1)
+            cosines.append(float(torch.nn.functional.cosine_similarity(left, right).min()))
+
+    return {
+        'task': task,
+        'texts': len(texts),
+        'min_cosine': min(cosines, default=None),
+        'mean_cosine': sum(cosines) / len(cosines) if cosines else None,
+        'label_agreement': sum(agreements) / len(agreements) if agreements else None,
+    }
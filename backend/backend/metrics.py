@@ -0,0 +1,199 @@
+"""
+Request and workload metrics, exported in Prometheus text format at /metrics
+
+Recorded per view (the URL name, so label cardinality stays bounded):
+
+- amieti_http_request_duration_seconds: latency of every request
+- amieti_http_request_db_queries / amieti_http_request_db_seconds: number and
+  total time of the database queries a request ran (sampled, see below)
+- amieti_cache_requests_total: cache lookups by result, hit or miss
+- amieti_task_duration_seconds: model inference (BERT, ICD-11 and mental health
+  detection), OCR and PDF generation, wrapped with track_task()
+
+Latency is always recorded. Timing database queries costs a little on every
+query, so only METRICS_SAMPLE_RATE of the requests are timed. Queries are
+attributed through a context variable, so those run from async views via
+sync_to_async are counted too.
+
+With several Gunicorn workers each process keeps its own samples;
+gunicorn.conf.py sets PROMETHEUS_MULTIPROC_DIR so /metrics reports all of them.
+"""
+
+import os
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+REQUEST_DURATION = Histogram(
+    'amieti_http_request_duration_seconds', 'Request latency',
+    ['view', 'method', 'status'], buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_QUERIES = Histogram(
+    'amieti_http_request_db_queries', 'Database queries per sampled request',
+    ['view'], buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    'amieti_http_request_db_seconds', 'Total database time per sampled request',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    'amieti_cache_requests', 'Cache lookups', ['cache', 'result'],
+)
+TASK_DURATION = Histogram(
+    'amieti_task_duration_seconds', 'Duration of inference, OCR and PDF generation',
+    ['task'], buckets=TASK_BUCKETS,
+)
+
+UNMATCHED_VIEW = 'unmatched'
+
+
+class QueryStats:
+    """Database queries of one sampled request"""
+
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_query_stats = ContextVar('query_stats', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - start
+
+
+def _install_query_recorder(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install_query_recorder)
+
+
+def track_task(task):
+    """
+    Time a block or function into amieti_task_duration_seconds
+
+    Usable as ``with track_task('ocr'):`` or as a ``@track_task('pdf_report')`` decorator.
+    """
+    return TASK_DURATION.labels(task).time()
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def view_label(request):
+    """URL name of the view that served the request (its dotted path when unnamed)"""
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else UNMATCHED_VIEW
+
+
+class MetricsMiddleware:
+    """
+    Records latency and sampled database usage for every request
+
+    Goes first in MIDDLEWARE so the time spent in other middleware is included.
+    Works under WSGI and ASGI without adding a thread hop to async views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start, token = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            stats = _query_stats.get()
+            _query_stats.reset(token)
+        self._finish(request, response, start, stats)
+        return response
+
+    async def __acall__(self, request):
+        start, token = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stats = _query_stats.get()
+            _query_stats.reset(token)
+        self._finish(request, response, start, stats)
+        return response
+
+    def _start(self):
+        stats = None
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            stats = QueryStats()
+            # Connections opened before this module was imported have no recorder yet
+            for connection in connections.all(initialized_only=True):
+                _install_query_recorder(connection)
+        return time.perf_counter(), _query_stats.set(stats)
+
+    def _finish(self, request, response, start, stats):
+        view = view_label(request)
+        REQUEST_DURATION.labels(view, request.method, response.status_code).observe(time.perf_counter() - start)
+        if stats is not None:
+            REQUEST_DB_QUERIES.labels(view).observe(stats.count)
+            REQUEST_DB_SECONDS.labels(view).observe(stats.seconds)
+
+
+def render_metrics():
+    """All metrics in Prometheus text format, merged across worker processes when configured"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+class CacheMetricsMixin:
+    """
+    Counts hits and misses of a Django cache backend
+
+    Mixed into the configured backend class (see backend/cache.py). Counting in
+    get() covers get_many() and the async variants, which the base backends
+    implement on top of it. The optional METRICS_NAME entry of the CACHES
+    setting names the cache label.
+    """
+
+    _miss = object()
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self._metrics_name = params.get('METRICS_NAME', 'default')
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._miss, version)
+        record_cache_lookup(self._metrics_name, value is not self._miss)
+        return default if value is self._miss else value
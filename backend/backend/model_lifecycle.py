@@ -0,0 +1,390 @@
+"""
+Lifecycle manager for the ML models served by the API
+
+Detectors are no longer built when their module is imported. Each one is
+registered here by dotted path and constructed on first use, so management
+commands (migrations, reminder crons, the outbox worker) never import torch or
+transformers. Web workers can additionally warm models up in a background
+thread after startup (MODEL_WARMUP=True); GET /api/health/models/ reports the
+load state of every model so a readiness probe can hold traffic until then.
+
+Pretrained weights are shared as well: every detector asks acquire_pretrained()
+for its checkpoint instead of calling from_pretrained() itself, so a worker
+holds one read-only copy of bert-base-multilingual-cased however many
+detectors use it.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+from .inference import inference_backend, load_onnx_model
+
+logger = logging.getLogger(__name__)
+
+NOT_LOADED = 'not_loaded'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+# name -> (dotted path of a zero-argument factory, optional method that loads the weights)
+MODEL_FACTORIES = {
+    'intent_detector': ('chatbot.bert_intent_detector.BERTIntentDetector', None),
+    'mental_health_icd11': ('analytics.mental_health_icd11_service.MentalHealthICD11Detector', 'load_bert_model'),
+    'hybrid_icd11': ('analytics.hybrid_icd11_service.HybridICD11Detector', '_ensure_models_loaded'),
+    'enhanced_mental_health': ('analytics.enhanced_mental_health_service.EnhancedMentalHealthDetector', 'load_bert_model'),
+}
+
+
+class ModelSlot:
+    """Load state of one registered model"""
+
+    def __init__(self, name, factory_path, warmup_method=None):
+        self.name = name
+        self.factory_path = factory_path
+        self.warmup_method = warmup_method
+        self.state = NOT_LOADED
+        self.instance = None
+        self.warmed_up = False
+        self.error = ''
+        self.load_seconds = None
+        self.lock = threading.Lock()
+
+    def as_dict(self):
+        return {
+            'state': self.state,
+            'warmed_up': self.warmed_up,
+            'load_seconds': self.load_seconds,
+            'error': self.error,
+        }
+
+
+_slots = {name: ModelSlot(name, *entry) for name, entry in MODEL_FACTORIES.items()}
+
+
+def _get_slot(name):
+    try:
+        return _slots[name]
+    except KeyError:
+        raise KeyError(f"Unknown model: {name}") from None
+
+
+def get_model(name):
+    """
+    Return the shared instance of a registered model, constructing it on first use
+
+    Concurrent callers block on the same load instead of building the model twice.
+    A failed load is retried on the next call.
+
+    Raises:
+        KeyError: name is not registered
+        Exception: whatever the model factory raised
+    """
+    slot = _get_slot(name)
+    if slot.state == READY:
+        return slot.instance
+
+    with slot.lock:
+        if slot.state == READY:
+            return slot.instance
+        slot.state = LOADING
+        started = time.monotonic()
+        try:
+            instance = import_string(slot.factory_path)()
+        except Exception as e:
+            slot.state = FAILED
+            slot.error = str(e)
+            logger.exception("Failed to load model %s", name)
+            raise
+        slot.instance = instance
+        slot.error = ''
+        slot.load_seconds = round(time.monotonic() - started, 3)
+        slot.state = READY
+        logger.info("Loaded model %s in %.2fs", name, slot.load_seconds)
+        return instance
+
+
+def lazy_model(name):
+    """Module-level stand-in for a model that is only constructed when first touched"""
+    return SimpleLazyObject(lambda: get_model(name))
+
+
+def warm_up(names=None):
+    """
+    Construct the given models (all registered ones by default) and load their weights
+
+    Returns:
+        dict: {name: state} after warming up; failures are logged, not raised
+    """
+    for name in names or MODEL_FACTORIES:
+        slot = _get_slot(name)
+        try:
+            instance = get_model(name)
+            if slot.warmup_method and not slot.warmed_up:
+                getattr(instance, slot.warmup_method)()
+            slot.warmed_up = True
+        except Exception:
+            # get_model already recorded and logged the failure
+            continue
+    return {name: _slots[name].state for name in names or MODEL_FACTORIES}
+
+
+def warmup_model_names():
+    """Models warmed up after startup, from the MODEL_WARMUP_NAMES setting"""
+    return getattr(settings, 'MODEL_WARMUP_NAMES', None) or list(MODEL_FACTORIES)
+
+
+# Set by the pre-fork server: warmup runs in the master before workers are forked
+_preload_warmup = False
+
+
+def use_preload_warmup():
+    """
+    Warm up with preload_models() before fork instead of in a background thread
+
+    Threads do not survive fork, and a lock held by one at fork time would stay
+    held forever in the children, so the pre-fork server calls this before the
+    application is imported.
+    """
+    global _preload_warmup
+    _preload_warmup = True
+
+
+def preload_models():
+    """
+    Warm models up synchronously, in the server master before it forks workers
+
+    Returns:
+        dict: {name: state}, empty when MODEL_WARMUP is disabled
+    """
+    if not getattr(settings, 'MODEL_WARMUP', False):
+        return {}
+    return warm_up(warmup_model_names())
+
+
+def start_background_warmup():
+    """
+    Warm models up in a daemon thread when MODEL_WARMUP is enabled
+
+    Called from the WSGI/ASGI entry points only, so management commands never
+    load models. Requests arriving meanwhile load what they need on demand.
+
+    Returns:
+        threading.Thread or None: The warmup thread, if one was started
+    """
+    if not getattr(settings, 'MODEL_WARMUP', False) or _preload_warmup:
+        return None
+    thread = threading.Thread(
+        target=warm_up, args=(warmup_model_names(),), name='model-warmup', daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def model_status():
+    """
+    Report the load state of every registered model
+
+    Returns:
+        Tuple[bool, dict]: (ready, {name: state details}). Without MODEL_WARMUP models
+        load on demand and the worker is always ready; with it, ready means every
+        warmup model has finished warming up.
+    """
+    models = {name: slot.as_dict() for name, slot in _slots.items()}
+    if not getattr(settings, 'MODEL_WARMUP', False):
+        return True, models
+    ready = all(_slots[name].warmed_up for name in warmup_model_names())
+    return ready, models
+
+
+def reset_models():
+    """Forget every loaded model; used by tests"""
+    for name, slot in list(_slots.items()):
+        _slots[name] = ModelSlot(name, slot.factory_path, slot.warmup_method)
+
+
+# Model classes per task, resolved from transformers when a checkpoint is loaded
+PRETRAINED_TASKS = {
+    'base': 'AutoModel',
+    'sequence_classification': 'AutoModelForSequenceClassification',
+}
+
+
+class PretrainedEntry:
+    """One loaded checkpoint and the number of detectors holding it"""
+
+    def __init__(self, key, tokenizer, model, encoder_key=None):
+        self.key = key
+        self.tokenizer = tokenizer
+        self.model = model
+        self.encoder_key = encoder_key
+        self.refs = 0
+
+    def as_dict(self):
+        checkpoint, task, options = self.key
+        return {
+            'checkpoint': checkpoint,
+            'task': task,
+            'options': dict(options),
+            'refs': self.refs,
+            'parameter_bytes': parameter_bytes([self.model]),
+            'shares_encoder': self.encoder_key is not None,
+        }
+
+
+_pretrained = {}
+# Reentrant: loading a classifier acquires the base encoder of the same checkpoint
+_pretrained_lock = threading.RLock()
+
+
+def _pretrained_key(checkpoint, task, options):
+    if task not in PRETRAINED_TASKS:
+        raise ValueError(f"Unknown pretrained task: {task}")
+    checkpoint = str(checkpoint)
+    if os.path.isdir(checkpoint):
+        # Local checkpoints are reached through different relative paths
+        checkpoint = os.path.abspath(checkpoint)
+    return (checkpoint, task, tuple(sorted(options.items())))
+
+
+def _apply_torch_threads():
+    # Exported per worker by gunicorn.conf.py; torch is often first imported here, after the fork
+    threads = int(os.environ.get('TORCH_NUM_THREADS') or 0)
+    if threads:
+        import torch
+        if torch.get_num_threads() != threads:
+            torch.set_num_threads(threads)
+
+
+def _load_pretrained(key):
+    import transformers
+
+    _apply_torch_threads()
+    checkpoint, task, options = key
+    model = getattr(transformers, PRETRAINED_TASKS[task]).from_pretrained(checkpoint, **dict(options))
+    # Shared between threads and detectors: never train, never track gradients
+    model.eval()
+    model.requires_grad_(False)
+
+    tokenizer = next(
+        (entry.tokenizer for entry in _pretrained.values() if entry.key[0] == checkpoint), None
+    ) or transformers.AutoTokenizer.from_pretrained(checkpoint)
+
+    if inference_backend() == 'onnx':
+        try:
+            # Each exported graph carries its own int8 encoder; the PyTorch weights are dropped
+            return PretrainedEntry(key, tokenizer, load_onnx_model(model, tokenizer, checkpoint, task, options))
+        except ImportError as e:
+            logger.warning("ONNX backend unavailable (%s); serving %s with PyTorch", e, checkpoint)
+
+    encoder_key = None
+    if task != 'base':
+        # A task head only adds a small layer on top of the encoder; reuse the shared
+        # base model's encoder or publish this one as the base model for the checkpoint
+        prefix = model.base_model_prefix
+        encoder = getattr(model, prefix, None)
+        base_key = _pretrained_key(checkpoint, 'base', {})
+        base = _pretrained.get(base_key)
+        if base is None and encoder is not None:
+            base = PretrainedEntry(base_key, tokenizer, encoder)
+            _pretrained[base_key] = base
+        if base is not None and type(base.model) is type(encoder):
+            setattr(model, prefix, base.model)
+            base.refs += 1
+            encoder_key = base_key
+
+    return PretrainedEntry(key, tokenizer, model, encoder_key)
+
+
+def acquire_pretrained(checkpoint, task='base', **options):
+    """
+    Return the process-wide (tokenizer, model) pair for a checkpoint
+
+    The checkpoint is loaded once and then handed to every caller. Models are in
+    eval mode with gradients disabled and must be treated as read-only. Classifier
+    heads share the encoder of the base model for the same checkpoint.
+
+    Args:
+        checkpoint: Hugging Face model name or local directory
+        task: 'base' (AutoModel) or 'sequence_classification'
+        **options: Extra from_pretrained() arguments, e.g. num_labels; part of the cache key
+
+    Returns:
+        Tuple: (tokenizer, model)
+    """
+    key = _pretrained_key(checkpoint, task, options)
+    with _pretrained_lock:
+        entry = _pretrained.get(key)
+        if entry is None:
+            started = time.monotonic()
+            entry = _load_pretrained(key)
+            _pretrained[key] = entry
+            logger.info("Loaded pretrained %s (%s) in %.2fs", checkpoint, task, time.monotonic() - started)
+        entry.refs += 1
+        return entry.tokenizer, entry.model
+
+
+def release_pretrained(checkpoint, task='base', **options):
+    """Drop one reference to a checkpoint; the weights are freed with the last one"""
+    key = _pretrained_key(checkpoint, task, options)
+    with _pretrained_lock:
+        while key is not None:
+            entry = _pretrained.get(key)
+            if entry is None:
+                return
+            entry.refs -= 1
+            if entry.refs > 0:
+                return
+            del _pretrained[key]
+            key = entry.encoder_key
+
+
+def parameter_bytes(models):
+    """Bytes held by the parameters and buffers of the given models, shared tensors counted once"""
+    seen = set()
+    total = 0
+    for model in models:
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            pointer = tensor.data_ptr()
+            if pointer not in seen:
+                seen.add(pointer)
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def process_memory_bytes():
+    """Resident set size of this process (peak RSS without /proc, None on Windows)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def pretrained_status():
+    """
+    Report the shared checkpoints and the memory they hold
+
+    Returns:
+        dict: {'checkpoints': [...], 'parameter_bytes': int, 'rss_bytes': int}
+    """
+    with _pretrained_lock:
+        entries = list(_pretrained.values())
+        return {
+            'checkpoints': [entry.as_dict() for entry in entries],
+            'parameter_bytes': parameter_bytes([entry.model for entry in entries]),
+            'rss_bytes': process_memory_bytes(),
+        }
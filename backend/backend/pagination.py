@@ -0,0 +1,164 @@
+"""
+Keyset (cursor) pagination helpers for notification feeds
+
+Feeds keep returning a plain JSON list so existing clients keep working;
+cursors for the next page and for incremental polling are sent in the
+X-Next-Cursor and X-Poll-Cursor response headers. Async feeds can also
+long-poll (?wait=) instead of being polled on a timer.
+"""
+
+import asyncio
+import base64
+import time
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_FEED_LIMIT = 50
+MAX_FEED_LIMIT = 200
+
+# Long polling: longest wait a client may ask for, and how often the feed is re-queried
+MAX_POLL_WAIT = 25
+POLL_INTERVAL = 1.0
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+POLL_CURSOR_HEADER = 'X-Poll-Cursor'
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a malformed cursor or limit"""
+
+
+def encode_cursor(timestamp, pk):
+    """Encode a (timestamp, primary key) position as an opaque cursor string"""
+    raw = f"{timestamp.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor into (timestamp, pk)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def get_feed_limit(request, default=DEFAULT_FEED_LIMIT):
+    """Read the page size from ?limit=, capped at MAX_FEED_LIMIT"""
+    try:
+        limit = int(request.GET.get('limit', default))
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor("limit must be an integer") from e
+    return max(1, min(limit, MAX_FEED_LIMIT))
+
+
+class FeedPage:
+    """
+    One keyset page of a feed: the query to run, then the cursors for its rows
+
+    Splitting the query from its evaluation lets paginate_feed and apaginate_feed
+    share the cursor logic while fetching rows synchronously or asynchronously.
+    """
+
+    def __init__(self, queryset, request, order_field='created_at', change_field='updated_at'):
+        self.limit = get_feed_limit(request)
+        self.since = request.GET.get('since')
+        self.before = request.GET.get('before')
+        self.order_field = order_field
+        self.change_field = change_field
+
+        if self.since:
+            changed_at, pk = decode_cursor(self.since)
+            self.queryset = queryset.filter(
+                Q(**{f'{change_field}__gt': changed_at}) |
+                Q(**{change_field: changed_at, 'pk__gt': pk})
+            ).order_by(change_field, 'pk')[:self.limit]
+            return
+
+        if self.before:
+            ordered_at, pk = decode_cursor(self.before)
+            queryset = queryset.filter(
+                Q(**{f'{order_field}__lt': ordered_at}) |
+                Q(**{order_field: ordered_at, 'pk__lt': pk})
+            )
+        # One extra row tells whether an older page exists
+        self.queryset = queryset.order_by(f'-{order_field}', '-pk')[:self.limit + 1]
+
+    def finish(self, rows):
+        """Trim the fetched rows to the page and compute the cursor headers"""
+        headers = {}
+
+        if self.since:
+            if rows:
+                last = rows[-1]
+                headers[POLL_CURSOR_HEADER] = encode_cursor(getattr(last, self.change_field), last.pk)
+            else:
+                headers[POLL_CURSOR_HEADER] = self.since
+            return rows, headers
+
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            last = rows[-1]
+            headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, self.order_field), last.pk)
+
+        if not self.before:
+            # Start polling from the most recently changed row on the first page
+            newest = max(rows, key=lambda row: (getattr(row, self.change_field), row.pk), default=None)
+            if newest is not None:
+                headers[POLL_CURSOR_HEADER] = encode_cursor(getattr(newest, self.change_field), newest.pk)
+
+        return rows, headers
+
+
+def paginate_feed(queryset, request, order_field='created_at', change_field='updated_at'):
+    """
+    Return one page of a feed using keyset pagination
+
+    Without parameters the newest page is returned, ordered by order_field desc.
+    ?before=<cursor> continues to older rows. ?since=<cursor> returns only rows whose
+    change_field moved past the cursor, oldest change first, so polling clients fetch
+    only what changed since their last request.
+
+    Args:
+        queryset: Base queryset, already filtered and projected
+        request: DRF request carrying the limit/before/since query parameters
+        order_field: Timestamp field used for page order
+        change_field: Timestamp field bumped whenever a row changes
+
+    Returns:
+        Tuple[list, dict]: (rows, response headers carrying the next/poll cursors)
+    """
+    page = FeedPage(queryset, request, order_field, change_field)
+    return page.finish(list(page.queryset))
+
+
+def get_poll_wait(request):
+    """Read the long-poll timeout in seconds from ?wait=, capped at MAX_POLL_WAIT"""
+    try:
+        wait = float(request.GET.get('wait', 0))
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor("wait must be a number") from e
+    return max(0.0, min(wait, MAX_POLL_WAIT))
+
+
+async def apaginate_feed(queryset, request, order_field='created_at', change_field='updated_at'):
+    """
+    Async paginate_feed for async views, with optional long polling
+
+    With ?since=<cursor>&wait=<seconds> and nothing new yet, the query is repeated
+    every POLL_INTERVAL seconds until a row changes or the wait runs out. The
+    request only holds a coroutine while it waits, not a server thread.
+
+    Returns:
+        Tuple[list, dict]: (rows, response headers carrying the next/poll cursors)
+    """
+    page = FeedPage(queryset, request, order_field, change_field)
+    deadline = time.monotonic() + (get_poll_wait(request) if page.since else 0)
+
+    rows = [row async for row in page.queryset]
+    while not rows and time.monotonic() < deadline:
+        await asyncio.sleep(min(POLL_INTERVAL, deadline - time.monotonic()))
+        rows = [row async for row in page.queryset.all()]
+    return page.finish(rows)
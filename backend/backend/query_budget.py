@@ -0,0 +1,127 @@
+"""
+Database query budgets for API endpoints
+
+Each EndpointBudget names an endpoint, the role that calls it and the most
+queries it may run, counting the SystemLog row the logging middleware writes.
+measure_query_counts() calls every registered endpoint on synthetic datasets
+of increasing size (see synthetic_data.py) and find_budget_violations() reports
+endpoints that exceed their budget or whose query count grows with the number
+of rows, the signature of an N+1 loop.
+
+The test suite runs every entry in ENDPOINT_BUDGETS. New list, feed or
+analytics endpoints should be added here.
+"""
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .synthetic_data import generate_dataset
+
+# Dataset scales compared for growth; 1 = 50 students, 200 permit requests, ...
+BUDGET_SCALES = (1, 3)
+
+
+class EndpointBudget:
+    """An endpoint and the number of queries one GET of it may run"""
+
+    def __init__(self, url_name, role, max_queries, params=None):
+        self.url_name = url_name
+        self.role = role
+        self.max_queries = max_queries
+        self.params = params or {}
+
+    def __repr__(self):
+        return f'EndpointBudget({self.url_name!r}, {self.role!r}, {self.max_queries})'
+
+
+ENDPOINT_BUDGETS = [
+    # Analytics
+    EndpointBudget('physical_health_trends', 'clinic', 3, {'months': 6}),
+    EndpointBudget('counselor_mental_health_trends', 'counselor', 7, {'months': 12}),
+    EndpointBudget('export_physical_health_pdf', 'clinic', 3, {'months': 12}),
+    # ICD-11 code lookup
+    EndpointBudget('autocomplete_icd_codes', 'clinic', 2, {'q': 'mig'}),
+    # Permit requests and their notification feeds
+    EndpointBudget('get_permit_requests', 'faculty', 2),
+    EndpointBudget('get_faculty_notifications', 'faculty', 2),
+    EndpointBudget('get_student_notifications', 'student', 2),
+    EndpointBudget('get_clinic_notifications', 'clinic', 2),
+    # Appointments and their notification feeds
+    EndpointBudget('appointments-list', 'clinic', 2),
+    EndpointBudget('student-appointment-notifications', 'student', 2),
+    EndpointBudget('clinic-appointment-notifications', 'clinic', 2),
+    EndpointBudget('counselor-appointment-notifications', 'counselor', 2),
+    # Administration
+    EndpointBudget('active_sessions', 'admin', 2),
+]
+
+
+def _user_for_role(dataset, role):
+    if role == 'student':
+        return dataset.students[0]
+    return getattr(dataset, role)
+
+
+def count_endpoint_queries(client, budget):
+    """
+    GET an endpoint as the authenticated client
+
+    Returns:
+        int: Number of queries the request ran
+
+    Raises:
+        AssertionError: The endpoint did not answer 200
+    """
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(reverse(budget.url_name), budget.params)
+    if response.status_code != 200:
+        raise AssertionError(f'{budget.url_name} returned {response.status_code}')
+    return len(captured.captured_queries)
+
+
+def measure_query_counts(budgets=None, scales=BUDGET_SCALES, seed=42):
+    """
+    Count the queries of every endpoint at each dataset scale
+
+    Each dataset is written in a transaction that is rolled back before the
+    next one, so every scale is measured on exactly its own rows.
+
+    Returns:
+        dict: {url_name: {scale: query count}}
+    """
+    budgets = ENDPOINT_BUDGETS if budgets is None else budgets
+    counts = {budget.url_name: {} for budget in budgets}
+    for scale in scales:
+        with transaction.atomic():
+            dataset = generate_dataset(scale=scale, seed=seed, prefix=f'budget{scale}')
+            for budget in budgets:
+                client = APIClient()
+                client.force_authenticate(_user_for_role(dataset, budget.role))
+                counts[budget.url_name][scale] = count_endpoint_queries(client, budget)
+            transaction.set_rollback(True)
+    return counts
+
+
+def find_budget_violations(counts, budgets=None):
+    """
+    Check measured query counts against the budgets
+
+    Returns:
+        list: Human-readable violations (empty when every endpoint is within budget)
+    """
+    budgets = ENDPOINT_BUDGETS if budgets is None else budgets
+    violations = []
+    for budget in budgets:
+        by_scale = counts[budget.url_name]
+        smallest, largest = min(by_scale), max(by_scale)
+        if by_scale[largest] > by_scale[smallest]:
+            violations.append(
+                f'{budget.url_name}: queries grow with the data '
+                f'({by_scale[smallest]} at scale {smallest}, {by_scale[largest]} at scale {largest})'
+            )
+        worst = max(by_scale.values())
+        if worst > budget.max_queries:
+            violations.append(f'{budget.url_name}: {worst} queries, budget {budget.max_queries}')
+    return violations
@@ -0,0 +1,78 @@
+"""
+Sizing of the production application server (see gunicorn.conf.py)
+
+Worker counts are derived from the CPUs and memory actually available to the
+process, cgroup limits included, so the same image sizes itself correctly on a
+laptop and in a memory-capped container.
+"""
+
+import math
+import os
+
+MB = 1024 * 1024
+
+# cgroup v2 and v1 locations of the container memory limit
+CGROUP_MEMORY_LIMITS = ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes')
+CGROUP_CPU_MAX = '/sys/fs/cgroup/cpu.max'
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def available_cpus():
+    """CPUs this process may use: the cgroup CPU quota, else the scheduler affinity"""
+    quota = _read(CGROUP_CPU_MAX)
+    if quota:
+        limit, _, period = quota.partition(' ')
+        if limit.isdigit() and period.isdigit() and int(period):
+            return max(1, math.ceil(int(limit) / int(period)))
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def available_memory_bytes():
+    """Memory this process may use: the cgroup limit, else physical memory (None if unknown)"""
+    for path in CGROUP_MEMORY_LIMITS:
+        value = _read(path)
+        # Unlimited cgroups report 'max' (v2) or a huge sentinel (v1)
+        if value and value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def compute_workers(cpus, memory_bytes, worker_memory_mb, shared_memory_mb=0):
+    """
+    Number of worker processes for the given resources
+
+    Uses the usual 2 * CPUs + 1, capped by how many workers fit in memory once the
+    weights shared by all workers (preloaded before fork) are set aside.
+
+    Args:
+        cpus: Available CPUs
+        memory_bytes: Available memory, or None when unknown
+        worker_memory_mb: Private memory one worker needs
+        shared_memory_mb: Memory shared copy-on-write by every worker
+
+    Returns:
+        int: At least 1
+    """
+    by_cpu = 2 * cpus + 1
+    if not memory_bytes:
+        return by_cpu
+    by_memory = int((memory_bytes / MB - shared_memory_mb) // max(worker_memory_mb, 1))
+    return max(1, min(by_cpu, by_memory))
+
+
+def compute_torch_threads(cpus, workers):
+    """Intra-op threads per worker so that all workers together use each CPU once"""
+    return max(1, cpus // max(workers, 1))
@@ -1,6 +1,6 @@
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import Csv, config
 import os
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -36,6 +36,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its latency includes every other middleware
+    'backend.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -67,6 +69,18 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+# Connection reuse. By default each worker thread keeps its connection for
+# DB_CONN_MAX_AGE seconds and checks it before reuse. DB_POOL=True switches to
+# psycopg 3's connection pool instead (requires psycopg[pool]). The pool holds at
+# most DB_POOL_MAX_SIZE connections per worker process, one per server thread by
+# default; requests beyond that wait up to DB_POOL_TIMEOUT seconds. Behind
+# PgBouncer in transaction mode, set DB_DISABLE_SERVER_SIDE_CURSORS=True.
+# Under SERVER_MODE=asgi persistent connections are always off: connections
+# opened in sync_to_async threads are not closed at the end of the request and
+# would pile up. Use DB_POOL=True there to reuse connections.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+ASGI_MODE = config('SERVER_MODE', default='wsgi').lower() == 'asgi'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -75,9 +89,26 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT'),
+        # Pooled connections go back to the pool after each request instead
+        'CONN_MAX_AGE': 0 if DB_POOL or ASGI_MODE else config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'DISABLE_SERVER_SIDE_CURSORS': config('DB_DISABLE_SERVER_SIDE_CURSORS', default=False, cast=bool),
+        'OPTIONS': {
+            'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+        },
     }
 }
 
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=1, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=config('GUNICORN_THREADS', default=4, cast=int), cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+    }
+
+# Processes used to hash passwords during bulk account imports (0 = one per CPU core)
+BULK_HASH_WORKERS = config('BULK_HASH_WORKERS', default=0, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -157,14 +188,14 @@ CSRF_TRUSTED_ORIGINS = [
     'http://localhost:3000',
     'http://127.0.0.1:3000',
 ]
-CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken']
+CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken', 'X-Next-Cursor', 'X-Poll-Cursor']
 CSRF_COOKIE_NAME = "csrftoken"
 CSRF_HEADER_NAME = "HTTP_X_CSRFTOKEN"
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
+EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = f"Amieti <{EMAIL_HOST_USER}>"
@@ -176,6 +207,14 @@ EMAIL_SSL_CERTVERIFY = False  # Disable SSL certificate verification
 EMAIL_SSL_KEYFILE = None
 EMAIL_SSL_CERTFILE = None
 
+# Email outbox worker (python manage.py send_outbox)
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', default=50, cast=int)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=6, cast=int)
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = config('EMAIL_OUTBOX_RETRY_BASE_SECONDS', default=30, cast=int)
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = config('EMAIL_OUTBOX_RETRY_MAX_SECONDS', default=3600, cast=int)
+# How long a claimed batch is reserved for its worker; a killed worker's rows are retried after it
+EMAIL_OUTBOX_LEASE_SECONDS = config('EMAIL_OUTBOX_LEASE_SECONDS', default=600, cast=int)
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -188,10 +227,33 @@ DEVELOPMENT_MODE = False  # Full features mode
 ENABLE_BERT_MODELS = config('ENABLE_BERT_MODELS', default='True').lower() == 'true'
 ENABLE_WHO_API = config('ENABLE_WHO_API', default='True').lower() == 'true'
 
+# Models load on first use; MODEL_WARMUP loads them in a background thread once a
+# web worker starts (see backend/model_lifecycle.py). Empty names means all models.
+MODEL_WARMUP = config('MODEL_WARMUP', default=False, cast=bool)
+MODEL_WARMUP_NAMES = config('MODEL_WARMUP_NAMES', default='', cast=Csv())
+
+# 'torch' (full precision) or 'onnx' (int8 via onnxruntime; exports are cached in ONNX_MODEL_DIR)
+BERT_INFERENCE_BACKEND = config('BERT_INFERENCE_BACKEND', default='torch')
+ONNX_MODEL_DIR = config('ONNX_MODEL_DIR', default=os.path.join(BASE_DIR, 'analytics', 'models', 'onnx'))
+
+# WHO ICD-11 CSV and the snapshot of the detectors' lookup tables built from it and
+# the ICD11Mapping table by `python manage.py build_icd11_snapshot` (see analytics/icd11_snapshot.py)
+ICD11_DATASET_PATH = config('ICD11_DATASET_PATH', default=os.path.join(BASE_DIR, '..', 'datasets', 'icd11_conditions.csv'))
+ICD11_SNAPSHOT_PATH = config('ICD11_SNAPSHOT_PATH', default=os.path.join(BASE_DIR, '..', 'datasets', 'icd11_snapshot.pickle'))
+
+# Request, cache and inference metrics, exported for Prometheus at /metrics (see backend/metrics.py).
+# METRICS_SAMPLE_RATE is the share of requests whose database queries are timed;
+# latency is recorded for all of them. When METRICS_TOKEN is set, scrapers must
+# send it as "Authorization: Bearer <token>".
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_SAMPLE_RATE = config('METRICS_SAMPLE_RATE', default=1.0, cast=float)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 # Cache configuration for WHO API
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # Django's LocMemCache, counting hits and misses for /metrics
+        'BACKEND': 'backend.cache.LocMemCache',
         'LOCATION': 'unique-snowflake',
     }
 }
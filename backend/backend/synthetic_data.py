@@ -0,0 +1,251 @@
+"""
+Seeded synthetic data for benchmarks and query budgets
+
+generate_dataset() fills the database with students, staff, permit requests,
+appointments, mood entries, mental health alerts and chatbot conversations,
+spread over the last months so the trend and report views have real work to
+do. The same seed and scale always produce the same rows, so timings taken
+from two runs are comparable.
+
+Rows are written with bulk_create. Call it inside a transaction that is rolled
+back afterwards, as the bench command and the query budget checks do, to leave
+the database untouched.
+"""
+
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+# Spread of the generated activity: six months, the default range of the trend views
+HISTORY_DAYS = 180
+
+GRADES = ['7', '8', '9', '10', '11', '12']
+SECTIONS = ['A', 'B', 'C', 'D']
+GENDERS = ['Male', 'Female']
+FIRST_NAMES = ['Juan', 'Maria', 'Jose', 'Ana', 'Mark', 'Kristine', 'Paolo', 'Angela', 'Miguel', 'Bea']
+LAST_NAMES = ['Santos', 'Reyes', 'Cruz', 'Bautista', 'Garcia', 'Mendoza', 'Torres', 'Flores', 'Ramos', 'Aquino']
+
+# (ICD-11 code, diagnosis name, visit reason) as recorded by the clinic
+DIAGNOSES = [
+    ('8A80', 'Migraine', 'Masakit ang ulo ko since morning'),
+    ('MG26', 'Fever of other or unknown origin', 'I have a fever and chills'),
+    ('CA00', 'Acute nasopharyngitis', 'Sipon at ubo since yesterday'),
+    ('DD90', 'Functional dyspepsia', 'My stomach hurts after lunch'),
+    ('ME84', 'Dizziness', 'Nahihilo ako sa klase'),
+    ('NA02', 'Injury of head', 'Nauntog ang ulo ko sa PE'),
+    ('MD90', 'Cough', 'Ubo nang ubo'),
+    ('QA00.0', 'General Consultation', 'Check up lang po'),
+]
+
+ALERT_TEXTS = [
+    ('Stress detected', 'Student reports feeling stressed about exams', ['stressed', 'exams']),
+    ('Anxiety keywords', 'Student feels anxious before presentations', ['anxious']),
+    ('Bullying reported', 'Student mentioned being bullied by classmates', ['bullied']),
+    ('Low mood pattern', 'Repeated sad mood entries this week', ['sad']),
+    ('Hopelessness', 'Student expressed feeling hopeless', ['hopeless']),
+    ('Sleep problems', 'Student is exhausted and cannot sleep', ['exhausted']),
+]
+
+KEYWORDS = [
+    ('stress', 'stress'), ('anxiety', 'anxiety'), ('sad', 'depression'),
+    ('lonely', 'depression'), ('tired', 'stress'), ('bullying', 'bullying'),
+]
+
+MOODS = ['happy', 'good', 'neutral', 'sad', 'angry']
+CONVERSATION_TYPES = ['mental_health', 'chat_with_me', 'general', 'mood_checkin']
+RISK_LEVELS = ['high', 'moderate', 'low', 'general']
+
+# Rows per unit of scale
+STUDENTS = 50
+PERMITS = 200
+APPOINTMENTS = 100
+MOOD_DAYS = 10
+ALERTS = 50
+CONVERSATIONS = 100
+
+
+class SyntheticDataset:
+    """Handles to the generated rows that benchmark cases need"""
+
+    def __init__(self, admin, clinic, counselor, faculty, students, counts):
+        self.admin = admin
+        self.clinic = clinic
+        self.counselor = counselor
+        self.faculty = faculty
+        self.students = students
+        self.counts = counts
+
+
+def _past_datetime(rng, now):
+    return now - timedelta(days=rng.randrange(HISTORY_DAYS), minutes=rng.randrange(24 * 60))
+
+
+def _backdate(model, rows, **field_values):
+    """
+    Overwrite auto_now_add fields, which bulk_create always sets to now
+
+    Args:
+        model: Model class of the rows
+        rows: Saved instances
+        field_values: Field name -> list of values, one per row
+    """
+    for index, row in enumerate(rows):
+        for field, values in field_values.items():
+            setattr(row, field, values[index])
+    model.objects.bulk_update(rows, list(field_values), batch_size=500)
+
+
+def generate_users(rng, now, prefix, scale):
+    from website.models import User
+
+    password = make_password(f'{prefix}-password')
+
+    def person(index, role, **fields):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        return User(
+            username=f'{prefix}-{role}-{index}', email=f'{prefix}-{role}-{index}@example.com',
+            full_name=f'{first} {last}', role=role, password=password, accepted_terms=True,
+            last_login=_past_datetime(rng, now) if rng.random() < 0.5 else None, **fields
+        )
+
+    staff = [person(0, role) for role in ('admin', 'clinic', 'counselor', 'faculty')]
+    students = [
+        person(
+            index, 'student', student_id=f'{prefix.upper()}-{index:05d}', grade=rng.choice(GRADES),
+            section=rng.choice(SECTIONS), gender=rng.choice(GENDERS),
+        )
+        for index in range(STUDENTS * scale)
+    ]
+    users = User.objects.bulk_create(staff + students)
+    return users[:4], users[4:]
+
+
+def generate_permits(rng, now, students, faculty, clinic, scale):
+    from health_records.models import PermitRequest
+
+    permits = []
+    for _ in range(PERMITS * scale):
+        student = rng.choice(students)
+        code, name, reason = rng.choice(DIAGNOSES)
+        completed = rng.random() < 0.8
+        permits.append(PermitRequest(
+            student=student, teacher=faculty, provider=clinic,
+            date=_past_datetime(rng, now).date(), time=time(rng.randrange(7, 17), rng.choice([0, 30])),
+            grade=student.grade, section=student.section, reason=reason,
+            status='completed' if completed else 'pending',
+            diagnosis_code=code if completed else None, diagnosis_name=name if completed else None,
+            vital_signs_temp=f'{rng.uniform(36.2, 39.0):.1f}',
+        ))
+    return PermitRequest.objects.bulk_create(permits)
+
+
+def generate_appointments(rng, now, students, clinic, counselor, scale):
+    from appointments.models import Appointment
+
+    appointments = []
+    for _ in range(APPOINTMENTS * scale):
+        physical = rng.random() < 0.6
+        code, name, reason = rng.choice(DIAGNOSES)
+        status = rng.choice(['completed', 'completed', 'upcoming', 'cancelled'])
+        appointments.append(Appointment(
+            provider=clinic if physical else counselor, client=rng.choice(students),
+            date=_past_datetime(rng, now).date(), time=time(rng.randrange(8, 16), 0),
+            service_type='physical' if physical else 'mental', status=status,
+            reason=reason if physical else 'Gusto ko lang po makausap ang counselor',
+            diagnosis_code=code if physical and status == 'completed' else None,
+            diagnosis_name=name if physical and status == 'completed' else None,
+        ))
+    return Appointment.objects.bulk_create(appointments)
+
+
+def generate_mood_entries(rng, now, students, scale):
+    from mood_tracker.models import MoodEntry
+
+    entries = []
+    for student in students:
+        # One entry per user and day
+        for offset in sorted(rng.sample(range(HISTORY_DAYS), MOOD_DAYS * scale)):
+            entries.append(MoodEntry(
+                user=student, date=(now - timedelta(days=offset)).date(), mood=rng.choice(MOODS),
+                answer_1=rng.randrange(1, 6), answer_2=rng.randrange(1, 6), answer_3=rng.randrange(1, 6),
+            ))
+    return MoodEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+def generate_alerts(rng, now, students, counselor, scale):
+    from analytics.models import MentalHealthAlert
+    from analytics.trend_engine import classify_alert
+
+    alerts = []
+    for _ in range(ALERTS * scale):
+        title, description, keywords = rng.choice(ALERT_TEXTS)
+        alert = MentalHealthAlert(
+            student=rng.choice(students), counselor=counselor, alert_type='keyword_detected',
+            severity=rng.choice(['low', 'moderate', 'high']), title=title, description=description,
+            status=rng.choice(['active', 'pending', 'resolved']), related_keywords=keywords,
+            detected_keywords=keywords,
+        )
+        # save() classifies alerts on write; bulk_create does not call it
+        alert.trend_reason = classify_alert(alert)
+        alerts.append(alert)
+    alerts = MentalHealthAlert.objects.bulk_create(alerts)
+    _backdate(MentalHealthAlert, alerts, created_at=[_past_datetime(rng, now) for _ in alerts])
+    return alerts
+
+
+def generate_conversations(rng, now, prefix, scale):
+    from chatbot.models import AnonymizedConversationMetadata, KeywordFlag
+
+    conversations = [
+        AnonymizedConversationMetadata(
+            session_id=f'{prefix}-session-{index}', risk_level=rng.choice(RISK_LEVELS),
+            conversation_type=rng.choice(CONVERSATION_TYPES), confidence_score=rng.random(),
+            total_messages=rng.randrange(2, 30),
+        )
+        for index in range(CONVERSATIONS * scale)
+    ]
+    conversations = AnonymizedConversationMetadata.objects.bulk_create(conversations)
+    started = [_past_datetime(rng, now) for _ in conversations]
+    _backdate(
+        AnonymizedConversationMetadata, conversations,
+        started_at=started, interaction_date=[moment.date() for moment in started],
+    )
+
+    flags, detected = [], []
+    for conversation, moment in zip(conversations, started):
+        for keyword, category in rng.sample(KEYWORDS, rng.randrange(0, 3)):
+            flags.append(KeywordFlag(keyword=keyword, category=category, session_id=conversation.session_id))
+            detected.append(moment)
+    flags = KeywordFlag.objects.bulk_create(flags)
+    _backdate(KeywordFlag, flags, detected_at=detected, detected_date=[moment.date() for moment in detected])
+    return conversations
+
+
+def generate_dataset(scale=1, seed=42, prefix='bench'):
+    """
+    Write a reproducible dataset
+
+    Args:
+        scale: Multiplier for the number of rows (1 = 50 students, 200 permits, ...)
+        seed: Random seed; the same seed and scale give the same rows
+        prefix: Prefix of usernames, emails and session ids
+
+    Returns:
+        SyntheticDataset: The staff accounts, the students and the row counts
+    """
+    rng = random.Random(seed)
+    # Midday, so the generated dates do not depend on the time the run starts
+    now = timezone.make_aware(datetime.combine(timezone.localdate(), time(12, 0)))
+
+    (admin, clinic, counselor, faculty), students = generate_users(rng, now, prefix, scale)
+    counts = {
+        'users': len(students) + 4,
+        'permit_requests': len(generate_permits(rng, now, students, faculty, clinic, scale)),
+        'appointments': len(generate_appointments(rng, now, students, clinic, counselor, scale)),
+        'mood_entries': len(generate_mood_entries(rng, now, students, scale)),
+        'alerts': len(generate_alerts(rng, now, students, counselor, scale)),
+        'conversations': len(generate_conversations(rng, now, prefix, scale)),
+    }
+    return SyntheticDataset(admin, clinic, counselor, faculty, students, counts)
@@ -17,6 +17,7 @@ from website.views import (
 )
 from mood_tracker.views import submit_mood, check_mood_submission, get_mood_data
 from dashboards import views as dashboards_views
+from .views import metrics, model_readiness
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -45,6 +46,8 @@ urlpatterns = [
     path('api/faculty/dashboard/', dashboards_views.faculty_dashboard, name='faculty_dashboard'),
     path('api/student/dashboard/', dashboards_views.student_dashboard, name='student_dashboard'),
     path('api/user/profile/', user_profile, name='user_profile'),
+    path('api/health/models/', model_readiness, name='model_readiness'),
+    path('metrics', metrics, name='metrics'),
     # path('api/referrals/', include('referrals.urls')),
     path('api/appointments/', include('appointments.urls')),
     path('api/bulletin/', include('bulletin.urls')),
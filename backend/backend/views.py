@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from prometheus_client import CONTENT_TYPE_LATEST
+from rest_framework import status
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from .metrics import render_metrics
+from .model_lifecycle import model_status, pretrained_status
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def model_readiness(request):
+    """Readiness probe: 200 once warmup models are loaded, 503 while they are still loading"""
+    ready, models = model_status()
+    return Response(
+        {'ready': ready, 'models': models, 'memory': pretrained_status()},
+        status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
+def metrics(request):
+    """Prometheus scrape endpoint; when METRICS_TOKEN is set it must be sent as a bearer token"""
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
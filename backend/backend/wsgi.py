@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Models otherwise load on first use; warm them up off the request path when enabled
+from backend.model_lifecycle import start_background_warmup  # noqa: E402
+
+start_background_warmup()
@@ -20,7 +20,7 @@ class KeywordFlagAdmin(admin.ModelAdmin):
     list_display = ('keyword', 'category', 'session_id_short', 'detected_at')
     list_filter = ('category', 'detected_at')
     search_fields = ('keyword', 'category', 'session_id')
-    readonly_fields = ('detected_at',)
+    readonly_fields = ('detected_at', 'detected_date')
     date_hierarchy = 'detected_at'
     
     def session_id_short(self, obj):
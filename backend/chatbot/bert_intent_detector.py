@@ -3,13 +3,13 @@ BERT-based Intent Detection for Mental Health Chatbot
 Uses Hugging Face Transformers to detect mental health intents in Tagalog, English, and Taglish
 """
 
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
 import json
 import os
 from typing import Dict, List, Tuple
 import logging
 
+from backend.metrics import track_task
+
 logger = logging.getLogger(__name__)
 
 class BERTIntentDetector:
@@ -23,23 +23,22 @@ class BERTIntentDetector:
     def initialize_model(self):
         """Initialize BERT model for intent classification"""
         try:
+            # Imported here so that importing this module stays cheap
+            from backend.model_lifecycle import acquire_pretrained
+
             # Use a multilingual BERT model that works well with Tagalog and English
             model_name = "bert-base-multilingual-cased"
             
-            # Initialize tokenizer and model
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModelForSequenceClassification.from_pretrained(
+            # Shared tokenizer and encoder; only the classification head is ours
+            self.tokenizer, self.model = acquire_pretrained(
                 model_name,
+                'sequence_classification',
                 num_labels=len(self.intent_labels)
             )
             
-            # Create classification pipeline
-            self.classifier = pipeline(
-                "text-classification",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                return_all_scores=True
-            )
+            # Scores every label, like a text-classification pipeline with return_all_scores;
+            # works for both the PyTorch and the ONNX inference backends
+            self.classifier = self._classify
             
             logger.info("BERT model initialized successfully")
             
@@ -97,6 +96,20 @@ class BERTIntentDetector:
             logger.error(f"BERT intent detection failed: {e}")
             return self._fallback_detection(text)
     
+    @track_task('bert_intent')
+    def _classify(self, text: str) -> List[List[Dict[str, float]]]:
+        """Return softmax scores for every intent label, in label order"""
+        import torch
+
+        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
+        with torch.no_grad():
+            logits = self.model(**inputs).logits
+        probabilities = torch.softmax(logits, dim=-1)[0].tolist()
+        return [[
+            {'label': f'LABEL_{i}', 'score': score}
+            for i, score in enumerate(probabilities)
+        ]]
+    
     def _preprocess_text(self, text: str) -> str:
         """Preprocess text for BERT model"""
         # Convert to lowercase
@@ -196,9 +209,7 @@ class BERTIntentDetector:
             'sentiment': sentiment_result
         }
 
-# Global instance
-intent_detector = BERTIntentDetector()
-
 def get_intent_detector() -> BERTIntentDetector:
-    """Get the global intent detector instance"""
-    return intent_detector
+    """Get the shared intent detector instance, loading the model on first use"""
+    from backend.model_lifecycle import get_model
+    return get_model('intent_detector')
@@ -0,0 +1,41 @@
+"""
+Django management command to fill KeywordFlag.detected_date for flags stored before the column existed
+Usage: python manage.py backfill_keyword_flag_dates [--batch-size N]
+Run once after the migration that adds detected_date; until then those flags
+are missing from the counselor keyword trends, which filter on the column.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from chatbot.models import KeywordFlag
+
+
+class Command(BaseCommand):
+    help = 'Set detected_date from detected_at on keyword flags that have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Range of flag ids updated per statement (default: 10000)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        missing = KeywordFlag.objects.filter(detected_date__isnull=True)
+        bounds = missing.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write(self.style.SUCCESS('Every keyword flag already has a detected_date'))
+            return
+
+        # TruncDate converts to the current time zone, as timezone.localdate() does for new flags
+        detected_date = TruncDate('detected_at', tzinfo=timezone.get_current_timezone())
+        updated = 0
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            updated += missing.filter(id__gte=start, id__lt=start + batch_size).update(detected_date=detected_date)
+        
+        self.stdout.write(self.style.SUCCESS(f"Set detected_date on {updated} keyword flags"))
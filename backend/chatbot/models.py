@@ -58,10 +58,24 @@ class KeywordFlag(models.Model):
     keyword = models.CharField(max_length=100)
     category = models.CharField(max_length=50)  # stress, anxiety, depression, etc.
     session_id = models.CharField(max_length=100, null=True, blank=True)  # Anonymized session identifier
-    detected_at = models.DateTimeField(auto_now_add=True)
+    detected_at = models.DateTimeField(default=timezone.now)
+    # Denormalized local calendar date of detected_at so date-range analytics can use an index.
+    # Null only for flags stored before the column existed; `manage.py backfill_keyword_flag_dates` fills them
+    detected_date = models.DateField(null=True, blank=True)
     
     class Meta:
         ordering = ['-detected_at']
+        indexes = [
+            models.Index(fields=['detected_at']),
+            models.Index(fields=['detected_date']),
+            models.Index(fields=['keyword', 'detected_at']),
+            models.Index(fields=['session_id']),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if self.detected_date is None:
+            self.detected_date = timezone.localdate(self.detected_at)
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.keyword} ({self.category}) - Session {self.session_id[:8]}"
\ No newline at end of file
@@ -206,6 +206,36 @@ def get_contextual_response(flagged_keywords: List[Dict[str, any]]) -> str:
     import random
     return random.choice(highest_severity['responses'])
 
+def record_keyword_flags(flagged_keywords: List[Dict[str, any]], session_id: str) -> int:
+    """
+    Store anonymized keyword flags for every detected word in a single INSERT
+    
+    Args:
+        flagged_keywords (List[Dict]): Output of detect_keywords
+        session_id (str): Anonymized session identifier
+        
+    Returns:
+        int: Number of flags stored
+    """
+    from .models import KeywordFlag
+    
+    # bulk_create skips KeywordFlag.save(), so both timestamps are set here
+    detected_at = timezone.now()
+    flags = [
+        KeywordFlag(
+            keyword=word,
+            category=keyword_data['category'],
+            session_id=session_id,
+            detected_at=detected_at,
+            detected_date=timezone.localdate(detected_at)
+        )
+        for keyword_data in flagged_keywords or []
+        for word in keyword_data['detected_words']
+    ]
+    if flags:
+        KeywordFlag.objects.bulk_create(flags)
+    return len(flags)
+
 def calculate_risk_score(user) -> int:
     """
     Calculate mental health risk score for a user based on various factors
@@ -9,9 +9,9 @@ from datetime import timedelta
 import json
 import random
 
-from .models import AnonymizedConversationMetadata, KeywordFlag
+from .models import AnonymizedConversationMetadata
 from analytics.models import MentalHealthAlert
-from .utils import detect_keywords, get_contextual_response, calculate_risk_score, should_create_alert
+from .utils import detect_keywords, get_contextual_response, calculate_risk_score, should_create_alert, record_keyword_flags
 from website.models import User
 from mood_tracker.models import MoodEntry
 
@@ -88,14 +88,7 @@ def log_message(request):
         flagged_keywords = detect_keywords(content)
         
         # Create anonymized keyword flags for tracking (always track for analytics)
-        if flagged_keywords:
-            for keyword_data in flagged_keywords:
-                for word in keyword_data['detected_words']:
-                    KeywordFlag.objects.create(
-                        keyword=word,
-                        category=keyword_data['category'],
-                        session_id=conversation_metadata.session_id
-                    )
+        record_keyword_flags(flagged_keywords, conversation_metadata.session_id)
         
         # Check if BERT detected high-risk intent
         bert_high_risk = bert_result.get('primary_intent') == 'high_risk' and bert_result.get('confidence', 0) > 0.6
@@ -777,15 +770,8 @@ def handle_chat_with_me_conversation(request):
         # Process user message for keywords (for analytics only)
         flagged_keywords = detect_keywords(user_message)
         
-        if flagged_keywords:
-            # Create anonymized keyword flags for tracking
-            for keyword_data in flagged_keywords:
-                for word in keyword_data['detected_words']:
-                    KeywordFlag.objects.create(
-                        keyword=word,
-                        category=keyword_data['category'],
-                        session_id=conversation_metadata.session_id
-                    )
+        # Create anonymized keyword flags for tracking
+        record_keyword_flags(flagged_keywords, conversation_metadata.session_id)
     
     bot_response = ""
     next_step = None
@@ -0,0 +1,148 @@
+"""
+Gunicorn configuration for the production backend
+Usage: gunicorn -c gunicorn.conf.py
+Workers are sized from available CPUs and memory; every value can be overridden
+through the environment or .env (GUNICORN_WORKERS, GUNICORN_THREADS, ...).
+SERVER_MODE=asgi serves backend.asgi with Uvicorn workers, so async views wait
+without holding a thread; the default, wsgi, serves backend.wsgi with threads.
+Under ASGI every sync view of a worker runs in that worker's single sync thread,
+one at a time, and GUNICORN_THREADS does not apply: size GUNICORN_WORKERS for the
+expected number of concurrent sync requests. Persistent database connections are
+off in this mode (see settings.py); set DB_POOL=True to reuse connections.
+"""
+
+import gc
+import os
+import sys
+import tempfile
+
+# Aliased: module-level names here are read as Gunicorn settings, and 'config' is one
+from decouple import config as env
+
+# Gunicorn executes this file before the application is on sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend import model_lifecycle  # noqa: E402
+from backend.server_profile import (  # noqa: E402
+    MB, available_cpus, available_memory_bytes, compute_torch_threads, compute_workers,
+)
+
+cpus = available_cpus()
+memory_bytes = available_memory_bytes()
+
+SERVER_MODES = {
+    'wsgi': ('backend.wsgi:application', 'gthread'),
+    'asgi': ('backend.asgi:application', 'uvicorn_worker.UvicornWorker'),
+}
+server_mode = env('SERVER_MODE', default='wsgi').lower()
+if server_mode not in SERVER_MODES:
+    raise ValueError(f"Unknown SERVER_MODE: {server_mode}")
+if server_mode == 'asgi' and not env('DB_POOL', default=False, cast=bool):
+    sys.stderr.write(
+        "SERVER_MODE=asgi without DB_POOL=True: every request opens a new database connection\n"
+    )
+
+bind = f"0.0.0.0:{env('PORT', default=8080, cast=int)}"
+wsgi_app = SERVER_MODES[server_mode][0]
+worker_class = env('GUNICORN_WORKER_CLASS', default=SERVER_MODES[server_mode][1])
+workers = env('GUNICORN_WORKERS', default=0, cast=int) or compute_workers(
+    cpus,
+    memory_bytes,
+    worker_memory_mb=env('GUNICORN_WORKER_MEMORY_MB', default=300, cast=int),
+    shared_memory_mb=env('GUNICORN_SHARED_MEMORY_MB', default=1200, cast=int),
+)
+threads = env('GUNICORN_THREADS', default=4, cast=int)
+torch_threads = env('TORCH_NUM_THREADS', default=0, cast=int) or compute_torch_threads(cpus, workers)
+
+# Load the application, and the models, once in the master; workers share the pages copy-on-write
+preload_app = env('GUNICORN_PRELOAD', default=True, cast=bool)
+if preload_app:
+    model_lifecycle.use_preload_warmup()
+
+# Recycle workers periodically so slow leaks cannot grow unbounded; jitter avoids restarting all at once
+max_requests = env('GUNICORN_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = env('GUNICORN_MAX_REQUESTS_JITTER', default=100, cast=int)
+
+timeout = env('GUNICORN_TIMEOUT', default=60, cast=int)
+graceful_timeout = env('GUNICORN_GRACEFUL_TIMEOUT', default=30, cast=int)
+keepalive = env('GUNICORN_KEEPALIVE', default=5, cast=int)
+if os.path.isdir('/dev/shm'):
+    # Worker heartbeats go to tmpfs instead of a possibly slow container filesystem
+    worker_tmp_dir = '/dev/shm'
+
+# Every worker writes its metric samples to this directory so /metrics reports all of
+# them (see backend/metrics.py). It must be set before the application is imported and
+# is emptied on start, as samples from a previous run would be counted again.
+metrics_dir = env('PROMETHEUS_MULTIPROC_DIR', default='') or os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'amieti-metrics'
+)
+os.makedirs(metrics_dir, exist_ok=True)
+for name in os.listdir(metrics_dir):
+    if name.endswith('.db'):
+        os.remove(os.path.join(metrics_dir, name))
+os.environ['PROMETHEUS_MULTIPROC_DIR'] = metrics_dir
+
+accesslog = '-'
+# %(D)s is the request time in microseconds, %(p)s the <pid> of the worker that served it
+access_log_format = '%(h)s "%(r)s" %(s)s %(b)s %(D)sus %(p)s'
+
+
+def close_database_connections():
+    from django.db import connections
+
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        if getattr(connection, 'close_pool', None):
+            connection.close_pool()
+
+
+def preload_icd11_reference(server):
+    # The detectors' ICD-11 lookup tables are small; load them even when MODEL_WARMUP is off
+    from analytics.icd11_snapshot import icd11_reference
+    try:
+        reference = icd11_reference()
+    except Exception as e:
+        server.log.warning("Could not preload ICD-11 reference data: %s", e)
+        return
+    server.log.info(
+        "Preloaded ICD-11 reference data: %s conditions, %s mappings",
+        len(reference.mental_health_conditions), len(reference.word_mappings),
+    )
+
+
+def when_ready(server):
+    server.log.info(
+        "Sizing: mode=%s cpus=%s memory=%sMB workers=%s threads=%s torch_threads=%s preload=%s",
+        server_mode, cpus, memory_bytes // MB if memory_bytes else 'unknown', workers, threads, torch_threads,
+        preload_app,
+    )
+    if preload_app:
+        states = model_lifecycle.preload_models()
+        if states:
+            server.log.info("Preloaded models: %s", states)
+        preload_icd11_reference(server)
+        # Loading models may have queried the database; a socket opened here would be
+        # shared by every forked worker
+        close_database_connections()
+        # Keep the preloaded objects out of later collections so workers do not touch their pages
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # Without preloading, torch (and MKL) are first imported in the worker and size
+    # their thread pools from the environment; model_lifecycle applies TORCH_NUM_THREADS
+    # when it loads the first checkpoint
+    for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'TORCH_NUM_THREADS'):
+        os.environ[name] = str(torch_threads)
+    if 'torch' in sys.modules:
+        # Imported in the master while preloading: resize the pool it already created
+        import torch
+        torch.set_num_threads(torch_threads)
+
+
+def worker_exit(server, worker):
+    rss = model_lifecycle.process_memory_bytes()
+    server.log.info(
+        "Worker %s exiting after %s requests, rss=%sMB",
+        worker.pid, worker.nr, rss // MB if rss else 'unknown',
+    )
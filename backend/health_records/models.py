@@ -62,6 +62,15 @@ class PermitRequest(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Notification feeds: newest page and since-cursor polling per recipient
+            models.Index(fields=['teacher', 'created_at']),
+            models.Index(fields=['teacher', 'updated_at']),
+            models.Index(fields=['student', 'created_at']),
+            models.Index(fields=['student', 'updated_at']),
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'updated_at']),
+        ]
     
     def __str__(self):
         return f"Permit Request - {self.student.full_name} - {self.date}"
@@ -0,0 +1,170 @@
+"""
+Permit request notification feeds for faculty, students and clinic staff
+
+Each feed is a single query: related users are joined with select_related and
+only the columns rendered in the notification are loaded.
+"""
+
+from django.utils import timezone
+
+from .models import PermitRequest
+
+# Columns rendered by every permit notification
+PERMIT_NOTIFICATION_FIELDS = (
+    'id', 'date', 'time', 'grade', 'section', 'reason', 'status',
+    'created_at', 'updated_at',
+    'faculty_decision', 'faculty_decision_at',
+    'outcome', 'outcome_date', 'outcome_time', 'parent_email',
+    'vital_signs_bp', 'vital_signs_temp', 'vital_signs_pr', 'vital_signs_spo2',
+    'nursing_intervention', 'diagnosis_code', 'diagnosis_name',
+    'student_viewed_at', 'faculty_viewed_at', 'clinic_viewed_at',
+    'student__full_name', 'student__guardian_email',
+    'teacher__full_name', 'provider__full_name',
+    'faculty_decision_by__full_name', 'clinic_assessment_by__full_name',
+)
+
+PERMIT_NOTIFICATION_RELATIONS = (
+    'student', 'teacher', 'provider', 'faculty_decision_by', 'clinic_assessment_by',
+)
+
+
+def permit_notification_queryset(role, user):
+    """
+    Build the feed queryset for a notification recipient
+
+    Args:
+        role: 'faculty', 'student' or 'clinic'
+        user: Requesting user
+
+    Returns:
+        QuerySet: Permit requests visible to the recipient
+    """
+    queryset = PermitRequest.objects.select_related(
+        *PERMIT_NOTIFICATION_RELATIONS
+    ).only(*PERMIT_NOTIFICATION_FIELDS)
+
+    if role == 'faculty':
+        return queryset.filter(teacher=user)
+    if role == 'student':
+        return queryset.filter(student=user)
+    if role == 'clinic':
+        return queryset.filter(status__in=['approved', 'completed'])
+    raise ValueError(f"Unknown notification role: {role}")
+
+
+def relative_time(timestamp, now=None):
+    """Format a timestamp as '5 minutes ago' style text"""
+    diff = (now or timezone.now()) - timestamp
+
+    if diff.days > 0:
+        return "1 day ago" if diff.days == 1 else f"{diff.days} days ago"
+    if diff.seconds >= 3600:  # 1 hour = 3600 seconds
+        hours = diff.seconds // 3600
+        return "1 hour ago" if hours == 1 else f"{hours} hours ago"
+    if diff.seconds >= 60:  # 1 minute = 60 seconds
+        minutes = diff.seconds // 60
+        return "1 minute ago" if minutes == 1 else f"{minutes} minutes ago"
+    return "Just now"
+
+
+def _full_name(user):
+    return user.full_name if user else None
+
+
+def _faculty_text(permit):
+    student_name = permit.student.full_name
+    if permit.status == 'approved':
+        return f"Permit to leave the classroom (Approved) - Student {student_name}"
+    if permit.status == 'denied':
+        return f"Permit to leave the classroom (Denied) - Student {student_name}"
+    if permit.status == 'completed':
+        if permit.outcome == 'back_to_class':
+            return f"Permit to leave the classroom - Student {student_name} (Completed: Back to Class)"
+        if permit.outcome == 'send_home':
+            return f"Permit to leave the classroom - Student {student_name} (Completed: Sent Home)"
+        return f"Permit to leave the classroom - Student {student_name} (Completed)"
+    return f"Permit to leave the classroom - Student {student_name}"
+
+
+def _student_text(permit):
+    if permit.status == 'pending':
+        return f"Permit to leave the classroom - Pending approval for Teacher {permit.teacher.full_name if permit.teacher else 'assigned teacher'}"
+    if permit.status == 'approved':
+        return f"Permit to leave the classroom - Approved by Teacher {permit.faculty_decision_by.full_name if permit.faculty_decision_by else 'teacher'}"
+    if permit.status == 'denied':
+        return f"Permit to leave the classroom - Denied by Teacher {permit.faculty_decision_by.full_name if permit.faculty_decision_by else 'teacher'}"
+    if permit.status == 'completed':
+        if permit.outcome == 'back_to_class':
+            return "Permit to leave the classroom - Completed: Back to class"
+        if permit.outcome == 'send_home':
+            return "Permit to leave the classroom - Completed: Sent home"
+        return "Permit to leave the classroom - Completed"
+    return f"Permit to leave the classroom - Status: {permit.status}"
+
+
+def _clinic_text(permit):
+    student_name = permit.student.full_name
+    if permit.status == 'approved':
+        teacher_name = permit.faculty_decision_by.full_name if permit.faculty_decision_by else 'Unknown Teacher'
+        return f"Permit to leave the classroom for Student {student_name} - Approved by Teacher {teacher_name}"
+    if permit.outcome == 'back_to_class':
+        return f"Permit to leave the classroom for Student {student_name} - Completed: Back to class"
+    if permit.outcome == 'send_home':
+        return f"Permit to leave the classroom for Student {student_name} - Completed: Sent home"
+    return f"Permit to leave the classroom for Student {student_name} - Completed"
+
+
+def serialize_permit_notification(permit, role, now=None):
+    """
+    Render a permit request as a notification dict for the given recipient role
+    """
+    permit_data = {
+        'date': permit.date,
+        'time': permit.time,
+        'student_name': permit.student.full_name,
+        'grade': permit.grade,
+        'section': permit.section,
+        'reason': permit.reason,
+        'status': permit.status,
+        'faculty_decision': permit.faculty_decision,
+        'faculty_decision_at': permit.faculty_decision_at,
+        'faculty_decision_by': _full_name(permit.faculty_decision_by),
+        'clinic_assessment_by': _full_name(permit.clinic_assessment_by),
+        'outcome': permit.outcome,
+        'outcome_date': permit.outcome_date,
+        'outcome_time': permit.outcome_time,
+        'parent_email': permit.parent_email,
+        'vital_signs_bp': permit.vital_signs_bp,
+        'vital_signs_temp': permit.vital_signs_temp,
+        'vital_signs_pr': permit.vital_signs_pr,
+        'vital_signs_spo2': permit.vital_signs_spo2,
+        'nursing_intervention': permit.nursing_intervention,
+    }
+
+    if role == 'faculty':
+        text = _faculty_text(permit)
+        is_read = permit.faculty_viewed_at is not None
+    elif role == 'student':
+        text = _student_text(permit)
+        is_read = permit.student_viewed_at is not None
+        permit_data['teacher_name'] = _full_name(permit.teacher)
+        permit_data['provider_name'] = _full_name(permit.provider)
+    else:
+        text = _clinic_text(permit)
+        is_read = permit.clinic_viewed_at is not None
+        permit_data['teacher_name'] = _full_name(permit.teacher)
+        permit_data['provider_name'] = _full_name(permit.provider)
+        # Fall back to the student's guardian email when the permit has none
+        permit_data['parent_email'] = permit.parent_email or permit.student.guardian_email
+        permit_data['diagnosis_code'] = permit.diagnosis_code
+        permit_data['diagnosis_name'] = permit.diagnosis_name
+
+    return {
+        'id': permit.id,
+        'text': text,
+        'timestamp': relative_time(permit.created_at, now),
+        'type': 'permit',
+        'isRead': is_read,
+        'status': permit.status,
+        'permit_data': permit_data,
+    }
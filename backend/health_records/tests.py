@@ -1,3 +1,78 @@
-from django.test import TestCase
+import asyncio
+import time
+from datetime import date, time as clock
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncRequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from backend import pagination
+from backend.pagination import POLL_CURSOR_HEADER
+from website.models import User
+from .models import PermitRequest
+from .views import get_faculty_notifications
+
+
+class AsyncNotificationFeedTest(TestCase):
+    """Notification feeds are async views that keep the @api_view contract"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(username='teacher1', password='testpass123', role='faculty')
+        cls.student = User.objects.create_user(username='student1', password='testpass123', role='student')
+        cls.permit = PermitRequest.objects.create(
+            student=cls.student, teacher=cls.teacher, date=date.today(), time=clock(9, 0),
+            grade='10', section='A', reason='Headache',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('get_faculty_notifications')
+
+    def test_feed_authenticates_and_checks_role(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        self.client.force_authenticate(self.teacher)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+        self.assertIn(POLL_CURSOR_HEADER, response)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    def poll(self, cursor, wait):
+        request = AsyncRequestFactory().get(self.url, {'since': cursor, 'wait': wait})
+        request._force_auth_user = self.teacher
+        return get_faculty_notifications(request)
+
+    def test_long_polls_share_one_thread(self):
+        self.client.force_authenticate(self.teacher)
+        cursor = self.client.get(self.url)[POLL_CURSOR_HEADER]
+
+        async def run():
+            async def update_permit():
+                await asyncio.sleep(0.3)
+                await sync_to_async(PermitRequest.objects.filter(pk=self.permit.pk).update)(
+                    status='approved', updated_at=timezone.now()
+                )
+
+            started = time.monotonic()
+            # Ten polls wait on the event loop thread until the permit changes
+            responses = await asyncio.gather(*[self.poll(cursor, 1) for _ in range(10)], update_permit())
+            return time.monotonic() - started, responses[:10]
+
+        with mock.patch.object(pagination, 'POLL_INTERVAL', 0.1):
+            elapsed, responses = async_to_sync(run)()
+
+        # Sequential polls would take about ten seconds
+        self.assertLess(elapsed, 5)
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+        response = responses[0]
+        response.render()
+        self.assertIn(b'approved', response.content)
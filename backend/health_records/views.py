@@ -4,13 +4,19 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.utils import timezone
-from django.core.mail import send_mail
+from website.outbox import queue_email
 from django.conf import settings
 from .models import PermitRequest, RecentActivity
+from .notifications import permit_notification_queryset, serialize_permit_notification
 from .serializers import PermitRequestSerializer, CreatePermitRequestSerializer, UpdatePermitRequestSerializer, ClinicAssessmentSerializer, RecentActivitySerializer
 from website.models import User
 from django.db import models
 from django.db.models import Count
+from backend.async_views import async_api_view
+from backend.pagination import InvalidCursor, apaginate_feed
+
+# Users nested in PermitRequestSerializer, fetched with the permit requests
+PERMIT_REQUEST_USERS = ('student', 'teacher', 'provider', 'faculty_decision_by', 'clinic_assessment_by')
 
 def create_activity_record(user, activity_type, title, description, related_appointment=None, related_permit=None):
     """Helper function to create activity records"""
@@ -65,6 +71,7 @@ def get_permit_requests(request):
     else:
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     
+    permit_requests = permit_requests.select_related(*PERMIT_REQUEST_USERS)
     serializer = PermitRequestSerializer(permit_requests, many=True)
     return Response(serializer.data)
 
@@ -239,9 +246,10 @@ def update_clinic_assessment(request, pk):
                     else:
                         vital_signs_text = "Not recorded"
                     
-                    send_mail(
+                    # Delivered by the send_outbox worker; the request only queues it
+                    queue_email(
                         subject='Student Sent Home - Notification',
-                        message=f'''
+                        body=f'''
 Dear Parent/Guardian,
 
 Your child {permit_request.student.full_name} has been assessed by the school nurse and requires to be sent home for medical attention.
@@ -261,14 +269,14 @@ Please arrange to pick up your child from school.
 Thank you,
 IETI School Health Office
                         ''',
+                        recipients=[parent_email],
                         from_email=settings.EMAIL_HOST_USER,
-                        recipient_list=[parent_email],
-                        fail_silently=False,
+                        category='parent_notification',
                     )
                     # Set status to completed immediately after successful assessment
                     permit_request.status = 'completed'
                 except Exception as e:
-                    return Response({'error': f'Failed to send email: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                    return Response({'error': f'Failed to queue email: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
             permit_request.save()
             serializer.save()
@@ -378,97 +386,25 @@ def get_recent_activities(request):
     
     return Response(activities_data)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_faculty_notifications(request):
+async def _permit_notification_feed(request, role):
+    """Serve one keyset-paginated page of permit notifications for a recipient role"""
+    queryset = permit_notification_queryset(role, request.user)
+    try:
+        permits, headers = await apaginate_feed(queryset, request)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    now = timezone.now()
+    notifications = [serialize_permit_notification(permit, role, now) for permit in permits]
+    return Response(notifications, headers=headers)
+
+@async_api_view(['GET'])
+async def get_faculty_notifications(request):
     """Get notifications for faculty (permit requests assigned to them)"""
     if request.user.role != 'faculty':
         return Response({'error': 'Only faculty can access notifications'}, status=status.HTTP_403_FORBIDDEN)
     
-    # Get permit requests assigned to this faculty member
-    permit_requests = PermitRequest.objects.filter(
-        teacher=request.user
-    ).order_by('-created_at')
-    
-    notifications = []
-    for permit in permit_requests:
-        # Calculate relative time
-        now = timezone.now()
-        diff = now - permit.created_at
-        
-        if diff.days > 0:
-            if diff.days == 1:
-                relative_time = "1 day ago"
-            else:
-                relative_time = f"{diff.days} days ago"
-        elif diff.seconds >= 3600:  # 1 hour = 3600 seconds
-            hours = diff.seconds // 3600
-            if hours == 1:
-                relative_time = "1 hour ago"
-            else:
-                relative_time = f"{hours} hours ago"
-        elif diff.seconds >= 60:  # 1 minute = 60 seconds
-            minutes = diff.seconds // 60
-            if minutes == 1:
-                relative_time = "1 minute ago"
-            else:
-                relative_time = f"{minutes} minutes ago"
-        else:
-            relative_time = "Just now"
-        
-        # Create notification text based on status
-        if permit.status == 'pending':
-            notification_text = f"Permit to leave the classroom - Student {permit.student.full_name}"
-        elif permit.status == 'approved':
-            notification_text = f"Permit to leave the classroom (Approved) - Student {permit.student.full_name}"
-        elif permit.status == 'denied':
-            notification_text = f"Permit to leave the classroom (Denied) - Student {permit.student.full_name}"
-        elif permit.status == 'completed':
-            if permit.outcome == 'back_to_class':
-                notification_text = f"Permit to leave the classroom - Student {permit.student.full_name} (Completed: Back to Class)"
-            elif permit.outcome == 'send_home':
-                notification_text = f"Permit to leave the classroom - Student {permit.student.full_name} (Completed: Sent Home)"
-            else:
-                notification_text = f"Permit to leave the classroom - Student {permit.student.full_name} (Completed)"
-        else:
-            notification_text = f"Permit to leave the classroom - Student {permit.student.full_name}"
-        
-        notifications.append({
-            'id': permit.id,
-            'text': notification_text,
-            'timestamp': relative_time,
-            'type': 'permit',
-            'isRead': permit.faculty_viewed_at is not None,  # Mark as read if faculty has viewed it
-            'status': permit.status,
-            'permit_data': {
-                'date': permit.date,
-                'time': permit.time,
-                'student_name': permit.student.full_name,
-                'grade': permit.grade,
-                'section': permit.section,
-                'reason': permit.reason,
-                'status': permit.status,  # Add status field
-                'faculty_decision': permit.faculty_decision,
-                'faculty_decision_at': permit.faculty_decision_at,
-                'faculty_decision_by': permit.faculty_decision_by.full_name if permit.faculty_decision_by else None,
-                'clinic_assessment_by': permit.clinic_assessment_by.full_name if permit.clinic_assessment_by else None,  # Add clinic_assessment_by field
-                'outcome': permit.outcome,
-                'outcome_date': permit.outcome_date,
-                'outcome_time': permit.outcome_time,
-                'parent_email': permit.parent_email,  # Add parent_email field
-                'vital_signs_bp': permit.vital_signs_bp,
-                'vital_signs_temp': permit.vital_signs_temp,
-                'vital_signs_pr': permit.vital_signs_pr,
-                'vital_signs_spo2': permit.vital_signs_spo2,
-                'nursing_intervention': permit.nursing_intervention
-            }
-        })
-        
-        # Debug: Print permit status for completed requests (only for debugging specific issues)
-        # if permit.status == 'completed':
-        #     print(f"Faculty notification - Completed permit {permit.id}: status={permit.status}, outcome={permit.outcome}, clinic_assessment_by={permit.clinic_assessment_by}")
-    
-    return Response(notifications)
+    return await _permit_notification_feed(request, 'faculty')
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -498,10 +434,9 @@ def mark_faculty_notifications_read(request):
                 faculty_viewed_at__isnull=True
             )
             
-            # Set faculty_viewed_at for all unread notifications
-            for permit in permit_requests:
-                permit.faculty_viewed_at = timezone.now()
-                permit.save()
+            # Set faculty_viewed_at for all unread notifications in one UPDATE
+            now = timezone.now()
+            permit_requests.update(faculty_viewed_at=now, updated_at=now)
             
             return Response({'message': 'Notifications marked as read'})
     except PermitRequest.DoesNotExist:
@@ -509,99 +444,13 @@ def mark_faculty_notifications_read(request):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_student_notifications(request):
+@async_api_view(['GET'])
+async def get_student_notifications(request):
     """Get notifications for students (their own permit requests)"""
     if request.user.role != 'student':
         return Response({'error': 'Only students can access notifications'}, status=status.HTTP_403_FORBIDDEN)
     
-    # Get permit requests created by this student
-    permit_requests = PermitRequest.objects.filter(
-        student=request.user
-    ).order_by('-created_at')
-    
-    notifications = []
-    for permit in permit_requests:
-        # Calculate relative time
-        now = timezone.now()
-        diff = now - permit.created_at
-        
-        if diff.days > 0:
-            if diff.days == 1:
-                relative_time = "1 day ago"
-            else:
-                relative_time = f"{diff.days} days ago"
-        elif diff.seconds >= 3600:  # 1 hour = 3600 seconds
-            hours = diff.seconds // 3600
-            if hours == 1:
-                relative_time = "1 hour ago"
-            else:
-                relative_time = f"{hours} hours ago"
-        elif diff.seconds >= 60:  # 1 minute = 60 seconds
-            minutes = diff.seconds // 60
-            if minutes == 1:
-                relative_time = "1 minute ago"
-            else:
-                relative_time = f"{minutes} minutes ago"
-        else:
-            relative_time = "Just now"
-        
-        # Create notification text based on status
-        if permit.status == 'pending':
-            notification_text = f"Permit to leave the classroom - Pending approval for Teacher {permit.teacher.full_name if permit.teacher else 'assigned teacher'}"
-        elif permit.status == 'approved':
-            notification_text = f"Permit to leave the classroom - Approved by Teacher {permit.faculty_decision_by.full_name if permit.faculty_decision_by else 'teacher'}"
-        elif permit.status == 'denied':
-            notification_text = f"Permit to leave the classroom - Denied by Teacher {permit.faculty_decision_by.full_name if permit.faculty_decision_by else 'teacher'}"
-        elif permit.status == 'completed':
-            if permit.outcome == 'back_to_class':
-                notification_text = f"Permit to leave the classroom - Completed: Back to class"
-            elif permit.outcome == 'send_home':
-                notification_text = f"Permit to leave the classroom - Completed: Sent home"
-            else:
-                notification_text = f"Permit to leave the classroom - Completed"
-        else:
-            notification_text = f"Permit to leave the classroom - Status: {permit.status}"
-        
-        # Debug: Print permit status for completed requests (only for debugging specific issues)
-        # if permit.status == 'completed':
-        #     print(f"Completed permit {permit.id}: status={permit.status}, outcome={permit.outcome}, clinic_assessment_by={permit.clinic_assessment_by}")
-        
-        notifications.append({
-            'id': permit.id,
-            'text': notification_text,
-            'timestamp': relative_time,
-            'type': 'permit',
-            'isRead': permit.student_viewed_at is not None,  # Mark as read if student has viewed it
-            'status': permit.status,
-            'permit_data': {
-                'date': permit.date,
-                'time': permit.time,
-                'student_name': permit.student.full_name,
-                'grade': permit.grade,
-                'section': permit.section,
-                'reason': permit.reason,
-                'status': permit.status,  # Add status field
-                'faculty_decision': permit.faculty_decision,
-                'faculty_decision_at': permit.faculty_decision_at,
-                'faculty_decision_by': permit.faculty_decision_by.full_name if permit.faculty_decision_by else None,
-                'teacher_name': permit.teacher.full_name if permit.teacher else None,
-                'provider_name': permit.provider.full_name if permit.provider else None,
-                'outcome': permit.outcome,
-                'outcome_date': permit.outcome_date,
-                'outcome_time': permit.outcome_time,
-                'parent_email': permit.parent_email,  # Add parent_email field
-                'clinic_assessment_by': permit.clinic_assessment_by.full_name if permit.clinic_assessment_by else None,  # Add clinic_assessment_by field
-                'vital_signs_bp': permit.vital_signs_bp,
-                'vital_signs_temp': permit.vital_signs_temp,
-                'vital_signs_pr': permit.vital_signs_pr,
-                'vital_signs_spo2': permit.vital_signs_spo2,
-                'nursing_intervention': permit.nursing_intervention
-            }
-        })
-    
-    return Response(notifications)
+    return await _permit_notification_feed(request, 'student')
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -631,10 +480,9 @@ def mark_student_notifications_read(request):
                 student_viewed_at__isnull=True
             )
             
-            # Set student_viewed_at for all unread notifications
-        for permit in permit_requests:
-                permit.student_viewed_at = timezone.now()
-                permit.save()
+            # Set student_viewed_at for all unread notifications in one UPDATE
+            now = timezone.now()
+            permit_requests.update(student_viewed_at=now, updated_at=now)
         
         return Response({'message': 'Notifications marked as read'})
     except PermitRequest.DoesNotExist:
@@ -642,100 +490,13 @@ def mark_student_notifications_read(request):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_clinic_notifications(request):
+@async_api_view(['GET'])
+async def get_clinic_notifications(request):
     """Get notifications for clinic staff (approved and completed permit requests)"""
     if request.user.role != 'clinic':
         return Response({'error': 'Only clinic staff can access notifications'}, status=status.HTTP_403_FORBIDDEN)
     
-    # Get approved and completed permit requests that clinic staff should see
-    permit_requests = PermitRequest.objects.filter(status__in=['approved', 'completed']).order_by('-created_at')
-    
-    # Debug: Print the count of approved and completed permit requests found (only for debugging specific issues)
-    # print(f"Found {permit_requests.count()} approved and completed permit requests for clinic notifications")
-    
-    notifications = []
-    for permit in permit_requests:
-        # Calculate relative time
-        now = timezone.now()
-        diff = now - permit.created_at
-        
-        if diff.days > 0:
-            if diff.days == 1:
-                relative_time = "1 day ago"
-            else:
-                relative_time = f"{diff.days} days ago"
-        elif diff.seconds >= 3600:  # 1 hour = 3600 seconds
-            hours = diff.seconds // 3600
-            if hours == 1:
-                relative_time = "1 hour ago"
-            else:
-                relative_time = f"{hours} hours ago"
-        elif diff.seconds >= 60:  # 1 minute = 60 seconds
-            minutes = diff.seconds // 60
-            if minutes == 1:
-                relative_time = "1 minute ago"
-            else:
-                relative_time = f"{minutes} minutes ago"
-        else:
-            relative_time = "Just now"
-        
-        # Create notification text based on status
-        if permit.status == 'approved':
-            teacher_name = permit.faculty_decision_by.full_name if permit.faculty_decision_by else 'Unknown Teacher'
-            notification_text = f"Permit to leave the classroom for Student {permit.student.full_name} - Approved by Teacher {teacher_name}"
-        elif permit.status == 'completed':
-            if permit.outcome == 'back_to_class':
-                notification_text = f"Permit to leave the classroom for Student {permit.student.full_name} - Completed: Back to class"
-            elif permit.outcome == 'send_home':
-                notification_text = f"Permit to leave the classroom for Student {permit.student.full_name} - Completed: Sent home"
-            else:
-                notification_text = f"Permit to leave the classroom for Student {permit.student.full_name} - Completed"
-        
-        notifications.append({
-            'id': permit.id,
-            'text': notification_text,
-            'timestamp': relative_time,
-            'type': 'permit',
-            'isRead': permit.clinic_viewed_at is not None,  # Mark as read if clinic has viewed it
-            'status': permit.status,
-            'permit_data': {
-                'date': permit.date,
-                'time': permit.time,
-                'student_name': permit.student.full_name,
-                'grade': permit.grade,
-                'section': permit.section,
-                'reason': permit.reason,
-                'status': permit.status,  # Add status to permit_data
-                'faculty_decision': permit.faculty_decision,
-                'faculty_decision_at': permit.faculty_decision_at,
-                'faculty_decision_by': permit.faculty_decision_by.full_name if permit.faculty_decision_by else None,
-                'teacher_name': permit.teacher.full_name if permit.teacher else None,
-                'provider_name': permit.provider.full_name if permit.provider else None,
-                'clinic_assessment_by': permit.clinic_assessment_by.full_name if permit.clinic_assessment_by else None,
-                'outcome': permit.outcome,
-                'outcome_date': permit.outcome_date,
-                'outcome_time': permit.outcome_time,
-                'parent_email': permit.parent_email or (permit.student.guardian_email if permit.student else None),  # Add parent_email field with fallback to student's guardian email
-                'vital_signs_bp': permit.vital_signs_bp,
-                'vital_signs_temp': permit.vital_signs_temp,
-                'vital_signs_pr': permit.vital_signs_pr,
-                'vital_signs_spo2': permit.vital_signs_spo2,
-                'nursing_intervention': permit.nursing_intervention,
-                'diagnosis_code': permit.diagnosis_code,
-                'diagnosis_name': permit.diagnosis_name
-            }
-        })
-        
-        # Debug: Print parent email information (only for debugging specific issues)
-        # parent_email = permit.parent_email or (permit.student.guardian_email if permit.student else None)
-        # print(f"Permit {permit.id}: parent_email={permit.parent_email}, student_guardian_email={permit.student.guardian_email if permit.student else None}, final_parent_email={parent_email}")
-    
-    # Debug: Print the final notifications count (only for debugging specific issues)
-    # print(f"Returning {len(notifications)} notifications")
-    
-    return Response(notifications)
+    return await _permit_notification_feed(request, 'clinic')
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -763,10 +524,9 @@ def mark_clinic_notifications_read(request):
                 clinic_viewed_at__isnull=True
             )
             
-            # Set clinic_viewed_at for all unread notifications
-            for permit in permit_requests:
-                permit.clinic_viewed_at = timezone.now()
-                permit.save()
+            # Set clinic_viewed_at for all unread notifications in one UPDATE
+            now = timezone.now()
+            permit_requests.update(clinic_viewed_at=now, updated_at=now)
             
             return Response({'message': 'Notifications marked as read'})
     except PermitRequest.DoesNotExist:
@@ -1,5 +1,3 @@
-import pytesseract
-from PIL import Image
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -7,13 +5,11 @@ from rest_framework import status, viewsets, serializers
 from .models import MedicalExam
 from .serializers import MedicalExamSerializer
 from .extraction import extract_fields
-from .utils.ocr_utils import extract_text_from_image, parse_student_form, parse_ieti_medical_form
-from .utils.enhanced_ocr import extract_medical_data_from_image, MedicalFormParser
-from .utils.simple_ocr import extract_medical_data_from_image_simple
 from website.models import User
 from datetime import datetime
 import os
 from django.core.files.storage import default_storage
+from backend.metrics import track_task
 
 # Helper to normalize date formats
 def normalize_date(date_str):
@@ -44,8 +40,13 @@ def process_medical_exam(request):
         except User.DoesNotExist:
             return Response({"error": "Student not found"}, status=status.HTTP_404_NOT_FOUND)
 
+        # OCR libraries pull in pandas and OpenCV; import them only when a form is processed
+        import pytesseract
+        from PIL import Image
+
         img = Image.open(image)
-        raw_text = pytesseract.image_to_string(img)
+        with track_task('ocr'):
+            raw_text = pytesseract.image_to_string(img)
 
         # Extract fields 
         data = extract_fields(raw_text)
@@ -141,6 +142,9 @@ def ocr_process_medical_exam(request):
         logger.info(f"Full file path: {full_file_path}")
         logger.info(f"File exists: {os.path.exists(full_file_path)}")
 
+        from .utils.enhanced_ocr import extract_medical_data_from_image
+        from .utils.simple_ocr import extract_medical_data_from_image_simple
+
         try:
             # Try enhanced OCR first
             structured_data = extract_medical_data_from_image(full_file_path)
@@ -200,6 +204,9 @@ def debug_ocr_extraction(request):
         logger.info(f"Debug - Full file path: {full_file_path}")
         logger.info(f"Debug - File exists: {os.path.exists(full_file_path)}")
 
+        from .utils.enhanced_ocr import extract_medical_data_from_image
+        from .utils.simple_ocr import extract_medical_data_from_image_simple
+
         try:
             # Try enhanced OCR first
             structured_data = extract_medical_data_from_image(full_file_path)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User
+from .models import User, OutboundEmail
 from django import forms
 
 class CustomUserAdminForm(forms.ModelForm):
@@ -129,7 +129,7 @@ class CustomUserAdmin(UserAdmin):
     def save_model(self, request, obj, form, change):
         """Override to ensure ID is generated if missing"""
         if not change:  # Only for new users
-            from .views import generate_student_id, generate_faculty_id, generate_counselor_id, generate_admin_id, generate_clinic_id
+            from .identifiers import generate_student_id, generate_faculty_id, generate_counselor_id, generate_admin_id, generate_clinic_id
             
             if obj.role == 'student' and not obj.student_id:
                 obj.student_id = generate_student_id()
@@ -162,3 +162,21 @@ class CustomUserAdmin(UserAdmin):
         return kwargs
 
 admin.site.register(User, CustomUserAdmin)
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'category', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status', 'category', 'created_at')
+    search_fields = ('subject', 'recipients', 'last_error')
+    readonly_fields = ('created_at', 'sent_at', 'attempts', 'last_error')
+    ordering = ('-created_at',)
+    actions = ['requeue_emails']
+
+    def requeue_emails(self, request, queryset):
+        """Send dead-lettered emails again"""
+        from .outbox import requeue_dead_emails
+        requeued = requeue_dead_emails(queryset)
+        self.message_user(request, f"Requeued {requeued} dead-lettered emails")
+    requeue_emails.short_description = 'Requeue selected dead-lettered emails'
+
@@ -0,0 +1,100 @@
+"""
+Bulk account creation
+
+Password hashing (PBKDF2 with the configured iteration count) dominates the
+cost of creating accounts, so bulk imports hash every password across a
+process pool and then insert all users with a single bulk_create.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from .models import User
+
+# Below this many passwords the pool start-up costs more than it saves
+PARALLEL_HASH_THRESHOLD = 16
+
+
+def _init_hash_worker(settings_module):
+    """Configure Django in pool workers started with the spawn method"""
+    if not settings.configured:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+        import django
+        django.setup()
+
+
+def _hash_password(password):
+    return make_password(password)
+
+
+def hash_worker_count():
+    """Pool size for bulk hashing: BULK_HASH_WORKERS, or one process per CPU core"""
+    return settings.BULK_HASH_WORKERS or os.cpu_count() or 1
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hash raw passwords with the default hasher, in parallel when worthwhile
+
+    Args:
+        passwords: List of raw passwords
+        workers: Pool size (defaults to hash_worker_count())
+
+    Returns:
+        list: Encoded password hashes, in the same order as passwords
+    """
+    passwords = list(passwords)
+    workers = min(workers or hash_worker_count(), len(passwords))
+    if workers <= 1 or len(passwords) < PARALLEL_HASH_THRESHOLD:
+        return [make_password(password) for password in passwords]
+
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_hash_worker,
+        initargs=(settings.SETTINGS_MODULE,)
+    ) as executor:
+        return list(executor.map(_hash_password, passwords, chunksize=chunksize))
+
+
+def create_users(accounts, workers=None):
+    """
+    Create many users with hashed passwords in one INSERT
+
+    Args:
+        accounts: List of dicts of User field values, each with a raw 'password'
+        workers: Hashing pool size (defaults to hash_worker_count())
+
+    Returns:
+        Tuple[list, list]: (created User instances, [(index, error message)] for
+            accounts that could not be inserted)
+    """
+    hashes = hash_passwords([account['password'] for account in accounts], workers)
+
+    users = []
+    for account, password_hash in zip(accounts, hashes):
+        fields = {key: value for key, value in account.items() if key != 'password'}
+        fields['username'] = User.normalize_username(fields['username'])
+        fields['email'] = User.objects.normalize_email(fields.get('email', ''))
+        users.append(User(password=password_hash, **fields))
+
+    try:
+        with transaction.atomic():
+            return User.objects.bulk_create(users), []
+    except IntegrityError:
+        pass
+
+    # A row conflicts (e.g. a username taken concurrently): insert one by one to report it
+    created, errors = [], []
+    for index, user in enumerate(users):
+        try:
+            with transaction.atomic():
+                user.save()
+            created.append(user)
+        except IntegrityError as e:
+            errors.append((index, str(e)))
+    return created, errors
@@ -0,0 +1,175 @@
+"""
+Role ID and username allocation for new users
+
+Role IDs (SID-2025-00001, FID-2025-00001, ...) come from a per-prefix, per-year
+IdSequence row. A caller locks the row and reserves a whole block of numbers
+in one UPDATE, so creating one user or a thousand costs the same two queries
+and concurrent creations can never receive the same ID.
+"""
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import IdSequence, User
+
+# ID prefix and the User field holding the ID, per role
+ROLE_ID_PREFIXES = {
+    'student': 'SID',
+    'faculty': 'FID',
+    'counselor': 'CID',
+    'admin': 'AID',
+    'clinic': 'NID',
+}
+
+ROLE_ID_FIELDS = {
+    'student': 'student_id',
+    'faculty': 'faculty_id',
+    'counselor': 'faculty_id',
+    'admin': 'faculty_id',
+    'clinic': 'faculty_id',
+}
+
+# Username prefixes per role
+USERNAME_PREFIXES = {
+    'student': 'student',
+    'faculty': 'faculty',
+    'admin': 'admin',
+    'clinic': 'nurse',
+    'counselor': 'counselor',
+}
+
+
+def _highest_existing_number(role, prefix, year):
+    """
+    Highest ID number already used by the role this year
+
+    Only runs when a year's sequence row is first created. Legacy plain
+    numeric IDs (0001) are counted too, as the old generators did.
+    """
+    field = ROLE_ID_FIELDS[role]
+    ids = User.objects.filter(role=role).filter(
+        Q(**{f'{field}__startswith': f'{prefix}-{year}-'}) | Q(**{f'{field}__regex': r'^[0-9]+$'})
+    ).values_list(field, flat=True)
+
+    highest = 0
+    for value in ids:
+        try:
+            highest = max(highest, int(value.split('-')[-1]))
+        except ValueError:
+            continue
+    return highest
+
+
+def allocate_ids(role, count=1, year=None):
+    """
+    Reserve a block of consecutive role IDs
+
+    Args:
+        role: User role ('student', 'faculty', 'counselor', 'admin' or 'clinic')
+        count: Number of IDs to reserve
+        year: ID year (defaults to the current year)
+
+    Returns:
+        list: count formatted IDs, e.g. ['SID-2025-00001', 'SID-2025-00002']
+    """
+    prefix = ROLE_ID_PREFIXES[role]
+    year = year or timezone.localdate().year
+    if count < 1:
+        return []
+
+    with transaction.atomic():
+        sequence = IdSequence.objects.select_for_update().filter(prefix=prefix, year=year).first()
+        if sequence is None:
+            # First ID of the year: start after anything already in the users table
+            IdSequence.objects.get_or_create(
+                prefix=prefix, year=year,
+                defaults={'last_value': _highest_existing_number(role, prefix, year)}
+            )
+            sequence = IdSequence.objects.select_for_update().get(prefix=prefix, year=year)
+
+        first = sequence.last_value + 1
+        sequence.last_value += count
+        sequence.save(update_fields=['last_value'])
+
+    return [f'{prefix}-{year}-{number:05d}' for number in range(first, first + count)]
+
+
+def generate_student_id():
+    """Generate automatic Student ID with format SID-2024-00001"""
+    return allocate_ids('student')[0]
+
+
+def generate_faculty_id():
+    """Generate automatic Faculty ID with format FID-2024-00001"""
+    return allocate_ids('faculty')[0]
+
+
+def generate_counselor_id():
+    """Generate automatic Counselor ID with format CID-2024-00001"""
+    return allocate_ids('counselor')[0]
+
+
+def generate_admin_id():
+    """Generate automatic Admin ID with format AID-2024-00001"""
+    return allocate_ids('admin')[0]
+
+
+def generate_clinic_id():
+    """Generate automatic Clinic/Nurse ID with format NID-2024-00001"""
+    return allocate_ids('clinic')[0]
+
+
+def _username_stem(full_name, role):
+    # Clean the full name - remove spaces and special characters
+    cleaned_name = full_name.strip().lower().replace(' ', '').replace('-', '').replace('.', '').replace(',', '')
+    role_prefix = USERNAME_PREFIXES.get(role, 'user') if role else 'user'
+    return f"{role_prefix}.{cleaned_name}"
+
+
+def generate_usernames(people):
+    """
+    Generate unique usernames for several users with one query
+
+    Format: {role_prefix}.{fullname_cleaned}@amieti.com, with a counter
+    appended when the name is taken (student.juandelacruz1@amieti.com).
+
+    Args:
+        people: Iterable of (full_name, role) tuples
+
+    Returns:
+        list: One username per entry, unique among themselves and existing users
+    """
+    people = list(people)
+    stems = [_username_stem(full_name, role) if full_name else None for full_name, role in people]
+
+    # Every existing username sharing a stem, fetched in one query per 200 stems
+    distinct_stems = sorted({stem for stem in stems if stem})
+    taken = set()
+    for start in range(0, len(distinct_stems), 200):
+        condition = Q()
+        for stem in distinct_stems[start:start + 200]:
+            condition |= Q(username__startswith=stem, username__endswith='@amieti.com')
+        taken.update(User.objects.filter(condition).values_list('username', flat=True))
+
+    usernames = []
+    for stem in stems:
+        if stem is None:
+            usernames.append("user@amieti.com")
+            continue
+        username = f"{stem}@amieti.com"
+        counter = 1
+        while username in taken:
+            username = f"{stem}{counter}@amieti.com"
+            counter += 1
+        taken.add(username)
+        usernames.append(username)
+    return usernames
+
+
+def generate_username(full_name, role=None):
+    """
+    Generate username based on role and full name
+    Format: {role_prefix}.{fullname_cleaned}@amieti.com
+    """
+    return generate_usernames([(full_name, role)])[0]
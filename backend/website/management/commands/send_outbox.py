@@ -0,0 +1,70 @@
+"""
+Django management command to deliver queued emails from the outbox
+Usage: python manage.py send_outbox [--loop]
+Run from cron every minute, or as a long-running worker with --loop
+
+To test against a local debugging SMTP server:
+    python -m aiosmtpd -n -l localhost:1025
+    EMAIL_HOST=localhost EMAIL_PORT=1025 EMAIL_USE_TLS=False python manage.py send_outbox
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from website.outbox import deliver_outbox, requeue_dead_emails
+
+
+class Command(BaseCommand):
+    help = 'Send pending outbox emails with retry, backoff and dead-lettering'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help='Number of emails sent per SMTP connection'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the outbox instead of exiting once it is drained'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to sleep between polls when --loop is set (default: 5)'
+        )
+        parser.add_argument(
+            '--requeue-dead',
+            action='store_true',
+            help='Move dead-lettered emails back to pending before sending'
+        )
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            requeued = requeue_dead_emails()
+            self.stdout.write(self.style.WARNING(f"Requeued {requeued} dead-lettered emails"))
+        
+        while True:
+            totals = self.drain(options['batch_size'])
+            if any(totals.values()):
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Sent {totals['sent']} emails, {totals['retrying']} to retry, {totals['dead']} dead-lettered"
+                    )
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        """Send batches until no due email is left"""
+        totals = {'sent': 0, 'retrying': 0, 'dead': 0}
+        while True:
+            counts = deliver_outbox(batch_size=batch_size)
+            for key, value in counts.items():
+                totals[key] += value
+            if sum(counts.values()) < batch_size:
+                return totals
@@ -0,0 +1,197 @@
+"""
+Durable email outbox
+
+Request paths and commands only insert OutboundEmail rows, in the same
+transaction as the change that caused them. The send_outbox worker leases due
+rows with SELECT ... FOR UPDATE SKIP LOCKED in a short transaction, sends each
+batch over one SMTP connection outside of any transaction and retries failures
+with exponential backoff until EMAIL_OUTBOX_MAX_ATTEMPTS, after which the row
+is dead-lettered.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, body, recipients, html_body='', from_email=None, category=''):
+    """
+    Queue one email for the outbox worker
+
+    Args:
+        subject: Subject line
+        body: Plain text body
+        recipients: List of recipient addresses
+        html_body: Optional HTML alternative
+        from_email: Sender (defaults to DEFAULT_FROM_EMAIL)
+        category: Short label used for filtering in the admin
+
+    Returns:
+        OutboundEmail: The queued row
+    """
+    return OutboundEmail.objects.create(
+        category=category,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+    )
+
+
+def queue_messages(messages, category=''):
+    """
+    Queue already built EmailMessage/EmailMultiAlternatives objects with one INSERT
+
+    Returns:
+        list: The queued OutboundEmail rows
+    """
+    rows = []
+    for message in messages:
+        html_body = next(
+            (content for content, mimetype in getattr(message, 'alternatives', []) if mimetype == 'text/html'),
+            ''
+        )
+        rows.append(OutboundEmail(
+            category=category,
+            subject=message.subject,
+            body=message.body,
+            html_body=html_body,
+            from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+            recipients=list(message.to),
+        ))
+    return OutboundEmail.objects.bulk_create(rows)
+
+
+def build_message(email, connection=None):
+    """Turn an outbox row back into a sendable message"""
+    message = EmailMultiAlternatives(
+        email.subject, email.body, email.from_email, email.recipients, connection=connection
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def retry_delay(attempts):
+    """Exponential backoff after the given number of failed attempts"""
+    seconds = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS))
+
+
+def _record_failure(email, error, now):
+    email.attempts += 1
+    email.last_error = error
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = 'dead'
+        logger.error(f"Email {email.id} to {', '.join(email.recipients)} dead-lettered: {error}")
+    else:
+        email.next_attempt_at = now + retry_delay(email.attempts)
+    email.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error'])
+
+
+def _record_sent(email):
+    email.status = 'sent'
+    email.attempts += 1
+    email.sent_at = timezone.now()
+    email.last_error = ''
+    # Bodies can carry login credentials; keep only the envelope once delivered
+    email.body = ''
+    email.html_body = ''
+    email.save(update_fields=['status', 'attempts', 'sent_at', 'last_error', 'body', 'html_body'])
+
+
+def claim_emails(batch_size, now):
+    """
+    Lease a batch of due emails to this worker
+
+    The rows stay pending but their next_attempt_at moves EMAIL_OUTBOX_LEASE_SECONDS
+    ahead, so other workers skip them until the lease runs out. The claim commits
+    immediately; nothing is held open while sending.
+
+    Returns:
+        Tuple: (claimed OutboundEmail rows, end of the lease)
+    """
+    lease_until = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+    with transaction.atomic():
+        # Rows claimed by a concurrent worker are skipped, never sent twice
+        emails = list(
+            OutboundEmail.objects.filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        OutboundEmail.objects.filter(id__in=[email.id for email in emails]).update(next_attempt_at=lease_until)
+    for email in emails:
+        email.next_attempt_at = lease_until
+    return emails, lease_until
+
+
+def deliver_outbox(batch_size=None, now=None):
+    """
+    Send one batch of due outbox emails
+
+    Rows are leased in a short transaction and sent outside of any; each result is
+    saved as soon as its message is handed to the server. A worker killed mid-batch
+    only resends the message it was sending, once its lease has run out.
+
+    Args:
+        batch_size: Maximum rows claimed (defaults to EMAIL_OUTBOX_BATCH_SIZE)
+        now: Current time (defaults to timezone.now())
+
+    Returns:
+        Dict: Counts of 'sent', 'retrying' and 'dead' rows in this batch
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    now = now or timezone.now()
+    counts = {'sent': 0, 'retrying': 0, 'dead': 0}
+
+    emails, lease_until = claim_emails(batch_size, now)
+    if not emails:
+        return counts
+
+    attempted = []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Could not connect to the email server: {str(e)}")
+        for email in emails:
+            _record_failure(email, f"Connection failed: {str(e)}", now)
+        attempted = emails
+    else:
+        try:
+            for email in emails:
+                # Stop before a send could outlast the lease and race the worker that takes the row over
+                if timezone.now() + timedelta(seconds=settings.EMAIL_TIMEOUT or 0) >= lease_until:
+                    logger.warning(f"Outbox lease ran out; {len(emails) - len(attempted)} emails left for the next run")
+                    break
+                attempted.append(email)
+                try:
+                    connection.send_messages([build_message(email, connection)])
+                except Exception as e:
+                    _record_failure(email, str(e), now)
+                    continue
+                _record_sent(email)
+        finally:
+            connection.close()
+
+    for email in attempted:
+        if email.status == 'pending':
+            counts['retrying'] += 1
+        else:
+            counts[email.status] += 1
+    return counts
+
+
+def requeue_dead_emails(queryset=None):
+    """Give dead-lettered emails a fresh set of attempts"""
+    queryset = OutboundEmail.objects.filter(status='dead') if queryset is None else queryset.filter(status='dead')
+    return queryset.update(status='pending', attempts=0, next_attempt_at=timezone.now())
@@ -1,3 +1,173 @@
-from django.test import TestCase
+from datetime import timedelta
+
+from django.core import mail
+from django.contrib.auth.hashers import check_password
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .bulk_accounts import PARALLEL_HASH_THRESHOLD, create_users, hash_passwords
+from .identifiers import allocate_ids, generate_student_id, generate_usernames
+from .models import OutboundEmail, User
+from .outbox import deliver_outbox, queue_email, requeue_dead_emails
 
 # Create your tests here.
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """Backend whose SMTP server rejects every message"""
+
+    def send_messages(self, email_messages):
+        raise ConnectionError('SMTP server unavailable')
+
+
+class InterruptedEmailBackend(BaseEmailBackend):
+    """Backend of a worker killed while sending its second message"""
+    sent = []
+
+    def send_messages(self, email_messages):
+        if self.sent:
+            raise SystemExit('worker killed')
+        self.sent.extend(email_messages)
+        return len(email_messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_OUTBOX_MAX_ATTEMPTS=3,
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS=30,
+)
+class EmailOutboxTest(TestCase):
+    def test_queue_does_not_send(self):
+        queue_email('Subject', 'Body', ['parent@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.get().status, 'pending')
+
+    def test_deliver_batch(self):
+        for i in range(3):
+            queue_email(f'Subject {i}', 'Body', [f'user{i}@example.com'], html_body='<p>Body</p>')
+        counts = deliver_outbox()
+        self.assertEqual(counts, {'sent': 3, 'retrying': 0, 'dead': 0})
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives[0][0], '<p>Body</p>')
+        # Delivered bodies are not retained
+        self.assertFalse(OutboundEmail.objects.exclude(body='').exists())
+        self.assertEqual(deliver_outbox(), {'sent': 0, 'retrying': 0, 'dead': 0})
+
+    @override_settings(EMAIL_BACKEND='website.tests.FailingEmailBackend')
+    def test_retry_backoff_and_dead_letter(self):
+        email = queue_email('Subject', 'Body', ['user@example.com'])
+        now = timezone.now()
+
+        self.assertEqual(deliver_outbox(now=now)['retrying'], 1)
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.next_attempt_at, now + timedelta(seconds=30))
+        self.assertIn('SMTP server unavailable', email.last_error)
+
+        # Not due yet
+        self.assertEqual(deliver_outbox(now=now), {'sent': 0, 'retrying': 0, 'dead': 0})
+
+        now += timedelta(seconds=30)
+        deliver_outbox(now=now)
+        email.refresh_from_db()
+        self.assertEqual(email.next_attempt_at, now + timedelta(seconds=60))
+
+        self.assertEqual(deliver_outbox(now=now + timedelta(seconds=60))['dead'], 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'dead')
+
+        self.assertEqual(requeue_dead_emails(), 1)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('pending', 0))
+
+    @override_settings(EMAIL_OUTBOX_LEASE_SECONDS=600)
+    def test_killed_worker_does_not_resend_delivered_mail(self):
+        emails = [queue_email(f'Subject {i}', 'Body', [f'user{i}@example.com']) for i in range(3)]
+        now = timezone.now()
+        InterruptedEmailBackend.sent = []
+
+        with override_settings(EMAIL_BACKEND='website.tests.InterruptedEmailBackend'):
+            with self.assertRaises(SystemExit):
+                deliver_outbox(now=now)
+        # The first message was recorded as sent before the second one was attempted
+        statuses = [OutboundEmail.objects.get(pk=email.pk) for email in emails]
+        self.assertEqual([email.status for email in statuses], ['sent', 'pending', 'pending'])
+        self.assertEqual(statuses[0].body, '')
+        # The rest stay leased to the dead worker until the lease runs out
+        self.assertEqual({email.next_attempt_at for email in statuses[1:]}, {now + timedelta(seconds=600)})
+        self.assertEqual(deliver_outbox(now=now + timedelta(seconds=599)), {'sent': 0, 'retrying': 0, 'dead': 0})
+
+        self.assertEqual(deliver_outbox(now=now + timedelta(seconds=600))['sent'], 2)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['user1@example.com', 'user2@example.com'])
+
+
+class IdentifierAllocationTest(TestCase):
+    def test_sequence_starts_after_existing_ids(self):
+        year = timezone.localdate().year
+        User.objects.create_user(username='old', password='x', role='student', student_id=f'SID-{year}-00007')
+        User.objects.create_user(username='legacy', password='x', role='student', student_id='0003')
+        self.assertEqual(generate_student_id(), f'SID-{year}-00008')
+        self.assertEqual(generate_student_id(), f'SID-{year}-00009')
+
+    def test_block_allocation_is_constant_cost(self):
+        allocate_ids('faculty', year=2030)
+        # Lock the sequence row and advance it; the block size does not matter
+        with self.assertNumQueries(4):
+            ids = allocate_ids('faculty', 500, year=2030)
+        self.assertEqual(ids[0], 'FID-2030-00002')
+        self.assertEqual(ids[-1], 'FID-2030-00501')
+        self.assertEqual(allocate_ids('faculty', year=2030), ['FID-2030-00502'])
+        # Prefixes have independent sequences
+        self.assertEqual(allocate_ids('clinic', year=2030), ['NID-2030-00001'])
+
+    def test_usernames_avoid_existing_and_each_other(self):
+        User.objects.create_user(username='student.juandelacruz@amieti.com', password='x', role='student')
+        with self.assertNumQueries(1):
+            usernames = generate_usernames([
+                ('Juan Dela Cruz', 'student'),
+                ('Juan Dela-Cruz', 'student'),
+                ('Juan Dela Cruz', 'clinic'),
+            ])
+        self.assertEqual(usernames, [
+            'student.juandelacruz1@amieti.com',
+            'student.juandelacruz2@amieti.com',
+            'nurse.juandelacruz@amieti.com',
+        ])
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+])
+class BulkAccountTest(TestCase):
+    def test_parallel_hashes_match_passwords(self):
+        passwords = [f'secret{i}' for i in range(PARALLEL_HASH_THRESHOLD)]
+        hashes = hash_passwords(passwords, workers=2)
+        self.assertEqual(len(set(hashes)), len(passwords))
+        for password, password_hash in zip(passwords, hashes):
+            self.assertTrue(check_password(password, password_hash))
+
+    def test_create_users_in_one_insert(self):
+        accounts = [
+            {'username': f'student{i}@amieti.com', 'email': f'student{i}@EXAMPLE.com', 'role': 'student',
+             'full_name': f'Student {i}', 'password': f'secret{i}', 'is_active': True}
+            for i in range(5)
+        ]
+        with self.assertNumQueries(3):
+            created, errors = create_users(accounts, workers=1)
+        self.assertEqual((len(created), errors), (5, []))
+        user = User.objects.get(username='student3@amieti.com')
+        self.assertEqual(user.email, 'student3@example.com')
+        self.assertTrue(user.check_password('secret3'))
+
+    def test_conflicting_row_is_reported(self):
+        User.objects.create_user(username='taken@amieti.com', password='x', role='student')
+        accounts = [
+            {'username': 'fresh@amieti.com', 'role': 'student', 'password': 'a'},
+            {'username': 'taken@amieti.com', 'role': 'student', 'password': 'b'},
+        ]
+        created, errors = create_users(accounts, workers=1)
+        self.assertEqual([user.username for user in created], ['fresh@amieti.com'])
+        self.assertEqual([index for index, _ in errors], [1])
+
@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model, authenticate, login
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, send_mail
 from django.conf import settings
 from rest_framework import status
 from rest_framework.views import APIView
@@ -12,12 +12,18 @@ from django.middleware.csrf import get_token
 from django import forms
 from django.utils import timezone
 from datetime import timedelta
+from django.db.models import Exists, OuterRef
 import random
 import string
-import time
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.pagination import PageNumberPagination
 from logs.models import SystemLog
+from .identifiers import (
+    allocate_ids, generate_usernames, generate_username, generate_student_id, generate_faculty_id,
+    generate_counselor_id, generate_admin_id, generate_clinic_id, ROLE_ID_FIELDS
+)
+from .bulk_accounts import create_users
+from .outbox import queue_email, queue_messages
 
 User = get_user_model()
 
@@ -29,8 +35,8 @@ def migrate_existing_ids():
     # Migrate students with old format IDs (only if they need migration)
     students_with_old_ids = User.objects.filter(
         role='student',
-        student_id__isnull=False
-    ).exclude(student_id='')
+        student_id__regex=r'^[0-9]+$'
+    )
     
     migrated_count = 0
     for student in students_with_old_ids:
@@ -45,8 +51,8 @@ def migrate_existing_ids():
     # Migrate faculty with old format IDs (only if they need migration)
     faculty_with_old_ids = User.objects.filter(
         role='faculty',
-        faculty_id__isnull=False
-    ).exclude(faculty_id='')
+        faculty_id__regex=r'^[0-9]+$'
+    )
     
     for faculty in faculty_with_old_ids:
         if faculty.faculty_id and faculty.faculty_id.isdigit():
@@ -60,8 +66,8 @@ def migrate_existing_ids():
     # Migrate counselors with old format IDs (only if they need migration)
     counselors_with_old_ids = User.objects.filter(
         role='counselor',
-        faculty_id__isnull=False
-    ).exclude(faculty_id='')
+        faculty_id__regex=r'^[0-9]+$'
+    )
     
     for counselor in counselors_with_old_ids:
         if counselor.faculty_id and counselor.faculty_id.isdigit():
@@ -75,8 +81,8 @@ def migrate_existing_ids():
     # Migrate admins with old format IDs (only if they need migration)
     admins_with_old_ids = User.objects.filter(
         role='admin',
-        faculty_id__isnull=False
-    ).exclude(faculty_id='')
+        faculty_id__regex=r'^[0-9]+$'
+    )
     
     for admin in admins_with_old_ids:
         if admin.faculty_id and admin.faculty_id.isdigit():
@@ -90,8 +96,8 @@ def migrate_existing_ids():
     # Migrate clinic/nurse with old format IDs (only if they need migration)
     clinics_with_old_ids = User.objects.filter(
         role='clinic',
-        faculty_id__isnull=False
-    ).exclude(faculty_id='')
+        faculty_id__regex=r'^[0-9]+$'
+    )
     
     for clinic in clinics_with_old_ids:
         if clinic.faculty_id and clinic.faculty_id.isdigit():
@@ -106,201 +112,6 @@ def migrate_existing_ids():
         # Auto-migrated users to 5-digit ID format
         pass
 
-def generate_student_id():
-    """Generate automatic Student ID with format SID-2024-00001"""
-    from datetime import datetime
-    current_year = datetime.now().year
-    
-    # Get the highest existing student ID number for current year
-    existing_students = User.objects.filter(
-        role='student', 
-        student_id__isnull=False
-    ).exclude(student_id='')
-    
-    if not existing_students.exists():
-        return f'SID-{current_year}-00001'
-    
-    # Extract numbers from existing IDs and find the highest for current year
-    max_number = 0
-    for student in existing_students:
-        if student.student_id:
-            # Handle both old format (0001) and new format (SID-2024-00001)
-            if student.student_id.startswith(f'SID-{current_year}-'):
-                try:
-                    # Extract number after SID-2024-
-                    number_part = student.student_id.split('-')[-1]
-                    number = int(number_part)
-                    max_number = max(max_number, number)
-                except (ValueError, IndexError):
-                    continue
-            elif student.student_id.isdigit():
-                # Handle old format (0001, 0002, etc.)
-                try:
-                    number = int(student.student_id)
-                    max_number = max(max_number, number)
-                except ValueError:
-                    continue
-    
-    # Generate next number
-    next_number = max_number + 1
-    return f'SID-{current_year}-{next_number:05d}'
-
-def generate_faculty_id():
-    """Generate automatic Faculty ID with format FID-2024-00001"""
-    from datetime import datetime
-    current_year = datetime.now().year
-    
-    # Get the highest existing faculty ID number for current year
-    existing_faculty = User.objects.filter(
-        role='faculty', 
-        faculty_id__isnull=False
-    ).exclude(faculty_id='')
-    
-    if not existing_faculty.exists():
-        return f'FID-{current_year}-00001'
-    
-    # Extract numbers from existing IDs and find the highest for current year
-    max_number = 0
-    for faculty in existing_faculty:
-        if faculty.faculty_id:
-            # Handle both old format (0001) and new format (FID-2024-00001)
-            if faculty.faculty_id.startswith(f'FID-{current_year}-'):
-                try:
-                    # Extract number after FID-2024-
-                    number_part = faculty.faculty_id.split('-')[-1]
-                    number = int(number_part)
-                    max_number = max(max_number, number)
-                except (ValueError, IndexError):
-                    continue
-            elif faculty.faculty_id.isdigit():
-                # Handle old format (0001, 0002, etc.)
-                try:
-                    number = int(faculty.faculty_id)
-                    max_number = max(max_number, number)
-                except ValueError:
-                    continue
-    
-    # Generate next number
-    next_number = max_number + 1
-    return f'FID-{current_year}-{next_number:05d}'
-
-def generate_counselor_id():
-    """Generate automatic Counselor ID with format CID-2024-00001"""
-    from datetime import datetime
-    current_year = datetime.now().year
-    
-    # Get the highest existing counselor ID number for current year
-    existing_counselors = User.objects.filter(
-        role='counselor', 
-        faculty_id__isnull=False
-    ).exclude(faculty_id='')
-    
-    if not existing_counselors.exists():
-        return f'CID-{current_year}-00001'
-    
-    # Extract numbers from existing IDs and find the highest for current year
-    max_number = 0
-    for counselor in existing_counselors:
-        if counselor.faculty_id:
-            # Handle both old format (0001) and new format (CID-2024-00001)
-            if counselor.faculty_id.startswith(f'CID-{current_year}-'):
-                try:
-                    # Extract number after CID-2024-
-                    number_part = counselor.faculty_id.split('-')[-1]
-                    number = int(number_part)
-                    max_number = max(max_number, number)
-                except (ValueError, IndexError):
-                    continue
-            elif counselor.faculty_id.isdigit():
-                # Handle old format (0001, 0002, etc.)
-                try:
-                    number = int(counselor.faculty_id)
-                    max_number = max(max_number, number)
-                except ValueError:
-                    continue
-    
-    # Generate next number
-    next_number = max_number + 1
-    return f'CID-{current_year}-{next_number:05d}'
-
-def generate_admin_id():
-    """Generate automatic Admin ID with format AID-2024-00001"""
-    from datetime import datetime
-    current_year = datetime.now().year
-    
-    # Get the highest existing admin ID number for current year
-    existing_admins = User.objects.filter(
-        role='admin', 
-        faculty_id__isnull=False
-    ).exclude(faculty_id='')
-    
-    if not existing_admins.exists():
-        return f'AID-{current_year}-00001'
-    
-    # Extract numbers from existing IDs and find the highest for current year
-    max_number = 0
-    for admin in existing_admins:
-        if admin.faculty_id:
-            # Handle both old format (0001) and new format (AID-2024-00001)
-            if admin.faculty_id.startswith(f'AID-{current_year}-'):
-                try:
-                    # Extract number after AID-2024-
-                    number_part = admin.faculty_id.split('-')[-1]
-                    number = int(number_part)
-                    max_number = max(max_number, number)
-                except (ValueError, IndexError):
-                    continue
-            elif admin.faculty_id.isdigit():
-                # Handle old format (0001, 0002, etc.)
-                try:
-                    number = int(admin.faculty_id)
-                    max_number = max(max_number, number)
-                except ValueError:
-                    continue
-    
-    # Generate next number
-    next_number = max_number + 1
-    return f'AID-{current_year}-{next_number:05d}'
-
-def generate_clinic_id():
-    """Generate automatic Clinic/Nurse ID with format NID-2024-00001"""
-    from datetime import datetime
-    current_year = datetime.now().year
-    
-    # Get the highest existing clinic ID number for current year
-    existing_clinics = User.objects.filter(
-        role='clinic', 
-        faculty_id__isnull=False
-    ).exclude(faculty_id='')
-    
-    if not existing_clinics.exists():
-        return f'NID-{current_year}-00001'
-    
-    # Extract numbers from existing IDs and find the highest for current year
-    max_number = 0
-    for clinic in existing_clinics:
-        if clinic.faculty_id:
-            # Handle both old format (0001) and new format (NID-2024-00001)
-            if clinic.faculty_id.startswith(f'NID-{current_year}-'):
-                try:
-                    # Extract number after NID-2024-
-                    number_part = clinic.faculty_id.split('-')[-1]
-                    number = int(number_part)
-                    max_number = max(max_number, number)
-                except (ValueError, IndexError):
-                    continue
-            elif clinic.faculty_id.isdigit():
-                # Handle old format (0001, 0002, etc.)
-                try:
-                    number = int(clinic.faculty_id)
-                    max_number = max(max_number, number)
-                except ValueError:
-                    continue
-    
-    # Generate next number
-    next_number = max_number + 1
-    return f'NID-{current_year}-{next_number:05d}'
-
 class CustomPageNumberPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
@@ -343,47 +154,10 @@ def get_tokens_for_user(user):
         'access': str(refresh.access_token),
     }
 
-def generate_username(full_name, role=None):
-    """
-    Generate username based on role and full name
-    Format: {role_prefix}.{fullname_cleaned}@amieti.com
-    """
-    if not full_name:
-        return f"user@amieti.com"
-    
-    # Clean the full name - remove spaces and special characters
-    cleaned_name = full_name.strip().lower().replace(' ', '').replace('-', '').replace('.', '').replace(',', '')
-    
-    # Role prefixes
-    role_prefixes = {
-        'student': 'student',
-        'faculty': 'faculty', 
-        'admin': 'admin',
-        'clinic': 'nurse',
-        'counselor': 'counselor'
-    }
-    
-    # Get role prefix, default to 'user' if role not found
-    role_prefix = role_prefixes.get(role, 'user') if role else 'user'
-    
-    # Generate username
-    username = f"{role_prefix}.{cleaned_name}@amieti.com"
-    
-    # Check if username already exists and add number if needed
-    counter = 1
-    original_username = username
-    while User.objects.filter(username=username).exists():
-        username = f"{role_prefix}.{cleaned_name}{counter}@amieti.com"
-        counter += 1
-        if counter > 10:  # Prevent infinite loop
-            break
-    
-    return username
-
 def generate_random_password():
     return ''.join(random.choices(string.ascii_letters + string.digits, k=8))
 
-def send_credentials_email(user, password):
+def build_credentials_email(user, password):
     subject = "Your Amieti Account Credentials"
     message = f"""Hello {user.full_name},
     
@@ -449,28 +223,14 @@ Amieti Team"""
     </html>
     """
 
-    max_retries = 3
-    retry_delay = 5  # seconds
-    
-    for attempt in range(max_retries):
-        try:
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-                fail_silently=False,
-                html_message=html_message
-            )
-            # Email sent successfully
-            return True
-        except Exception as e:
-            # Email attempt failed
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-            else:
-                # All email attempts failed
-                raise Exception(f"Failed to send email after {max_retries} attempts: {str(e)}")
+    email = EmailMultiAlternatives(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+    email.attach_alternative(html_message, 'text/html')
+    return email
+
+def send_credentials_email(user, password):
+    # Delivered (with retries) by the send_outbox worker
+    queue_messages([build_credentials_email(user, password)], category='credentials')
+    return True
 
 def send_forgot_password_email(user, new_password):
     subject = "Your Amieti Password Has Been Reset"
@@ -532,28 +292,9 @@ Please log in using these credentials."""
     </html>
     """
 
-    max_retries = 3
-    retry_delay = 5  # seconds
-    
-    for attempt in range(max_retries):
-        try:
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-                fail_silently=False,
-                html_message=html_message
-            )
-            # Email sent successfully
-            return True
-        except Exception as e:
-            # Email attempt failed
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-            else:
-                # All email attempts failed
-                raise Exception(f"Failed to send email after {max_retries} attempts: {str(e)}")
+    # Delivered (with retries) by the send_outbox worker
+    queue_email(subject, message, [user.email], html_body=html_message, category='password_reset')
+    return True
 
 class AdminCreateUserView(APIView):
     permission_classes = [IsAuthenticated]
@@ -831,7 +572,15 @@ class AdminBulkUploadUsersView(APIView):
                 'total_processed': 0
             }
 
-            for row_num, row in enumerate(csv_reader, start=2):  # Start from 2 because row 1 is header
+            rows = list(enumerate(csv_reader, start=2))  # Start from 2 because row 1 is header
+            
+            # Look up every email in the file with one query
+            emails = [(row.get('Email') or '').strip() for _, row in rows]
+            taken_emails = set(User.objects.filter(email__in=[e for e in emails if e]).values_list('email', flat=True))
+            
+            # First pass: validate rows
+            valid_rows = []
+            for row_num, row in rows:
                 try:
                     # Extract data from CSV row
                     full_name = row['Name'].strip()
@@ -866,8 +615,8 @@ class AdminBulkUploadUsersView(APIView):
                         })
                         continue
 
-                    # Check if user already exists
-                    if User.objects.filter(email=email).exists():
+                    # Check if user already exists (or appears earlier in the file)
+                    if email in taken_emails:
                         results['errors'].append({
                             'row': row_num,
                             'error': f'User with email {email} already exists'
@@ -898,64 +647,15 @@ class AdminBulkUploadUsersView(APIView):
                             })
                             continue
 
-                    # Generate username and password
-                    username = generate_username(full_name, role)
-                    password = generate_random_password()
-
-                    # Auto-generate IDs based on role
-                    student_id = ''
-                    faculty_id = ''
-                    
-                    if role == 'student':
-                        student_id = generate_student_id()
-                    elif role == 'faculty':
-                        faculty_id = generate_faculty_id()
-                    elif role == 'counselor':
-                        faculty_id = generate_counselor_id()
-                    elif role == 'admin':
-                        faculty_id = generate_admin_id()
-                    elif role == 'clinic':
-                        faculty_id = generate_clinic_id()
-
-                    # Create user
-                    user = User.objects.create_user(
-                        username=username,
-                        email=email,
-                        full_name=full_name,
-                        role=role,
-                        password=password,
-                        is_active=True,
-                        student_id=student_id,
-                        grade=grade if role == 'student' else '',
-                        section=section if role == 'student' else '',
-                        faculty_id=faculty_id,
-                        dob=dob
-                    )
-                    user.save()
-
-                    # Send email with credentials
-                    email_sent = True
-                    try:
-                        send_credentials_email(user, password)
-                    except Exception as e:
-                        email_sent = False
-                        # Log the warning but don't fail the user creation
-
-                    # Add to success results
-                    results['success'].append({
+                    taken_emails.add(email)
+                    valid_rows.append({
                         'row': row_num,
-                        'user': {
-                            'id': user.id,
-                            'username': user.username,
-                            'full_name': user.full_name,
-                            'email': user.email,
-                            'role': user.role,
-                            'student_id': user.student_id,
-                            'grade': user.grade,
-                            'section': user.section,
-                            'faculty_id': user.faculty_id,
-                            'email_sent': email_sent
-                        }
+                        'full_name': full_name,
+                        'email': email,
+                        'role': role,
+                        'grade': grade,
+                        'section': section,
+                        'dob': dob,
                     })
 
                 except Exception as e:
@@ -963,7 +663,90 @@ class AdminBulkUploadUsersView(APIView):
                         'row': row_num,
                         'error': f'Unexpected error: {str(e)}'
                     })
+                    results['total_processed'] += 1
+
+            # Reserve usernames and one block of role IDs per role up front
+            usernames = generate_usernames((entry['full_name'], entry['role']) for entry in valid_rows)
+            role_ids = {}
+            for role in ROLE_ID_FIELDS:
+                count = sum(1 for entry in valid_rows if entry['role'] == role)
+                role_ids[role] = iter(allocate_ids(role, count))
+
+            # Second pass: hash passwords in parallel and insert every user at once
+            accounts = []
+            passwords = []
+            for entry, username in zip(valid_rows, usernames):
+                role = entry['role']
+                password = generate_random_password()
+                passwords.append(password)
+
+                # Auto-generate IDs based on role
+                student_id = ''
+                faculty_id = ''
+                if ROLE_ID_FIELDS[role] == 'student_id':
+                    student_id = next(role_ids[role])
+                else:
+                    faculty_id = next(role_ids[role])
+
+                accounts.append({
+                    'username': username,
+                    'email': entry['email'],
+                    'full_name': entry['full_name'],
+                    'role': role,
+                    'password': password,
+                    'is_active': True,
+                    'student_id': student_id,
+                    'grade': entry['grade'] if role == 'student' else '',
+                    'section': entry['section'] if role == 'student' else '',
+                    'faculty_id': faculty_id,
+                    'dob': entry['dob'],
+                })
+
+            created_users, create_errors = create_users(accounts)
+            failed = dict(create_errors)
+            created_indexes = [index for index in range(len(valid_rows)) if index not in failed]
+            created_iter = iter(created_users)
+
+            # Queue every credentials email with one INSERT
+            email_sent = True
+            try:
+                queue_messages(
+                    [build_credentials_email(user, passwords[index])
+                     for index, user in zip(created_indexes, created_users)],
+                    category='credentials'
+                )
+            except Exception as e:
+                email_sent = False
+                # Log the warning but don't fail the user creation
+
+            for index, entry in enumerate(valid_rows):
+                row_num = entry['row']
+                if index in failed:
+                    results['errors'].append({
+                        'row': row_num,
+                        'error': f'Unexpected error: {failed[index]}'
+                    })
+                    results['total_processed'] += 1
+                    continue
+
+                user = next(created_iter)
 
+                # Add to success results
+                results['success'].append({
+                    'row': row_num,
+                    'user': {
+                        'id': user.id,
+                        'username': user.username,
+                        'full_name': user.full_name,
+                        'email': user.email,
+                        'role': user.role,
+                        'student_id': user.student_id,
+                        'grade': user.grade,
+                        'section': user.section,
+                        'faculty_id': user.faculty_id,
+                        'email_sent': email_sent
+                    }
+                })
                 results['total_processed'] += 1
 
             # Prepare response
@@ -1189,24 +972,13 @@ def active_sessions(request):
             is_active=True
         )
         
-        # Get all logout events from SystemLog
-        logout_events = SystemLog.objects.filter(
-            action='Logged out'
-        ).values_list('user', flat=True)
-        
-        # Count users who have logged in but haven't logged out
-        active_users = 0
-        for user in logged_in_users:
-            # Check if this user has a logout event after their last login
-            user_logout_events = SystemLog.objects.filter(
-                user=user.username,
-                action='Logged out',
-                datetime__gte=user.last_login
-            )
-            
-            # If no logout events after last login, consider user as active
-            if not user_logout_events.exists():
-                active_users += 1
+        # Users with no logout event after their last login, counted in one query
+        logged_out_since_login = SystemLog.objects.filter(
+            user=OuterRef('username'),
+            action='Logged out',
+            datetime__gte=OuterRef('last_login')
+        )
+        active_users = logged_in_users.exclude(Exists(logged_out_since_login)).count()
         
         return Response({
             "active_sessions": active_users
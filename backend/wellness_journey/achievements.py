@@ -0,0 +1,65 @@
+"""
+Achievement engine for the wellness journey
+
+Every achievement belongs to an award rule and a period. Awards are inserted
+with ON CONFLICT DO NOTHING against the unique (user, rule, period) constraint,
+so re-evaluating a rule - a retried request, a double submit or two concurrent
+completions - never stores a second copy.
+"""
+
+import re
+
+from .models import Achievement
+
+DAILY_TASK_RULE = 'daily_task:{task}'
+WEEKLY_GOAL_RULE = 'weekly_goal:{goal}'
+
+# Descriptions written before rules existed, used to backfill rule and period
+LEGACY_DAILY_TASK_DESCRIPTION = re.compile(r'^Completed (?P<name>.+) on (?P<period>\d{4}-\d{2}-\d{2})$')
+LEGACY_WEEKLY_GOAL_DESCRIPTION = re.compile(r'^Achieved (?P<name>.+) for the week starting (?P<period>\d{4}-\d{2}-\d{2})\.$')
+
+
+def award(user, rule, period, title, description=''):
+    """Award an achievement once per rule and period with a single INSERT"""
+    Achievement.objects.bulk_create(
+        [Achievement(user=user, rule=rule, period=period, title=title, description=description)],
+        ignore_conflicts=True
+    )
+
+
+def award_daily_task(user, task):
+    """Achievement for completing a daily task, once per task and day"""
+    award(
+        user,
+        DAILY_TASK_RULE.format(task=task.task),
+        task.date.isoformat(),
+        task.task,
+        f'Completed {task.task} on {task.date}'
+    )
+
+
+def award_weekly_goal(user, goal):
+    """Achievement for reaching a weekly goal, once per goal and week"""
+    award(
+        user,
+        WEEKLY_GOAL_RULE.format(goal=goal.goal),
+        goal.week_start.isoformat(),
+        goal.goal,
+        f'Achieved {goal.goal} for the week starting {goal.week_start}.'
+    )
+
+
+def legacy_rule(achievement):
+    """
+    Recover (rule, period) for an achievement written before rules existed
+
+    Returns:
+        Tuple[str, str] or None if the description does not match a known rule
+    """
+    match = LEGACY_DAILY_TASK_DESCRIPTION.match(achievement.description or '')
+    if match:
+        return DAILY_TASK_RULE.format(task=match['name']), match['period']
+    match = LEGACY_WEEKLY_GOAL_DESCRIPTION.match(achievement.description or '')
+    if match:
+        return WEEKLY_GOAL_RULE.format(goal=match['name']), match['period']
+    return None
@@ -2,8 +2,8 @@ from django.contrib import admin
 from .models import WellnessProfile, DailyTask, WeeklyGoal, Achievement
 
 class WellnessProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'xp', 'level', 'stage', 'last_login_date', 'day_streak', 'best_streak', 'last_streak_reset')
-    fields = ('user', 'xp', 'level', 'stage', 'last_login_date', 'day_streak', 'best_streak', 'last_streak_reset')
+    list_display = ('user', 'xp', 'level', 'stage', 'last_login_date', 'day_streak', 'best_streak', 'last_streak_reset', 'last_active_date')
+    fields = ('user', 'xp', 'level', 'stage', 'last_login_date', 'day_streak', 'best_streak', 'last_streak_reset', 'last_active_date')
     search_fields = ('user__username', 'user__full_name')
     list_filter = ('level', 'stage')
 
@@ -20,8 +20,8 @@ class WeeklyGoalAdmin(admin.ModelAdmin):
     date_hierarchy = 'week_start'
 
 class AchievementAdmin(admin.ModelAdmin):
-    list_display = ('user', 'title', 'date_earned')
-    list_filter = ('date_earned',)
+    list_display = ('user', 'title', 'rule', 'period', 'date_earned')
+    list_filter = ('date_earned', 'rule')
     search_fields = ('user__username', 'user__full_name', 'title', 'description')
     date_hierarchy = 'date_earned'
 
@@ -0,0 +1,70 @@
+"""
+Django management command to assign award rules to old achievements and drop duplicates
+Usage: python manage.py deduplicate_achievements [--dry-run]
+Run once after deploying the achievement engine
+"""
+
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from wellness_journey.achievements import legacy_rule
+from wellness_journey.models import Achievement
+
+
+class Command(BaseCommand):
+    help = 'Backfill rule/period on legacy achievements and delete repeated awards of the same rule and period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without writing'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows written per batch (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+        
+        achievements = Achievement.objects.only(
+            'id', 'user_id', 'description', 'rule', 'period', 'date_earned'
+        ).order_by('user_id', 'date_earned', 'id')
+        
+        to_update = []
+        to_delete = []
+        for user_id, rows in groupby(achievements.iterator(chunk_size=batch_size), key=lambda a: a.user_id):
+            rows = list(rows)
+            # Keys already held by rule-based rows win over legacy copies
+            earned = {(a.rule, a.period) for a in rows if a.rule is not None}
+            for achievement in rows:
+                if achievement.rule is not None:
+                    continue
+                key = legacy_rule(achievement)
+                if key is None:
+                    continue
+                if key in earned:
+                    # The oldest copy was kept; later repeats are redundant
+                    to_delete.append(achievement.id)
+                else:
+                    achievement.rule, achievement.period = key
+                    to_update.append(achievement)
+                    earned.add(key)
+        
+        if not dry_run:
+            with transaction.atomic():
+                for start in range(0, len(to_delete), batch_size):
+                    Achievement.objects.filter(id__in=to_delete[start:start + batch_size]).delete()
+                Achievement.objects.bulk_update(to_update, ['rule', 'period'], batch_size=batch_size)
+        
+        prefix = 'Would update' if dry_run else 'Updated'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix} {len(to_update)} legacy achievements and {'would delete' if dry_run else 'deleted'} {len(to_delete)} duplicates"
+            )
+        )
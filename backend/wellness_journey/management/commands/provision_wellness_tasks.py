@@ -0,0 +1,64 @@
+"""
+Django management command to create the day's wellness tasks ahead of time
+Usage: python manage.py provision_wellness_tasks [--date YYYY-MM-DD]
+Can be run as a daily cron job shortly after midnight
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from website.models import User
+from wellness_journey.provisioning import provision_daily_tasks, provision_weekly_goals, week_start_for
+
+
+class Command(BaseCommand):
+    help = 'Bulk create daily tasks (and the weekly goals of that week) for active users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Day to provision, YYYY-MM-DD (default: today)'
+        )
+        parser.add_argument(
+            '--roles',
+            default='student',
+            help='Comma-separated user roles to provision (default: student)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of users provisioned per INSERT batch (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format')
+        else:
+            day = timezone.now().date()
+        roles = [role.strip() for role in options['roles'].split(',') if role.strip()]
+        batch_size = options['batch_size']
+        
+        user_ids = User.objects.filter(is_active=True, role__in=roles).order_by('id').values_list('id', flat=True)
+        
+        users = 0
+        batch = []
+        for user_id in user_ids.iterator(chunk_size=batch_size):
+            batch.append(user_id)
+            if len(batch) >= batch_size:
+                self.provision(batch, day)
+                users += len(batch)
+                batch = []
+        if batch:
+            self.provision(batch, day)
+            users += len(batch)
+        
+        self.stdout.write(self.style.SUCCESS(f"Provisioned wellness tasks for {users} users on {day}"))
+
+    def provision(self, user_ids, day):
+        provision_daily_tasks(user_ids, day)
+        provision_weekly_goals(user_ids, week_start_for(day))
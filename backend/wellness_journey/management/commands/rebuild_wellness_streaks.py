@@ -0,0 +1,87 @@
+"""
+Django management command to rebuild wellness streaks from daily task history
+Usage: python manage.py rebuild_wellness_streaks
+Run once after deploying incremental streaks, or to repair back-dated completions
+"""
+
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from wellness_journey.models import DailyTask, WellnessProfile
+
+
+def compute_streaks(dates, today):
+    """
+    Streak state for a sorted list of distinct completion dates
+
+    Returns:
+        Tuple[int, int, date]: (current streak, best streak, last active date)
+    """
+    best = current = 0
+    previous = None
+    for day in dates:
+        if previous is not None and (day - previous).days == 1:
+            current += 1
+        else:
+            current = 1
+        best = max(best, current)
+        previous = day
+    # A streak whose last activity is older than yesterday is already broken
+    if previous is None or (today - previous).days > 1:
+        current = 0
+    cap = WellnessProfile.MAX_STREAK
+    return min(current, cap), min(best, cap), previous
+
+
+class Command(BaseCommand):
+    help = 'Recompute day streak, best streak and last active date for every wellness profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of profiles written per batch (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        today = timezone.now().date()
+        profiles = {profile.user_id: profile for profile in WellnessProfile.objects.only(
+            'id', 'user_id', 'day_streak', 'best_streak', 'last_streak_reset', 'last_active_date'
+        )}
+        
+        # One pass over the distinct completion days of every user
+        completion_days = (
+            DailyTask.objects.filter(completed=True, date__lte=today)
+            .values_list('user_id', 'date')
+            .distinct()
+            .order_by('user_id', 'date')
+        )
+        seen = set()
+        for user_id, rows in groupby(completion_days.iterator(chunk_size=2000), key=lambda row: row[0]):
+            profile = profiles.get(user_id)
+            if profile is None:
+                continue
+            current, best, last_active = compute_streaks([day for _, day in rows], today)
+            profile.day_streak = current
+            profile.best_streak = best
+            profile.last_active_date = last_active
+            profile.last_streak_reset = last_active - timezone.timedelta(days=current)
+            seen.add(user_id)
+        
+        # Profiles without any completed task
+        for user_id, profile in profiles.items():
+            if user_id not in seen:
+                profile.day_streak = 0
+                profile.best_streak = 0
+                profile.last_active_date = None
+                profile.last_streak_reset = None
+        
+        WellnessProfile.objects.bulk_update(
+            list(profiles.values()),
+            ['day_streak', 'best_streak', 'last_active_date', 'last_streak_reset'],
+            batch_size=batch_size
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt streaks for {len(profiles)} wellness profiles"))
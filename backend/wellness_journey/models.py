@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 
@@ -13,8 +13,55 @@ class WellnessProfile(models.Model):
     day_streak = models.PositiveIntegerField(default=0)
     best_streak = models.PositiveIntegerField(default=0)
     last_streak_reset = models.DateField(null=True, blank=True)
+    last_active_date = models.DateField(null=True, blank=True)
 
-    def add_xp(self, amount):
+    # Streaks are displayed as a 7-day cycle
+    MAX_STREAK = 7
+
+    @classmethod
+    def record_task_completion(cls, user, xp, day=None):
+        """
+        Apply a completed daily task to the user's profile
+
+        XP, level, last login and streak state are updated incrementally on the
+        locked profile row and written with a single UPDATE, so the cost does not
+        depend on how many tasks the user has completed before.
+
+        Args:
+            user: User who completed the task
+            xp: XP awarded by the task
+            day: Date the task belongs to (defaults to today)
+
+        Returns:
+            WellnessProfile: The updated profile
+        """
+        day = day or timezone.now().date()
+        with transaction.atomic():
+            profile, _ = cls.objects.select_for_update().get_or_create(user=user)
+            profile.apply_xp(xp)
+            profile.last_login_date = timezone.now().date()
+            profile.advance_streak(day)
+            profile.save(update_fields=[
+                'xp', 'level', 'stage', 'last_login_date',
+                'day_streak', 'best_streak', 'last_streak_reset', 'last_active_date',
+            ])
+        return profile
+
+    def advance_streak(self, day):
+        """Extend or restart the current streak for activity on day (does not save)"""
+        if self.last_active_date is not None and day <= self.last_active_date:
+            # Already counted (or back-dated; rebuild_wellness_streaks repairs history)
+            return
+        if self.last_active_date == day - timezone.timedelta(days=1):
+            self.day_streak = min(self.day_streak + 1, self.MAX_STREAK)
+        else:
+            self.day_streak = 1
+        self.best_streak = max(self.best_streak, self.day_streak)
+        self.last_active_date = day
+        self.last_streak_reset = day - timezone.timedelta(days=self.day_streak)
+
+    def apply_xp(self, amount):
+        """Add XP and update level and stage (does not save)"""
         self.xp += amount
         # Level up logic: Level 1 (0-999 XP), Level 2 (1000+ XP)
         if self.xp >= 1000 and self.level < 2:
@@ -23,57 +70,10 @@ class WellnessProfile(models.Model):
         elif self.xp < 1000:
             self.level = 1
             self.stage = 'Egg Stage'
-        self.save()
 
-    def calculate_best_streak(self):
-        from .models import DailyTask
-        # Get all dates with completed daily tasks for this user
-        completed_dates = DailyTask.objects.filter(user=self.user, completed=True).values_list('date', flat=True).distinct()
-        if not completed_dates:
-            self.best_streak = 0
-            self.save()
-            return 0
-        # Convert to sorted list of date objects
-        dates = sorted([d for d in completed_dates])
-        best = 1
-        current = 1
-        for i in range(1, len(dates)):
-            if (dates[i] - dates[i-1]).days == 1:
-                current += 1
-                if current > best:
-                    best = current
-            else:
-                current = 1
-        self.best_streak = min(best, 7)
-        self.save()
-        return self.best_streak
-
-    def calculate_day_streak(self):
-        from .models import DailyTask
-        from django.utils import timezone
-        today = timezone.now().date()
-        # Get all unique dates with completed daily tasks for this user, up to today
-        completed_dates = set(DailyTask.objects.filter(user=self.user, completed=True, date__lte=today).values_list('date', flat=True))
-        if not completed_dates:
-            self.day_streak = 0
-            self.last_streak_reset = None
-            self.save()
-            return 0
-        streak = 0
-        for i in range(0, 7):
-            day = today - timezone.timedelta(days=i)
-            if day in completed_dates:
-                streak += 1
-            else:
-                break
-        self.day_streak = streak
-        # Find the last reset date (the day before the current streak started)
-        if streak > 0:
-            self.last_streak_reset = today - timezone.timedelta(days=streak)
-        else:
-            self.last_streak_reset = today
+    def add_xp(self, amount):
+        self.apply_xp(amount)
         self.save()
-        return streak
 
     def __str__(self):
         return f"{self.user.username} Wellness Profile"
@@ -124,9 +124,17 @@ class Achievement(models.Model):
     title = models.CharField(max_length=64)
     description = models.TextField(blank=True)
     date_earned = models.DateTimeField(default=timezone.now)  # allow editing in admin
+    # Award rule and period (e.g. 'daily_task:Hydration Goal' / '2025-03-14'); each is earned once.
+    # Null for rows written before rules existed, which the unique constraint ignores.
+    rule = models.CharField(max_length=64, null=True, blank=True)
+    period = models.CharField(max_length=16, null=True, blank=True)
 
     class Meta:
         ordering = ['-date_earned']
+        unique_together = ('user', 'rule', 'period')
+        indexes = [
+            models.Index(fields=['user', 'date_earned']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.title}"
@@ -0,0 +1,80 @@
+"""
+Daily task and weekly goal provisioning
+
+Each user's task set for a period is created once, by the first list request
+of the period or by the provision_wellness_tasks job, with a single
+bulk_create(ignore_conflicts=True). The unique (user, task, date) and
+(user, goal, week_start) constraints make concurrent provisioning harmless,
+so list endpoints stay read-only once the period exists.
+"""
+
+from django.utils import timezone
+
+from .models import DailyTask, WeeklyGoal
+
+# (task, xp) for the six daily tasks
+DAILY_TASK_DEFINITIONS = [
+    ("Mindful Meditation", 10),
+    ("Active Achievement", 20),
+    ("Hydration Goal", 5),
+    ("Mood Check-In", 8),
+    ("Gratitude Practice", 12),
+    ("Nature Connection", 10),
+]
+
+# (goal, target, xp) for the three weekly goals
+WEEKLY_GOAL_DEFINITIONS = [
+    ("Meditation Master", 5, 50),
+    ("Active Lifestyle", 4, 60),
+    ("Transformation Seeker", 10, 120),
+]
+
+
+def week_start_for(day):
+    """Monday of the week containing day"""
+    return day - timezone.timedelta(days=day.weekday())
+
+
+def provision_daily_tasks(user_ids, day=None, batch_size=1000):
+    """
+    Create the daily task set for each user on day
+
+    Args:
+        user_ids: Iterable of user ids
+        day: Task date (defaults to today)
+        batch_size: Rows per INSERT
+
+    Returns:
+        int: Number of task rows submitted (existing rows are skipped by the database)
+    """
+    day = day or timezone.now().date()
+    tasks = [
+        DailyTask(user_id=user_id, task=task_name, date=day, xp=xp)
+        for user_id in user_ids
+        for task_name, xp in DAILY_TASK_DEFINITIONS
+    ]
+    DailyTask.objects.bulk_create(tasks, ignore_conflicts=True, batch_size=batch_size)
+    return len(tasks)
+
+
+def provision_weekly_goals(user_ids, week_start=None, batch_size=1000):
+    """
+    Create the weekly goal set for each user for the week starting week_start
+
+    Args:
+        user_ids: Iterable of user ids
+        week_start: Monday of the week (defaults to the current week)
+        batch_size: Rows per INSERT
+
+    Returns:
+        int: Number of goal rows submitted (existing rows are skipped by the database)
+    """
+    week_start = week_start or week_start_for(timezone.now().date())
+    goals = [
+        WeeklyGoal(user_id=user_id, goal=goal_name, week_start=week_start,
+                   target=target, xp=xp, progress=0, completed=False)
+        for user_id in user_ids
+        for goal_name, target, xp in WEEKLY_GOAL_DEFINITIONS
+    ]
+    WeeklyGoal.objects.bulk_create(goals, ignore_conflicts=True, batch_size=batch_size)
+    return len(goals)
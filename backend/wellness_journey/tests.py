@@ -1,3 +1,140 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from website.models import User
+from .models import Achievement, DailyTask, WeeklyGoal, WellnessProfile
+from .provisioning import DAILY_TASK_DEFINITIONS, WEEKLY_GOAL_DEFINITIONS
 
 # Create your tests here.
+
+
+class WellnessStreakTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student1', password='testpass123', role='student')
+        self.today = timezone.now().date()
+
+    def complete_on(self, day, xp=10):
+        return WellnessProfile.record_task_completion(self.user, xp, day)
+
+    def test_consecutive_days_extend_streak(self):
+        start = self.today - timedelta(days=3)
+        for offset in range(4):
+            profile = self.complete_on(start + timedelta(days=offset))
+        self.assertEqual((profile.day_streak, profile.best_streak), (4, 4))
+        self.assertEqual(profile.last_active_date, self.today)
+        self.assertEqual(profile.last_streak_reset, start - timedelta(days=1))
+        self.assertEqual(profile.xp, 40)
+
+    def test_same_day_counts_once_and_gap_resets(self):
+        self.complete_on(self.today - timedelta(days=5))
+        self.complete_on(self.today - timedelta(days=4))
+        self.complete_on(self.today - timedelta(days=4))
+        profile = self.complete_on(self.today)
+        self.assertEqual((profile.day_streak, profile.best_streak), (1, 2))
+
+    def test_streak_is_capped(self):
+        for offset in range(10, -1, -1):
+            profile = self.complete_on(self.today - timedelta(days=offset))
+        self.assertEqual((profile.day_streak, profile.best_streak), (7, 7))
+
+    def test_complete_cost_does_not_grow_with_history(self):
+        for offset in range(1, 60):
+            DailyTask.objects.create(user=self.user, task='Hydration Goal', completed=True,
+                                     date=self.today - timedelta(days=offset), xp=5)
+        call_command('rebuild_wellness_streaks', stdout=StringIO())  # no profile yet: nothing to rebuild
+        client = APIClient()
+        client.force_authenticate(self.user)
+        task = DailyTask.objects.create(user=self.user, task='Mood Check-In', date=self.today, xp=8)
+        # Task lookup, completion claim, locked profile get-or-create and UPDATE,
+        # achievement INSERT and request log; none of them scan the 59 earlier completions
+        with self.assertNumQueries(11):
+            response = client.post('/api/wellness-journey/daily-tasks/complete/', {'id': task.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        profile = WellnessProfile.objects.get(user=self.user)
+        self.assertEqual((profile.day_streak, profile.xp), (1, 8))
+
+        # Rebuilding from history sees the unbroken 60 day run
+        call_command('rebuild_wellness_streaks', stdout=StringIO())
+        profile.refresh_from_db()
+        self.assertEqual((profile.day_streak, profile.best_streak, profile.last_active_date), (7, 7, self.today))
+
+        # Completing again is idempotent
+        client.post('/api/wellness-journey/daily-tasks/complete/', {'id': task.id}, format='json')
+        profile.refresh_from_db()
+        self.assertEqual(profile.xp, 8)
+
+
+class WellnessProvisioningTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student1', password='testpass123', role='student')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_provisions_once_then_reads_only(self):
+        for url, model, definitions in (
+            ('/api/wellness-journey/daily-tasks/', DailyTask, DAILY_TASK_DEFINITIONS),
+            ('/api/wellness-journey/weekly-goals/', WeeklyGoal, WEEKLY_GOAL_DEFINITIONS),
+        ):
+            # Read, one bulk INSERT, re-read, request log
+            with self.assertNumQueries(4):
+                response = self.client.get(url)
+            self.assertEqual(len(response.json()), len(definitions))
+            # Afterwards a single SELECT plus the request log
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(len(response.json()), len(definitions))
+            self.assertEqual(model.objects.filter(user=self.user).count(), len(definitions))
+
+    def test_scheduled_provisioning_is_idempotent(self):
+        User.objects.create_user(username='faculty1', password='testpass123', role='faculty')
+        for _ in range(2):
+            call_command('provision_wellness_tasks', stdout=StringIO())
+        self.assertEqual(DailyTask.objects.count(), len(DAILY_TASK_DEFINITIONS))
+        self.assertEqual(WeeklyGoal.objects.count(), len(WEEKLY_GOAL_DEFINITIONS))
+
+
+class AchievementEngineTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student1', password='testpass123', role='student')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = timezone.now().date()
+
+    def test_awards_are_unique_per_rule_and_period(self):
+        from .achievements import award_daily_task
+        task = DailyTask.objects.create(user=self.user, task='Hydration Goal', date=self.today, xp=5)
+        for _ in range(3):
+            award_daily_task(self.user, task)
+        self.assertEqual(Achievement.objects.filter(user=self.user).count(), 1)
+        achievement = Achievement.objects.get()
+        self.assertEqual((achievement.rule, achievement.period), ('daily_task:Hydration Goal', self.today.isoformat()))
+
+    def test_list_is_paginated(self):
+        for offset in range(5):
+            Achievement.objects.create(user=self.user, title='Hydration Goal',
+                                       date_earned=timezone.now() - timedelta(days=offset))
+        for url in ('/api/wellness-journey/achievements/', '/api/wellness-journey/achievements/all/'):
+            response = self.client.get(url, {'limit': 2})
+            self.assertEqual(len(response.json()), 2)
+            cursor = response['X-Next-Cursor']
+            seen = [a['id'] for a in response.json()]
+            while cursor:
+                response = self.client.get(url, {'limit': 2, 'before': cursor})
+                seen += [a['id'] for a in response.json()]
+                cursor = response.get('X-Next-Cursor')
+            self.assertEqual(len(set(seen)), 5)
+
+    def test_legacy_duplicates_are_collapsed(self):
+        day = self.today.isoformat()
+        for _ in range(3):
+            Achievement.objects.create(user=self.user, title='Mood Check-In', description=f'Completed Mood Check-In on {day}')
+        Achievement.objects.create(user=self.user, title='Custom', description='Given by admin')
+        call_command('deduplicate_achievements', stdout=StringIO())
+        self.assertEqual(Achievement.objects.count(), 2)
+        self.assertTrue(Achievement.objects.filter(rule='daily_task:Mood Check-In', period=day).exists())
+
@@ -4,7 +4,12 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.utils import timezone
 from django.db.models import Sum
+from backend.pagination import InvalidCursor, paginate_feed
+from .achievements import award_daily_task, award_weekly_goal
 from .models import WellnessProfile, DailyTask, WeeklyGoal, Achievement
+from .provisioning import (
+    DAILY_TASK_DEFINITIONS, WEEKLY_GOAL_DEFINITIONS, provision_daily_tasks, provision_weekly_goals, week_start_for
+)
 from .serializers import WellnessProfileSerializer, DailyTaskSerializer, WeeklyGoalSerializer, AchievementSerializer
 from rest_framework.settings import api_settings
 
@@ -30,56 +35,28 @@ class DailyTaskViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        today = timezone.now().date()
-        # Ensure all 6 daily tasks exist for the user for today
-        task_defs = [
-            ("Mindful Meditation", 10),
-            ("Active Achievement", 20),
-            ("Hydration Goal", 5),
-            ("Mood Check-In", 8),
-            ("Gratitude Practice", 12),
-            ("Nature Connection", 10),
-        ]
-        for task_name, xp in task_defs:
-            DailyTask.objects.get_or_create(
-                user=self.request.user,
-                task=task_name,
-                date=today,
-                defaults={"xp": xp}
-            )
-        return DailyTask.objects.filter(user=self.request.user, date=today)
+        return DailyTask.objects.filter(user=self.request.user, date=timezone.now().date())
+
+    def list(self, request, *args, **kwargs):
+        tasks = list(self.get_queryset())
+        if len(tasks) < len(DAILY_TASK_DEFINITIONS):
+            # First visit of the day: create all 6 daily tasks at once
+            provision_daily_tasks([request.user.id])
+            tasks = list(self.get_queryset())
+        serializer = self.get_serializer(tasks, many=True)
+        return Response(serializer.data)
 
     @action(detail=False, methods=['post'])
     def complete(self, request):
         task_id = request.data.get('id')
         try:
             task = DailyTask.objects.get(id=task_id, user=request.user)
-            if not task.completed:
-                task.completed = True
-                task.save()
-                # Add XP to profile
-                profile, _ = WellnessProfile.objects.get_or_create(user=request.user)
-                profile.add_xp(task.xp)
-                # Update last_login_date
-                today = timezone.now().date()
-                profile.last_login_date = today
-                # Calculate day streak
-                yesterday = today - timezone.timedelta(days=1)
-                if profile.last_login_date == yesterday:
-                    profile.day_streak += 1
-                elif profile.last_login_date != today:
-                    profile.day_streak = 1
-                    profile.last_streak_reset = today
-                # Update best streak
-                if profile.day_streak > profile.best_streak:
-                    profile.best_streak = profile.day_streak
-                profile.save()
-                # Update best streak using frontend logic
-                profile.calculate_best_streak()
-                # Update day streak and last streak reset using frontend logic
-                profile.calculate_day_streak()
-                # Always create a new achievement entry
-                Achievement.objects.create(user=request.user, title=task.task, description=f'Completed {task.task} on {timezone.now().date()}')
+            # Claim the completion atomically so a double submit awards XP once
+            if DailyTask.objects.filter(id=task.id, completed=False).update(completed=True):
+                # XP, level and streaks in one locked profile update
+                WellnessProfile.record_task_completion(request.user, task.xp, task.date)
+                # One achievement per task and day, however often this is retried
+                award_daily_task(request.user, task)
             return Response({'status': 'completed'})
         except DailyTask.DoesNotExist:
             return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -90,23 +67,18 @@ class WeeklyGoalViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        week_start = timezone.now().date() - timezone.timedelta(days=timezone.now().date().weekday())
-        # Define the weekly goals, targets, and XP
-        goal_defs = [
-            ("Meditation Master", 5, 50),
-            ("Active Lifestyle", 4, 60),
-            ("Transformation Seeker", 10, 120),
-        ]
-        # Ensure all 3 weekly goals exist for the user for the current week
-        for goal_name, target, xp in goal_defs:
-            WeeklyGoal.objects.get_or_create(
-                user=self.request.user,
-                goal=goal_name,
-                week_start=week_start,
-                defaults={"target": target, "xp": xp, "progress": 0, "completed": False}
-            )
+        week_start = week_start_for(timezone.now().date())
         return WeeklyGoal.objects.filter(user=self.request.user, week_start=week_start)
 
+    def list(self, request, *args, **kwargs):
+        goals = list(self.get_queryset())
+        if len(goals) < len(WEEKLY_GOAL_DEFINITIONS):
+            # First visit of the week: create all 3 weekly goals at once
+            provision_weekly_goals([request.user.id])
+            goals = list(self.get_queryset())
+        serializer = self.get_serializer(goals, many=True)
+        return Response(serializer.data)
+
     @action(detail=False, methods=['post'])
     def progress(self, request):
         goal_id = request.data.get('id')
@@ -119,12 +91,8 @@ class WeeklyGoalViewSet(viewsets.ModelViewSet):
                     # Add XP to profile
                     profile, _ = WellnessProfile.objects.get_or_create(user=request.user)
                     profile.add_xp(goal.xp)
-                    # Achievement: always create a new one for each week
-                    achievement = Achievement.objects.create(
-                        user=request.user,
-                        title=goal.goal,
-                        description=f'Achieved {goal.goal} for the week starting {goal.week_start}.'
-                    )
+                    # Achievement: one per goal and week
+                    award_weekly_goal(request.user, goal)
                 goal.save()
             return Response({'status': 'progressed'})
         except WeeklyGoal.DoesNotExist:
@@ -134,14 +102,23 @@ class AchievementViewSet(viewsets.ModelViewSet):
     queryset = Achievement.objects.all()
     serializer_class = AchievementSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = None  # Disable pagination for achievements
+    pagination_class = None  # Lists are paged with cursors in list()
 
     def get_queryset(self):
         return Achievement.objects.filter(user=self.request.user).order_by('-date_earned')
 
-    # Custom endpoint to return all achievements for the user, no pagination
+    def list(self, request, *args, **kwargs):
+        # Newest first, ?limit= per page; the next page cursor is sent in X-Next-Cursor (?before=)
+        try:
+            achievements, headers = paginate_feed(
+                self.get_queryset(), request, order_field='date_earned', change_field='date_earned'
+            )
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(achievements, many=True)
+        return Response(serializer.data, headers=headers)
+
+    # Endpoint the frontend calls; paged like list() so long histories are not sent in one response
     @action(detail=False, methods=['get'])
     def all(self, request):
-        achievements = Achievement.objects.filter(user=request.user).order_by('-date_earned')
-        serializer = self.get_serializer(achievements, many=True)
-        return Response(serializer.data)
+        return self.list(request)